@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """
-gw1000.py
+gw1000/__init__.py
 
 A WeeWX driver for devices using the Ecowitt LAN/Wi-Fi Gateway API.
 
@@ -39,6 +39,102 @@ this program.  If not, see https://www.gnu.org/licenses/.
 Version: 0.6.3                                     Date: 2 August 2024
 
 Revision History
+    Unreleased
+        -   added optional capture of raw API request and response frames to
+            an indexed, rotating, append-only binary capture file, enabled by
+            setting config option capture_path
+        -   added a replay mode that passes captured API responses through the
+            full driver processing pipeline in real time, a multiple of real
+            time or as fast as possible, enabled by setting config option
+            replay_path or by use of the --replay command line option
+        -   added the --backfill command line option to import a frame capture
+            into the WeeWX archive
+        -   the driver can now generate archive records, enabled by setting
+            config option archive_interval, recently completed archive records
+            are retained and optionally saved to disk so WeeWX can catch up
+            after a restart
+        -   the device can now be polled by a separate process, enabled by
+            setting config option collector_process, collector data is passed
+            to the driver/service via a shared memory ring, the process is
+            spawned rather than forked so it cannot inherit a lock held by
+            another WeeWX thread
+        -   GatewayDevice property values are now cached with a per property
+            time to live and concurrent requests for the same property share a
+            single device request
+        -   the API commands used each poll are now negotiated on startup,
+            CMD_READ_RAIN is no longer used if it provides no additional mapped
+            fields, eg on a station without a piezo rain gauge
+        -   added an adaptive poll mode that learns the update period and
+            phase of each group of sensor fields and polls just after each
+            expected update, enabled by setting config option adaptive_poll
+        -   added optional high rate wind only polls between full polls, the
+            highest gust and average wind seen are used to enrich the next full
+            poll data, enabled by setting config option wind_poll_interval
+        -   polling is now throttled when the device shows memory pressure or
+            rising response latency, when throttled the poll interval is
+            stretched, sensor state data and firmware update checks are not
+            refreshed, wind only polls are suspended and device requests are
+            serialised
+        -   failed API commands are now retried with exponential backoff and
+            jitter starting from retry_wait (now 1 second by default), a
+            device that stops responding is no longer sent API commands until
+            a reset period has elapsed, refused connections are not retried
+            and retry waits are abandoned on shutdown
+        -   API socket timeouts are now derived from the observed response
+            times of each device and API command, the estimates are available
+            via GatewayApi.rtt_stats
+        -   all blocking waits in the collector, API command and discovery
+            paths can now be cancelled, collector shutdown now completes in
+            under a second
+        -   sensor data may now be received from device 'customized' Ecowitt
+            protocol uploads rather than by polling the API, optionally the
+            API is polled at a slower rate for fields not included in uploads,
+            API data is not used if the last poll failed or it is stale, a
+            failed API poll does not interrupt uploads
+        -   live data may now be obtained via both the API and HTTP, each
+            field is obtained via the fastest transport that provides it and
+            per transport latency and CPU cost statistics are recorded
+        -   parsed device data is now held in a compact record with a shared
+            field layout from parsing through to field mapping, reducing the
+            memory used per packet and the cost of mapping device fields
+        -   added an optional in memory rolling history of parsed device data
+            that can be queried for recent values and statistics without
+            accessing the database, enabled by setting config option
+            history_window, the history is sized for the shortest poll
+            interval in use
+        -   windowed aggregates (eg 10 minute average wind or 1 hour rain) of
+            parsed device data can now be emitted as derived loop packet
+            fields, the aggregates are maintained incrementally as each packet
+            is received, derived fields are specified under config option
+            [[derived_fields]]
+        -   a standby gateway device receiving the same sensors may be
+            specified using config option standby_ip_address, if a poll of
+            the primary device fails the standby device is polled instead and
+            cumulative rain and lightning counters continue across the switch,
+            the standby device is health checked in the background and an
+            unresponsive standby device does not delay startup or polls, the
+            number of attempts made of the primary device before switching is
+            set by config option primary_max_tries
+        -   data from several gateway devices receiving the same sensors may
+            be combined using config option gateways, each sensor is reported
+            once only using the data from the device with the best signal
+            level for that sensor, an unresponsive additional device is
+            skipped rather than delaying polls
+        -   the driver is now a package, the configuration editor,
+            configurator, command line interface and the push and process
+            collectors are imported only when first used which reduces the
+            time taken to load the driver or service, bin/user/gw1000.py from
+            an earlier install is no longer used and may be deleted
+        -   custom units are now defined once per process rather than each
+            time a driver or service object is created
+        -   when running the driver directly each action now contacts the
+            device only as required, sends only the API commands the action
+            needs and uses a single connection to the device
+        -   added --follow command line option to continuously display
+            --live-data output as JSON Lines over a single connection to the
+            device, fields are converted and rounded using a per-field
+            conversion determined once, optionally only changed fields are
+            displayed
     2 August 2024          `v0.6.3
         -   added support for WS85 sensor array
         -   added support for WH46 air quality sensor
@@ -326,6 +422,12 @@ depend on the sensors connected to the device. As the field names returned by
 mapped to WeeWX fields names, the --live-data output is useful for configuring
 the field map to be used by the Ecowitt Gateway driver.
 
+    Note: Adding the --follow command line option displays the live data
+          continuously as one JSON object per line (JSON Lines) every
+          --poll-interval seconds, which may be piped to another program
+          without running WeeWX. Use --changed-only to display only those
+          fields that have changed since the previous poll.
+
 5.  Once you believe the Ecowitt Gateway driver is configured the --test-driver
 or --test-service command line options can be used to confirm correct operation
 of the Ecowitt Gateway driver as a driver or as a service respectively.
@@ -359,26 +461,58 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-import calendar
-import configobj
+import array
+import binascii
+import bisect
+import collections
+import copy
+import errno
+import importlib
 import json
+import math
+import os
+import os.path
+import random
 import re
+import select
 import socket
 import struct
+import sys
 import threading
 import time
-from operator import itemgetter
 
 # Python 2/3 compatibility shims
 import six
-from six.moves import StringIO
 from six.moves import urllib
 from six.moves.urllib.error import URLError
 from six.moves.urllib.parse import urlencode
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    # python 2
+    from collections import MutableMapping
+# numpy is optional, if available it is used to hold and query the history
+# buffer
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# time.monotonic() is not available under python 2, fall back to time.time()
+try:
+    monotonic = time.monotonic
+except AttributeError:
+    monotonic = time.time
+# time.thread_time() is not available under python 2 or on some platforms,
+# fall back to time.clock()
+try:
+    thread_time = time.thread_time
+except AttributeError:
+    thread_time = getattr(time, 'clock', time.time)
 
 # WeeWX imports
-import weecfg
 import weeutil.weeutil
+import weewx.accum
 import weewx.drivers
 import weewx.engine
 import weewx.units
@@ -457,6 +591,9 @@ default_broadcast_address = '255.255.255.255'
 default_broadcast_port = 46000
 # default socket timeout
 default_socket_timeout = 2
+# default bounds in seconds of adaptive socket timeouts
+default_min_socket_timeout = 0.5
+default_max_socket_timeout = 10
 # default broadcast timeout
 default_broadcast_timeout = 5
 # default discovery method, may be 'api' or 'broadcast'
@@ -465,15 +602,39 @@ default_discovery_method = 'broadcast'
 default_discovery_port = 59387
 # default period in seconds to use for discovery of devices by broadcast monitoring
 default_discovery_period = 5
-# default retry/wait time
-default_retry_wait = 10
+# default wait time in seconds before the first retry of a failed API
+# command, the retry wait time doubles with each further retry
+default_retry_wait = 1
 # default max tries when polling the API
 default_max_tries = 3
+# default maximum retry wait time, retry wait time doubles with each retry up
+# to this limit
+default_max_retry_wait = 60
+# default number of consecutive failed attempts to send an API command after
+# which API commands are not sent to the device, more than default_max_tries
+# so that a single failed API command does not suspend API commands
+default_breaker_threshold = 6
+# default period in seconds after which an API command is again sent to a
+# device that has stopped responding
+default_breaker_reset = 60
 # When run as a service the default age in seconds after which API data is
 # considered stale and will not be used to augment loop packets
 default_max_age = 60
 # default device poll interval
 default_poll_interval = 20
+# default minimum and maximum period in seconds between adaptive polls
+default_min_poll_interval = 5
+default_max_poll_interval = 60
+# default period in seconds after an expected sensor update that an adaptive
+# poll occurs
+default_poll_margin = 1.0
+# default device free heap memory in bytes below which polling is throttled
+default_throttle_heap_free = 20000
+# default multiple of the baseline device response latency above which
+# polling is throttled
+default_throttle_latency_factor = 3.0
+# default multiple by which the poll interval is stretched when throttled
+default_throttle_poll_factor = 2.0
 # default period between lost contact log entries during an extended period of
 # lost contact when run as a Service
 default_lost_contact_log_period = 21600
@@ -481,6 +642,52 @@ default_lost_contact_log_period = 21600
 default_show_battery = False
 # default firmware update check interval
 default_fw_check_interval = 86400
+# default capture replay speed as a multiple of real time, 0 replays as fast as
+# possible
+default_replay_speed = 1.0
+# default maximum number of replayed polls queued for the driver/service
+default_replay_queue_size = 100
+# default port on which uploads from the device are received
+default_push_port = 8080
+# default interval in seconds between probes of the API and HTTP live data
+# transports
+default_http_probe_interval = 3600
+# default interval (seconds) between health checks of a standby device
+default_health_check_interval = 60
+# default maximum socket timeout in seconds used with a standby or additional
+# gateway device
+default_secondary_socket_timeout = 1
+# default number of consecutive successful primary device health checks before
+# switching back to the primary device
+default_failback_checks = 3
+# default max tries when polling the primary device of a primary and standby
+# pair, the standby device is the retry
+default_primary_max_tries = 1
+# default number of archive records saved per transaction when importing a
+# frame capture
+default_backfill_batch_size = 1000
+# default number of recently completed archive records retained by the driver
+default_archive_ring_size = 288
+# default number of slots in the shared memory ring used by a collector
+# process
+default_ring_slots = 64
+# default size in bytes of each shared memory ring slot
+default_ring_slot_size = 8192
+# default size in bytes at which a frame capture file is rotated, 0 disables
+# size based rotation
+default_capture_max_size = 10485760
+# default age in seconds at which a frame capture file is rotated, 0 disables
+# time based rotation
+default_capture_rotate_interval = 86400
+# default number of rotated frame capture files to keep
+default_capture_keep = 7
+# default size in bytes of the frame capture write buffer
+default_capture_buffer_size = 65536
+# default period in seconds between frame capture index entries
+default_capture_index_interval = 60
+# default maximum period in seconds that captured frames are buffered before
+# being written to disk
+default_capture_flush_interval = 10
 # For packet unit conversion to work correctly each possible WeeWX field needs
 # to be assigned to a unit group. This is normally already taken care of for
 # WeeWX fields that are part of the in-use database schema; however, an Ecowitt
@@ -714,6 +921,16 @@ class GWIOError(Exception):
     encountered."""
 
 
+class CircuitOpen(GWIOError):
+    """Exception raised when an API command is not sent because the device
+    has stopped responding."""
+
+
+class OperationCancelled(GWIOError):
+    """Exception raised when a device operation is cancelled, eg on
+    shutdown."""
+
+
 class DebugOptions(object):
     """Class to simplify use and handling of device debug options."""
 
@@ -1071,6 +1288,9 @@ class Gateway(object):
 
         # obtain the field map to be used
         self.field_map = self.construct_field_map(gw_config)
+        # the field map as applied to each PacketRecord layout, keyed by
+        # layout
+        self.map_plans = {}
         # network broadcast address and port
         self.broadcast_address = str.encode(gw_config.get('broadcast_address',
                                                           default_broadcast_address))
@@ -1078,6 +1298,13 @@ class Gateway(object):
                                                                    default_broadcast_port))
         self.socket_timeout = weeutil.weeutil.to_int(gw_config.get('socket_timeout',
                                                                    default_socket_timeout))
+        # are API socket timeouts derived from observed device response
+        # times, and if so within what bounds
+        self.adaptive_timeout = weeutil.weeutil.tobool(gw_config.get('adaptive_timeout', True))
+        self.min_socket_timeout = weeutil.weeutil.to_float(gw_config.get('min_socket_timeout',
+                                                                         default_min_socket_timeout))
+        self.max_socket_timeout = weeutil.weeutil.to_float(gw_config.get('max_socket_timeout',
+                                                                         default_max_socket_timeout))
         self.broadcast_timeout = weeutil.weeutil.to_int(gw_config.get('broadcast_timeout',
                                                                       default_broadcast_timeout))
 
@@ -1118,13 +1345,49 @@ class Gateway(object):
         # how many times to poll the API before giving up, default is
         # default_max_tries
         self.max_tries = int(gw_config.get('max_tries', default_max_tries))
-        # wait time in seconds between retries, default is default_retry_wait
-        # seconds
+        # wait time in seconds before the first retry, the wait time doubles
+        # with each further retry, default is default_retry_wait seconds
         self.retry_wait = int(gw_config.get('retry_wait',
                                             default_retry_wait))
+        # maximum wait time in seconds between retries, default is
+        # default_max_retry_wait seconds
+        self.max_retry_wait = weeutil.weeutil.to_int(gw_config.get('max_retry_wait',
+                                                                   default_max_retry_wait))
+        # how many consecutive failed attempts to send an API command before
+        # we stop sending API commands to the device and for how long, 0
+        # disables
+        self.breaker_threshold = weeutil.weeutil.to_int(gw_config.get('breaker_threshold',
+                                                                      default_breaker_threshold))
+        self.breaker_reset = weeutil.weeutil.to_int(gw_config.get('breaker_reset',
+                                                                  default_breaker_reset))
         # how often (in seconds) we should poll the API, use a default
         self.poll_interval = int(gw_config.get('poll_interval',
                                                default_poll_interval))
+        # how often (in seconds) we should poll the API for wind data only
+        # between full polls, None or 0 disables wind only polls
+        wind_poll_interval = weeutil.weeutil.to_float(gw_config.get('wind_poll_interval', 0))
+        # do we throttle polling when the device is unhealthy, if so obtain a
+        # DeviceHealthMonitor object
+        if weeutil.weeutil.tobool(gw_config.get('throttle', True)):
+            health_monitor = DeviceHealthMonitor(heap_free=weeutil.weeutil.to_int(gw_config.get('throttle_heap_free',
+                                                                                                 default_throttle_heap_free)),
+                                                 latency_factor=weeutil.weeutil.to_float(gw_config.get('throttle_latency_factor',
+                                                                                                       default_throttle_latency_factor)),
+                                                 poll_factor=weeutil.weeutil.to_float(gw_config.get('throttle_poll_factor',
+                                                                                                    default_throttle_poll_factor)))
+        else:
+            health_monitor = None
+        # do we adapt our poll times to sensor updates, if so obtain an
+        # AdaptivePollScheduler object
+        if weeutil.weeutil.tobool(gw_config.get('adaptive_poll', False)):
+            poll_scheduler = AdaptivePollScheduler(min_interval=weeutil.weeutil.to_float(gw_config.get('min_poll_interval',
+                                                                                                        default_min_poll_interval)),
+                                                   max_interval=weeutil.weeutil.to_float(gw_config.get('max_poll_interval',
+                                                                                                        default_max_poll_interval)),
+                                                   margin=weeutil.weeutil.to_float(gw_config.get('poll_margin',
+                                                                                                  default_poll_margin)))
+        else:
+            poll_scheduler = None
         # Is a WH32 in use. WH32 TH sensor can override/provide outdoor TH data
         # to the gateway device. In terms of TH data the process is transparent
         # and we do not need to know if a WH32 or other sensor is providing
@@ -1167,6 +1430,50 @@ class Gateway(object):
         # whether to log an available firmware update
         log_fw_update_avail = weeutil.weeutil.tobool(gw_config.get('log_firmware_update_avail',
                                                                    False))
+        # are we capturing API frames, if so obtain a FrameRecorder object
+        capture_path = gw_config.get('capture_path')
+        if capture_path is not None:
+            recorder = FrameRecorder(capture_path,
+                                     max_size=weeutil.weeutil.to_int(gw_config.get('capture_max_size',
+                                                                                   default_capture_max_size)),
+                                     rotate_interval=weeutil.weeutil.to_int(gw_config.get('capture_rotate_interval',
+                                                                                          default_capture_rotate_interval)),
+                                     keep=weeutil.weeutil.to_int(gw_config.get('capture_keep',
+                                                                               default_capture_keep)),
+                                     buffer_size=weeutil.weeutil.to_int(gw_config.get('capture_buffer_size',
+                                                                                      default_capture_buffer_size)),
+                                     index_interval=weeutil.weeutil.to_int(gw_config.get('capture_index_interval',
+                                                                                         default_capture_index_interval)),
+                                     flush_interval=weeutil.weeutil.to_int(gw_config.get('capture_flush_interval',
+                                                                                         default_capture_flush_interval)))
+        else:
+            recorder = None
+        # do we keep an in memory history of parsed device data, if so obtain
+        # a HistoryBuffer object sized to hold history_window seconds of polls,
+        # if polling is adaptive allow for polls as often as the minimum poll
+        # interval
+        history_window = weeutil.weeutil.to_int(gw_config.get('history_window', 0))
+        if history_window > 0:
+            if poll_scheduler is not None:
+                shortest_interval = poll_scheduler.min_interval
+            else:
+                shortest_interval = self.poll_interval
+            history_slots = weeutil.weeutil.to_int(gw_config.get('history_slots',
+                                                                 int(math.ceil(float(history_window) / shortest_interval))))
+            self.history = HistoryBuffer(max(history_slots, 1))
+        else:
+            self.history = None
+        # do we derive windowed aggregate fields, if so obtain a
+        # WindowAggregator object
+        derived_fields = WindowAggregator.parse_config(gw_config.get('derived_fields', {}))
+        if len(derived_fields) > 0:
+            self.aggregator = WindowAggregator(derived_fields)
+            self.define_derived_fields(derived_fields)
+        else:
+            self.aggregator = None
+        # any GatewayDevice property cache time to live overrides, a value of
+        # None caches until invalidated, 0 disables caching
+        cache_ttl = dict((k, weeutil.weeutil.to_int(v)) for k, v in six.iteritems(gw_config.get('cache_ttl', {})))
 
         # log our config/settings that are not being pushed further down before
         # we obtain a GatewayCollector object, obtaining a gatewayCollector
@@ -1183,17 +1490,44 @@ class Gateway(object):
             loginf('     device port not specified, port will be obtained by discovery')
         elif self.ip_address is None and self.port is None:
             loginf('     device IP address and port not specified, address and port will be obtained by discovery')
-        loginf('     poll interval is %d seconds' % self.poll_interval)
+        if poll_scheduler is not None:
+            loginf('     adaptive polling, poll interval is %s to %s seconds' % (poll_scheduler.min_interval,
+                                                                                poll_scheduler.max_interval))
+        else:
+            loginf('     poll interval is %d seconds' % self.poll_interval)
         if self.debug.any or weewx.debug > 0:
-            loginf('     max tries is %d, retry wait time is %d seconds' % (self.max_tries,
-                                                                            self.retry_wait))
+            loginf('     max tries is %d, retry wait time is %d to %d seconds' % (self.max_tries,
+                                                                                  self.retry_wait,
+                                                                                  self.max_retry_wait))
+            if self.breaker_threshold > 0:
+                loginf('     API commands will be suspended for %d seconds after %d consecutive failed attempts' % (self.breaker_reset,
+                                                                                                                self.breaker_threshold))
             loginf('     broadcast address is %s:%d, broadcast timeout is %d seconds' % (self.broadcast_address.decode(),
                                                                                          self.broadcast_port,
                                                                                          self.broadcast_timeout))
-            loginf('     socket timeout is %d seconds' % self.socket_timeout)
+            if self.adaptive_timeout:
+                loginf('     socket timeout is adaptive, initially %d seconds, '
+                       'bounded by %s and %s seconds' % (self.socket_timeout,
+                                                         self.min_socket_timeout,
+                                                         self.max_socket_timeout))
+            else:
+                loginf('     socket timeout is %d seconds' % self.socket_timeout)
             loginf("     device discovery method is '%s'" % self.discovery_method)
             loginf("     discovery port is %d, discovery period is %d" % (self.discovery_port,
                                                                           self.discovery_period))
+            if recorder is not None:
+                loginf("     API frames will be captured to '%s'" % recorder.path)
+            if len(cache_ttl) > 0:
+                loginf('     device property cache time to live overrides are %s' % natural_sort_dict(cache_ttl))
+            if health_monitor is not None:
+                loginf('     polling will be throttled if free heap memory is below %d bytes '
+                       'or response latency exceeds %s times baseline' % (health_monitor.heap_free_threshold,
+                                                                         health_monitor.latency_factor))
+            if self.aggregator is not None:
+                loginf('     derived fields are %s' % natural_sort_dict(derived_fields))
+            if self.history is not None:
+                loginf('     the most recent %d packets of device data will be held in memory%s' % (self.history.slots,
+                                                                                                 '' if numpy is not None else ' (numpy not available)'))
             # The field map. Field map dict output will be in unsorted key order.
             # It is easier to read if sorted alphanumerically, but we have keys
             # such as xxxxx16 that do not sort well. Use a custom natural sort of
@@ -1211,27 +1545,107 @@ class Gateway(object):
         if len(debug_list) > 0:
             loginf(" ".join(debug_list))
 
-        # create an GatewayCollector object to interact with the gateway device
-        # API
-        self.collector = GatewayCollector(ip_address=self.ip_address,
-                                          port=self.port,
-                                          broadcast_address=self.broadcast_address,
-                                          broadcast_port=self.broadcast_port,
-                                          socket_timeout=self.socket_timeout,
-                                          broadcast_timeout=self.broadcast_timeout,
-                                          poll_interval=self.poll_interval,
-                                          max_tries=self.max_tries,
-                                          retry_wait=self.retry_wait,
-                                          use_wh32=use_wh32,
-                                          ignore_wh40_batt=ignore_wh40_batt,
-                                          show_battery=show_battery,
-                                          discovery_method=self.discovery_method,
-                                          discovery_port=self.discovery_port,
-                                          discovery_period=self.discovery_period,
-                                          log_unknown_fields=log_unknown_fields,
-                                          fw_update_check_interval=fw_update_check_interval,
-                                          log_fw_update_avail=log_fw_update_avail,
-                                          debug=self.debug)
+        # are we replaying a frame capture rather than using a gateway device
+        replay_path = gw_config.get('replay_path')
+        if replay_path is not None:
+            # create a ReplayCollector object to replay the capture
+            replay_speed = weeutil.weeutil.to_float(gw_config.get('replay_speed',
+                                                                  default_replay_speed))
+            if replay_speed > 0:
+                loginf("     replaying frame capture '%s' at %s times real time" % (replay_path,
+                                                                                   replay_speed))
+            else:
+                loginf("     replaying frame capture '%s' as fast as possible" % replay_path)
+            self.collector = ReplayCollector(replay_path,
+                                             speed=replay_speed,
+                                             use_wh32=use_wh32,
+                                             ignore_wh40_batt=ignore_wh40_batt,
+                                             show_battery=show_battery,
+                                             log_unknown_fields=log_unknown_fields,
+                                             debug=self.debug)
+        else:
+            # the GatewayCollector parameters, common to all collectors that
+            # interact with a gateway device
+            collector_kwargs = dict(ip_address=self.ip_address,
+                                    port=self.port,
+                                    broadcast_address=self.broadcast_address,
+                                    broadcast_port=self.broadcast_port,
+                                    socket_timeout=self.socket_timeout,
+                                    broadcast_timeout=self.broadcast_timeout,
+                                    poll_interval=self.poll_interval,
+                                    max_tries=self.max_tries,
+                                    retry_wait=self.retry_wait,
+                                    use_wh32=use_wh32,
+                                    ignore_wh40_batt=ignore_wh40_batt,
+                                    show_battery=show_battery,
+                                    discovery_method=self.discovery_method,
+                                    discovery_port=self.discovery_port,
+                                    discovery_period=self.discovery_period,
+                                    log_unknown_fields=log_unknown_fields,
+                                    fw_update_check_interval=fw_update_check_interval,
+                                    log_fw_update_avail=log_fw_update_avail,
+                                    recorder=recorder,
+                                    cache_ttl=cache_ttl,
+                                    required_fields=self.field_map.values(),
+                                    poll_scheduler=poll_scheduler,
+                                    wind_poll_interval=wind_poll_interval,
+                                    health_monitor=health_monitor,
+                                    max_retry_wait=self.max_retry_wait,
+                                    breaker_threshold=self.breaker_threshold,
+                                    breaker_reset=self.breaker_reset,
+                                    adaptive_timeout=self.adaptive_timeout,
+                                    min_socket_timeout=self.min_socket_timeout,
+                                    max_socket_timeout=self.max_socket_timeout,
+                                    hybrid_livedata=weeutil.weeutil.tobool(gw_config.get('hybrid_livedata',
+                                                                                         False)),
+                                    http_probe_interval=weeutil.weeutil.to_int(gw_config.get('http_probe_interval',
+                                                                                             default_http_probe_interval)),
+                                    debug=self.debug)
+            if weeutil.weeutil.tobool(gw_config.get('push_receiver', False)):
+                # create a PushCollector object to receive data uploaded by
+                # the gateway device
+                push_port = weeutil.weeutil.to_int(gw_config.get('push_port',
+                                                                 default_push_port))
+                loginf('     device data will be received from device uploads on port %d' % push_port)
+                from .push import PushCollector
+                self.collector = PushCollector(push_address=gw_config.get('push_address', ''),
+                                               push_port=push_port,
+                                               push_passkey=gw_config.get('push_passkey'),
+                                               hybrid_poll_interval=weeutil.weeutil.to_int(gw_config.get('hybrid_poll_interval',
+                                                                                                         0)),
+                                               **collector_kwargs)
+            elif weeutil.weeutil.tobool(gw_config.get('collector_process', False)):
+                # create a ProcessCollector object to interact with the
+                # gateway device API from a separate process
+                loginf('     device will be polled by a separate process')
+                from .process import ProcessCollector
+                self.collector = ProcessCollector(ring_slots=weeutil.weeutil.to_int(gw_config.get('ring_slots',
+                                                                                                  default_ring_slots)),
+                                                  ring_slot_size=weeutil.weeutil.to_int(gw_config.get('ring_slot_size',
+                                                                                                      default_ring_slot_size)),
+                                                  **collector_kwargs)
+            elif gw_config.get('standby_ip_address') is not None:
+                # create a FailoverCollector object to interact with a
+                # primary and standby gateway device
+                self.collector = FailoverCollector(standby_ip_address=gw_config['standby_ip_address'],
+                                                   standby_port=weeutil.weeutil.to_int(gw_config.get('standby_port',
+                                                                                                     default_port)),
+                                                   health_check_interval=weeutil.weeutil.to_int(gw_config.get('health_check_interval',
+                                                                                                              default_health_check_interval)),
+                                                   failback_checks=weeutil.weeutil.to_int(gw_config.get('failback_checks',
+                                                                                                        default_failback_checks)),
+                                                   primary_max_tries=weeutil.weeutil.to_int(gw_config.get('primary_max_tries',
+                                                                                                          default_primary_max_tries)),
+                                                   **collector_kwargs)
+            elif gw_config.get('gateways') is not None:
+                # create a MultiGatewayCollector object to combine data from
+                # several gateway devices
+                self.collector = MultiGatewayCollector(gateways=self.parse_gateways(gw_config['gateways']),
+                                                       **collector_kwargs)
+            else:
+                # create an GatewayCollector object to interact with the
+                # gateway device API
+                self.collector = GatewayCollector(**collector_kwargs)
         # initialise last lightning count and last rain properties
         self.last_lightning = None
         self.last_rain = None
@@ -1241,6 +1655,54 @@ class Gateway(object):
         self.piezo_rain_mapping_confirmed = False
         self.piezo_rain_total_field = None
 
+    @staticmethod
+    def parse_gateways(gateways):
+        """Parse a list of additional gateway device addresses.
+
+        gateways: list of gateway device addresses in the format
+                  'IP address[:port]', if the port is omitted the default
+                  port is used
+
+        Returns a list of (IP address, port) tuples.
+        """
+
+        result = []
+        for gateway in weeutil.weeutil.option_as_list(gateways):
+            ip_address, _, port = gateway.strip().partition(':')
+            result.append((ip_address, int(port) if port else default_port))
+        return result
+
+    def define_derived_fields(self, derived_fields):
+        """Assign unit groups and accumulator extractors to derived fields.
+
+        A derived field takes the unit group of the WeeWX field to which its
+        source field is mapped, a count takes unit group 'group_count'. As a
+        derived field is already aggregated over a window the 'last'
+        accumulator extractor is used. Existing unit group and accumulator
+        settings are not overwritten.
+        """
+
+        # map of device field to WeeWX field
+        weewx_fields = dict((v, k) for k, v in six.iteritems(self.field_map))
+        for name, (source, agg, window) in six.iteritems(derived_fields):
+            if agg == 'count':
+                group = 'group_count'
+            else:
+                group = weewx.units.obs_group_dict.get(weewx_fields.get(source))
+                if agg == 'delta' and group == 'group_temperature':
+                    # a temperature difference cannot be converted as a
+                    # temperature
+                    group = None
+            if group is not None and name not in weewx.units.obs_group_dict:
+                weewx.units.obs_group_dict[name] = group
+            try:
+                # accumulator configuration is appended so it may be
+                # overridden by the user
+                weewx.accum.accum_dict.maps.append({name: {'extractor': 'last'}})
+            except AttributeError:
+                # WeeWX 3 does not have accumulator configuration
+                pass
+
     @staticmethod
     def construct_field_map(gw_config):
         """Given a gateway device config construct the field map."""
@@ -1316,6 +1778,22 @@ class Gateway(object):
 
         # parsed device API data uses the METRICWX unit system
         _result = {'usUnits': weewx.METRICWX}
+        if isinstance(data, PacketRecord):
+            # we have a PacketRecord, the fields to be mapped and their
+            # indices need only be determined once for each record layout
+            plan = self.map_plans.get(data.layout)
+            if plan is None:
+                index = data.layout.index
+                plan = [(weewx_field, index[data_field])
+                        for weewx_field, data_field in six.iteritems(self.field_map)
+                        if data_field in index]
+                self.map_plans[data.layout] = plan
+            values = data.values
+            missing = PacketRecord.missing
+            for weewx_field, i in plan:
+                if values[i] is not missing:
+                    _result[weewx_field] = values[i]
+            return _result
         # iterate over each of the key, value pairs in the field map
         for weewx_field, data_field in six.iteritems(self.field_map):
             # if the field to be mapped exists in the data obtain it's
@@ -1799,8 +2277,14 @@ class GatewayService(weewx.engine.StdService, Gateway):
             self.calculate_rain(self.latest_sensor_data)
             # get the lightning strike count this period from total
             self.calculate_lightning_count(self.latest_sensor_data)
+            # add the data to our history
+            if self.history is not None:
+                self.history.add(self.latest_sensor_data)
             # map the raw data to WeeWX loop packet fields
             mapped_data = self.map_data(self.latest_sensor_data)
+            # add any derived fields
+            if self.aggregator is not None:
+                mapped_data.update(self.aggregator.update(self.latest_sensor_data))
             # log the mapped data if necessary
             if self.debug.loop:
                 loginf('GatewayService: Mapped %s data: %s' % (self.collector.device.model,
@@ -1860,8 +2344,9 @@ class GatewayService(weewx.engine.StdService, Gateway):
                 # the sensor data is not stale, but is it more recent than our
                 # current saved packet
                 if self.latest_sensor_data is None or sensor_data['datetime'] > self.latest_sensor_data['datetime']:
-                    # this packet is newer, so keep it
-                    self.latest_sensor_data = dict(sensor_data)
+                    # this packet is newer, so keep it, the collector does
+                    # not retain queued data so there is no need to copy it
+                    self.latest_sensor_data = sensor_data
             elif self.debug.loop or weewx.debug >= 2:
                 # the sensor data is stale and we have debug settings that
                 # dictate we log the discard
@@ -1972,591 +2457,15 @@ def loader(config_dict, engine):
 
 def configurator_loader(config_dict):  # @UnusedVariable
 
+    from .config import GatewayConfigurator
     return GatewayConfigurator()
 
 
 def confeditor_loader():
+    from .config import Gw1000ConfEditor
     return Gw1000ConfEditor()
 
 
-# ============================================================================
-#                          class Gw1000ConfEditor
-# ============================================================================
-
-class Gw1000ConfEditor(weewx.drivers.AbstractConfEditor):
-    # define our config as a multiline string so we can preserve comments
-    accum_config = """
-    [Accumulator]
-        # Start GW1000 driver extractors
-        [[daymaxwind]]
-            extractor = last
-        [[lightning_distance]]
-            extractor = last
-        [[lightning_strike_count]]
-            extractor = sum
-        [[lightning_last_det_time]]
-            extractor = last
-        [[stormRain]]
-            extractor = last
-        [[dayRain]]
-            extractor = last
-        [[weekRain]]
-            extractor = last
-        [[monthRain]]
-            extractor = last
-        [[yearRain]]
-            extractor = last
-        [[totalRain]]
-            extractor = last
-        [[t_rain]]
-            extractor = sum
-        [[t_stormRain]]
-            extractor = last
-        [[t_dayRain]]
-            extractor = last
-        [[t_weekRain]]
-            extractor = last
-        [[t_monthRain]]
-            extractor = last
-        [[t_yearRain]]
-            extractor = last
-        [[p_rain]]
-            extractor = sum
-        [[p_stormRain]]
-            extractor = last
-        [[p_dayRain]]
-            extractor = last
-        [[p_weekRain]]
-            extractor = last
-        [[p_monthRain]]
-            extractor = last
-        [[p_yearRain]]
-            extractor = last
-        [[pm1_0_24h_avg]]
-            extractor = last
-        [[pm2_51_24h_avg]]
-            extractor = last
-        [[pm2_52_24h_avg]]
-            extractor = last
-        [[pm2_53_24h_avg]]
-            extractor = last
-        [[pm2_54_24h_avg]]
-            extractor = last
-        [[pm2_55_24h_avg]]
-            extractor = last
-        [[pm4_0_24h_avg]]
-            extractor = last
-        [[pm10_0_24h_avg]]
-            extractor = last
-        [[co2_24h_avg]]
-            extractor = last
-        [[heap_free]]
-            extractor = last
-        [[wh40_batt]]
-            extractor = last
-        [[wh26_batt]]
-            extractor = last
-        [[wh25_batt]]
-            extractor = last
-        [[wh65_batt]]
-            extractor = last
-        [[wh32_batt]]
-            extractor = last
-        [[wh31_ch1_batt]]
-            extractor = last
-        [[wh31_ch2_batt]]
-            extractor = last
-        [[wh31_ch3_batt]]
-            extractor = last
-        [[wh31_ch4_batt]]
-            extractor = last
-        [[wh31_ch5_batt]]
-            extractor = last
-        [[wh31_ch6_batt]]
-            extractor = last
-        [[wh31_ch7_batt]]
-            extractor = last
-        [[wh31_ch8_batt]]
-            extractor = last
-        [[wn34_ch1_batt]]
-            extractor = last
-        [[wn34_ch2_batt]]
-            extractor = last
-        [[wn34_ch3_batt]]
-            extractor = last
-        [[wn34_ch4_batt]]
-            extractor = last
-        [[wn34_ch5_batt]]
-            extractor = last
-        [[wn34_ch6_batt]]
-            extractor = last
-        [[wn34_ch7_batt]]
-            extractor = last
-        [[wn34_ch8_batt]]
-            extractor = last
-        [[wn35_ch1_batt]]
-            extractor = last
-        [[wn35_ch2_batt]]
-            extractor = last
-        [[wn35_ch3_batt]]
-            extractor = last
-        [[wn35_ch4_batt]]
-            extractor = last
-        [[wn35_ch5_batt]]
-            extractor = last
-        [[wn35_ch6_batt]]
-            extractor = last
-        [[wn35_ch7_batt]]
-            extractor = last
-        [[wn35_ch8_batt]]
-            extractor = last
-        [[wh41_ch1_batt]]
-            extractor = last
-        [[wh41_ch2_batt]]
-            extractor = last
-        [[wh41_ch3_batt]]
-            extractor = last
-        [[wh41_ch4_batt]]
-            extractor = last
-        [[wh45_batt]]
-            extractor = last
-        [[wh46_batt]]
-            extractor = last
-        [[wh51_ch1_batt]]
-            extractor = last
-        [[wh51_ch2_batt]]
-            extractor = last
-        [[wh51_ch3_batt]]
-            extractor = last
-        [[wh51_ch4_batt]]
-            extractor = last
-        [[wh51_ch5_batt]]
-            extractor = last
-        [[wh51_ch6_batt]]
-            extractor = last
-        [[wh51_ch7_batt]]
-            extractor = last
-        [[wh51_ch8_batt]]
-            extractor = last
-        [[wh51_ch9_batt]]
-            extractor = last
-        [[wh51_ch10_batt]]
-            extractor = last
-        [[wh51_ch11_batt]]
-            extractor = last
-        [[wh51_ch12_batt]]
-            extractor = last
-        [[wh51_ch13_batt]]
-            extractor = last
-        [[wh51_ch14_batt]]
-            extractor = last
-        [[wh51_ch15_batt]]
-            extractor = last
-        [[wh51_ch16_batt]]
-            extractor = last
-        [[wh55_ch1_batt]]
-            extractor = last
-        [[wh55_ch2_batt]]
-            extractor = last
-        [[wh55_ch3_batt]]
-            extractor = last
-        [[wh55_ch4_batt]]
-            extractor = last
-        [[wh57_batt]]
-            extractor = last
-        [[wh68_batt]]
-            extractor = last
-        [[ws80_batt]]
-            extractor = last
-        [[wh40_sig]]
-            extractor = last
-        [[wh26_sig]]
-            extractor = last
-        [[wh25_sig]]
-            extractor = last
-        [[wh65_sig]]
-            extractor = last
-        [[wh32_sig]]
-            extractor = last
-        [[wh31_ch1_sig]]
-            extractor = last
-        [[wh31_ch2_sig]]
-            extractor = last
-        [[wh31_ch3_sig]]
-            extractor = last
-        [[wh31_ch4_sig]]
-            extractor = last
-        [[wh31_ch5_sig]]
-            extractor = last
-        [[wh31_ch6_sig]]
-            extractor = last
-        [[wh31_ch7_sig]]
-            extractor = last
-        [[wh31_ch8_sig]]
-            extractor = last
-        [[wn34_ch1_sig]]
-            extractor = last
-        [[wn34_ch2_sig]]
-            extractor = last
-        [[wn34_ch3_sig]]
-            extractor = last
-        [[wn34_ch4_sig]]
-            extractor = last
-        [[wn34_ch5_sig]]
-            extractor = last
-        [[wn34_ch6_sig]]
-            extractor = last
-        [[wn34_ch7_sig]]
-            extractor = last
-        [[wn34_ch8_sig]]
-            extractor = last
-        [[wn35_ch1_sig]]
-            extractor = last
-        [[wn35_ch2_sig]]
-            extractor = last
-        [[wn35_ch3_sig]]
-            extractor = last
-        [[wn35_ch4_sig]]
-            extractor = last
-        [[wn35_ch5_sig]]
-            extractor = last
-        [[wn35_ch6_sig]]
-            extractor = last
-        [[wn35_ch7_sig]]
-            extractor = last
-        [[wn35_ch8_sig]]
-            extractor = last
-        [[wh41_ch1_sig]]
-            extractor = last
-        [[wh41_ch2_sig]]
-            extractor = last
-        [[wh41_ch3_sig]]
-            extractor = last
-        [[wh41_ch4_sig]]
-            extractor = last
-        [[wh45_sig]]
-            extractor = last
-        [[wh46_sig]]
-            extractor = last
-        [[wh51_ch1_sig]]
-            extractor = last
-        [[wh51_ch2_sig]]
-            extractor = last
-        [[wh51_ch3_sig]]
-            extractor = last
-        [[wh51_ch4_sig]]
-            extractor = last
-        [[wh51_ch5_sig]]
-            extractor = last
-        [[wh51_ch6_sig]]
-            extractor = last
-        [[wh51_ch7_sig]]
-            extractor = last
-        [[wh51_ch8_sig]]
-            extractor = last
-        [[wh51_ch9_sig]]
-            extractor = last
-        [[wh51_ch10_sig]]
-            extractor = last
-        [[wh51_ch11_sig]]
-            extractor = last
-        [[wh51_ch12_sig]]
-            extractor = last
-        [[wh51_ch13_sig]]
-            extractor = last
-        [[wh51_ch14_sig]]
-            extractor = last
-        [[wh51_ch15_sig]]
-            extractor = last
-        [[wh51_ch16_sig]]
-            extractor = last
-        [[wh55_ch1_sig]]
-            extractor = last
-        [[wh55_ch2_sig]]
-            extractor = last
-        [[wh55_ch3_sig]]
-            extractor = last
-        [[wh55_ch4_sig]]
-            extractor = last
-        [[wh57_sig]]
-            extractor = last
-        [[wh68_sig]]
-            extractor = last
-        [[ws80_sig]]
-            extractor = last
-        # End GW1000 driver extractors
-    """
-
-    @property
-    def default_stanza(self):
-        return """
-    [GW1000]
-        # This section is for the GW1000 API driver.
-
-        # The driver to use:
-        driver = user.gw1000
-
-        # How often to poll the GW1000 API:
-        poll_interval = %d
-    """ % (default_poll_interval,)
-
-    def get_conf(self, orig_stanza=None):
-        """Given a configuration stanza, return a possibly modified copy
-        that will work with the current version of the device driver.
-
-        The default behavior is to return the original stanza, unmodified.
-
-        Derived classes should override this if they need to modify previous
-        configuration options or warn about deprecated or harmful options.
-
-        The return value should be a long string. See default_stanza above
-        for an example string stanza.
-        """
-
-        return self.default_stanza if orig_stanza is None else orig_stanza
-
-    def prompt_for_settings(self):
-        """Prompt for settings required for proper operation of this driver.
-
-        Returns a dict of setting, value key pairs for settings to be included
-        in the driver stanza. The _prompt() method may be used to prompt the
-        user for input with a default.
-        """
-
-        # obtain IP address
-        print()
-        print("Specify the gateway device IP address, for example: 192.168.1.100")
-        print("Set to 'auto' to autodiscover the gateway device IP address (not")
-        print("recommended for systems with more than one gateway device)")
-        ip_address = self._prompt('IP address',
-                                  dflt=self.existing_options.get('ip_address'))
-        # obtain port number
-        print()
-        print("Specify gateway device network port, for example: 45000")
-        port = self._prompt('port', dflt=self.existing_options.get('port', default_port))
-        # obtain poll interval
-        print()
-        print("Specify how often to poll the gateway API in seconds")
-        poll_interval = self._prompt('Poll interval',
-                                     dflt=self.existing_options.get('poll_interval',
-                                                                    default_poll_interval))
-        return {'ip_address': ip_address,
-                'port': port,
-                'poll_interval': poll_interval
-                }
-
-    @staticmethod
-    def modify_config(config_dict):
-        import weecfg
-
-        # set loop_on_init
-        loop_on_init_config = """loop_on_init = %d"""
-        dflt = config_dict.get('loop_on_init', '1')
-        label = """The GW1000 driver requires a network connection to the 
-gateway device. Consequently, the absence of a network connection 
-when WeeWX starts will cause WeeWX to exit and such a situation 
-can occur on system startup. The 'loop_on_init' setting can be
-used to mitigate such problems by having WeeWX retry startup 
-indefinitely. Set to '0' to attempt startup once only or '1' to 
-attempt startup indefinitely."""
-        print()
-        loop_on_init = int(weecfg.prompt_with_options(label, dflt, ['0', '1']))
-        loop_on_init_dict = configobj.ConfigObj(StringIO(loop_on_init_config % (loop_on_init,)))
-        config_dict.merge(loop_on_init_dict)
-        if len(config_dict.comments['loop_on_init']) == 0:
-            config_dict.comments['loop_on_init'] = ['',
-                                                    '# Whether to try indefinitely to load the driver']
-        print()
-
-        # set record generation to software
-        print("""Setting record_generation to software.""")
-        config_dict['StdArchive']['record_generation'] = 'software'
-        print()
-
-        # set the accumulator extractor functions
-        print("""Setting accumulator extractor functions.""")
-        # construct our default accumulator config dict
-        accum_config_dict = configobj.ConfigObj(StringIO(Gw1000ConfEditor.accum_config))
-        # merge the existing config dict into our default accumulator config
-        # dict so that we keep any changes made to [Accumulator] by the user
-        accum_config_dict.merge(config_dict)
-        # now make our updated accumulator config the config dict
-        config_dict = configobj.ConfigObj(accum_config_dict)
-
-        # we don't need weecfg anymore so remove it from memory
-        del weecfg
-        print()
-
-
-# ============================================================================
-#                          GatewayConfigurator class
-# ============================================================================
-
-class GatewayConfigurator(weewx.drivers.AbstractConfigurator):
-    """Configures the Ecowitt gateway weather station.
-
-    This class is used by wee_device when interrogating a supported Ecowitt
-    gateway device.
-
-    The Ecowitt gateway device API supports both reading and setting various
-    gateway device parameters; however, at this time the Ecowitt gateway
-    device driver only supports the reading these parameters. The Ecowitt
-    gateway device driver does not support setting these parameters, rather
-    this should be done via the Ecowitt WSView Plus app.
-
-    When used with wee_device this configurator allows station hardware
-    parameters to be displayed. The Ecowitt gateway device driver may also be
-    run directly to test the Ecowitt gateway device driver operation as well as
-    display various driver configuration options (as distinct from gateway
-    device hardware parameters).
-    """
-
-    @property
-    def description(self):
-        """Description displayed as part of wee_device help information."""
-
-        return "Read data and configuration from an Ecowitt gateway weather station."
-
-    @property
-    def usage(self):
-        """wee_device usage information."""
-        return """%prog --help
-       %prog --live-data
-            [CONFIG_FILE|--config=CONFIG_FILE]
-            [--units=us|metric|metricwx]
-            [--ip-address=IP_ADDRESS] [--port=PORT]
-            [--show-all-batt]
-            [--debug=0|1|2|3]
-       %prog --sensors
-            [CONFIG_FILE|--config=CONFIG_FILE]
-            [--ip-address=IP_ADDRESS] [--port=PORT]
-            [--show-all-batt]
-            [--debug=0|1|2|3]
-       %prog --firmware-version|--mac-address|
-            --system-params|--get-rain-data|--get-all-rain_data
-            [CONFIG_FILE|--config=CONFIG_FILE]
-            [--ip-address=IP_ADDRESS] [--port=PORT]
-            [--debug=0|1|2|3]
-       %prog --get-calibration|--get-mulch-th-cal|
-            --get-mulch-soil-cal|--get-pm25-cal|
-            --get-co2-cal
-            [CONFIG_FILE|--config=CONFIG_FILE]
-            [--ip-address=IP_ADDRESS] [--port=PORT]
-            [--debug=0|1|2|3]
-       %prog --get-services
-            [CONFIG_FILE|--config=CONFIG_FILE]
-            [--ip-address=IP_ADDRESS] [--port=PORT]
-            [--unmask] [--debug=0|1|2|3]"""
-
-    @property
-    def epilog(self):
-        """Epilog displayed as part of wee_device help information."""
-
-        return ""
-        # return "Mutating actions will request confirmation before proceeding.\n"
-
-    def add_options(self, parser):
-        """Define wee_device option parser options."""
-
-        parser.add_option('--live-data', dest='live', action='store_true',
-                          help='display device live sensor data')
-        parser.add_option('--sensors', dest='sensors', action='store_true',
-                          help='display device sensor information')
-        parser.add_option('--firmware', dest='firmware',
-                          action='store_true',
-                          help='display device firmware information')
-        parser.add_option('--mac-address', dest='mac', action='store_true',
-                          help='display device station MAC address')
-        parser.add_option('--system-params', dest='sys_params', action='store_true',
-                          help='display device system parameters')
-        parser.add_option('--get-rain-data', dest='get_rain', action='store_true',
-                          help='display device traditional rain data only')
-        parser.add_option('--get-all-rain-data', dest='get_all_rain', action='store_true',
-                          help='display device traditional, piezo and rain reset '
-                               'time data')
-        parser.add_option('--get-calibration', dest='get_calibration',
-                          action='store_true',
-                          help='display device calibration data')
-        parser.add_option('--get-mulch-th-cal', dest='get_mulch_offset',
-                          action='store_true',
-                          help='display device multi-channel temperature and '
-                               'humidity calibration data')
-        parser.add_option('--get-mulch-soil-cal', dest='get_soil_calibration',
-                          action='store_true',
-                          help='display device soil moisture calibration data')
-        parser.add_option('--get-mulch-t-cal', dest='get_temp_calibration',
-                          action='store_true',
-                          help='display device temperature (WN34) calibration data')
-        parser.add_option('--get-pm25-cal', dest='get_pm25_offset',
-                          action='store_true',
-                          help='display device PM2.5 calibration data')
-        parser.add_option('--get-co2-cal', dest='get_co2_offset',
-                          action='store_true',
-                          help='display device CO2 (WH45) calibration data')
-        parser.add_option('--get-services', dest='get_services',
-                          action='store_true',
-                          help='display device weather services configuration data')
-        parser.add_option('--ip-address', dest='ip_address',
-                          help='device IP address to use')
-        parser.add_option('--port', dest='port', type=int,
-                          help='device port to use')
-        parser.add_option('--max-tries', dest='max_tries', type=int,
-                          help='max number of attempts to contact the device')
-        parser.add_option('--retry-wait', dest='retry_wait', type=int,
-                          help='how long to wait between attempts to contact the device')
-        parser.add_option('--show-all-batt', dest='show_battery',
-                          action='store_true',
-                          help='show all available battery state data regardless of '
-                               'sensor state')
-        parser.add_option('--unmask', dest='unmask', action='store_true',
-                          help='unmask sensitive settings')
-        parser.add_option('--units', dest='units', metavar='UNITS', default='metric',
-                          help='unit system to use when displaying live data')
-        parser.add_option('--config', dest='config_path', metavar='CONFIG_FILE',
-                          help="use configuration file CONFIG_FILE.")
-        parser.add_option('--debug', dest='debug', type=int,
-                          help='how much status to display, 0-3')
-        parser.add_option('--yes', '-y', dest="noprompt", action="store_true",
-                          help="answer yes to every prompt")
-
-    def do_options(self, options, parser, config_dict, prompt):
-        """Process wee_device option parser options."""
-
-        # get station config dict to use
-        stn_dict = config_dict.get('GW1000', {})
-
-        # set weewx.debug as necessary
-        if options.debug is not None:
-            _debug = weeutil.weeutil.to_int(options.debug)
-        else:
-            _debug = weeutil.weeutil.to_int(config_dict.get('debug', 0))
-        weewx.debug = _debug
-        # inform the user if the debug level is 'higher' than 0
-        if _debug > 0:
-            print("debug level is '%d'" % _debug)
-
-        # Now we can set up the user customized logging, but we need to handle both
-        # v3 and v4 logging. V4 logging is very easy but v3 logging requires us to
-        # set up syslog and raise our log level based on weewx.debug
-        try:
-            # assume v 4 logging
-            weeutil.logger.setup('weewx', config_dict)
-        except AttributeError:
-            # must be v3 logging, so first set the defaults for the system logger
-            syslog.openlog('weewx', syslog.LOG_PID | syslog.LOG_CONS)
-            # now raise the log level if required
-            if weewx.debug > 0:
-                syslog.setlogmask(syslog.LOG_UPTO(syslog.LOG_DEBUG))
-
-        # define custom unit settings used by the gateway driver
-        define_units()
-
-        # get a DirectGateway object
-        direct_gw = DirectGateway(options, parser, stn_dict)
-        # now let the DirectGateway object process the options
-        direct_gw.process_options()
-
-
 # ============================================================================
 #                            GatewayDriver class
 # ============================================================================
@@ -2592,6 +2501,23 @@ class GatewayDriver(weewx.drivers.AbstractDevice, Gateway):
         self.debug = DebugOptions(stn_dict)
         # now initialize my superclasses
         super(GatewayDriver, self).__init__(**stn_dict)
+        # If an archive interval has been specified we generate our own archive
+        # records, in which case get an ArchiveGenerator object. Otherwise,
+        # WeeWX will use software record generation.
+        _interval = weeutil.weeutil.to_int(stn_dict.get('archive_interval'))
+        if _interval is not None and _interval > 0:
+            self.archive_generator = ArchiveGenerator(_interval,
+                                                      ring_size=weeutil.weeutil.to_int(stn_dict.get('archive_ring_size',
+                                                                                                    default_archive_ring_size)),
+                                                      ring_path=stn_dict.get('archive_ring_path'))
+            loginf('GatewayDriver: archive records will be generated by the driver '
+                   'using a %d second archive interval' % _interval)
+            if len(self.archive_generator.ring) > 0:
+                loginf('GatewayDriver: restored %d archive records, '
+                       'the most recent is %s' % (len(self.archive_generator.ring),
+                                                  timestamp_to_string(self.archive_generator.ring[-1]['dateTime'])))
+        else:
+            self.archive_generator = None
         # start the Gw1000Collector in its own thread
         self.collector.startup()
 
@@ -2603,6 +2529,8 @@ class GatewayDriver(weewx.drivers.AbstractDevice, Gateway):
         packet.
         """
 
+        # count the packets we emit, used to report replay throughput
+        packet_count = 0
         # generate loop packets forever
         while True:
             # wrap in a try to catch any instances where the queue is empty
@@ -2647,14 +2575,6 @@ class GatewayDriver(weewx.drivers.AbstractDevice, Gateway):
                             # received data, if they do not exist say so
                             self.log_wind_data(queue_data,
                                                'GatewayDriver: Received %s data' % self.collector.device.model)
-                    # Now start to create a loop packet. A loop packet must
-                    # have a timestamp, if we have one (key 'datetime') in the
-                    # received data use it otherwise allocate one.
-                    if 'datetime' in queue_data:
-                        packet = {'dateTime': queue_data['datetime']}
-                    else:
-                        # we don't have a timestamp so create one
-                        packet = {'dateTime': int(time.time() + 0.5)}
                     # if not already determined, determine which cumulative rain
                     # field will be used to determine the per period rain field
                     if not self.rain_mapping_confirmed or not self.piezo_rain_mapping_confirmed:
@@ -2663,8 +2583,14 @@ class GatewayDriver(weewx.drivers.AbstractDevice, Gateway):
                     self.calculate_rain(queue_data)
                     # get the lightning strike count this period from total
                     self.calculate_lightning_count(queue_data)
+                    # add the data to our history
+                    if self.history is not None:
+                        self.history.add(queue_data)
                     # map the raw data to WeeWX loop packet fields
                     mapped_data = self.map_data(queue_data)
+                    # add any derived fields
+                    if self.aggregator is not None:
+                        mapped_data.update(self.aggregator.update(queue_data))
                     # log the mapped data if necessary
                     if self.debug.loop:
                         if 'datetime' in mapped_data:
@@ -2687,8 +2613,16 @@ class GatewayDriver(weewx.drivers.AbstractDevice, Gateway):
                             # mapped data, if they do not exist say so
                             self.log_wind_data(mapped_data,
                                                'GatewayDriver: Mapped %s data' % self.collector.device.model)
-                    # add the mapped data to the empty packet
-                    packet.update(mapped_data)
+                    # The mapped data is our loop packet. A loop packet must
+                    # have a timestamp, if we have one (key 'datetime') in the
+                    # received data use it otherwise allocate one.
+                    packet = mapped_data
+                    if 'dateTime' not in packet:
+                        if 'datetime' in queue_data:
+                            packet['dateTime'] = queue_data['datetime']
+                        else:
+                            # we don't have a timestamp so create one
+                            packet['dateTime'] = int(time.time() + 0.5)
                     # log the packet if necessary, there are several debug
                     # settings that may require this, start from the highest
                     # (most encompassing) and work to the lowest (least
@@ -2710,7 +2644,15 @@ class GatewayDriver(weewx.drivers.AbstractDevice, Gateway):
                             # say so
                             self.log_wind_data(mapped_data,
                                                'GatewayDriver: Packets %s' % timestamp_to_string(packet['dateTime']))
+                    # if we are generating archive records add the packet to
+                    # the current archive interval
+                    if self.archive_generator is not None:
+                        record = self.archive_generator.add_packet(packet)
+                        if record is not None and (self.debug.loop or weewx.debug >= 2):
+                            loginf('GatewayDriver: Archive record %s: %s' % (timestamp_to_string(record['dateTime']),
+                                                                             natural_sort_dict(record)))
                     # yield the loop packet
+                    packet_count += 1
                     yield packet
                 # if it's a tuple then it's a tuple with an exception and
                 # exception text
@@ -2740,6 +2682,15 @@ class GatewayDriver(weewx.drivers.AbstractDevice, Gateway):
                 # if it's None then its a signal the Collector needs to shut
                 # down
                 elif queue_data is None:
+                    # if we are replaying a capture None signals the end of
+                    # the capture, report our throughput and stop
+                    if isinstance(self.collector, ReplayCollector):
+                        elapsed = monotonic() - self.collector.replay_start
+                        loginf('GatewayDriver: Replay complete, %d packets in %.3f seconds '
+                               '(%.1f packets per second)' % (packet_count,
+                                                              elapsed,
+                                                              packet_count / max(elapsed, 1e-6)))
+                        return
                     # if debug.loop log what we received
                     if self.debug.loop:
                         loginf('GatewayDriver: Received shutdown signal')
@@ -2753,6 +2704,32 @@ class GatewayDriver(weewx.drivers.AbstractDevice, Gateway):
                 else:
                     pass
 
+    @property
+    def archive_interval(self):
+        """Return the archive interval in seconds.
+
+        Only available if the driver is generating archive records, otherwise
+        raise NotImplementedError so that WeeWX uses software record
+        generation.
+        """
+
+        if self.archive_generator is None:
+            raise NotImplementedError("Property 'archive_interval' not implemented")
+        return self.archive_generator.interval
+
+    def genArchiveRecords(self, since_ts):
+        """Return a generator of archive records since a given time.
+
+        Only available if the driver is generating archive records, otherwise
+        raise NotImplementedError so that WeeWX uses software record
+        generation. Only archive records for completed archive intervals are
+        returned.
+        """
+
+        if self.archive_generator is None:
+            raise NotImplementedError("Method 'genArchiveRecords' not implemented")
+        return self.archive_generator.gen_records(since_ts)
+
     @property
     def hardware_name(self):
         """Return the hardware name.
@@ -2799,6 +2776,565 @@ class GatewayDriver(weewx.drivers.AbstractDevice, Gateway):
 Gw1000Driver = GatewayDriver
 
 
+# ============================================================================
+#                           class ArchiveGenerator
+# ============================================================================
+
+class ArchiveGenerator(object):
+    """Class to generate archive records from loop packets.
+
+    An ArchiveGenerator object accumulates loop packets into archive records
+    using a WeeWX accumulator per archive interval. The accumulator maintains
+    means, min/max values (and their times), vector averaged wind and summed
+    rain and lightning deltas as determined by the WeeWX accumulator
+    configuration. When a packet is received for a later archive interval the
+    archive record for the current interval is extracted from the accumulator.
+
+    Completed archive records are kept in a fixed size ring of recently
+    completed records. If a path is specified the ring is saved to disk as
+    each archive record is completed and is restored on startup.
+    """
+
+    def __init__(self, interval, ring_size=default_archive_ring_size,
+                 ring_path=None):
+        """Initialise an ArchiveGenerator object."""
+
+        # archive interval in seconds
+        self.interval = interval
+        self.ring_size = ring_size
+        self.ring_path = ring_path
+        # the accumulator for the current archive interval
+        self.accum = None
+        # the ring of recently completed archive records
+        self.ring = self.load()
+
+    def add_packet(self, packet):
+        """Add a loop packet to the current archive interval.
+
+        packet: a loop packet with at least fields 'dateTime' and 'usUnits'
+
+        Returns the archive record for the previous archive interval if the
+        packet is the first packet of a new archive interval, otherwise returns
+        None.
+        """
+
+        record = None
+        if self.accum is None or not self.accum.timespan.includesArchiveTime(packet['dateTime']):
+            if self.accum is not None and packet['dateTime'] <= self.accum.timespan.start:
+                # the packet is older than the current archive interval so we
+                # cannot use it
+                logdbg("Discarding out of order packet %s" % timestamp_to_string(packet['dateTime']))
+                return None
+            record = self.close()
+            start_ts = weeutil.weeutil.startOfInterval(packet['dateTime'], self.interval)
+            self.accum = weewx.accum.Accum(weeutil.weeutil.TimeSpan(start_ts,
+                                                                    start_ts + self.interval))
+        self.accum.addRecord(packet)
+        return record
+
+    def close(self):
+        """Complete the current archive interval.
+
+        Returns the archive record for the current archive interval or None if
+        there is no current archive interval.
+        """
+
+        if self.accum is None:
+            return None
+        record = self.accum.getRecord()
+        record['interval'] = self.interval // 60
+        self.accum = None
+        if self.ring_size > 0:
+            self.ring.append(record)
+            del self.ring[:-self.ring_size]
+            self.save()
+        return record
+
+    def gen_records(self, since_ts=0):
+        """Generator function yielding completed archive records.
+
+        Yields the archive records in the ring with a timestamp later than
+        since_ts in time order.
+        """
+
+        for record in list(self.ring):
+            if since_ts is None or record['dateTime'] > since_ts:
+                # yield a copy, our consumer may alter the record
+                yield dict(record)
+
+    def load(self):
+        """Load the ring from disk.
+
+        Returns a list of archive records. If the ring has not been saved or
+        cannot be read an empty list is returned.
+        """
+
+        if self.ring_path is None or not os.path.exists(self.ring_path):
+            return []
+        try:
+            with open(self.ring_path, 'r') as f:
+                ring = json.load(f)
+        except (IOError, OSError, ValueError) as e:
+            logerr("Unable to load archive record ring '%s': %s" % (self.ring_path, e))
+            return []
+        return ring[-self.ring_size:] if self.ring_size > 0 else []
+
+    def save(self):
+        """Save the ring to disk.
+
+        The ring is written to a temporary file that then replaces any
+        previously saved ring, so a crash cannot leave a partially written
+        ring.
+        """
+
+        if self.ring_path is None:
+            return
+        tmp_path = ''.join([self.ring_path, '.tmp'])
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.ring, f)
+            os.rename(tmp_path, self.ring_path)
+        except (IOError, OSError) as e:
+            logerr("Unable to save archive record ring '%s': %s" % (self.ring_path, e))
+
+
+# ============================================================================
+#                            class HistoryBuffer
+# ============================================================================
+
+class HistoryBuffer(object):
+    """Class to hold an in memory rolling history of parsed device data.
+
+    A HistoryBuffer object holds the numeric fields of recent parsed device
+    data in preallocated columns, a timestamp column plus one column per
+    field. The columns are used as a ring, once the buffer is full each new
+    packet replaces the oldest packet. A field that is missing from a packet
+    is held as NaN. If numpy is available the columns are numpy arrays and
+    queries are vectorised, otherwise the columns are python arrays.
+
+    The buffer supports simple queries of the recent history of a field
+    (latest value, values over a time range, min/max/mean, resampling and
+    vector averaged wind) allowing other services to obtain recent
+    statistics without querying the database. Time ranges are specified as
+    epoch timestamps, start is exclusive and stop is inclusive as per WeeWX
+    archive timespans, None means unbounded.
+    """
+
+    # aggregates supported by aggregate() and resample()
+    aggregates = ('min', 'max', 'mean', 'sum', 'count', 'first', 'last')
+
+    def __init__(self, slots):
+        """Initialise a HistoryBuffer object.
+
+        slots: the number of packets to be held
+        """
+
+        self.slots = slots
+        # the timestamp column
+        self.timestamps = self.new_column()
+        # the field columns keyed by field name
+        self.columns = {}
+        # index of the slot to be used for the next packet
+        self.head = 0
+        # number of slots in use
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def new_column(self):
+        """Obtain a new column with every slot set to NaN."""
+
+        if numpy is not None:
+            return numpy.full(self.slots, numpy.nan)
+        return array.array('d', [float('nan')]) * self.slots
+
+    def add(self, data):
+        """Add a packet of parsed device data to the buffer.
+
+        Non-numeric fields are ignored, field 'datetime' is held in the
+        timestamp column. A packet with the same timestamp as the latest
+        packet in the buffer replaces the latest packet, an earlier packet is
+        discarded.
+        """
+
+        ts = data.get('datetime')
+        if ts is None:
+            ts = time.time()
+        with self.lock:
+            latest = (self.head - 1) % self.slots
+            if self.count > 0 and ts < self.timestamps[latest]:
+                return
+            if self.count > 0 and ts == self.timestamps[latest]:
+                # the packet replaces the latest packet
+                head = latest
+            else:
+                head = self.head
+                self.head = (head + 1) % self.slots
+                self.count = min(self.count + 1, self.slots)
+            self.timestamps[head] = ts
+            # clear the slot in any columns not included in this packet
+            for column in six.itervalues(self.columns):
+                column[head] = float('nan')
+            for field, value in six.iteritems(data):
+                if field == 'datetime' or isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                column = self.columns.get(field)
+                if column is None:
+                    column = self.columns[field] = self.new_column()
+                column[head] = value
+
+    @property
+    def fields(self):
+        """The fields held in the buffer."""
+
+        return sorted(self.columns.keys())
+
+    def ordered(self, column):
+        """Obtain the used slots of a column in time order."""
+
+        if self.count < self.slots:
+            return column[:self.count]
+        if numpy is not None:
+            return numpy.concatenate((column[self.head:], column[:self.head]))
+        return column[self.head:] + column[:self.head]
+
+    def select(self, field, start=None, stop=None):
+        """Obtain the timestamps and non-NaN values of a field in a range.
+
+        Returns a tuple of timestamps and values in time order, numpy arrays
+        if numpy is available otherwise lists.
+        """
+
+        with self.lock:
+            column = self.columns.get(field)
+            if column is None:
+                return [], []
+            timestamps = self.ordered(self.timestamps)
+            values = self.ordered(column)
+        lo = 0 if start is None else bisect.bisect_right(timestamps, start)
+        hi = len(timestamps) if stop is None else bisect.bisect_right(timestamps, stop)
+        timestamps = timestamps[lo:hi]
+        values = values[lo:hi]
+        if numpy is not None:
+            valid = ~numpy.isnan(values)
+            return timestamps[valid], values[valid]
+        pairs = [(ts, v) for ts, v in zip(timestamps, values) if not math.isnan(v)]
+        return [ts for ts, v in pairs], [v for ts, v in pairs]
+
+    def latest(self, field):
+        """Obtain the latest value of a field.
+
+        Returns a tuple of timestamp and value or None if the buffer holds no
+        value for the field.
+        """
+
+        timestamps, values = self.select(field)
+        if len(values) == 0:
+            return None
+        return int(timestamps[-1]), float(values[-1])
+
+    def range(self, field, start=None, stop=None):
+        """Obtain the values of a field in a range.
+
+        Returns a list of timestamp, value tuples in time order.
+        """
+
+        timestamps, values = self.select(field, start, stop)
+        return [(int(ts), float(v)) for ts, v in zip(timestamps, values)]
+
+    @staticmethod
+    def reduce(values, agg):
+        """Reduce a non-empty sequence of values to a single value."""
+
+        if agg == 'min':
+            return float(min(values)) if numpy is None else float(values.min())
+        elif agg == 'max':
+            return float(max(values)) if numpy is None else float(values.max())
+        elif agg == 'sum':
+            return float(math.fsum(values)) if numpy is None else float(values.sum())
+        elif agg == 'mean':
+            return float(math.fsum(values) / len(values)) if numpy is None else float(values.mean())
+        elif agg == 'count':
+            return len(values)
+        elif agg == 'first':
+            return float(values[0])
+        elif agg == 'last':
+            return float(values[-1])
+        raise ValueError("Unknown aggregate '%s'" % agg)
+
+    def aggregate(self, field, agg, start=None, stop=None):
+        """Aggregate the values of a field in a range.
+
+        agg: the aggregate to calculate, one of 'min', 'max', 'mean', 'sum',
+             'count', 'first' or 'last'
+
+        Returns the aggregate value or None if there are no values in the
+        range. The 'count' aggregate is always returned.
+        """
+
+        if agg not in self.aggregates:
+            raise ValueError("Unknown aggregate '%s'" % agg)
+        timestamps, values = self.select(field, start, stop)
+        if len(values) == 0:
+            return 0 if agg == 'count' else None
+        return self.reduce(values, agg)
+
+    def min(self, field, start=None, stop=None):
+        """Obtain the minimum value of a field in a range."""
+
+        return self.aggregate(field, 'min', start, stop)
+
+    def max(self, field, start=None, stop=None):
+        """Obtain the maximum value of a field in a range."""
+
+        return self.aggregate(field, 'max', start, stop)
+
+    def mean(self, field, start=None, stop=None):
+        """Obtain the mean value of a field in a range."""
+
+        return self.aggregate(field, 'mean', start, stop)
+
+    def resample(self, field, interval, agg='mean', start=None, stop=None):
+        """Resample the values of a field in a range.
+
+        Values are aggregated over consecutive periods of interval seconds
+        aligned to the epoch. As per WeeWX archive records each period
+        includes its end time and is labelled with its end time.
+
+        Returns a list of timestamp, aggregate value tuples in time order,
+        periods without values are omitted.
+        """
+
+        if agg not in self.aggregates:
+            raise ValueError("Unknown aggregate '%s'" % agg)
+        timestamps, values = self.select(field, start, stop)
+        if len(values) == 0:
+            return []
+        if numpy is not None:
+            periods = numpy.ceil(timestamps / interval) * interval
+            # the periods are in time order so find where each period starts
+            bounds = numpy.flatnonzero(numpy.diff(periods)) + 1
+            starts = numpy.concatenate(([0], bounds))
+            ends = numpy.concatenate((bounds, [len(values)]))
+            return [(int(periods[s]), self.reduce(values[s:e], agg))
+                    for s, e in zip(starts, ends)]
+        result = []
+        s = 0
+        for i in range(1, len(values) + 1):
+            period = int(math.ceil(timestamps[s] / interval) * interval)
+            if i == len(values) or math.ceil(timestamps[i] / interval) * interval != period:
+                result.append((period, self.reduce(values[s:i], agg)))
+                s = i
+        return result
+
+    def wind_vector(self, start=None, stop=None, speed_field='windspeed',
+                    dir_field='winddir'):
+        """Obtain the vector averaged wind in a range.
+
+        Returns a tuple of vector averaged speed and direction (in degrees),
+        the direction is None if the vector averaged speed is zero. Returns
+        None if there is no wind data in the range.
+        """
+
+        with self.lock:
+            speed_column = self.columns.get(speed_field)
+            dir_column = self.columns.get(dir_field)
+            if speed_column is None or dir_column is None:
+                return None
+            timestamps = self.ordered(self.timestamps)
+            speeds = self.ordered(speed_column)
+            dirs = self.ordered(dir_column)
+        lo = 0 if start is None else bisect.bisect_right(timestamps, start)
+        hi = len(timestamps) if stop is None else bisect.bisect_right(timestamps, stop)
+        if numpy is not None:
+            speeds = speeds[lo:hi]
+            dirs = numpy.radians(dirs[lo:hi])
+            valid = ~(numpy.isnan(speeds) | numpy.isnan(dirs))
+            if not valid.any():
+                return None
+            x = float((speeds[valid] * numpy.sin(dirs[valid])).mean())
+            y = float((speeds[valid] * numpy.cos(dirs[valid])).mean())
+        else:
+            pairs = [(s, math.radians(d)) for s, d in zip(speeds[lo:hi], dirs[lo:hi])
+                     if not math.isnan(s) and not math.isnan(d)]
+            if len(pairs) == 0:
+                return None
+            x = math.fsum(s * math.sin(d) for s, d in pairs) / len(pairs)
+            y = math.fsum(s * math.cos(d) for s, d in pairs) / len(pairs)
+        speed = math.sqrt(x * x + y * y)
+        if speed == 0:
+            return 0.0, None
+        return speed, math.degrees(math.atan2(x, y)) % 360.0
+
+
+# ============================================================================
+#                   classes WindowedAggregate and WindowAggregator
+# ============================================================================
+
+class WindowedAggregate(object):
+    """Class to incrementally aggregate a field over a sliding time window.
+
+    A WindowedAggregate object maintains an aggregate of the values of a
+    field received over the last window seconds. Sums, means and counts are
+    maintained as running totals of the values in the window, minimums and
+    maximums are maintained using a monotonic deque of candidate values.
+    Each value is added to and expired from the window once, so the cost of
+    maintaining the aggregate does not depend on the window length.
+
+    Supported aggregates are:
+
+    mean:  mean of the values in the window
+    sum:   sum of the values in the window
+    count: number of values in the window
+    min:   minimum value in the window
+    max:   maximum value in the window
+    delta: change in value across the window, eg pressure tendency
+    """
+
+    aggregates = ('mean', 'sum', 'count', 'min', 'max', 'delta')
+
+    __slots__ = ('source', 'agg', 'window', 'values', 'total')
+
+    def __init__(self, source, agg, window):
+        """Initialise a WindowedAggregate object.
+
+        source: the parsed device data field to be aggregated
+        agg:    the aggregate to be maintained
+        window: the window length in seconds
+        """
+
+        if agg not in self.aggregates:
+            raise ValueError("Unknown aggregate '%s'" % agg)
+        self.source = source
+        self.agg = agg
+        self.window = window
+        # the (timestamp, value) pairs in the window, for min and max only
+        # those values that may yet become the min/max are kept
+        self.values = collections.deque()
+        # running total of the values in the window
+        self.total = 0.0
+
+    def add(self, ts, value):
+        """Add a value to the window."""
+
+        if self.agg == 'max':
+            # discard any values that can no longer be the maximum
+            while self.values and self.values[-1][1] <= value:
+                self.values.pop()
+        elif self.agg == 'min':
+            # discard any values that can no longer be the minimum
+            while self.values and self.values[-1][1] >= value:
+                self.values.pop()
+        else:
+            self.total += value
+        self.values.append((ts, value))
+
+    def expire(self, ts):
+        """Expire the values that are no longer in the window ending at ts."""
+
+        cutoff = ts - self.window
+        while self.values and self.values[0][0] <= cutoff:
+            self.total -= self.values.popleft()[1]
+        if not self.values:
+            # avoid the accumulation of rounding errors
+            self.total = 0.0
+
+    @property
+    def value(self):
+        """The aggregate value, None if the window holds no values."""
+
+        if self.agg == 'count':
+            return len(self.values)
+        if not self.values:
+            return None
+        if self.agg == 'sum':
+            return self.total
+        if self.agg == 'mean':
+            return self.total / len(self.values)
+        if self.agg == 'delta':
+            return self.values[-1][1] - self.values[0][1]
+        # min or max, the first value in the deque is the min/max
+        return self.values[0][1]
+
+
+class WindowAggregator(object):
+    """Class to derive windowed aggregate fields from parsed device data.
+
+    A WindowAggregator object maintains a number of WindowedAggregate objects,
+    each of which is emitted as a derived field. Derived fields are specified
+    as a dict keyed by derived field name with each value a source field,
+    aggregate, window length (seconds) sequence, eg:
+
+        {'windSpeed10': ('windspeed', 'mean', 600),
+         'windGust10': ('gustspeed', 'max', 600),
+         'rain1h': ('t_rain', 'sum', 3600),
+         'pressureTrend3h': ('relbarometer', 'delta', 10800),
+         'lightning1h': ('lightning_strike_count', 'sum', 3600)}
+
+    Source fields are parsed device data fields and include the per period
+    rain and lightning fields calculated by the driver. Derived field values
+    are in the units of the source field.
+    """
+
+    def __init__(self, derived_fields):
+        """Initialise a WindowAggregator object."""
+
+        self.aggregates = dict((name, WindowedAggregate(source, agg, window))
+                               for name, (source, agg, window) in six.iteritems(derived_fields))
+        # timestamp of the latest data
+        self.last_ts = None
+
+    @staticmethod
+    def parse_config(config):
+        """Obtain derived field definitions from a derived field config.
+
+        config: dict keyed by derived field name with each value a list of
+                source field, aggregate and window length in seconds
+
+        Invalid definitions are logged and ignored. Returns a dict suitable
+        for initialising a WindowAggregator object.
+        """
+
+        derived_fields = dict()
+        for name, definition in six.iteritems(config):
+            try:
+                if isinstance(definition, six.string_types):
+                    # the definition has not been split by ConfigObj
+                    definition = definition.split(',')
+                source, agg, window = [v.strip() for v in definition]
+                window = int(window)
+                if agg not in WindowedAggregate.aggregates or window <= 0:
+                    raise ValueError
+            except (TypeError, ValueError):
+                loginf("Invalid derived field definition '%s = %s' ignored" % (name, definition))
+                continue
+            derived_fields[name] = (source, agg, window)
+        return derived_fields
+
+    def update(self, data):
+        """Update the aggregates with parsed device data.
+
+        Out of order data is ignored. Returns a dict of derived field values,
+        derived fields with no value are omitted.
+        """
+
+        ts = data.get('datetime')
+        if ts is None:
+            ts = time.time()
+        if self.last_ts is not None and ts < self.last_ts:
+            return {}
+        self.last_ts = ts
+        derived_data = dict()
+        for name, aggregate in six.iteritems(self.aggregates):
+            value = data.get(aggregate.source)
+            if value is not None:
+                aggregate.add(ts, value)
+            aggregate.expire(ts)
+            value = aggregate.value
+            if value is not None:
+                derived_data[name] = value
+        return derived_data
+
+
 # ============================================================================
 #                              class Collector
 # ============================================================================
@@ -2818,57 +3354,670 @@ class Collector(object):
 
 
 # ============================================================================
-#                              class GatewayCollector
+#                    classes PacketLayout and PacketRecord
 # ============================================================================
 
-class GatewayCollector(Collector):
-    """Class to collect data from an Ecowitt LAN/Wi-Fi Gateway device.
+class PacketLayout(object):
+    """Class representing the field layout of a PacketRecord.
 
-    A GatewayCollector object is responsible for obtaining data from an Ecowitt
-    LAN/Wi-Fi Gateway device and passing relevant data to its parent
-    driver/service. A GatewayCollector object uses subordinate classes to
-    obtain data from the gateway device via the Ecowitt LAN/Wi-Fi Gateway
-    device API and direct HTTP requests suitable for passing to its parent
-    driver/service. A GatewayCollector can also be used to obtain device data
-    when the driver is operated in direct mode.
+    A PacketLayout object maps each field name to a fixed index in the values
+    of a PacketRecord. Layouts are immutable, adding a field to a layout
+    results in a new layout. The new layout is cached so that all records
+    that gain the same fields in the same order share the same layout
+    objects. For a given station a stable set of layouts is quickly
+    established and per layout processing (eg field mapping) can be
+    determined once and reused.
+    """
 
-    A GatewayCollector object uses a GatewayDevice object to handle all
-    interaction with the device.
+    __slots__ = ('fields', 'index', 'successors')
+
+    def __init__(self, fields=()):
+        """Initialise a PacketLayout object."""
+
+        # the fields in index order
+        self.fields = tuple(fields)
+        # map of field name to index
+        self.index = dict((field, i) for i, field in enumerate(self.fields))
+        # cache of layouts derived from this layout keyed by added field
+        self.successors = {}
+
+    def extend(self, field):
+        """Obtain the layout that results from adding a field."""
+
+        layout = self.successors.get(field)
+        if layout is None:
+            layout = self.successors[field] = PacketLayout(self.fields + (field,))
+        return layout
+
+
+class PacketRecord(MutableMapping):
+    """Class representing a compact packet of device data.
+
+    A parsed poll passes through the collector, rain and lightning
+    calculations and field mapping before becoming a WeeWX loop packet. A
+    PacketRecord holds the poll data as a list of values indexed by a shared
+    PacketLayout rather than as a dict. This avoids the hash table
+    allocations and resizing incurred as a dict is built up field by field
+    and reduces the memory held by queued packets. A PacketRecord behaves as
+    a (mutable) dict and is materialised as a dict only when required, eg
+    when mapped to a loop packet.
     """
 
-    def __init__(self, ip_address=None, port=None, broadcast_address=None,
-                 broadcast_port=None, socket_timeout=None, broadcast_timeout=None,
-                 poll_interval=default_poll_interval,
-                 max_tries=default_max_tries, retry_wait=default_retry_wait,
-                 use_wh32=True, ignore_wh40_batt=True, show_battery=False,
-                 discovery_method=default_discovery_method,
-                 discovery_port=default_discovery_port,
-                 discovery_period=default_discovery_period,
-                 log_unknown_fields=False, fw_update_check_interval=86400,
-                 log_fw_update_avail=False, debug=DebugOptions({})):
-        """Initialise our class."""
+    __slots__ = ('layout', 'values')
 
-        # initialize my base class:
-        super(GatewayCollector, self).__init__()
+    # marker for a field in the layout that has no value in this record
+    missing = object()
 
-        # interval between polls of the API, use a default
-        self.poll_interval = poll_interval
-        # how many times to poll the API before giving up, default is
-        # default_max_tries
-        self.max_tries = max_tries
-        # period in seconds to wait before polling again, default is
-        # default_retry_wait seconds
-        self.retry_wait = retry_wait
-        # how to handle checks for a gateway device firmware update
-        # how often to check for a firmware update
-        self.fw_update_check_interval = fw_update_check_interval
-        # whether to log when a firmware update is available
-        self.log_fw_update_avail = log_fw_update_avail
-        # log our config options before obtaining a GatewayDevice object, this
-        # will help in remote debugging should the device be uncontactable
-        if self.log_fw_update_avail:
-            logdbg('     firmware update checks will occur and will be logged')
-            logdbg('     firmware update check interval is %d' % self.fw_update_check_interval)
+    def __init__(self, layout=None, data=None):
+        """Initialise a PacketRecord object.
+
+        layout: PacketLayout object to start from, if None an empty layout is
+                used
+        data:   dict or other mapping of initial field values
+        """
+
+        self.layout = layout if layout is not None else PacketLayout()
+        self.values = [PacketRecord.missing] * len(self.layout.fields)
+        if data is not None:
+            for field, value in six.iteritems(data):
+                self[field] = value
+
+    def __getitem__(self, field):
+        i = self.layout.index.get(field)
+        if i is None or self.values[i] is PacketRecord.missing:
+            raise KeyError(field)
+        return self.values[i]
+
+    def __setitem__(self, field, value):
+        i = self.layout.index.get(field)
+        if i is None:
+            self.layout = self.layout.extend(field)
+            self.values.append(value)
+        else:
+            self.values[i] = value
+
+    def __delitem__(self, field):
+        i = self.layout.index.get(field)
+        if i is None or self.values[i] is PacketRecord.missing:
+            raise KeyError(field)
+        self.values[i] = PacketRecord.missing
+
+    def __contains__(self, field):
+        i = self.layout.index.get(field)
+        return i is not None and self.values[i] is not PacketRecord.missing
+
+    def __iter__(self):
+        missing = PacketRecord.missing
+        for field, value in zip(self.layout.fields, self.values):
+            if value is not missing:
+                yield field
+
+    def __len__(self):
+        missing = PacketRecord.missing
+        return sum(1 for value in self.values if value is not missing)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def __reduce__(self):
+        return PacketRecord, (None, self.to_dict())
+
+    def __copy__(self):
+        record = PacketRecord.__new__(PacketRecord)
+        record.layout = self.layout
+        record.values = list(self.values)
+        return record
+
+    def __deepcopy__(self, memo):
+        record = PacketRecord.__new__(PacketRecord)
+        record.layout = self.layout
+        record.values = [v if v is PacketRecord.missing else copy.deepcopy(v, memo)
+                         for v in self.values]
+        return record
+
+    copy = __copy__
+
+    def get(self, field, default=None):
+        i = self.layout.index.get(field)
+        if i is None or self.values[i] is PacketRecord.missing:
+            return default
+        return self.values[i]
+
+    def to_dict(self):
+        """Materialise the record as a dict."""
+
+        missing = PacketRecord.missing
+        return dict((field, value) for field, value in zip(self.layout.fields, self.values)
+                    if value is not missing)
+
+
+# ============================================================================
+#                          class AdaptivePollScheduler
+# ============================================================================
+
+class AdaptivePollScheduler(object):
+    """Class to schedule device polls just after expected sensor updates.
+
+    Gateway device sensor data only changes when a sensor transmission is
+    received. Each sensor transmits at a fixed period, eg 16 seconds for a
+    WH31 or 4.75 seconds for a WS80, so polling at a fixed interval results in
+    an average delay of half the poll interval between a sensor transmission
+    and the resulting loop packet.
+
+    An AdaptivePollScheduler object groups device fields by the sensor that
+    provides them and observes when each group changes value. A group change
+    seen by a poll means the sensor transmitted sometime between the previous
+    poll and this poll. Once a group has been seen to change a few times the
+    sensor transmission period is estimated from the observed intervals and
+    the transmission phase is refined by successive polls so that polls
+    occur just after each expected transmission. If an expected transmission
+    is repeatedly not seen the period is learnt again.
+
+    Polls back off towards the maximum interval when nothing changes. Polls
+    are never closer together than the minimum interval or further apart than
+    the maximum interval.
+    """
+
+    # device fields provided by the same sensor, fields not listed are grouped
+    # by WH31 channel or treated as a group of their own
+    field_groups = {'winddir': 'wind', 'windspeed': 'wind', 'gustspeed': 'wind',
+                    'outtemp': 'outdoor', 'outhumid': 'outdoor',
+                    'dewpoint': 'outdoor', 'windchill': 'outdoor',
+                    'heatindex': 'outdoor',
+                    'intemp': 'indoor', 'inhumid': 'indoor',
+                    'absbarometer': 'indoor', 'relbarometer': 'indoor',
+                    'light': 'solar', 'uv': 'solar', 'uvi': 'solar'}
+    # device fields that do not change on a sensor transmission
+    ignore_fields = ('datetime', 'heap_free', 'daymaxwind', 'throttled')
+    # known sensor transmission periods, a period estimate close to one of
+    # these is assumed to be that period
+    known_periods = (4.75, 8.8, 16.0, 61.0, 70.0)
+    # how close, as a fraction of a known period, an estimate must be to be
+    # assumed to be a known period
+    snap_tolerance = 0.1
+    # number of observed intervals required before a period is estimated
+    min_intervals = 3
+    # number of observed intervals retained for each group
+    history = 8
+    # number of consecutive missed transmissions after which a period is
+    # learnt again
+    max_misses = 5
+
+    class FieldGroup(object):
+        """Class to hold the observed state of a group of device fields."""
+
+        def __init__(self, value, poll_ts):
+            # the current group value
+            self.value = value
+            # the timestamp of the poll that last saw the group
+            self.seen = poll_ts
+            # the earliest and latest times the last transmission could have
+            # occurred
+            self.lo = None
+            self.hi = None
+            # observed (shortest, longest) intervals between transmissions
+            self.intervals = []
+            # the transmission period, None if not yet known
+            self.period = None
+            # number of consecutive missed transmissions
+            self.misses = 0
+
+    def __init__(self, min_interval=default_min_poll_interval,
+                 max_interval=default_max_poll_interval,
+                 margin=default_poll_margin):
+        """Initialise our class."""
+
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.margin = margin
+        # the field groups seen so far keyed by group name
+        self.groups = dict()
+        # the timestamp of the poll that last saw a group change, or of our
+        # first poll if no change has been seen
+        self.last_change = None
+
+    def group_name(self, field):
+        """Obtain the group name for a device field."""
+
+        try:
+            return self.field_groups[field]
+        except KeyError:
+            _match = re.match(r'(?:temp|humid)([1-8])$', field)
+            return 'wh31_ch%s' % _match.group(1) if _match else field
+
+    def update(self, poll_ts, data):
+        """Update the scheduler with the data from a poll.
+
+        Returns the timestamp at which the next poll should occur.
+        """
+
+        if self.last_change is None:
+            self.last_change = poll_ts
+        values = dict()
+        for field, value in six.iteritems(data):
+            if value is None or field in self.ignore_fields or field.endswith(('_batt', '_sig')):
+                continue
+            values.setdefault(self.group_name(field), []).append((field, value))
+        for name, items in six.iteritems(values):
+            value = tuple(sorted(items))
+            group = self.groups.get(name)
+            if group is None:
+                self.groups[name] = AdaptivePollScheduler.FieldGroup(value, poll_ts)
+                continue
+            if value != group.value:
+                self.last_change = poll_ts
+                self.observe(group, poll_ts)
+            elif group.period is not None:
+                self.no_change(group, poll_ts)
+            group.value = value
+            group.seen = poll_ts
+        return self.next_poll(poll_ts)
+
+    def next_window(self, group, ts):
+        """Obtain the window for a group's first transmission due after ts.
+
+        Returns a tuple of the earliest and latest times the transmission may
+        occur.
+        """
+
+        k = math.floor((ts - group.hi - self.margin) / group.period) + 1
+        return group.lo + k * group.period, group.hi + k * group.period
+
+    def observe(self, group, poll_ts):
+        """Process a poll that saw a group change."""
+
+        # the transmission occurred after the previous poll and no later than
+        # this poll
+        lo, hi = group.seen, poll_ts
+        if group.period is not None:
+            # narrow the window using the window we expected
+            w_lo, w_hi = self.next_window(group, group.seen)
+            if max(lo, w_lo) <= min(hi, w_hi):
+                lo, hi = max(lo, w_lo), min(hi, w_hi)
+        elif group.lo is not None:
+            group.intervals.append((lo - group.hi, hi - group.lo))
+            del group.intervals[:-self.history]
+            if len(group.intervals) >= self.min_intervals:
+                group.period = self.estimate_period(group.intervals)
+        group.lo, group.hi = lo, hi
+        group.misses = 0
+
+    def no_change(self, group, poll_ts):
+        """Process a poll that saw no change in a group with a known period."""
+
+        lo, hi = self.next_window(group, group.seen)
+        if poll_ts >= hi + self.margin:
+            # the expected transmission was not seen, it may have been lost or
+            # our window is wrong so widen the window a little
+            group.misses += 1
+            group.hi += self.margin / 2.0
+            if group.misses >= self.max_misses:
+                group.period = None
+                group.misses = 0
+                del group.intervals[:]
+        elif poll_ts > lo:
+            # the transmission has not yet occurred
+            group.lo = poll_ts - (lo - group.lo)
+
+    def estimate_period(self, intervals):
+        """Estimate a transmission period from observed intervals.
+
+        The shortest observed interval is taken to be a single period, any
+        other intervals are assumed to span a whole number of periods due to
+        lost transmissions. The estimate is the midpoint of the range of
+        periods consistent with all observed intervals.
+        """
+
+        base = min((a + b) / 2.0 for a, b in intervals)
+        lower, upper = 0.0, float('inf')
+        for a, b in intervals:
+            n = max(1, int((a + b) / 2.0 / base + 0.3))
+            lower, upper = max(lower, a / n), min(upper, b / n)
+        period = (lower + upper) / 2.0 if lower <= upper else base
+        known = min(self.known_periods, key=lambda p: abs(p - period))
+        if abs(period - known) <= known * self.snap_tolerance:
+            return known
+        return period
+
+    def next_poll(self, poll_ts):
+        """Obtain the timestamp of the next poll."""
+
+        due = None
+        learning = False
+        for group in six.itervalues(self.groups):
+            if group.period is None:
+                # a recently changed group without a period is being learnt
+                if group.hi is not None and poll_ts - group.hi < self.max_interval:
+                    learning = True
+                continue
+            lo, hi = self.next_window(group, poll_ts)
+            mid = (lo + hi) / 2.0
+            # poll in the middle of a wide window to narrow it, otherwise poll
+            # just after the window
+            if hi - lo > 2 * self.margin and poll_ts < mid:
+                _due = mid
+            else:
+                _due = hi + self.margin
+            due = _due if due is None else min(due, _due)
+        if learning:
+            # poll as often as we can to learn as quickly as we can
+            due = poll_ts
+        elif due is None:
+            # back off the longer it has been since anything changed
+            due = poll_ts + (poll_ts - self.last_change) / 2.0
+        return min(max(due, poll_ts + self.min_interval),
+                   poll_ts + self.max_interval)
+
+
+# ============================================================================
+#                            class WindAccumulator
+# ============================================================================
+
+class WindAccumulator(object):
+    """Class to accumulate wind data from wind only polls.
+
+    A WindAccumulator object accumulates the wind data obtained by wind only
+    polls between full polls of a gateway device. The accumulated data is
+    used to enrich the data from the next full poll:
+
+    -   gustspeed is the highest gust speed seen
+    -   windspeed is the average wind speed seen
+    -   winddir is the vector average wind direction seen
+
+    Wind speeds are in the device units (m/s) and wind direction in degrees.
+    """
+
+    def __init__(self):
+        """Initialise our class."""
+
+        self.reset()
+
+    def reset(self):
+        """Discard any accumulated wind data."""
+
+        self.count = 0
+        self.speed_sum = 0.0
+        self.x_sum = 0.0
+        self.y_sum = 0.0
+        self.gust = None
+
+    def add(self, data):
+        """Add the wind data from a poll to the accumulator."""
+
+        speed = data.get('windspeed')
+        direction = data.get('winddir')
+        gust = data.get('gustspeed')
+        if speed is not None:
+            self.count += 1
+            self.speed_sum += speed
+            if direction is not None:
+                self.x_sum += speed * math.sin(math.radians(direction))
+                self.y_sum += speed * math.cos(math.radians(direction))
+        if gust is not None and (self.gust is None or gust > self.gust):
+            self.gust = gust
+
+    def enrich(self, data):
+        """Enrich the data from a full poll with the accumulated wind data.
+
+        The full poll wind data is included in the accumulated data. The
+        accumulator is reset ready for the next full poll.
+        """
+
+        if self.count > 0 or self.gust is not None:
+            self.add(data)
+            if self.gust is not None:
+                data['gustspeed'] = self.gust
+            if self.count > 0:
+                data['windspeed'] = self.speed_sum / self.count
+                # calm wind has no direction so only update the wind
+                # direction if there is a direction to average
+                if 'winddir' in data and (self.x_sum != 0.0 or self.y_sum != 0.0):
+                    data['winddir'] = math.degrees(math.atan2(self.x_sum, self.y_sum)) % 360
+        self.reset()
+
+
+# ============================================================================
+#                          class DeviceHealthMonitor
+# ============================================================================
+
+class DeviceHealthMonitor(object):
+    """Class to monitor gateway device health.
+
+    Gateway devices have been known to reboot when free heap memory runs low
+    under aggressive polling. A DeviceHealthMonitor object tracks the device
+    free heap memory (device field heap_free) and the device response latency
+    each poll and determines whether polling should be throttled.
+
+    Polling is throttled if free heap memory falls below a threshold or if
+    the short term average response latency exceeds a multiple of the
+    baseline response latency. The baseline latency is a long term average
+    latency that is only updated while polling is not throttled. Throttling
+    is relaxed once free heap memory and response latency have recovered for
+    a number of consecutive polls. Each change of state is logged.
+    """
+
+    NORMAL = 'normal'
+    THROTTLED = 'throttled'
+
+    # weighting given to each new latency in the short and long term
+    # (baseline) average latencies
+    fast_alpha = 0.3
+    slow_alpha = 0.05
+    # latency in seconds below which latency is never considered to be rising
+    latency_floor = 0.5
+    # number of consecutive healthy polls required to relax throttling
+    recover_polls = 3
+    # free heap memory must exceed the threshold by this factor to be
+    # considered recovered
+    heap_hysteresis = 1.25
+
+    def __init__(self, heap_free=default_throttle_heap_free,
+                 latency_factor=default_throttle_latency_factor,
+                 poll_factor=default_throttle_poll_factor):
+        """Initialise our class."""
+
+        self.heap_free_threshold = heap_free
+        self.latency_factor = latency_factor
+        self.poll_factor = poll_factor
+        self.state = DeviceHealthMonitor.NORMAL
+        self.heap_free = None
+        self.latency = None
+        self.baseline = None
+        self.healthy_polls = 0
+        # number of times polling has been throttled
+        self.throttle_count = 0
+
+    @property
+    def throttled(self):
+        """Whether polling is currently throttled."""
+
+        return self.state == DeviceHealthMonitor.THROTTLED
+
+    @property
+    def metrics(self):
+        """Current device health metrics."""
+
+        return {'state': self.state,
+                'heap_free': self.heap_free,
+                'latency': self.latency,
+                'baseline_latency': self.baseline,
+                'throttle_count': self.throttle_count}
+
+    def update(self, heap_free, latency):
+        """Update device health with the results of a poll.
+
+        heap_free: device free heap memory in bytes, may be None
+        latency:   device response latency in seconds, may be None
+
+        Returns True if the throttle state changed.
+        """
+
+        self.heap_free = heap_free
+        if latency is not None:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += self.fast_alpha * (latency - self.latency)
+            if self.baseline is None:
+                self.baseline = latency
+            elif not self.throttled:
+                self.baseline += self.slow_alpha * (latency - self.baseline)
+        reasons = []
+        heap_low = heap_free is not None and heap_free < self.heap_free_threshold
+        if heap_low:
+            reasons.append('free heap memory %d bytes' % heap_free)
+        latency_high = self.latency is not None and self.latency > self.latency_floor and \
+            self.latency > self.latency_factor * self.baseline
+        if latency_high:
+            reasons.append('response latency %.2f seconds (baseline %.2f seconds)' % (self.latency,
+                                                                                     self.baseline))
+        if not self.throttled:
+            if reasons:
+                self.state = DeviceHealthMonitor.THROTTLED
+                self.throttle_count += 1
+                self.healthy_polls = 0
+                loginf('Device polling throttled due to %s' % ' and '.join(reasons))
+                return True
+            return False
+        heap_ok = heap_free is None or heap_free >= self.heap_free_threshold * self.heap_hysteresis
+        latency_ok = self.latency is None or self.latency <= self.latency_floor or \
+            self.latency <= self.latency_factor * self.baseline / 2.0
+        if heap_ok and latency_ok:
+            self.healthy_polls += 1
+        else:
+            self.healthy_polls = 0
+        if self.healthy_polls >= self.recover_polls:
+            self.state = DeviceHealthMonitor.NORMAL
+            loginf('Device polling no longer throttled')
+            return True
+        return False
+
+
+# ============================================================================
+#                              class GatewayCollector
+# ============================================================================
+
+class GatewayCollector(Collector):
+    """Class to collect data from an Ecowitt LAN/Wi-Fi Gateway device.
+
+    A GatewayCollector object is responsible for obtaining data from an Ecowitt
+    LAN/Wi-Fi Gateway device and passing relevant data to its parent
+    driver/service. A GatewayCollector object uses subordinate classes to
+    obtain data from the gateway device via the Ecowitt LAN/Wi-Fi Gateway
+    device API and direct HTTP requests suitable for passing to its parent
+    driver/service. A GatewayCollector can also be used to obtain device data
+    when the driver is operated in direct mode.
+
+    A GatewayCollector object uses a GatewayDevice object to handle all
+    interaction with the device.
+
+    The API commands used to obtain sensor data each poll are negotiated on
+    the first poll. CMD_GW1000_LIVEDATA is always used. CMD_READ_RAIN is only
+    used if the device supports it and it provides required fields not
+    provided by CMD_GW1000_LIVEDATA. Piezo rain gauge fields are only required
+    if a piezo rain gauge is connected. The negotiated command set is used
+    until the device firmware version or connected sensors change.
+
+    If hybrid_livedata is set live data is obtained by a LiveDataRouter
+    object via the API and/or HTTP, each required field being obtained via
+    the fastest transport that provides it.
+
+    The device is polled every poll_interval seconds unless an
+    AdaptivePollScheduler object is provided in which case the scheduler
+    determines when each poll occurs.
+
+    Ultrasonic sensor arrays update wind data every few seconds. If a wind
+    poll interval is set the device live data is additionally polled at the
+    wind poll interval between full polls. Only the wind fields are decoded
+    and the wind data is accumulated by a WindAccumulator object that
+    enriches the data from the next full poll with the highest gust and the
+    average wind seen since the previous full poll.
+
+    If a DeviceHealthMonitor object is provided polling is throttled when the
+    device shows memory pressure or rising response latency. When throttled
+    the poll interval is stretched, sensor state data and firmware update
+    checks are not refreshed, wind only polls are suspended and device
+    requests are serialised. The device field 'throttled' is set to 1 when
+    polling is throttled and 0 otherwise.
+    """
+
+    # sensor addresses of sensors that include a piezo rain gauge
+    piezo_gauge_addresses = (b'\x30', b'\x31')
+    # device fields derived by the driver and the device fields each may be
+    # derived from
+    derived_fields = {'t_rain': ('t_raintotals', 't_rainyear', 't_rainmonth'),
+                      'p_rain': ('p_rainyear', 'p_rainmonth')}
+
+    def __init__(self, ip_address=None, port=None, broadcast_address=None,
+                 broadcast_port=None, socket_timeout=None, broadcast_timeout=None,
+                 poll_interval=default_poll_interval,
+                 max_tries=default_max_tries, retry_wait=default_retry_wait,
+                 use_wh32=True, ignore_wh40_batt=True, show_battery=False,
+                 discovery_method=default_discovery_method,
+                 discovery_port=default_discovery_port,
+                 discovery_period=default_discovery_period,
+                 log_unknown_fields=False, fw_update_check_interval=86400,
+                 log_fw_update_avail=False, recorder=None, cache_ttl=None,
+                 required_fields=None, poll_scheduler=None,
+                 wind_poll_interval=None, health_monitor=None,
+                 max_retry_wait=default_max_retry_wait,
+                 breaker_threshold=default_breaker_threshold,
+                 breaker_reset=default_breaker_reset,
+                 adaptive_timeout=True,
+                 min_socket_timeout=default_min_socket_timeout,
+                 max_socket_timeout=default_max_socket_timeout,
+                 hybrid_livedata=False,
+                 http_probe_interval=default_http_probe_interval,
+                 device=None, debug=DebugOptions({})):
+        """Initialise our class.
+
+        If a GatewayDevice (or compatible) object is passed via the device
+        parameter it is used in lieu of creating a GatewayDevice object.
+        """
+
+        # initialize my base class:
+        super(GatewayCollector, self).__init__()
+
+        # event used to cancel all blocking waits when we shut down
+        self.cancel_event = threading.Event()
+        # interval between polls of the API, use a default
+        self.poll_interval = poll_interval
+        # AdaptivePollScheduler object used to schedule polls, if None polls
+        # occur every poll_interval seconds
+        self.poll_scheduler = poll_scheduler
+        # interval between wind only polls of the API and the WindAccumulator
+        # object used to accumulate wind only poll data, None if wind only
+        # polls are not used
+        if wind_poll_interval:
+            self.wind_poll_interval = wind_poll_interval
+            self.wind_accumulator = WindAccumulator()
+            logdbg('     wind data will be polled every %s seconds' % wind_poll_interval)
+        else:
+            self.wind_poll_interval = None
+            self.wind_accumulator = None
+        # DeviceHealthMonitor object used to throttle polling, None if
+        # polling is never throttled
+        self.health = health_monitor
+        # response latency of the last live data request and the last sensor
+        # state data obtained
+        self.latency = None
+        self.last_sensor_state = None
+        # how many times to poll the API before giving up, default is
+        # default_max_tries
+        self.max_tries = max_tries
+        # period in seconds to wait before polling again, default is
+        # default_retry_wait seconds
+        self.retry_wait = retry_wait
+        # how to handle checks for a gateway device firmware update
+        # how often to check for a firmware update
+        self.fw_update_check_interval = fw_update_check_interval
+        # whether to log when a firmware update is available
+        self.log_fw_update_avail = log_fw_update_avail
+        # log our config options before obtaining a GatewayDevice object, this
+        # will help in remote debugging should the device be uncontactable
+        if self.log_fw_update_avail:
+            logdbg('     firmware update checks will occur and will be logged')
+            logdbg('     firmware update check interval is %d' % self.fw_update_check_interval)
         else:
             logdbg('     firmware update checks will not occur')
         if use_wh32:
@@ -2887,21 +4036,62 @@ class GatewayCollector(Collector):
             logdbg('     unknown fields will be reported')
         else:
             logdbg('     unknown fields will be ignored')
-
+        # FrameRecorder object used to capture API frames, may be None
+        self.recorder = recorder
+        # the device fields our parent requires, None if all device fields are
+        # required
+        if required_fields is not None:
+            required_fields = set(required_fields)
+            for field, sources in six.iteritems(self.derived_fields):
+                if field in required_fields:
+                    required_fields.update(sources)
+        self.required_fields = required_fields
+        # the negotiated API command set and the firmware version and
+        # connected sensors it was negotiated for
+        self.command_plan = None
+        self.command_plan_key = None
+        # the layout of the last PacketRecord we produced, each poll starts
+        # from this layout
+        self.packet_layout = PacketLayout()
+
+        # the GatewayDevice parameters other than device address, retained
+        # so further GatewayDevice objects can be obtained
+        self.device_kwargs = dict(broadcast_address=broadcast_address,
+                                  broadcast_port=broadcast_port,
+                                  socket_timeout=socket_timeout,
+                                  broadcast_timeout=broadcast_timeout,
+                                  max_tries=max_tries, retry_wait=retry_wait,
+                                  use_wh32=use_wh32, ignore_wh40_batt=ignore_wh40_batt,
+                                  show_battery=show_battery,
+                                  discovery_method=discovery_method,
+                                  discovery_port=discovery_port,
+                                  discovery_period=discovery_period,
+                                  log_unknown_fields=log_unknown_fields,
+                                  recorder=recorder, cache_ttl=cache_ttl,
+                                  max_retry_wait=max_retry_wait,
+                                  breaker_threshold=breaker_threshold,
+                                  breaker_reset=breaker_reset,
+                                  adaptive_timeout=adaptive_timeout,
+                                  min_socket_timeout=min_socket_timeout,
+                                  max_socket_timeout=max_socket_timeout,
+                                  cancel_event=self.cancel_event,
+                                  debug=debug)
         # get a GatewayDevice to handle interaction with the gateway device
-        self.device = GatewayDevice(ip_address=ip_address, port=port,
-                                    broadcast_address=broadcast_address,
-                                    broadcast_port=broadcast_port,
-                                    socket_timeout=socket_timeout,
-                                    broadcast_timeout=broadcast_timeout,
-                                    max_tries=max_tries, retry_wait=retry_wait,
-                                    use_wh32=use_wh32, ignore_wh40_batt=ignore_wh40_batt,
-                                    show_battery=show_battery,
-                                    discovery_method=discovery_method,
-                                    discovery_port=discovery_port,
-                                    discovery_period=discovery_period,
-                                    log_unknown_fields=log_unknown_fields, debug=debug)
-
+        if device is not None:
+            self.device = device
+        else:
+            self.device = GatewayDevice(ip_address=ip_address, port=port,
+                                        **self.device_kwargs)
+
+        # do we obtain live data via the API and HTTP, if so get a
+        # LiveDataRouter to route each field to the cheapest transport
+        if hybrid_livedata:
+            self.livedata_router = LiveDataRouter(self.device,
+                                                  required_fields=self.required_fields,
+                                                  probe_interval=http_probe_interval)
+            logdbg('     live data will be obtained via the API and HTTP')
+        else:
+            self.livedata_router = None
         # start off logging failures
         self.log_failures = True
         # do we have a legacy WH40 and how are we handling its battery state
@@ -2919,6 +4109,28 @@ class GatewayCollector(Collector):
         # are threaded
         self.collect_data = False
 
+    def get_secondary_device(self, ip_address, port):
+        """Obtain a GatewayDevice object for a standby or additional device.
+
+        A secondary device is sent each API command once only with a short
+        socket timeout, so an unresponsive secondary device cannot hold up
+        our other devices. The device is not contacted, it must be identified
+        (GatewayApi.identify()) before it is used.
+        """
+
+        device_kwargs = dict(self.device_kwargs)
+        socket_timeout = device_kwargs['socket_timeout']
+        max_socket_timeout = min(device_kwargs['max_socket_timeout'],
+                                 default_secondary_socket_timeout)
+        if socket_timeout is None or socket_timeout > max_socket_timeout:
+            socket_timeout = max_socket_timeout
+        device_kwargs.update(max_tries=1, socket_timeout=socket_timeout,
+                             min_socket_timeout=min(device_kwargs['min_socket_timeout'],
+                                                    max_socket_timeout),
+                             max_socket_timeout=max_socket_timeout,
+                             identify=False)
+        return GatewayDevice(ip_address=ip_address, port=port, **device_kwargs)
+
     def collect(self):
         """Collect and queue sensor data.
 
@@ -2931,6 +4143,10 @@ class GatewayCollector(Collector):
 
         # initialise ts of last time API was polled
         last_poll = 0
+        # initialise ts of next adaptive poll
+        next_poll = 0
+        # initialise ts of last wind only poll
+        last_wind_poll = 0
         # initialise ts of last firmware check
         last_fw_check = 0
         # collect data continuously while we are told to collect data
@@ -2938,7 +4154,11 @@ class GatewayCollector(Collector):
             # store the current time
             now = time.time()
             # is it time to poll?
-            if now - last_poll > self.poll_interval:
+            if self.poll_scheduler is not None:
+                poll_due = now >= next_poll
+            else:
+                poll_due = now - last_poll > self.poll_interval
+            if poll_due:
                 # it is time to poll, wrap in a try..except in case we get a
                 # GWIOError exception
                 try:
@@ -2953,14 +4173,44 @@ class GatewayCollector(Collector):
                     # assign the GWIOError exception, so it will be sent in
                     # the queue to our controlling object
                     queue_data = e
+                # update the device health and throttle as required
+                if self.health is not None and hasattr(queue_data, 'keys'):
+                    if self.health.update(queue_data.get('heap_free'), self.latency):
+                        self.device.serialise = self.health.throttled
+                    queue_data['throttled'] = 1 if self.health.throttled else 0
+                # the poll interval is stretched if we are throttled
+                if self.health is not None and self.health.throttled:
+                    poll_factor = self.health.poll_factor
+                else:
+                    poll_factor = 1
+                if self.poll_scheduler is not None:
+                    # have the scheduler learn from this poll and tell us
+                    # when to next poll, if the poll failed wait as per a
+                    # normal poll
+                    if hasattr(queue_data, 'keys'):
+                        next_poll = self.poll_scheduler.update(now, queue_data)
+                    else:
+                        next_poll = now + self.poll_interval
+                    next_poll = now + (next_poll - now) * poll_factor
+                    # debug log when we will next poll the API
+                    logdbg('Next update in %.1f seconds' % (next_poll - now))
+                else:
+                    # debug log when we will next poll the API
+                    logdbg('Next update in %d seconds' % (self.poll_interval * poll_factor))
+                # enrich the data with any wind data obtained since the last
+                # poll
+                if self.wind_accumulator is not None and hasattr(queue_data, 'keys'):
+                    self.wind_accumulator.enrich(queue_data)
                 # put the queue data in the queue
                 self.queue.put(queue_data)
-                # debug log when we will next poll the API
-                logdbg('Next update in %d seconds' % self.poll_interval)
-                # reset the last poll ts
-                last_poll = now
-                # do a firmware update check if required
-                if now - last_fw_check > self.fw_update_check_interval and self.log_fw_update_avail:
+                # reset the last poll and last wind poll ts, if throttled
+                # stretch the poll interval by moving the last poll ts
+                last_poll = now + self.poll_interval * (poll_factor - 1)
+                last_wind_poll = now
+                # do a firmware update check if required, but not if
+                # throttled
+                if now - last_fw_check > self.fw_update_check_interval and self.log_fw_update_avail \
+                        and poll_factor == 1:
                     if self.device.firmware_update_avail:
                         _msg = "A firmware is available, "\
                                "current %s firmware version is %s" % (self.device.model,
@@ -2975,8 +4225,24 @@ class GatewayCollector(Collector):
                         else:
                             loginf("    no firmware update message found")
                     last_fw_check = now
-            # sleep for a second and then see if it's time to poll again
-            time.sleep(1)
+            elif self.wind_accumulator is not None and now - last_wind_poll >= self.wind_poll_interval \
+                    and not (self.health is not None and self.health.throttled):
+                # it is time for a wind only poll between full polls
+                try:
+                    self.wind_accumulator.add(self.device.wind)
+                except GWIOError as e:
+                    # leave it to the next full poll to report any problem
+                    logdbg('Unable to obtain live wind data: %s' % e)
+                last_wind_poll = now
+            # sleep for a second and then see if it's time to poll again, an
+            # adaptive or wind poll may be due sooner, wake immediately if we
+            # are shut down
+            wait = 1
+            if self.poll_scheduler is not None:
+                wait = min(wait, next_poll - time.time())
+            if self.wind_accumulator is not None:
+                wait = min(wait, last_wind_poll + self.wind_poll_interval - time.time())
+            self.cancel_event.wait(max(0.1, wait))
 
     def get_current_data(self):
         """Get all current sensor data.
@@ -2996,7 +4262,16 @@ class GatewayCollector(Collector):
         # Now obtain the bulk of the current sensor data via the API. If the
         # data cannot be obtained we will see a GWIOError exception which we
         # just let bubble up. Otherwise, we are returned the parsed live data.
-        parsed_data = self.device.livedata
+        # Keep track of how long the device took to respond.
+        start = monotonic()
+        if self.livedata_router is not None:
+            livedata = self.livedata_router.get_livedata()
+        else:
+            livedata = self.device.livedata
+        self.latency = monotonic() - start
+        # accumulate our data in a PacketRecord using the layout of our
+        # previous poll
+        parsed_data = PacketRecord(self.packet_layout, livedata)
         # add the timestamp to the data dict
         parsed_data['datetime'] = _timestamp
         # Now get the parsed rain data via the API. If the data cannot be
@@ -3006,12 +4281,24 @@ class GatewayCollector(Collector):
         # only available rain data will already be in our livedata response. So
         # just set the raindata response to None. If we get a GWIOError then
         # let it bubble up.
-        try:
-            parsed_rain_data = self.device.rain
-        except UnknownApiCommand:
+        # Whether we use CMD_READ_RAIN depends on our negotiated command set,
+        # if we have no command set or the firmware or connected sensors have
+        # changed negotiate a new command set.
+        plan_key = self.get_command_plan_key()
+        if self.command_plan is None or plan_key != self.command_plan_key:
+            parsed_rain_data = self.negotiate_command_plan(parsed_data, plan_key)
+        elif 'CMD_READ_RAIN' in self.command_plan:
+            try:
+                parsed_rain_data = self.device.rain
+            except UnknownApiCommand:
+                # the device no longer supports CMD_READ_RAIN, negotiate a
+                # new command set next poll
+                self.command_plan = None
+                parsed_rain_data = None
+            except GWIOError:
+                raise
+        else:
             parsed_rain_data = None
-        except GWIOError:
-            raise
         # now update our parsed data with the parsed rain data if we have any
         if parsed_rain_data is not None:
             parsed_data.update(parsed_rain_data)
@@ -3021,10 +4308,15 @@ class GatewayCollector(Collector):
         # The parsed data does not currently contain any sensor battery state
         # or signal level data so obtain the parsed sensor battery state
         # and signal level data from our GatewayDevice.
-        try:
-            parsed_sensor_state_data = self.device.sensor_state
-        except GWIOError:
-            raise
+        # If polling is throttled sensor state data is not refreshed.
+        if self.health is not None and self.health.throttled and self.last_sensor_state is not None:
+            parsed_sensor_state_data = self.last_sensor_state
+        else:
+            try:
+                parsed_sensor_state_data = self.device.sensor_state
+            except GWIOError:
+                raise
+            self.last_sensor_state = parsed_sensor_state_data
         # now update our parsed data with the parsed sensor state data if we
         # have any
         if parsed_sensor_state_data is not None:
@@ -3032,11 +4324,72 @@ class GatewayCollector(Collector):
         # log the processed parsed data but only if debug>=3
         if weewx.debug >= 3:
             logdbg("Processed parsed data: %s" % parsed_data)
+        # use the resulting layout next poll
+        self.packet_layout = parsed_data.layout
         return parsed_data
 
+    def get_command_plan_key(self):
+        """Obtain the key used to determine if a command set is current.
+
+        A command set is negotiated for a given device firmware version and
+        set of connected sensors.
+        """
+
+        try:
+            firmware_version = self.device.firmware_version
+        except GWIOError:
+            # we could not get the firmware version, use the version our
+            # command set was negotiated for if there is one
+            firmware_version = self.command_plan_key[0] if self.command_plan_key is not None else None
+        return firmware_version, frozenset(self.device.api.sensors.connected_addresses)
+
+    def negotiate_command_plan(self, parsed_data, plan_key):
+        """Negotiate the API commands used to obtain sensor data.
+
+        Obtain CMD_READ_RAIN data and determine whether CMD_READ_RAIN provides
+        any required fields that are not provided by CMD_GW1000_LIVEDATA.
+
+        parsed_data: Parsed CMD_GW1000_LIVEDATA data for this poll.
+        plan_key:    The firmware version and connected sensors key for the
+                     command set.
+
+        Returns the parsed CMD_READ_RAIN data for this poll or None if the
+        device does not support CMD_READ_RAIN.
+        """
+
+        try:
+            parsed_rain_data = self.device.rain
+        except UnknownApiCommand:
+            # most likely an older device or firmware that does not support
+            # CMD_READ_RAIN, all we have is the live data rain data
+            parsed_rain_data = None
+        plan = ['CMD_GW1000_LIVEDATA']
+        unique_fields = set()
+        if parsed_rain_data is not None:
+            # the fields with data that only CMD_READ_RAIN provides
+            live_fields = set(k for k, v in six.iteritems(parsed_data) if v is not None)
+            unique_fields = set(k for k, v in six.iteritems(parsed_rain_data) if v is not None) - live_fields
+            if self.required_fields is not None:
+                unique_fields &= self.required_fields
+            # piezo gauge fields are only of use if we have a piezo gauge
+            if not any(a in plan_key[1] for a in self.piezo_gauge_addresses):
+                unique_fields = set(f for f in unique_fields if not f.startswith('p_'))
+            if len(unique_fields) > 0:
+                plan.append('CMD_READ_RAIN')
+        self.command_plan = plan
+        self.command_plan_key = plan_key
+        if len(unique_fields) > 0:
+            loginf("Using API commands %s, CMD_READ_RAIN provides %s" % (', '.join(plan),
+                                                                        ', '.join(sorted(unique_fields))))
+        else:
+            loginf("Using API command %s" % (', '.join(plan),))
+        return parsed_rain_data
+
     def startup(self):
         """Start a thread that collects data from the API."""
 
+        # we may have been shut down previously so allow blocking waits
+        self.cancel_event.clear()
         try:
             self.thread = GatewayCollector.CollectorThread(self)
             self.collect_data = True
@@ -3050,13 +4403,17 @@ class GatewayCollector(Collector):
     def shutdown(self):
         """Shut down the thread that collects data from the API.
 
-        Tell the thread to stop, then wait for it to finish.
+        Tell the thread to stop and cancel any blocking wait (eg a retry wait
+        or waiting for a device response) the thread may be in, then wait for
+        the thread to finish.
         """
 
         # we only need do something if a thread exists
         if self.thread:
             # tell the thread to stop collecting data
             self.collect_data = False
+            # cancel any blocking waits so we are not kept waiting
+            self.cancel_event.set()
             # terminate the thread
             self.thread.join(10.0)
             # log the outcome
@@ -3065,6 +4422,9 @@ class GatewayCollector(Collector):
             else:
                 loginf("GatewayCollector thread has been terminated")
         self.thread = None
+        # write any captured frames to disk
+        if self.recorder is not None:
+            self.recorder.close()
 
     class CollectorThread(threading.Thread):
         """Class using a thread to collect data via the Ecowitt LAN/Wi-Fi
@@ -3089,6 +4449,606 @@ class GatewayCollector(Collector):
                 log_traceback_critical('    ****  ')
 
 
+# ============================================================================
+#                           class ReplayCollector
+# ============================================================================
+
+class ReplayCollector(GatewayCollector):
+    """Class to replay a gateway device frame capture.
+
+    A ReplayCollector object is a drop in replacement for a GatewayCollector
+    object that obtains its data from a frame capture rather than from a
+    gateway device. Captured responses are passed through the same GatewayApi,
+    ApiParser and Sensors processing used for live data and the resulting data
+    is queued for the parent driver/service with the captured timestamp.
+    Polls may be replayed in real time (speed = 1), at a multiple of real time
+    (speed > 1) or as fast as possible (speed = 0).
+
+    When the capture is exhausted the value None is queued and throughput
+    statistics are logged.
+    """
+
+    def __init__(self, path, speed=default_replay_speed, start_ts=None,
+                 stop_ts=None, use_wh32=True, ignore_wh40_batt=True,
+                 show_battery=False, log_unknown_fields=False,
+                 debug=DebugOptions({})):
+        """Initialise our class."""
+
+        # initialize my base class, skip GatewayCollector initialisation as it
+        # requires a gateway device
+        Collector.__init__(self)
+        # use a bounded queue so that a fast replay cannot get too far ahead
+        # of our consumer
+        self.queue = six.moves.queue.Queue(maxsize=default_replay_queue_size)
+        self.path = path
+        self.speed = speed
+        # event used to cancel waits when we shut down
+        self.cancel_event = threading.Event()
+        # there is no device to poll, but our parent may want to know
+        self.poll_interval = 0
+        self.poll_scheduler = None
+        self.wind_poll_interval = None
+        self.wind_accumulator = None
+        self.health = None
+        self.latency = None
+        self.last_sensor_state = None
+        self.recorder = None
+        self.log_failures = True
+        # negotiate our command set as per the captured device
+        self.required_fields = None
+        self.command_plan = None
+        self.command_plan_key = None
+        self.packet_layout = PacketLayout()
+        # our source of captured API responses
+        self.source = ReplaySource(path, start_ts=start_ts, stop_ts=stop_ts)
+        # get a GatewayDevice that uses the capture in lieu of a device
+        api = ReplayApi(self.source, use_wh32=use_wh32,
+                        ignore_wh40_batt=ignore_wh40_batt,
+                        show_battery=show_battery,
+                        log_unknown_fields=log_unknown_fields,
+                        debug=debug)
+        self.device = GatewayDevice(api=api)
+        # live data is only available via the API
+        self.livedata_router = None
+        # replay statistics
+        self.replay_start = None
+        self.replay_end = None
+        self.skipped = 0
+        # create a thread property
+        self.thread = None
+        # we start off not collecting data, it will be turned on later when we
+        # are threaded
+        self.collect_data = False
+
+    def collect(self):
+        """Replay and queue captured sensor data."""
+
+        self.replay_start = monotonic()
+        first_ts = None
+        while self.collect_data and self.source.next_poll():
+            if first_ts is None:
+                first_ts = self.source.poll_ts
+            # if we are not replaying as fast as possible wait until it is
+            # time to replay this poll, but keep an eye out for a shutdown
+            if self.speed > 0:
+                due = self.replay_start + (self.source.poll_ts - first_ts) / self.speed
+                while self.collect_data and monotonic() < due:
+                    self.cancel_event.wait(min(due - monotonic(), 1))
+            try:
+                queue_data = self.get_current_data()
+            except GWIOError as e:
+                # the captured poll was incomplete or invalid, it would have
+                # failed at the time of capture too, so skip it
+                logdbg("Skipping captured poll at %s: %s" % (timestamp_to_string(int(self.source.poll_ts)),
+                                                             e))
+                self.skipped += 1
+                continue
+            self.put(queue_data)
+        self.replay_end = monotonic()
+        loginf("Replayed %d polls from '%s' in %.3f seconds "
+               "(%d polls skipped)" % (self.source.polls - self.skipped,
+                                       self.path,
+                                       self.replay_end - self.replay_start,
+                                       self.skipped))
+        # signal our parent that there is no more data
+        self.put(None)
+
+    def put(self, queue_data):
+        """Put data in the queue, waiting for space if necessary."""
+
+        while self.collect_data:
+            try:
+                self.queue.put(queue_data, True, 1)
+            except six.moves.queue.Full:
+                continue
+            return
+
+    def get_current_data(self):
+        """Get the current captured sensor data.
+
+        Obtain current sensor data as per GatewayCollector.get_current_data(),
+        but timestamp the data with the captured time.
+        """
+
+        parsed_data = super(ReplayCollector, self).get_current_data()
+        parsed_data['datetime'] = int(self.source.poll_ts)
+        return parsed_data
+
+
+# ============================================================================
+#                           class FailoverCollector
+# ============================================================================
+
+class FailoverCollector(GatewayCollector):
+    """Class to collect data from a primary and a standby gateway device.
+
+    A FailoverCollector object is a drop in replacement for a
+    GatewayCollector object that polls a primary gateway device and keeps a
+    second (standby) gateway device receiving the same sensors in reserve.
+    The device not being polled is health checked, in a separate thread,
+    every health_check_interval seconds. If a poll of the active device
+    fails the collector immediately switches to the other device and polls
+    it, so no poll is lost. The standby device is sent each API command once
+    only, the primary device is sent each API command primary_max_tries
+    times (by default once only), the other device is the retry. The standby device uses a short socket
+    timeout and keeps its own circuit breaker, so an unresponsive standby
+    device delays neither startup nor polls of the primary device. Once the
+    primary device has passed failback_checks consecutive health checks the
+    collector switches back to the primary device.
+
+    Each device keeps its own cumulative rain and lightning counters, so the
+    counters are offset to provide a continuous series across a switch. Each
+    health check aligns the counters of the checked device with the most
+    recent counters from the active device, on a switch the counters of the
+    new active device are offset by the aligned difference. Rain or
+    lightning that occurs between a health check and a switch is therefore
+    not lost. A counter that decreases (eg a device reset or rain year
+    rollover) is no longer offset, the decrease is handled by the driver as
+    a counter wrap around.
+    """
+
+    # cumulative device fields used to derive per period rain and lightning
+    counter_fields = ('t_raintotals', 't_rainyear', 't_rainmonth',
+                      'p_rainyear', 'p_rainmonth', 'lightningcount')
+
+    def __init__(self, standby_ip_address=None,
+                 standby_port=default_port,
+                 health_check_interval=default_health_check_interval,
+                 failback_checks=default_failback_checks,
+                 primary_max_tries=default_primary_max_tries, **kwargs):
+        """Initialise our class."""
+
+        # initialize my base class
+        super(FailoverCollector, self).__init__(**kwargs)
+
+        self.standby_ip_address = standby_ip_address
+        self.standby_port = standby_port
+        self.health_check_interval = health_check_interval
+        self.failback_checks = failback_checks
+        # the primary and standby GatewayDevice objects, the standby is not
+        # contacted until it is first health checked
+        self.devices = [self.device,
+                        self.get_secondary_device(standby_ip_address, standby_port)]
+        self.devices[0].api.max_tries = primary_max_tries
+        # index of the active device
+        self.active = 0
+        # consecutive successful health checks of each device
+        self.check_successes = [0, 0]
+        # monotonic time of the last health check
+        self.last_check = None
+        # the thread performing the current health check, if any
+        self.check_thread = None
+        # lock used to serialise changes to our device and counter state
+        self.lock = threading.Lock()
+        # per device counter offsets, the last raw counter values from each
+        # device and the offsets that align each device with the active
+        # device as at its last health check
+        self.offsets = [{}, {}]
+        self.last_raw = [{}, {}]
+        self.aligned = [{}, {}]
+        # the most recent counter values we provided
+        self.counters = {}
+        self.switches = 0
+        loginf('     standby device is %s:%d, health checks every %d seconds' % (standby_ip_address,
+                                                                                 standby_port,
+                                                                                 health_check_interval))
+        loginf('     primary device max tries is %d, switching back to the primary device '
+               'after %d successful health checks' % (primary_max_tries, failback_checks))
+
+    def describe(self, index):
+        """A short description of a device for logging."""
+
+        device = self.devices[index]
+        return "%s device %s:%d" % ('primary' if index == 0 else 'standby',
+                                    device.ip_address.decode(), device.port)
+
+    def get_current_data(self):
+        """Get the current data from the active device.
+
+        Switch back to the primary device if it has been healthy for long
+        enough. If the poll fails switch to the other device and poll it. The
+        inactive device is health checked in a separate thread after a poll,
+        if due, so that its counters are aligned with current data without
+        delaying our polls.
+        """
+
+        with self.lock:
+            failback = self.active == 1 and self.check_successes[0] >= self.failback_checks
+        if failback:
+            self.switch(0, 'primary device has recovered')
+        try:
+            data = super(FailoverCollector, self).get_current_data()
+        except OperationCancelled:
+            raise
+        except GWIOError as e:
+            other = 1 - self.active
+            with self.lock:
+                self.check_successes[self.active] = 0
+            # the other device must be identified before it can be polled
+            try:
+                if not self.devices[other].api.identified:
+                    self.devices[other].api.identify()
+            except OperationCancelled:
+                raise
+            except GWIOError:
+                raise e
+            self.switch(other, e)
+            data = super(FailoverCollector, self).get_current_data()
+        self.update_counters(data)
+        now = monotonic()
+        if self.last_check is None or now - self.last_check >= self.health_check_interval:
+            if self.check_thread is None or not self.check_thread.is_alive():
+                self.last_check = now
+                self.check_thread = threading.Thread(target=self.health_check,
+                                                     args=(1 - self.active,),
+                                                     name='GatewayHealthCheck')
+                self.check_thread.daemon = True
+                self.check_thread.start()
+        return data
+
+    def health_check(self, index):
+        """Health check a device and align its counters with ours.
+
+        The result is discarded if the device became the active device while
+        it was being checked.
+        """
+
+        device = self.devices[index]
+        try:
+            if not device.api.identified:
+                device.api.identify()
+            raw = dict(device.livedata)
+            if self.command_plan is not None and 'CMD_READ_RAIN' in self.command_plan:
+                try:
+                    raw.update(device.rain)
+                except UnknownApiCommand:
+                    pass
+        except OperationCancelled:
+            return False
+        except GWIOError as e:
+            with self.lock:
+                if self.check_successes[index] > 0 or weewx.debug >= 2:
+                    loginf("Health check of %s device failed: %s" % ('primary' if index == 0 else 'standby',
+                                                                     e))
+                self.check_successes[index] = 0
+            return False
+        with self.lock:
+            if index == self.active:
+                return False
+            self.check_successes[index] += 1
+            self.aligned[index] = dict((field, self.counters[field] - raw[field])
+                                       for field in self.counter_fields
+                                       if raw.get(field) is not None and field in self.counters)
+            self.last_raw[index] = dict((field, raw[field]) for field in self.counter_fields
+                                        if raw.get(field) is not None)
+        return True
+
+    def switch(self, index, reason):
+        """Make a device the active device."""
+
+        loginf("Switching from %s to %s: %s" % (self.describe(self.active),
+                                                self.describe(index),
+                                                reason))
+        with self.lock:
+            self.active = index
+            self.device = self.devices[index]
+            # our counters continue from those of the previous device
+            self.offsets[index] = dict(self.aligned[index])
+        # the command set and live data routes are device specific
+        self.command_plan = None
+        if self.livedata_router is not None:
+            self.livedata_router = LiveDataRouter(self.device,
+                                                  required_fields=self.livedata_router.required_fields,
+                                                  probe_interval=self.livedata_router.probe_interval)
+        self.switches += 1
+
+    def update_counters(self, data):
+        """Offset the counters in data from the active device."""
+
+        with self.lock:
+            offsets = self.offsets[self.active]
+            last_raw = self.last_raw[self.active]
+            for field in self.counter_fields:
+                raw = data.get(field)
+                if raw is None:
+                    continue
+                if field in last_raw and raw < last_raw[field]:
+                    # the device counter has decreased, stop offsetting it
+                    offsets[field] = 0
+                elif field not in offsets:
+                    # we have not aligned this counter, continue from our
+                    # last value, any change since then is lost
+                    offsets[field] = self.counters[field] - raw if field in self.counters else 0
+                last_raw[field] = raw
+                value = raw + offsets[field]
+                # avoid floating point noise in offset rain totals
+                data[field] = round(value, 4) if isinstance(value, float) else value
+                self.counters[field] = data[field]
+
+
+# ============================================================================
+#                            class SensorArbiter
+# ============================================================================
+
+class SensorArbiter(object):
+    """Class to arbitrate between gateway devices that hear the same sensors.
+
+    Where several gateway devices receive the same sensor the data for the
+    sensor is taken from one device only. For each sensor (identified by
+    sensor ID) the device with the best signal level is chosen, ties are
+    broken in favour of the freshest data and then the device listed first.
+    The choice is made using an index keyed by sensor ID, so the cost of
+    arbitration grows with the total number of sensors reported rather than
+    with the number of devices squared. If different sensors use the same
+    sensor address (eg WH31 channel 1) on different devices the sensor with
+    the best signal level is used.
+
+    The device fields for each sensor, including the sensor battery state and
+    signal level fields, are taken from the chosen device. Device fields that
+    are not associated with a sensor (eg indoor temperature or free heap
+    memory) are taken from the first device.
+
+    The cumulative rain and lightning counters are device specific, so a
+    counter is taken from the same device as long as that device continues
+    to provide it.
+    """
+
+    # device fields provided by the outdoor sensors
+    th_fields = ('outtemp', 'outhumid', 'dewpoint', 'windchill', 'heatindex')
+    wind_fields = ('winddir', 'windspeed', 'gustspeed', 'daymaxwind')
+    solar_fields = ('light', 'uv', 'uvi')
+    rain_fields = ('t_rainevent', 't_rainrate', 't_rainday', 't_rainweek',
+                   't_rainmonth', 't_rainyear', 't_raintotals')
+    piezo_rain_fields = ('p_rainrate', 'p_rainevent', 'p_rainday',
+                         'p_rainweek', 'p_rainmonth', 'p_rainyear')
+    # device fields provided by the sensors at fixed sensor addresses,
+    # multichannel sensors are added when initialised
+    fixed_sensor_fields = {
+        b'\x00': th_fields + wind_fields + solar_fields + rain_fields,
+        b'\x01': wind_fields + solar_fields,
+        b'\x02': th_fields + wind_fields + solar_fields,
+        b'\x03': rain_fields,
+        b'\x05': th_fields,
+        b'\x1a': ('lightningdist', 'lightningdettime', 'lightningcount'),
+        b'\x27': ('temp17', 'humid17', 'pm10', 'pm10_24h_avg', 'pm255',
+                  'pm255_24h_avg', 'co2', 'co2_24h_avg', 'pm1', 'pm1_24h_avg',
+                  'pm4', 'pm4_24h_avg'),
+        b'\x30': th_fields + wind_fields + solar_fields + piezo_rain_fields,
+        b'\x31': wind_fields + piezo_rain_fields
+    }
+
+    def __init__(self, counter_fields=()):
+        """Initialise a SensorArbiter object.
+
+        counter_fields: device fields that are cumulative counters
+        """
+
+        # device fields provided by each sensor keyed by sensor address
+        self.sensor_fields = dict(self.fixed_sensor_fields)
+        for ch in range(1, 9):
+            self.sensor_fields[struct.pack('B', 0x05 + ch)] = ('temp%d' % ch, 'humid%d' % ch)
+            self.sensor_fields[struct.pack('B', 0x0d + ch)] = ('soilmoist%d' % ch,)
+            self.sensor_fields[struct.pack('B', 0x1e + ch)] = ('temp%d' % (ch + 8),)
+            self.sensor_fields[struct.pack('B', 0x27 + ch)] = ('leafwet%d' % ch,)
+        for ch in range(1, 5):
+            self.sensor_fields[struct.pack('B', 0x15 + ch)] = ('pm25%d' % ch, 'pm25%d_24h_avg' % ch)
+            self.sensor_fields[struct.pack('B', 0x1a + ch)] = ('leak%d' % ch,)
+        # all device fields associated with a sensor
+        self.all_sensor_fields = set()
+        for fields in six.itervalues(self.sensor_fields):
+            self.all_sensor_fields.update(fields)
+        self.counter_fields = counter_fields
+        # the index of the source each counter field was last taken from
+        self.counter_sources = {}
+        # the sensor ID and source index chosen for each sensor address at
+        # the last arbitration
+        self.choices = {}
+
+    def choose(self, sources):
+        """Choose the source of each sensor.
+
+        sources: list of (data, Sensors object) tuples, one per device, None
+                 for a device that did not provide data
+
+        Returns a dict keyed by sensor address of (sensor ID, source index)
+        tuples.
+        """
+
+        # the best source of each sensor keyed by sensor ID
+        best = {}
+        for index, source in enumerate(sources):
+            if source is None:
+                continue
+            data, sensors = source
+            ts = data.get('datetime') or 0
+            for address, sensor in six.iteritems(sensors.data):
+                if sensor['id'] in Sensors.not_registered:
+                    continue
+                score = (sensor.get('signal') or 0, ts, -index)
+                current = best.get(sensor['id'])
+                if current is None or score > current[0]:
+                    best[sensor['id']] = (score, index, address)
+        # now resolve any sensors that share an address
+        by_address = {}
+        for sensor_id, (score, index, address) in six.iteritems(best):
+            current = by_address.get(address)
+            if current is None or score > current[0]:
+                by_address[address] = (score, sensor_id, index)
+        return dict((address, (sensor_id, index))
+                    for address, (score, sensor_id, index) in six.iteritems(by_address))
+
+    def arbitrate(self, sources):
+        """Combine data from several devices.
+
+        sources: list of (data, Sensors object) tuples, one per device, None
+                 for a device that did not provide data, the first device
+                 that provided data is used for device fields not associated
+                 with a sensor
+
+        Returns a dict of combined device data.
+        """
+
+        self.choices = self.choose(sources)
+        base = [source for source in sources if source is not None][0][0]
+        result = dict((field, value) for field, value in six.iteritems(base)
+                      if field not in self.all_sensor_fields
+                      and not field.endswith(('_batt', '_sig')))
+        for address, (sensor_id, index) in six.iteritems(self.choices):
+            data = sources[index][0]
+            for field in self.sensor_fields.get(address, ()):
+                if field in data and field not in self.counter_fields:
+                    result[field] = data[field]
+            name = Sensors.sensor_ids[address]['name'] if address in Sensors.sensor_ids else None
+            if name is not None:
+                for field in ('%s_batt' % name, '%s_sig' % name):
+                    if field in data:
+                        result[field] = data[field]
+        # counters are taken from the same source for as long as possible
+        for field in self.counter_fields:
+            index = self.counter_sources.get(field)
+            if index is None or sources[index] is None or sources[index][0].get(field) is None:
+                candidates = [i for i, source in enumerate(sources)
+                              if source is not None and source[0].get(field) is not None]
+                if len(candidates) == 0:
+                    continue
+                if index is not None:
+                    loginf("Obtaining '%s' from a different device, "
+                           "counter continuity may be lost" % field)
+                index = self.counter_sources[field] = candidates[0]
+            result[field] = sources[index][0][field]
+        return result
+
+
+# ============================================================================
+#                          class MultiGatewayCollector
+# ============================================================================
+
+class MultiGatewayCollector(GatewayCollector):
+    """Class to collect data from several gateway devices.
+
+    A MultiGatewayCollector object is a drop in replacement for a
+    GatewayCollector object that polls several gateway devices receiving
+    some or all of the same sensors. The data from each device is combined
+    by a SensorArbiter object so that each sensor is reported once only,
+    using the data from the device currently receiving that sensor best.
+
+    The first device is polled as per a GatewayCollector and is used for
+    device details (eg model and firmware version), wind only polls and
+    health monitoring, device health (and any throttling) is based on the
+    first device only. Each additional device is specified as an IP address
+    and port, is sent each API command once only with a short socket timeout
+    and keeps its own circuit breaker, so an unresponsive additional device
+    is quickly skipped rather than delaying our polls. Data is combined from
+    those devices that could be polled.
+    """
+
+    def __init__(self, gateways=(), **kwargs):
+        """Initialise our class.
+
+        gateways: list of (IP address, port) tuples of the additional
+                  gateway devices
+        """
+
+        # initialize my base class
+        super(MultiGatewayCollector, self).__init__(**kwargs)
+
+        # our GatewayDevice objects, the additional devices are not contacted
+        # until they are first polled
+        self.devices = [self.device] + [self.get_secondary_device(ip_address, port)
+                                        for ip_address, port in gateways]
+        # whether each device failed at its last poll
+        self.failed = [False] * len(self.devices)
+        # the per device command set, packet layout and last sensor state
+        # data
+        self.device_state = [(None, None, PacketLayout(), None) for device in self.devices]
+        # the layout of the last combined PacketRecord we produced
+        self.combined_layout = PacketLayout()
+        self.arbiter = SensorArbiter(counter_fields=FailoverCollector.counter_fields)
+        loginf('     data from %d additional gateway devices will be combined' % len(gateways))
+
+    def get_current_data(self):
+        """Get the combined current data from our devices.
+
+        Each device is polled in turn. The first failure of a device is
+        logged as is its recovery. A GWIOError is raised if no device could
+        be polled.
+        """
+
+        sources = []
+        error = None
+        latency = None
+        try:
+            for index, device in enumerate(self.devices):
+                # use the device command set, packet layout and sensor state
+                self.device = device
+                (self.command_plan, self.command_plan_key,
+                 self.packet_layout, self.last_sensor_state) = self.device_state[index]
+                try:
+                    # a device must be identified before it can be polled
+                    if not device.api.identified:
+                        device.api.identify()
+                    data = super(MultiGatewayCollector, self).get_current_data()
+                except OperationCancelled:
+                    raise
+                except GWIOError as e:
+                    error = e
+                    sources.append(None)
+                    if not self.failed[index]:
+                        logerr("Unable to obtain data from gateway device %s:%d: %s" % (device.ip_address.decode(),
+                                                                                        device.port,
+                                                                                        e))
+                        self.failed[index] = True
+                else:
+                    sources.append((data, device.api.sensors))
+                    if index == 0:
+                        latency = self.latency
+                    if self.failed[index]:
+                        loginf("Gateway device %s:%d has recovered" % (device.ip_address.decode(),
+                                                                       device.port))
+                        self.failed[index] = False
+                finally:
+                    self.device_state[index] = (self.command_plan,
+                                                self.command_plan_key,
+                                                self.packet_layout,
+                                                self.last_sensor_state)
+        finally:
+            # our first device is the device used for all other purposes
+            self.device = self.devices[0]
+            (self.command_plan, self.command_plan_key,
+             self.packet_layout, self.last_sensor_state) = self.device_state[0]
+            # device health is monitored using our first device only
+            self.latency = latency
+        if all(source is None for source in sources):
+            raise error if error is not None else GWIOError('Unable to contact any gateway device')
+        combined = self.arbiter.arbitrate(sources)
+        if sources[0] is None:
+            # free heap memory is that of our first device only
+            combined.pop('heap_free', None)
+        combined_data = PacketRecord(self.combined_layout, combined)
+        self.combined_layout = combined_data.layout
+        return combined_data
+
+
 class ApiParser(object):
     """Class to parse and decode device API response payload data.
 
@@ -3273,7 +5233,7 @@ class ApiParser(object):
         # do we log unknown fields at info or leave at debug
         self.log_unknown_fields = log_unknown_fields
 
-    def parse_addressed_data(self, payload, structure):
+    def parse_addressed_data(self, payload, structure, codes=None):
         """Parse an address structure API response payload.
 
         Parses the data payload of an API response that uses an addressed
@@ -3289,6 +5249,9 @@ class ApiParser(object):
                    decode function, field size and the field name to be
                    used as the key against which the decoded data is to be
                    stored in the result dict
+        codes:     iterable of the data element addresses to be decoded, all
+                   other data elements are skipped. If None all data elements
+                   are decoded.
 
         Returns a dict of decoded data keyed by destination field name
         """
@@ -3325,6 +5288,10 @@ class ApiParser(object):
                     # data
                     break
                 else:
+                    # skip the field if we are not interested in it
+                    if codes is not None and payload[index:index + 1] not in codes:
+                        index += field_size + 1
+                        continue
                     _field_data = getattr(self, decode_fn_str)(payload[index + 1:index + 1 + field_size],
                                                                field)
                     # do we have any decoded data?
@@ -3377,6 +5344,23 @@ class ApiParser(object):
         # return the result
         return self.parse_addressed_data(payload, self.live_data_struct)
 
+    def parse_livedata_wind(self, response):
+        """Parse wind data from a CMD_GW1000_LIVEDATA API response.
+
+        As per parse_livedata() except only wind related fields are decoded.
+
+        Returns a dict of wind observations.
+        """
+
+        # obtain the payload size, it's a big endian short (two byte) integer
+        payload_size = struct.unpack(">H", response[3:5])[0]
+        # obtain the payload
+        payload = response[5:5 + payload_size - 4]
+        # this is addressed data, so we can call parse_addressed_data() and
+        # return the result
+        return self.parse_addressed_data(payload, self.live_data_struct,
+                                         codes=self.wind_field_codes)
+
     def parse_read_rain(self, response):
         """Parse data from a CMD_READ_RAIN API response.
 
@@ -4861,106 +6845,731 @@ class Sensors(object):
         else:
             return 'Unknown'
 
-    @staticmethod
-    def batt_binary(batt):
-        """Decode a binary battery state.
+    @staticmethod
+    def batt_binary(batt):
+        """Decode a binary battery state.
+
+        Battery state is stored in bit 0 as either 0 or 1. If 1 the battery
+        is low, if 0 the battery is normal. We need to mask off bits 1 to 7 as
+        they are not guaranteed to be set in any particular way.
+
+        Tested by SensorsTestCase.test_battery_methods
+        """
+
+        return batt & 1
+
+    @staticmethod
+    def batt_int(batt):
+        """Decode a integer battery state.
+
+        According to the API documentation battery state is stored as an
+        integer from 0 to 5 with <=1 being considered low. Experience with
+        WH43 has shown that battery state 6 also exists when the device is
+        run from DC. This does not appear to be documented in the API
+        documentation.
+
+        Tested by SensorsTestCase.test_battery_methods
+        """
+
+        return batt
+
+    @staticmethod
+    def batt_volt(batt):
+        """Decode a voltage battery state in 2mV increments.
+
+        Battery state is stored as integer values of battery voltage/0.02
+        with <=1.2V considered low.
+
+        Tested by SensorsTestCase.test_battery_methods
+        """
+
+        return round(0.02 * batt, 2)
+
+    def wh40_batt_volt(self, batt):
+        """Decode WH40 battery state.
+
+        Initial WH40 devices did not provide battery state information. API
+        versions up to and including v.1.6.4 reported WH40 battery state
+        via a single bit. API v1.6.5 and later report WH40 battery state in
+        a single byte in 100mV increments. It appears that API v1.6.5 and
+        later return a fixed value of 0x10 (decodes to 1.6V) for WH40
+        battery state for WH40 devices that do not report battery state.
+        WH40 devices that do report battery state appear to return a value
+        in a single byte in 10mV increments rather than 100mV increments as
+        documented in the Ecowitt LAN/Wi-Fi Gateway API
+        documentation v1.6.4. There is no known way to identify via the API
+        whether a given WH40 reports battery state information or not.
+
+        Consequently, decoding of WH40 battery state data is handled as
+        follows:
+
+        -   the WH40 battery state data is decoded as per the API
+            documentation as a value in 100mV increments
+        -   if the decoded value is <2.0V the device is assumed to be a
+            non-battery state reporting WH40 and the value None is returned
+        -   if the decoded value is >=2.0V the device is assumed to be a
+            battery state reporting WH40 and the value returned is the WH40
+            battery state data decoded in 10mV increments
+
+        For WH40 that report battery state data a decoded value of <=1.2V
+        is considered low.
+
+        Tested by SensorsTestCase.test_battery_methods
+        """
+
+        if round(0.1 * batt, 1) < 2.0:
+            # assume we have a non-battery state reporting WH40
+            # first set the legacy_wh40 flag
+            self.legacy_wh40 = True
+            # then do we ignore the result or pass it on
+            if self.ignore_wh40_batt:
+                # we are ignoring the result so return None
+                return None
+            else:
+                # we are not ignoring the result so return the result
+                return round(0.1 * batt, 1)
+        else:
+            # assume we have a battery state reporting WH40
+            # first reset the legacy_wh40 flag
+            self.legacy_wh40 = False
+            return round(0.01 * batt, 2)
+
+    @staticmethod
+    def batt_volt_tenth(batt):
+        """Decode a voltage battery state in 100mV increments.
+
+        Battery state is stored as integer values of battery voltage/0.1
+        with <=1.2V considered low.
+
+        Tested by SensorsTestCase.test_battery_methods
+        """
+
+        return round(0.1 * batt, 1)
+
+
+# ============================================================================
+#                            class FrameRecorder
+# ============================================================================
+
+class FrameRecorder(object):
+    """Class to capture raw API request and response frames to disk.
+
+    A FrameRecorder object writes each API request and response frame
+    exchanged with a gateway device to an append-only binary capture file. A
+    capture file consists of a short file header followed by a sequence of
+    records. Each record consists of a fixed length record header followed by
+    the raw frame. The record header contains:
+
+    sync:      2 byte sync marker 0xA5 0x5A
+    direction: 1 byte frame direction, 0=request, 1=response, 2=error
+    timestamp: 8 byte double, wall clock epoch timestamp
+    monotonic: 8 byte unsigned integer, monotonic clock time in nanoseconds
+    mac:       6 byte device MAC address, all zeros if not known
+    command:   1 byte API command code
+    rtt:       4 byte float, request round trip time in seconds (response and
+               error records only)
+    length:    4 byte unsigned integer, length of the frame that follows
+
+    All multibyte values are big endian. Error records carry a short utf-8
+    description of the error in lieu of a frame.
+
+    A sidecar index file (capture file name with '.idx' appended) is
+    maintained to allow a capture file to be searched by time. The index
+    consists of a sequence of 8 byte double timestamp and 8 byte unsigned
+    integer file offset pairs. An index entry is written for the first record
+    in a capture file and then at most every index_interval seconds.
+
+    Records are accumulated in a bounded buffer that is written to disk when
+    the buffer exceeds buffer_size bytes, when buffered data is more than
+    flush_interval seconds old or when the recorder is closed. The capture file
+    is rotated when it exceeds max_size bytes or is more than rotate_interval
+    seconds old. Rotated files are renamed with a numeric suffix, .1 being the
+    most recent, and at most keep rotated files are retained.
+    """
+
+    # capture file header, magic string and format version
+    magic = b'GWCAP'
+    format_version = 1
+    # record sync marker
+    sync = b'\xa5\x5a'
+    # record header struct
+    record_struct = struct.Struct('>2sBdQ6sBfI')
+    # index entry struct
+    index_struct = struct.Struct('>dQ')
+    # frame directions
+    REQUEST = 0
+    RESPONSE = 1
+    ERROR = 2
+
+    def __init__(self, path, max_size=default_capture_max_size,
+                 rotate_interval=default_capture_rotate_interval,
+                 keep=default_capture_keep,
+                 buffer_size=default_capture_buffer_size,
+                 index_interval=default_capture_index_interval,
+                 flush_interval=default_capture_flush_interval):
+        """Initialise a FrameRecorder object."""
+
+        self.path = path
+        self.index_path = ''.join([path, '.idx'])
+        self.max_size = max_size
+        self.rotate_interval = rotate_interval
+        self.keep = keep
+        self.buffer_size = buffer_size
+        self.index_interval = index_interval
+        self.flush_interval = flush_interval
+        # buffers for pending capture and index data
+        self.buffer = bytearray()
+        self.index_buffer = bytearray()
+        # cache of MAC address strings converted to bytes
+        self.mac_cache = {}
+        # the recorder may be shared by multiple threads
+        self.lock = threading.Lock()
+        self.file = None
+        self.index_file = None
+        self.offset = 0
+        self.opened_ts = None
+        self.last_index_ts = None
+        self.last_flush = monotonic()
+        # open the capture file
+        self.open()
+
+    def __getstate__(self):
+        """Obtain our state for pickling.
+
+        A FrameRecorder object is pickled when passed to a spawned collector
+        process. Open files and our lock cannot be pickled, the capture must
+        be closed and is reopened by calling open().
+        """
+
+        state = dict(self.__dict__)
+        state.update(lock=None, file=None, index_file=None)
+        return state
+
+    def __setstate__(self, state):
+        """Restore our state when unpickled."""
+
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def open(self):
+        """Open the capture and index files for appending."""
+
+        # create any missing directories in our path
+        _dir = os.path.dirname(self.path)
+        if _dir and not os.path.isdir(_dir):
+            os.makedirs(_dir)
+        self.file = open(self.path, 'ab')
+        self.index_file = open(self.index_path, 'ab')
+        # where are we in the capture file
+        self.offset = self.file.tell()
+        self.last_index_ts = None
+        self.opened_ts = time.time()
+        if self.offset == 0:
+            # we have a new file, so write the file header
+            self.buffer.extend(self.magic)
+            self.buffer.extend(struct.pack('B', self.format_version))
+            self.offset = len(self.buffer)
+        else:
+            # we are appending to an existing file, use the first index entry
+            # to determine when the file was started
+            index = CaptureReader.read_index(self.index_path)
+            if len(index) > 0:
+                self.opened_ts = index[0][0]
+
+    def record(self, direction, frame, cmd=0, mac=None, rtt=0.0):
+        """Add a frame to the capture.
+
+        direction: Frame direction, one of REQUEST, RESPONSE or ERROR.
+        frame:     The raw frame. Byte string.
+        cmd:       The API command code. Integer.
+        mac:       The device MAC address. Colon separated hex string or None.
+        rtt:       The request round trip time in seconds. Float.
+        """
+
+        ts = time.time()
+        mono = int(monotonic() * 1000000000)
+        header = self.record_struct.pack(self.sync, direction, ts, mono,
+                                         self.mac_to_bytes(mac), cmd, rtt,
+                                         len(frame))
+        with self.lock:
+            # do we need to rotate before we write this record
+            if self.rotate_due(ts):
+                self.rotate()
+            # do we need an index entry for this record
+            if self.last_index_ts is None or ts - self.last_index_ts >= self.index_interval:
+                self.index_buffer.extend(self.index_struct.pack(ts, self.offset))
+                self.last_index_ts = ts
+            self.buffer.extend(header)
+            self.buffer.extend(frame)
+            self.offset += len(header) + len(frame)
+            # write the buffer to disk if it is full or old
+            if len(self.buffer) >= self.buffer_size or monotonic() - self.last_flush >= self.flush_interval:
+                self._flush()
+
+    def rotate_due(self, ts):
+        """Is the current capture file due for rotation."""
+
+        if self.max_size > 0 and self.offset >= self.max_size:
+            return True
+        if self.rotate_interval > 0 and ts - self.opened_ts >= self.rotate_interval:
+            return True
+        return False
+
+    def rotate(self):
+        """Close the current capture file and start a new one.
+
+        Rotated files are shifted such that capture.1 is the most recently
+        rotated file. Only self.keep rotated files are retained. The caller
+        must hold the lock.
+        """
+
+        self._close()
+        for n in range(self.keep, 0, -1):
+            src = self.path if n == 1 else '%s.%d' % (self.path, n - 1)
+            dst = '%s.%d' % (self.path, n)
+            for suffix in ('', '.idx'):
+                if os.path.exists(src + suffix):
+                    if os.path.exists(dst + suffix):
+                        os.remove(dst + suffix)
+                    os.rename(src + suffix, dst + suffix)
+        if self.keep < 1:
+            # we are not keeping any rotated files
+            for suffix in ('', '.idx'):
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
+        self.open()
+
+    def flush(self):
+        """Write any buffered data to disk."""
+
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        """Write any buffered data to disk, the caller must hold the lock."""
+
+        if self.file is not None:
+            if len(self.buffer) > 0:
+                self.file.write(self.buffer)
+                self.file.flush()
+                del self.buffer[:]
+            # the index is written after the capture data it refers to
+            if len(self.index_buffer) > 0:
+                self.index_file.write(self.index_buffer)
+                self.index_file.flush()
+                del self.index_buffer[:]
+        self.last_flush = monotonic()
+
+    def close(self):
+        """Write any buffered data and close the capture."""
+
+        with self.lock:
+            self._close()
+
+    def _close(self):
+        """Write any buffered data and close the capture files, the caller
+        must hold the lock."""
+
+        self._flush()
+        for f in (self.file, self.index_file):
+            if f is not None:
+                f.close()
+        self.file = None
+        self.index_file = None
+
+    def mac_to_bytes(self, mac):
+        """Convert a colon separated hex MAC address string to bytes."""
+
+        if mac is None:
+            return b'\x00' * 6
+        try:
+            return self.mac_cache[mac]
+        except KeyError:
+            try:
+                _mac = binascii.unhexlify(mac.replace(':', ''))
+            except (TypeError, ValueError, AttributeError):
+                _mac = b''
+            self.mac_cache[mac] = _mac[:6].ljust(6, b'\x00')
+            return self.mac_cache[mac]
+
+
+# ============================================================================
+#                            class CaptureReader
+# ============================================================================
+
+class CaptureReader(object):
+    """Class to read a FrameRecorder capture file.
+
+    A CaptureReader object iterates over the records in a capture file
+    produced by a FrameRecorder object. Each record is returned as a dict
+    keyed by 'direction', 'timestamp', 'monotonic', 'mac', 'cmd', 'rtt' and
+    'frame'. The sidecar index, if present, is used to seek to the records at
+    a given time. A truncated final record, as may occur if the capture was not
+    closed cleanly, is ignored.
+    """
+
+    def __init__(self, path):
+        """Initialise a CaptureReader object."""
+
+        self.path = path
+        self.index = self.read_index(''.join([path, '.idx']))
+
+    @staticmethod
+    def read_index(index_path):
+        """Read a capture index file.
+
+        Returns a list of (timestamp, offset) tuples. If the index file does
+        not exist an empty list is returned.
+        """
+
+        index_struct = FrameRecorder.index_struct
+        try:
+            with open(index_path, 'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            return []
+        size = index_struct.size
+        return [index_struct.unpack_from(data, i)
+                for i in range(0, len(data) - len(data) % size, size)]
+
+    @staticmethod
+    def segments(path):
+        """List the capture files for a capture path, oldest first.
+
+        Includes any rotated capture files, eg capture.2, capture.1 and
+        capture.
+        """
+
+        _dir = os.path.dirname(path) or '.'
+        base = os.path.basename(path)
+        rotated = []
+        if not os.path.isdir(_dir):
+            return []
+        for name in os.listdir(_dir):
+            stem, _, suffix = name.rpartition('.')
+            if stem == base and suffix.isdigit():
+                rotated.append(int(suffix))
+        _segments = ['%s.%d' % (path, n) for n in sorted(rotated, reverse=True)]
+        if os.path.exists(path):
+            _segments.append(path)
+        return _segments
+
+    def seek_offset(self, ts):
+        """Obtain the file offset from which to read records from time ts.
+
+        Returns the offset of the last index entry at or before ts. If there
+        is no such entry the offset of the first record is returned.
+        """
+
+        header_size = len(FrameRecorder.magic) + 1
+        if ts is None or len(self.index) == 0:
+            return header_size
+        i = bisect.bisect_right([entry[0] for entry in self.index], ts)
+        return self.index[i - 1][1] if i > 0 else header_size
+
+    def records(self, start_ts=None, stop_ts=None):
+        """Generator yielding the records in the capture file.
+
+        start_ts: If not None only records with timestamps at or after start_ts
+                  are returned.
+        stop_ts:  If not None only records with timestamps before stop_ts are
+                  returned.
+        """
+
+        record_struct = FrameRecorder.record_struct
+        header_size = record_struct.size
+        with open(self.path, 'rb') as f:
+            # check the file header
+            magic = f.read(len(FrameRecorder.magic) + 1)
+            if magic[:len(FrameRecorder.magic)] != FrameRecorder.magic:
+                raise IOError("'%s' is not a gateway frame capture file" % self.path)
+            f.seek(self.seek_offset(start_ts))
+            while True:
+                header = f.read(header_size)
+                if len(header) < header_size:
+                    # end of file or a truncated record header
+                    return
+                sync, direction, ts, mono, mac, cmd, rtt, length = record_struct.unpack(header)
+                if sync != FrameRecorder.sync:
+                    logerr("Capture file '%s' is corrupt at offset %d" % (self.path,
+                                                                          f.tell() - header_size))
+                    return
+                frame = f.read(length)
+                if len(frame) < length:
+                    # truncated record
+                    return
+                if start_ts is not None and ts < start_ts:
+                    continue
+                if stop_ts is not None and ts >= stop_ts:
+                    return
+                yield {'direction': direction,
+                       'timestamp': ts,
+                       'monotonic': mono,
+                       'mac': bytes_to_hex(mac, separator=':'),
+                       'cmd': cmd,
+                       'rtt': rtt,
+                       'frame': frame}
+
+    def __iter__(self):
+        return self.records()
+
+
+# ============================================================================
+#                              class RetryPolicy
+# ============================================================================
+
+class RetryPolicy(object):
+    """Class to determine how failed API commands are retried.
+
+    The first retry waits the retry wait, by default a short wait as a
+    device that has missed a single request is usually back within a second
+    or so. The wait then doubles with each retry up to a maximum wait. Each
+    wait is reduced by a random amount (jitter) so that the retries of
+    multiple clients do not align. Waits may
+    be cancelled, eg on shutdown, in which case no further retries are made.
+    """
+
+    # factor by which the wait increases with each retry
+    multiplier = 2.0
+    # maximum fraction by which each wait is reduced
+    jitter = 0.5
+
+    def __init__(self, max_tries=default_max_tries,
+                 retry_wait=default_retry_wait,
+                 max_wait=default_max_retry_wait, cancel_event=None):
+        """Initialise our class.
+
+        If a threading.Event (or compatible) object is passed via the
+        cancel_event parameter it is used to cancel waits, otherwise our own
+        event is used.
+        """
+
+        self.max_tries = max_tries
+        self.retry_wait = retry_wait
+        self.max_wait = max(max_wait, retry_wait)
+        # event used to cancel waits
+        self.cancelled = cancel_event if cancel_event is not None else threading.Event()
+
+    def delay(self, attempt):
+        """The wait in seconds after a given (zero based) failed attempt."""
+
+        wait = min(self.max_wait, self.retry_wait * self.multiplier ** attempt)
+        return wait * (1.0 - self.jitter * random.random())
+
+    def sleep(self, seconds):
+        """Wait for a period unless cancelled.
+
+        Returns True if the full period elapsed or False if cancelled.
+        """
+
+        if seconds > 0:
+            return not self.cancelled.wait(seconds)
+        return not self.cancelled.is_set()
+
+    def cancel(self):
+        """Cancel any current and future waits."""
+
+        self.cancelled.set()
+
+    def reset(self):
+        """Allow waits once more."""
+
+        self.cancelled.clear()
+
+
+# ============================================================================
+#                             class CircuitBreaker
+# ============================================================================
+
+class CircuitBreaker(object):
+    """Class to stop sending API commands to a device that is not responding.
+
+    A CircuitBreaker object is normally closed and API commands are sent to
+    the device. If a number of consecutive attempts to send an API command
+    fail the circuit breaker opens and API commands are not sent to the
+    device. Once a reset period has elapsed the circuit breaker is half-open
+    and a single trial API command is sent to the device. If the trial
+    command succeeds the circuit breaker closes, otherwise it opens again.
+
+    A threshold of 0 disables the circuit breaker.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
 
-        Battery state is stored in bit 0 as either 0 or 1. If 1 the battery
-        is low, if 0 the battery is normal. We need to mask off bits 1 to 7 as
-        they are not guaranteed to be set in any particular way.
+    def __init__(self, threshold=default_breaker_threshold,
+                 reset_timeout=default_breaker_reset, name='device'):
+        """Initialise our class."""
 
-        Tested by SensorsTestCase.test_battery_methods
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        # name used to identify the device when logging
+        self.name = name
+        self.state = CircuitBreaker.CLOSED
+        self.failures = 0
+        self.opened = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Whether an API command may be sent to the device.
+
+        If the reset period has elapsed since the circuit breaker opened the
+        circuit breaker becomes half-open and the caller may make a single
+        trial API command.
         """
 
-        return batt & 1
+        if self.threshold <= 0:
+            return True
+        with self.lock:
+            if self.state == CircuitBreaker.CLOSED:
+                return True
+            if self.state == CircuitBreaker.OPEN and monotonic() - self.opened >= self.reset_timeout:
+                self.state = CircuitBreaker.HALF_OPEN
+                logdbg("Sending trial API command to %s" % self.name)
+                return True
+            return False
 
-    @staticmethod
-    def batt_int(batt):
-        """Decode a integer battery state.
+    def record_success(self):
+        """Record an API command that succeeded."""
 
-        According to the API documentation battery state is stored as an
-        integer from 0 to 5 with <=1 being considered low. Experience with
-        WH43 has shown that battery state 6 also exists when the device is
-        run from DC. This does not appear to be documented in the API
-        documentation.
+        with self.lock:
+            if self.state != CircuitBreaker.CLOSED:
+                loginf("%s is responding, API commands resumed" % self.name)
+            self.state = CircuitBreaker.CLOSED
+            self.failures = 0
 
-        Tested by SensorsTestCase.test_battery_methods
-        """
+    def record_failure(self):
+        """Record a failed attempt to send an API command."""
 
-        return batt
+        if self.threshold <= 0:
+            return
+        with self.lock:
+            self.failures += 1
+            if self.state == CircuitBreaker.HALF_OPEN or \
+                    (self.state == CircuitBreaker.CLOSED and self.failures >= self.threshold):
+                if self.state == CircuitBreaker.CLOSED:
+                    loginf("%s is not responding, API commands suspended for %d seconds" % (self.name,
+                                                                                            self.reset_timeout))
+                self.state = CircuitBreaker.OPEN
+                self.opened = monotonic()
 
-    @staticmethod
-    def batt_volt(batt):
-        """Decode a voltage battery state in 2mV increments.
+    def reset(self):
+        """Close the circuit breaker."""
 
-        Battery state is stored as integer values of battery voltage/0.02
-        with <=1.2V considered low.
+        with self.lock:
+            self.state = CircuitBreaker.CLOSED
+            self.failures = 0
 
-        Tested by SensorsTestCase.test_battery_methods
-        """
 
-        return round(0.02 * batt, 2)
+# ============================================================================
+#                             class RttEstimator
+# ============================================================================
 
-    def wh40_batt_volt(self, batt):
-        """Decode WH40 battery state.
+class RttEstimator(object):
+    """Class to derive socket timeouts from observed device response times.
 
-        Initial WH40 devices did not provide battery state information. API
-        versions up to and including v.1.6.4 reported WH40 battery state
-        via a single bit. API v1.6.5 and later report WH40 battery state in
-        a single byte in 100mV increments. It appears that API v1.6.5 and
-        later return a fixed value of 0x10 (decodes to 1.6V) for WH40
-        battery state for WH40 devices that do not report battery state.
-        WH40 devices that do report battery state appear to return a value
-        in a single byte in 10mV increments rather than 100mV increments as
-        documented in the Ecowitt LAN/Wi-Fi Gateway API
-        documentation v1.6.4. There is no known way to identify via the API
-        whether a given WH40 reports battery state information or not.
+    An RttEstimator object maintains a smoothed round trip time (SRTT) and
+    round trip time variation (RTTVAR) for establishing a connection with a
+    device and for each API command sent to the device. Estimates are updated
+    as per RFC 6298 and the timeout for each is SRTT + 4 * RTTVAR bounded by
+    minimum and maximum timeouts. Until a round trip time has been observed
+    an initial timeout is used.
 
-        Consequently, decoding of WH40 battery state data is handled as
-        follows:
+    As per Karn's algorithm a timeout doubles the timeout used next time
+    until a round trip time is next observed.
+    """
 
-        -   the WH40 battery state data is decoded as per the API
-            documentation as a value in 100mV increments
-        -   if the decoded value is <2.0V the device is assumed to be a
-            non-battery state reporting WH40 and the value None is returned
-        -   if the decoded value is >=2.0V the device is assumed to be a
-            battery state reporting WH40 and the value returned is the WH40
-            battery state data decoded in 10mV increments
+    # key used for connection estimates
+    CONNECT = 'connect'
+    # gains used to update SRTT and RTTVAR
+    alpha = 0.125
+    beta = 0.25
+    # RTTVAR multiplier
+    k = 4
+
+    class Estimate(object):
+        """Class to hold the round trip time estimate for a single key."""
+
+        def __init__(self):
+            self.srtt = None
+            self.rttvar = None
+            self.samples = 0
+            self.timeouts = 0
+            self.backoff = 1
+
+    def __init__(self, initial_timeout=default_socket_timeout,
+                 min_timeout=default_min_socket_timeout,
+                 max_timeout=default_max_socket_timeout):
+        """Initialise our class."""
 
-        For WH40 that report battery state data a decoded value of <=1.2V
-        is considered low.
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max(max_timeout, min_timeout)
+        self.estimates = dict()
+        self.lock = threading.Lock()
 
-        Tested by SensorsTestCase.test_battery_methods
-        """
+    def estimate(self, key):
+        """Obtain the estimate for a key, creating it if necessary."""
 
-        if round(0.1 * batt, 1) < 2.0:
-            # assume we have a non-battery state reporting WH40
-            # first set the legacy_wh40 flag
-            self.legacy_wh40 = True
-            # then do we ignore the result or pass it on
-            if self.ignore_wh40_batt:
-                # we are ignoring the result so return None
-                return None
+        try:
+            return self.estimates[key]
+        except KeyError:
+            return self.estimates.setdefault(key, RttEstimator.Estimate())
+
+    def timeout(self, key):
+        """The timeout in seconds to use for a key."""
+
+        with self.lock:
+            est = self.estimate(key)
+            if est.srtt is None:
+                timeout = self.initial_timeout
             else:
-                # we are not ignoring the result so return the result
-                return round(0.1 * batt, 1)
-        else:
-            # assume we have a battery state reporting WH40
-            # first reset the legacy_wh40 flag
-            self.legacy_wh40 = False
-            return round(0.01 * batt, 2)
+                timeout = est.srtt + self.k * est.rttvar
+            timeout *= est.backoff
+        return min(max(timeout, self.min_timeout), self.max_timeout)
+
+    def update(self, key, rtt):
+        """Update the estimate for a key with an observed round trip time."""
+
+        with self.lock:
+            est = self.estimate(key)
+            if est.srtt is None:
+                est.srtt = rtt
+                est.rttvar = rtt / 2.0
+            else:
+                est.rttvar += self.beta * (abs(est.srtt - rtt) - est.rttvar)
+                est.srtt += self.alpha * (rtt - est.srtt)
+            est.samples += 1
+            est.backoff = 1
 
-    @staticmethod
-    def batt_volt_tenth(batt):
-        """Decode a voltage battery state in 100mV increments.
+    def timed_out(self, key):
+        """Record a timeout for a key."""
 
-        Battery state is stored as integer values of battery voltage/0.1
-        with <=1.2V considered low.
+        with self.lock:
+            est = self.estimate(key)
+            est.timeouts += 1
+            est.backoff = min(est.backoff * 2, 64)
 
-        Tested by SensorsTestCase.test_battery_methods
+    @property
+    def stats(self):
+        """Current estimates keyed by key.
+
+        Each estimate is a dict containing the SRTT, RTTVAR and timeout in
+        seconds and the number of round trip times and timeouts observed.
         """
 
-        return round(0.1 * batt, 1)
+        with self.lock:
+            keys = list(self.estimates.keys())
+        _stats = dict()
+        for key in keys:
+            est = self.estimates[key]
+            _stats[key] = {'srtt': est.srtt,
+                           'rttvar': est.rttvar,
+                           'timeout': self.timeout(key),
+                           'samples': est.samples,
+                           'timeouts': est.timeouts}
+        return _stats
 
 
 class GatewayApi(object):
@@ -5032,6 +7641,25 @@ class GatewayApi(object):
     }
     # header used in each API command and response packet
     header = b'\xff\xff'
+    # socket error numbers that indicate an API command failed quickly and
+    # there is little point retrying
+    fast_fail_errors = (errno.ECONNREFUSED, errno.EHOSTUNREACH,
+                        errno.ENETUNREACH)
+    # RttEstimator object used to derive socket timeouts, if None
+    # socket_timeout is used
+    rtt = None
+    # socket error numbers that indicate a non-blocking connect is in progress
+    connect_in_progress = (errno.EINPROGRESS, errno.EALREADY, errno.EWOULDBLOCK,
+                           getattr(errno, 'WSAEWOULDBLOCK', errno.EWOULDBLOCK))
+    # maximum period in seconds a socket wait blocks before checking for
+    # cancellation
+    cancel_check_interval = 0.1
+    # whether all API commands are sent using a single connection that is kept
+    # open between commands and, if so, the connection
+    persistent = False
+    connection = None
+    # whether the device MAC address, model and Sensors object are known
+    identified = False
     # known device models
     known_models = ('GW1000', 'GW1100', 'GW1200', 'GW2000', 'WH2650',
                     'WH2680', 'WN1900', 'WS3800', 'WS3900', 'WS3910')
@@ -5045,10 +7673,22 @@ class GatewayApi(object):
                  discovery_method=default_discovery_method,
                  discovery_port=default_discovery_port,
                  discovery_period=default_discovery_period,
-                 log_unknown_fields=False, debug=DebugOptions({})):
+                 log_unknown_fields=False, recorder=None,
+                 max_retry_wait=default_max_retry_wait,
+                 breaker_threshold=default_breaker_threshold,
+                 breaker_reset=default_breaker_reset,
+                 adaptive_timeout=True,
+                 min_socket_timeout=default_min_socket_timeout,
+                 max_socket_timeout=default_max_socket_timeout,
+                 cancel_event=None, identify=True, persistent=False,
+                 debug=DebugOptions({})):
 
         # get a parser object to parse any API data
         self.parser = ApiParser(log_unknown_fields=log_unknown_fields)
+        # whether API commands use a persistent connection
+        self.persistent = persistent
+        # FrameRecorder object used to capture API frames, may be None
+        self.recorder = recorder
 
         # network broadcast address
         self.broadcast_address = broadcast_address if broadcast_address is not None else default_broadcast_address
@@ -5056,10 +7696,22 @@ class GatewayApi(object):
         self.broadcast_port = broadcast_port if broadcast_port is not None else default_broadcast_port
         self.socket_timeout = socket_timeout if socket_timeout is not None else default_socket_timeout
         self.broadcast_timeout = broadcast_timeout if broadcast_timeout is not None else default_broadcast_timeout
+        # if required derive our API socket timeouts from observed device
+        # response times
+        if adaptive_timeout:
+            self.rtt = RttEstimator(initial_timeout=self.socket_timeout,
+                                    min_timeout=min_socket_timeout,
+                                    max_timeout=max_socket_timeout)
 
         self.discovery_method = discovery_method if discovery_method is not None else default_discovery_method
         self.discovery_port = discovery_port if discovery_port is not None else default_discovery_port
         self.discovery_period = discovery_period if discovery_period is not None else default_discovery_period
+        # how we retry failed API commands, our retry policy also provides
+        # the event used to cancel all blocking waits
+        self.retry_policy = RetryPolicy(max_tries=max_tries,
+                                        retry_wait=retry_wait,
+                                        max_wait=max_retry_wait,
+                                        cancel_event=cancel_event)
         # initialise flags to indicate if IP address or port were discovered
         self.ip_discovered = ip_address is None
         self.port_discovered = port is None
@@ -5102,8 +7754,9 @@ class GatewayApi(object):
                         # do we try again or raise an exception
                         if attempt < max_tries - 1:
                             # we still have at least one more try left so sleep
-                            # and try again
-                            time.sleep(retry_wait)
+                            # and try again, unless we are cancelled
+                            if not self.retry_policy.sleep(retry_wait):
+                                raise OperationCancelled("Device discovery cancelled")
                         else:
                             # we've used all our tries, log it and raise an exception
                             _msg = "Failed to detect device IP address and/or " \
@@ -5120,16 +7773,51 @@ class GatewayApi(object):
             loginf('     Using discovered address %s:%d' % (ip_address, port))
         self.max_tries = max_tries
         self.retry_wait = retry_wait
+        # circuit breaker used to stop sending API commands to an
+        # unresponsive device
+        self.breaker = CircuitBreaker(threshold=breaker_threshold,
+                                      reset_timeout=breaker_reset,
+                                      name='Device at %s:%d' % (ip_address, port))
         # start off logging failures
         self.log_failures = True
+        # the options used to obtain our Sensors object
+        self.sensors_options = dict(use_wh32=use_wh32,
+                                    ignore_wh40_batt=ignore_wh40_batt,
+                                    show_battery=show_battery,
+                                    debug=debug)
+        # Identify the device now unless our user will do so as required. The
+        # device MAC address, model and Sensors object are not set until the
+        # device is identified.
+        if mac is not None:
+            self.mac = mac
+        if identify:
+            self.identify()
+
+    def identify(self):
+        """Identify the device.
+
+        Obtain the device MAC address (unless already known), model and a
+        Sensors object. If the device cannot be contacted a GWIOError is
+        raised and the device remains unidentified.
+        """
+
         # Get my MAC address to use later if we have to rediscover. Within
         # class GatewayApi the MAC address is stored as a bytestring.
-        if mac is None:
+        if getattr(self, 'mac', None) is None:
             self.mac = self.get_mac_address()
-        else:
-            self.mac = mac
         # get my device model
         self.model = self.get_model_from_firmware(self.get_firmware_version())
+        # get a Sensors object to parse any API sensor state data
+        self.identify_sensors()
+        self.identified = True
+
+    def identify_sensors(self):
+        """Obtain a Sensors object for the sensors connected to the device.
+
+        The device system parameters and live data are used to determine how
+        some sensors are decoded. The Sensors object is saved as our sensors
+        property and updated with the current sensor ID data.
+        """
 
         # Do we have a WH24 attached? First obtain our system parameters.
         _sys_params = self.get_system_params()
@@ -5140,9 +7828,8 @@ class GatewayApi(object):
         live_data = self.get_livedata()
         is_wh46 = 'pm1' in live_data.keys()
         # get a Sensors object to parse any API sensor state data
-        self.sensors = Sensors(use_wh32=use_wh32, ignore_wh40_batt=ignore_wh40_batt,
-                               show_battery=show_battery, is_wh24=is_wh24, is_wh46=is_wh46,
-                               debug=debug)
+        self.sensors = Sensors(is_wh24=is_wh24, is_wh46=is_wh46,
+                               **self.sensors_options)
         # log our WH45/WH46 sensor ID decoding state
         if is_wh46:
             logdbg("     sensor ID decoding will use 'WH46' in lieu of 'WH45'")
@@ -5214,7 +7901,8 @@ class GatewayApi(object):
         while True:
             # wrap in try .. except to capture any errors
             try:
-                # receive a response
+                # wait for and receive a response
+                self.wait_socket(s, monotonic() + self.broadcast_timeout)
                 response = s.recv(1024)
                 # log the response if debug is high enough
                 if weewx.debug >= 3:
@@ -5224,6 +7912,11 @@ class GatewayApi(object):
                 break
             except socket.error:
                 # raise any other socket error
+                s.close()
+                raise
+            except OperationCancelled:
+                # we were cancelled, tidy up and let our caller know
+                s.close()
                 raise
             # check the response is valid, as it happens the format is the same
             # as used when responding to CMD_BROADCAST API commands
@@ -5303,6 +7996,7 @@ class GatewayApi(object):
         # obtain any responses
         while True:
             try:
+                self.wait_socket(s, monotonic() + self.broadcast_timeout)
                 response = s.recv(1024)
                 # log the response if debug is high enough
                 if weewx.debug >= 3:
@@ -5310,8 +8004,9 @@ class GatewayApi(object):
             except socket.timeout:
                 # if we time out then we are done
                 break
-            except socket.error:
-                # raise any other socket error
+            except (socket.error, OperationCancelled):
+                # raise any other socket error or a cancellation
+                s.close()
                 raise
             else:
                 # check the response is valid
@@ -5529,6 +8224,10 @@ class GatewayApi(object):
         try:
             # get the validated API response
             response = self.send_cmd_with_retries('CMD_GW1000_LIVEDATA')
+        except CircuitOpen:
+            # the device has stopped responding, there is no point
+            # attempting rediscovery until the device is tried again
+            raise
         except GWIOError:
             # there was a problem contacting the device, it could be it has
             # changed IP address so attempt to rediscover
@@ -5723,6 +8422,10 @@ class GatewayApi(object):
         try:
             # get the validated API response
             response = self.send_cmd_with_retries('CMD_READ_SENSOR_ID_NEW')
+        except CircuitOpen:
+            # the device has stopped responding, there is no point
+            # attempting rediscovery until the device is tried again
+            raise
         except GWIOError:
             # there was a problem contacting the device, it could be it has
             # changed IP address so attempt to rediscover
@@ -5855,6 +8558,21 @@ class GatewayApi(object):
         # now return the parsed response
         return self.parser.parse_get_co2_offset(response)
 
+    def get_wind_data(self):
+        """Obtain parsed live wind data.
+
+        Sends the API command to the device to obtain live data with retries
+        and parses only the wind related fields. Unlike get_livedata()
+        rediscovery is not attempted if the device cannot be contacted, the
+        GWIOError exception is raised and left to the next full poll to
+        handle.
+        """
+
+        # get the validated API response
+        response = self.send_cmd_with_retries('CMD_GW1000_LIVEDATA')
+        # now return the parsed wind data
+        return self.parser.parse_livedata_wind(response)
+
     def read_rain(self):
         """Get traditional gauge and piezo gauge rain data.
 
@@ -5877,20 +8595,35 @@ class GatewayApi(object):
         Send a command to the device and obtain the response. If the
         response is valid return the response. If the response is invalid
         an appropriate exception is raised and the command resent up to
-        self.max_tries times after which the value None is returned.
+        self.max_tries times after which a GWIOError exception is raised.
+
+        Retries are made as per our RetryPolicy object. The time spent
+        waiting for a response that timed out counts towards the wait before
+        the next retry. A connection that is refused or a device that is
+        unreachable fails quickly and is not retried. Each failed attempt is
+        recorded by our CircuitBreaker object and no further attempts are made
+        once it opens. If our CircuitBreaker object is open the command is not
+        sent and a CircuitOpen exception is raised.
 
         cmd: A string containing a valid API command,
              eg: 'CMD_READ_FIRMWARE_VERSION'
         payload: The data to be sent with the API command, byte string.
 
-        Returns the response as a byte string or the value None.
+        Returns the response as a byte string.
         """
 
         # construct the message packet
         packet = self.build_cmd_packet(cmd, payload)
+        # do not send the command if the device has stopped responding
+        if not self.breaker.allow():
+            raise CircuitOpen("Command '%s' not sent, %s is not responding" % (cmd,
+                                                                               self.breaker.name))
         response = None
+        attempts = 0
         # attempt to send up to 'self.max_tries' times
         for attempt in range(self.max_tries):
+            attempts += 1
+            start = monotonic()
             # wrap in  try..except so we can catch any errors
             try:
                 response = self.send_cmd(packet)
@@ -5899,6 +8632,17 @@ class GatewayApi(object):
                 if self.log_failures:
                     logdbg("Failed to obtain response to attempt %d "
                            "to send command '%s': %s" % (attempt + 1, cmd, e))
+            except socket.error as e:
+                if self.log_failures:
+                    logdbg("Failed attempt %d to send command '%s': %s" % (attempt + 1, cmd, e))
+                # if the connection was refused or the device is unreachable
+                # retrying is unlikely to help
+                if getattr(e, 'errno', None) in self.fast_fail_errors:
+                    self.breaker.record_failure()
+                    break
+            except OperationCancelled:
+                # we have been cancelled, there is nothing more to do
+                raise
             except Exception as e:
                 # an exception was encountered, log it
                 if self.log_failures:
@@ -5916,7 +8660,8 @@ class GatewayApi(object):
                     # most likely we have encountered a device that does
                     # not understand the command, possibly due to an old or
                     # outdated firmware version, raise the exception for
-                    # our caller to deal with
+                    # our caller to deal with, the device did respond
+                    self.breaker.record_success()
                     raise
                 except Exception as e:
                     # Some other error occurred in check_response(),
@@ -5927,15 +8672,22 @@ class GatewayApi(object):
                     log_traceback_error('    ****  ')
                 else:
                     # our response is valid so return it
+                    self.breaker.record_success()
                     return response
-            # sleep before our next attempt, but skip the sleep if we
-            # have just made our last attempt
+            # each failed attempt counts towards opening our circuit breaker,
+            # once open make no further attempts
+            self.breaker.record_failure()
+            if not self.breaker.allow():
+                break
+            # wait before our next attempt, but skip the wait if we have just
+            # made our last attempt, give up if our wait was cancelled
             if attempt < self.max_tries - 1:
-                time.sleep(self.retry_wait)
-        # if we made it here we failed after self.max_tries attempts
-        # first log it
+                wait = self.retry_policy.delay(attempt) - (monotonic() - start)
+                if not self.retry_policy.sleep(wait):
+                    break
+        # if we made it here we failed, first log it
         _msg = ("Failed to obtain response to command '%s' "
-                "after %d attempts" % (cmd, self.max_tries))
+                "after %d attempts" % (cmd, attempts))
         if response is not None or self.log_failures:
             logerr(_msg)
         # then finally, raise a GWIOError exception
@@ -5983,44 +8735,236 @@ class GatewayApi(object):
         errors are trapped and raised, code calling send_cmd should be
         prepared to handle such exceptions.
 
+        The socket is used in non-blocking mode so that waiting to connect
+        and waiting for a response can be cancelled, if cancelled an
+        OperationCancelled exception is raised.
+
+        If our connection is persistent the command is sent using the
+        existing connection if there is one. If the device has closed the
+        existing connection the command is sent once more using a new
+        connection. The connection is closed if an error occurs.
+
         cmd: A valid API command
 
         Returns the response as a byte string.
         """
 
+        cmd = six.indexbytes(packet, 2)
+        # the round trip time estimate to penalise should we time out, we
+        # start off waiting for a connection
+        key = RttEstimator.CONNECT
+        start = monotonic()
+        # if we are capturing frames record the packet we are sending
+        if self.recorder is not None:
+            self.recorder.record(FrameRecorder.REQUEST, packet,
+                                 cmd=cmd,
+                                 mac=getattr(self, 'mac', None))
+        # use our persistent connection if we have one, but not if the device
+        # has since closed it
+        s = self.connection
+        if s is not None and not self.connection_open(s):
+            self.close()
+            s = None
+        # wrap our connect in a try..except, so we can catch any socket
+        # related exceptions
+        try:
+            if s is None:
+                s = self.open_connection(start)
+            key = cmd
+            try:
+                response = self.exchange(s, packet)
+            except socket.timeout:
+                raise
+            except socket.error:
+                # an error using a new connection is an error, but a
+                # persistent connection may have been closed by the device
+                if s is not self.connection:
+                    raise
+                response = b''
+            if len(response) == 0 and s is self.connection:
+                # the device closed our persistent connection before
+                # responding, try once more using a new connection
+                self.close()
+                key = RttEstimator.CONNECT
+                s = self.open_connection(monotonic())
+                key = cmd
+                response = self.exchange(s, packet)
+            # if we are capturing frames record the response
+            if self.recorder is not None:
+                self.recorder.record(FrameRecorder.RESPONSE, response,
+                                     cmd=cmd,
+                                     mac=getattr(self, 'mac', None),
+                                     rtt=monotonic() - start)
+            # return the response
+            return response
+        except socket.error as e:
+            # if we timed out use a longer timeout next time
+            if self.rtt is not None and isinstance(e, socket.timeout):
+                self.rtt.timed_out(key)
+            # we received a socket error, if we are capturing frames record
+            # the error, then raise it
+            if self.recorder is not None:
+                self.recorder.record(FrameRecorder.ERROR, str(e).encode('utf-8'),
+                                     cmd=cmd,
+                                     mac=getattr(self, 'mac', None),
+                                     rtt=monotonic() - start)
+            # the state of a connection that failed is unknown so do not use
+            # it again
+            self.close()
+            raise
+        finally:
+            # make sure we close our socket unless it is our persistent
+            # connection
+            if s is not None and s is not self.connection:
+                s.close()
+
+    def open_connection(self, start):
+        """Open a connection to the API.
+
+        A non-blocking socket is created and connected to the device. If our
+        connection is persistent the socket is saved as our connection. Socket
+        related errors are raised.
+
+        start: monotonic time the connection attempt started
+
+        Returns the connected socket.
+        """
+
         # create a socket object for sending api_commands and broadcasting to
         # the network, would normally do this using a with statement but
         # with statement support for socket.socket did not appear until
         # python 3.
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        # set the socket timeout
-        s.settimeout(self.socket_timeout)
-        # wrap our connect in a try..except, so we can catch any socket
-        # related exceptions
+        s.setblocking(False)
+        # obtain the connect timeout, if we have an RttEstimator use the
+        # timeout it derives for establishing a connection
+        if self.rtt is not None:
+            timeout = self.rtt.timeout(RttEstimator.CONNECT)
+        else:
+            timeout = self.socket_timeout
+        connected = False
         try:
             # connect to the device
-            s.connect((self.ip_address, self.port))
-            # if required log the packet we are sending
-            if weewx.debug >= 3:
-                logdbg("Sending packet '%s' to %s:%d" % (bytes_to_hex(packet),
-                                                         self.ip_address.decode(),
-                                                         self.port))
-            # send the packet
-            s.sendall(packet)
-            # obtain the response, we assume here the response will be less
-            # than 1024 characters
-            response = s.recv(1024)
-            # if required log the response
-            if weewx.debug >= 3:
-                logdbg("Received response '%s'" % (bytes_to_hex(response),))
-            # return the response
-            return response
-        except socket.error:
-            # we received a socket error, raise it
-            raise
+            err = s.connect_ex((self.ip_address, self.port))
+            if err in self.connect_in_progress:
+                # wait for the connection to complete
+                self.wait_socket(s, start + timeout, write=True)
+                err = s.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err != 0:
+                raise socket.error(err, os.strerror(err))
+            connected = True
         finally:
-            # make sure we close our socket
-            s.close()
+            if not connected:
+                s.close()
+        # if we have an RttEstimator update the connection estimate
+        if self.rtt is not None:
+            self.rtt.update(RttEstimator.CONNECT, monotonic() - start)
+        if self.persistent:
+            self.connection = s
+        return s
+
+    def exchange(self, sock, packet):
+        """Send a packet over a connected socket and obtain the response.
+
+        If we have an RttEstimator the timeout it derives for the command is
+        used when awaiting the response. Socket related errors are raised.
+
+        Returns the response as a byte string.
+        """
+
+        cmd = six.indexbytes(packet, 2)
+        sent = monotonic()
+        # if we have an RttEstimator use the timeout derived for this command
+        # when awaiting the response
+        if self.rtt is not None:
+            timeout = self.rtt.timeout(cmd)
+        else:
+            timeout = self.socket_timeout
+        # if required log the packet we are sending
+        if weewx.debug >= 3:
+            logdbg("Sending packet '%s' to %s:%d" % (bytes_to_hex(packet),
+                                                     self.ip_address.decode(),
+                                                     self.port))
+        # send the packet
+        sock.sendall(packet)
+        # wait for and obtain the response, we assume here the response
+        # will be less than 1024 characters
+        self.wait_socket(sock, sent + timeout)
+        response = sock.recv(1024)
+        # update the command estimate, but only if the device actually
+        # responded
+        if self.rtt is not None and len(response) > 0:
+            self.rtt.update(cmd, monotonic() - sent)
+        # if required log the response
+        if weewx.debug >= 3:
+            logdbg("Received response '%s'" % (bytes_to_hex(response),))
+        return response
+
+    @staticmethod
+    def connection_open(sock):
+        """Whether a persistent connection is still open.
+
+        A persistent connection is idle between commands, so if it is
+        readable the device has either closed the connection or sent
+        something unexpected. In either case the connection should not be
+        used.
+        """
+
+        try:
+            _r, _w, _x = select.select([sock], [], [sock], 0)
+        except (socket.error, ValueError):
+            return False
+        return not (_r or _x)
+
+    def close(self):
+        """Close our persistent connection if we have one."""
+
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def wait_socket(self, sock, deadline, write=False):
+        """Wait until a socket is ready unless cancelled.
+
+        Wait until a socket is readable (or writable if write is True) or a
+        deadline (monotonic time) is reached. A socket.timeout exception is
+        raised if the deadline is reached. The wait is made in short periods
+        so that cancellation is detected promptly, if cancelled an
+        OperationCancelled exception is raised.
+        """
+
+        while True:
+            if self.retry_policy.cancelled.is_set():
+                raise OperationCancelled("Device operation cancelled")
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                raise socket.timeout('timed out')
+            wait = min(remaining, self.cancel_check_interval)
+            if write:
+                _r, _w, _x = select.select([], [sock], [sock], wait)
+            else:
+                _r, _w, _x = select.select([sock], [], [], wait)
+            if _r or _w or _x:
+                return
+
+    def cancel(self):
+        """Cancel any current and future blocking waits."""
+
+        self.retry_policy.cancel()
+
+    @property
+    def rtt_stats(self):
+        """Round trip time estimates for establishing a connection and for
+        each API command sent.
+
+        Returns a dict of estimates keyed by 'connect' or API command name,
+        the dict is empty if socket timeouts are not adaptive.
+        """
+
+        if self.rtt is None:
+            return dict()
+        cmd_names = dict((six.byte2int(code), name) for name, code in six.iteritems(self.api_commands))
+        return dict((cmd_names.get(key, key), value) for key, value in six.iteritems(self.rtt.stats))
 
     def check_response(self, response, cmd_code):
         """Check the validity of an API response.
@@ -6123,9 +9067,10 @@ class GatewayApi(object):
                 loginf("Attempting to re-discover %s..." % self.model)
             # attempt to discover up to self.max_tries times
             for attempt in range(self.max_tries):
-                # sleep before our attempt, but not if it's the first one
-                if attempt > 0:
-                    time.sleep(self.retry_wait)
+                # wait before our attempt, but not if it's the first one,
+                # give up if our wait is cancelled
+                if attempt > 0 and not self.retry_policy.sleep(self.retry_policy.delay(attempt - 1)):
+                    break
                 try:
                     # discover devices on the local network, the result is
                     # a list of dicts in IP address order with each dict
@@ -6167,6 +9112,10 @@ class GatewayApi(object):
                         loginf("%s at address %s:%d will be used" % (self.model,
                                                                      self.ip_address.decode(),
                                                                      self.port))
+                        # we have a new address so start afresh with our
+                        # circuit breaker
+                        self.breaker.name = 'Device at %s:%d' % (self.ip_address.decode(), self.port)
+                        self.breaker.reset()
                         # return True indicating the re-discovery was
                         # successful
                         return True
@@ -6187,14 +9136,222 @@ class GatewayApi(object):
         # if we made it here re-discovery was unsuccessful so return False
         return False
 
-    def update_sensor_id_data(self):
-        """Update the Sensors object with current sensor ID data."""
+    def update_sensor_id_data(self):
+        """Update the Sensors object with current sensor ID data."""
+
+        # first get the current sensor ID data
+        # TODO. This should return a value
+        sensor_id_data = self.get_sensor_id()
+        # now use the sensor ID data to re-initialise our sensors object
+        self.sensors.set_sensor_id_data(sensor_id_data)
+
+
+# ============================================================================
+#                             class ReplaySource
+# ============================================================================
+
+class ReplaySource(object):
+    """Class to serve captured API responses in lieu of a gateway device.
+
+    A ReplaySource object steps through the response records in a frame
+    capture (including any rotated capture files) one poll at a time. A poll
+    consists of a CMD_GW1000_LIVEDATA response and any other responses
+    captured before the next CMD_GW1000_LIVEDATA response. Responses captured
+    in the current poll are served as the device response to each command.
+    Commands that are not part of any poll, such as those issued at startup,
+    are served the most recent captured response.
+    """
+
+    # the command code that marks the start of each poll
+    poll_cmd = six.byte2int(GatewayApi.api_commands['CMD_GW1000_LIVEDATA'])
+
+    def __init__(self, path, start_ts=None, stop_ts=None):
+        """Initialise a ReplaySource object."""
+
+        self.path = path
+        self.start_ts = start_ts
+        # the most recent captured response to each command, keyed by command
+        # code
+        self.responses = {}
+        # the responses captured in the current poll, keyed by command code
+        self.poll_responses = {}
+        # the command codes that have been seen as part of a poll
+        self.polled = set()
+        # the device MAC address as captured
+        self.mac = None
+        # timestamp of the current poll
+        self.poll_ts = None
+        # number of polls replayed
+        self.polls = 0
+        # the first response record of the next poll
+        self.pending = None
+        if len(CaptureReader.segments(path)) == 0:
+            raise GWIOError("Frame capture '%s' not found" % (path,))
+        # a generator of the captured response records
+        self.records = self.response_records(stop_ts)
+        # obtain the first poll, but don't consume it
+        self.prime()
+
+    def response_records(self, stop_ts=None):
+        """Generator yielding captured response records in time order."""
+
+        for segment in CaptureReader.segments(self.path):
+            for record in CaptureReader(segment).records(stop_ts=stop_ts):
+                if record['direction'] == FrameRecorder.RESPONSE:
+                    yield record
+
+    def prime(self):
+        """Read the captured responses up to the first poll to be replayed.
+
+        Responses captured before start_ts are not replayed as polls, but they
+        do provide responses to commands such as CMD_READ_STATION_MAC and
+        CMD_READ_FIRMWARE_VERSION that are typically only issued at startup.
+        """
+
+        for record in self.records:
+            if record['cmd'] == self.poll_cmd and (self.start_ts is None or record['timestamp'] >= self.start_ts):
+                self.pending = record
+                # make the first poll available to initialise our stand-in
+                # device
+                self.poll_responses = {self.poll_cmd: record['frame']}
+                self.mac = record['mac']
+                break
+            self.responses[record['cmd']] = record['frame']
+
+    def next_poll(self):
+        """Advance to the next captured poll.
+
+        Returns True if a poll was available or False if the capture has been
+        exhausted.
+        """
+
+        record = self.pending
+        if record is None:
+            return False
+        self.pending = None
+        self.poll_ts = record['timestamp']
+        self.mac = record['mac']
+        self.poll_responses = {self.poll_cmd: record['frame']}
+        # gather the remaining responses that form part of this poll
+        for record in self.records:
+            if record['cmd'] == self.poll_cmd:
+                self.pending = record
+                break
+            self.poll_responses[record['cmd']] = record['frame']
+            self.responses[record['cmd']] = record['frame']
+        self.polled.update(self.poll_responses)
+        self.polls += 1
+        return True
+
+    def response(self, cmd_code):
+        """Obtain the captured response to a command.
+
+        cmd_code: the command code. Integer.
+
+        Returns the response as a bytestring or None if no response has been
+        captured. A command that has been seen as part of an earlier poll but
+        is missing from the current poll has no response, the command most
+        likely failed at the time of capture.
+        """
+
+        if cmd_code in self.poll_responses:
+            return self.poll_responses[cmd_code]
+        if cmd_code in self.polled:
+            return None
+        return self.responses.get(cmd_code)
+
+
+# ============================================================================
+#                              class ReplayApi
+# ============================================================================
+
+class ReplayApi(GatewayApi):
+    """Class to replay captured gateway device API responses.
+
+    A ReplayApi object is a drop in replacement for a GatewayApi object that
+    obtains API responses from a ReplaySource object rather than from a
+    gateway device. Captured responses are validated and parsed exactly as if
+    they had been received from the device.
+    """
+
+    def __init__(self, source, use_wh32=True, ignore_wh40_batt=True,
+                 show_battery=False, log_unknown_fields=False,
+                 debug=DebugOptions({})):
+        """Initialise a ReplayApi object."""
+
+        # get a parser object to parse any API data
+        self.parser = ApiParser(log_unknown_fields=log_unknown_fields)
+        # we never capture replayed frames
+        self.recorder = None
+        # our source of API responses
+        self.source = source
+        # there is no device so there is no address
+        self.ip_address = b'0.0.0.0'
+        self.port = 0
+        self.ip_discovered = False
+        self.port_discovered = False
+        # there is no point retrying a captured response
+        self.max_tries = 1
+        self.retry_wait = 0
+        self.retry_policy = RetryPolicy(max_tries=1, retry_wait=0)
+        self.breaker = CircuitBreaker(threshold=0)
+        self.log_failures = True
+        # The capture may not include responses to commands that are only
+        # issued at startup, so fall back to what we can determine from the
+        # capture.
+        try:
+            self.mac = self.get_mac_address()
+        except GWIOError:
+            self.mac = source.mac
+        try:
+            self.model = self.get_model_from_firmware(self.get_firmware_version())
+        except GWIOError:
+            self.model = None
+        try:
+            _sys_params = self.get_system_params()
+        except GWIOError:
+            _sys_params = {}
+        # WH24 is indicated by the sensor_type field being 0
+        is_wh24 = _sys_params.get('sensor_type', 0) == 0
+        # a WH46 is indicated by the presence of PM1 data
+        is_wh46 = 'pm1' in self.get_livedata().keys()
+        # get a Sensors object to parse any API sensor state data
+        self.sensors = Sensors(use_wh32=use_wh32, ignore_wh40_batt=ignore_wh40_batt,
+                               show_battery=show_battery, is_wh24=is_wh24, is_wh46=is_wh46,
+                               debug=debug)
+        # update the sensors object if we can, if not it will be updated on
+        # the first poll
+        try:
+            self.update_sensor_id_data()
+        except GWIOError:
+            pass
+
+    def send_cmd_with_retries(self, cmd, payload=b''):
+        """Obtain the captured response to an API command.
+
+        Obtain the captured response to an API command and validate it in the
+        same manner as GatewayApi.send_cmd_with_retries() validates a device
+        response. Raise a GWIOError if there is no captured response or the
+        captured response is invalid.
+        """
+
+        try:
+            cmd_code = self.api_commands[cmd]
+        except KeyError:
+            raise UnknownApiCommand("Unknown API command '%s'" % (cmd,))
+        response = self.source.response(six.byte2int(cmd_code))
+        if response is None:
+            raise GWIOError("No captured response to command '%s'" % (cmd,))
+        try:
+            self.check_response(response, cmd_code)
+        except InvalidChecksum as e:
+            raise GWIOError("Invalid captured response to command '%s': %s" % (cmd, e))
+        return response
+
+    def rediscover(self):
+        """There is nothing to rediscover when replaying."""
 
-        # first get the current sensor ID data
-        # TODO. This should return a value
-        sensor_id_data = self.get_sensor_id()
-        # now use the sensor ID data to re-initialise our sensors object
-        self.sensors.set_sensor_id_data(sensor_id_data)
+        return False
 
 
 # ============================================================================
@@ -6211,11 +9368,13 @@ class GatewayHttp(object):
                 'get_cli_soilad', 'get_cli_multiCh', 'get_cli_pm25',
                 'get_cli_co2', 'get_piezo_rain']
 
-    def __init__(self, ip_address):
+    def __init__(self, ip_address, timeout=None):
         """Initialise a HttpRequest object."""
 
         # the IP address to be used (stored as a string)
         self.ip_address = ip_address
+        # request timeout in seconds, None uses the global default
+        self.timeout = timeout
 
     def request(self, command_str, data={}, headers={}):
         """Send a HTTP request to the device and return the response.
@@ -6251,7 +9410,10 @@ class GatewayHttp(object):
             req = urllib.request.Request(url=full_url, headers=headers)
             try:
                 # submit the request and obtain the raw response
-                w = urllib.request.urlopen(req)
+                if self.timeout is not None:
+                    w = urllib.request.urlopen(req, timeout=self.timeout)
+                else:
+                    w = urllib.request.urlopen(req)
                 # Get charset used so we can decode the stream correctly.
                 # Unfortunately, the way to get the charset depends on whether we
                 # are running under python2 or python3. Assume python3, but be
@@ -6451,6 +9613,341 @@ class GatewayHttp(object):
             return None
 
 
+# ============================================================================
+#                             class HttpParser
+# ============================================================================
+
+class HttpParser(object):
+    """Class to parse and decode device HTTP live data.
+
+    The get_livedata_info HTTP request returns live sensor data as JSON.
+    Observations are grouped by sensor type and values are strings that
+    include the unit in use by the device either as a suffix or in a
+    separate 'unit' key. Class HttpParser decodes get_livedata_info data into
+    a dict using the same device field names and units as ApiParser.
+
+    Observations that have no API equivalent (eg 'feels like' temperature)
+    are ignored.
+    """
+
+    # unit conversion factors to ApiParser units keyed by lower case unit,
+    # temperature is handled separately
+    unit_factors = {
+        'm/s': 1.0, 'km/h': 1 / 3.6, 'mph': 0.44704, 'knots': 0.514444,
+        'ft/s': 0.3048, 'hpa': 1.0, 'inhg': 33.8639, 'mmhg': 1.33322,
+        'mm': 1.0, 'in': 25.4, 'mm/hr': 1.0, 'in/hr': 25.4, 'lux': 1.0,
+        'w/m2': 126.7, 'fc': 10.76391, 'km': 1.0, 'mi': 1.609344, '%': 1.0
+    }
+    # ApiParser decode functions that return integer values
+    int_decoders = ('decode_humid', 'decode_dir', 'decode_uvi',
+                    'decode_moist', 'decode_leak', 'decode_wet',
+                    'decode_count', 'decode_distance')
+    # regex to split a value string into a number and any unit
+    value_re = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*(.*?)\s*$')
+    # keys of the co2 (WH45/WH46) group and their device field names
+    co2_fields = {'temp': 'temp17', 'humidity': 'humid17', 'PM25': 'pm255',
+                  'PM25_24H': 'pm255_24h_avg', 'PM10': 'pm10',
+                  'PM10_24H': 'pm10_24h_avg', 'PM1': 'pm1',
+                  'PM1_24H': 'pm1_24h_avg', 'PM4': 'pm4',
+                  'PM4_24H': 'pm4_24h_avg', 'CO2': 'co2',
+                  'CO2_24H': 'co2_24h_avg'}
+
+    def __init__(self):
+        """Initialise a HttpParser object."""
+
+        # map of live data address as used in the HTTP data, eg '0x02', to
+        # device field name
+        self.address_fields = dict(('0x%02X' % six.byte2int(k), v[2])
+                                   for k, v in six.iteritems(ApiParser.live_data_struct)
+                                   if isinstance(v[2], str))
+        # the device fields that are integers
+        self.int_fields = set(v[2] for v in six.itervalues(ApiParser.live_data_struct)
+                              if isinstance(v[2], str) and v[0] in self.int_decoders)
+        self.int_fields.update(('humid17', 'co2', 'co2_24h_avg', 'p_rainhour'))
+
+    def parse_livedata_info(self, livedata_info):
+        """Parse get_livedata_info data.
+
+        Returns a dict of device field data.
+        """
+
+        data = {}
+        if not hasattr(livedata_info, 'keys'):
+            return data
+        for item in livedata_info.get('common_list', []):
+            field = self.address_fields.get(item.get('id', '').upper().replace('0X', '0x'))
+            if field is not None:
+                self.add(data, field, item.get('val'), item.get('unit'))
+        for group, prefix in (('rain', 't_'), ('piezoRain', 'p_')):
+            for item in livedata_info.get(group, []):
+                field = self.address_fields.get(item.get('id', '').upper().replace('0X', '0x'))
+                if field is not None and field.startswith('t_rain'):
+                    self.add(data, prefix + field[2:], item.get('val'), item.get('unit'))
+        for item in livedata_info.get('wh25', []):
+            self.add(data, 'intemp', item.get('intemp'), item.get('unit'))
+            self.add(data, 'inhumid', item.get('inhumi'))
+            self.add(data, 'absbarometer', item.get('abs'))
+            self.add(data, 'relbarometer', item.get('rel'))
+        for item in livedata_info.get('lightning', []):
+            self.add(data, 'lightningdist', item.get('distance'))
+            self.add(data, 'lightningdettime', item.get('timestamp'))
+            self.add(data, 'lightningcount', item.get('count'))
+        for item in livedata_info.get('co2', []):
+            for key, field in six.iteritems(self.co2_fields):
+                self.add(data, field, item.get(key), item.get('unit') if key == 'temp' else None)
+        for group, fields in (('ch_aisle', (('temp', 'temp%d', 0), ('humidity', 'humid%d', 0))),
+                              ('ch_temp', (('temp', 'temp%d', 8),)),
+                              ('ch_soil', (('humidity', 'soilmoist%d', 0),)),
+                              ('ch_leaf', (('humidity', 'leafwet%d', 0),)),
+                              ('ch_pm25', (('PM25', 'pm25%d', 0), ('PM25_24H', 'pm25%d_24h_avg', 0))),
+                              ('ch_leak', (('status', 'leak%d', 0),))):
+            for item in livedata_info.get(group, []):
+                try:
+                    channel = int(item.get('channel'))
+                except (TypeError, ValueError):
+                    continue
+                for key, field_fmt, offset in fields:
+                    value = item.get(key)
+                    if key == 'status' and value is not None:
+                        value = '0' if value.lower() == 'normal' else '1'
+                    self.add(data, field_fmt % (channel + offset), value,
+                             item.get('unit') if key == 'temp' else None)
+        return data
+
+    def add(self, data, field, value, unit=None):
+        """Decode a value string and add it to a data dict."""
+
+        value = self.decode(value, unit)
+        if value is not None and field in self.int_fields:
+            value = int(round(value))
+        data[field] = value
+
+    def decode(self, value, unit=None):
+        """Decode a value string to a number in ApiParser units.
+
+        value: The value string, eg '1013.2 hPa' or '70%'.
+        unit:  The unit if not included in the value string, eg 'C'.
+
+        Returns the decoded value or None if the value string could not be
+        decoded.
+        """
+
+        if value is None:
+            return None
+        match = self.value_re.match(str(value))
+        if match is None:
+            return None
+        number = float(match.group(1))
+        unit = (unit or match.group(2) or '').strip().lower()
+        if unit in ('f', u'℉'):
+            return round((number - 32.0) * 5.0 / 9.0, 1)
+        if unit in ('', 'c', u'℃'):
+            return number
+        try:
+            return round(number * self.unit_factors[unit], 1)
+        except KeyError:
+            # a unit we do not know how to convert
+            return None
+
+
+# ============================================================================
+#                            class LiveDataRouter
+# ============================================================================
+
+class LiveDataRouter(object):
+    """Class to obtain device live data via the API and HTTP.
+
+    Device live data may be obtained via the API (CMD_GW1000_LIVEDATA) or via
+    HTTP (get_livedata_info). Depending on the device model and firmware some
+    fields are only available via one of the two transports. A
+    LiveDataRouter object probes both transports to learn which fields each
+    provides and how long each takes to respond. Each required field is then
+    routed to the cheapest (fastest) transport that provides it. If all
+    required fields are routed to one transport only that transport is used
+    each poll, otherwise both transports are used concurrently and the
+    results merged.
+
+    Transports are probed again if the device model or firmware changes and
+    every probe_interval seconds to refresh the cost of each transport.
+
+    The latency and CPU cost of each request are recorded for each
+    transport and are available via the stats property.
+    """
+
+    transports = ('api', 'http')
+
+    def __init__(self, device, required_fields=None,
+                 probe_interval=default_http_probe_interval):
+        """Initialise a LiveDataRouter object.
+
+        device:          GatewayDevice object used to obtain data.
+        required_fields: Iterable of required device field names, None if
+                         all fields are required.
+        probe_interval:  Interval in seconds between probes of both
+                         transports.
+        """
+
+        self.device = device
+        self.required_fields = set(required_fields) if required_fields is not None else None
+        self.probe_interval = probe_interval
+        # the device model and firmware version the routes were determined
+        # for
+        self.route_key = None
+        self.last_probe = None
+        # device fields routed to each transport, keyed by transport
+        self.routes = None
+        # per transport request statistics
+        self.stats = dict((t, {'requests': 0, 'failures': 0, 'latency': None,
+                               'cpu': None, 'fields': 0}) for t in self.transports)
+
+    def get_livedata(self):
+        """Obtain parsed live data.
+
+        If both transports are used and one fails the data from the other
+        transport is returned. If the API is not used and HTTP fails the API
+        is used instead. GWIOError exceptions raised by the API are passed
+        through.
+        """
+
+        route_key = self.get_route_key()
+        if self.routes is None or route_key != self.route_key or \
+                monotonic() - self.last_probe > self.probe_interval:
+            return self.probe(route_key)
+        results = self.fetch([t for t in self.transports if len(self.routes[t]) > 0])
+        if results.get('api') is None and results.get('http') is None:
+            # HTTP was our only transport and it failed, fall back to the API
+            results = self.fetch(['api'])
+        return self.merge(results)
+
+    def get_route_key(self):
+        """Obtain the key used to determine if the routes are current."""
+
+        try:
+            return self.device.model, self.device.firmware_version
+        except GWIOError:
+            return self.route_key
+
+    def probe(self, route_key):
+        """Obtain data via both transports and determine the field routes."""
+
+        results = self.fetch(self.transports)
+        fields = dict((t, set(k for k, v in six.iteritems(results[t] or {}) if v is not None))
+                      for t in self.transports)
+        # order the transports by cost, the API is preferred if it has not
+        # been measured
+        cost = dict((t, self.stats[t]['latency'] if fields[t] else None) for t in self.transports)
+        ordered = sorted([t for t in self.transports if cost[t] is not None],
+                         key=lambda t: cost[t])
+        routes = dict((t, set()) for t in self.transports)
+        for field in set().union(*fields.values()):
+            if self.required_fields is not None and field not in self.required_fields:
+                continue
+            for transport in ordered:
+                if field in fields[transport]:
+                    routes[transport].add(field)
+                    break
+        self.routes = routes
+        self.route_key = route_key
+        self.last_probe = monotonic()
+        for transport in self.transports:
+            self.stats[transport]['fields'] = len(fields[transport])
+        loginf("Live data routes: %s" % self.summary())
+        return self.merge(results)
+
+    def fetch(self, transports):
+        """Obtain data via one or more transports.
+
+        If both transports are required HTTP is used in a separate thread
+        concurrently with the API. Returns a dict of parsed data keyed by
+        transport, the value is None if data could not be obtained. A
+        GWIOError raised by the API is raised if HTTP data is not available.
+        """
+
+        results = dict((t, None) for t in self.transports)
+        thread = None
+        if 'http' in transports:
+            if 'api' in transports:
+                thread = threading.Thread(target=self.fetch_transport,
+                                          args=('http', results))
+                thread.daemon = True
+                thread.start()
+            else:
+                self.fetch_transport('http', results)
+        error = None
+        if 'api' in transports:
+            try:
+                self.fetch_transport('api', results)
+            except GWIOError as e:
+                error = e
+        if thread is not None:
+            thread.join()
+        if error is not None and results['http'] is None:
+            raise error
+        return results
+
+    def fetch_transport(self, transport, results):
+        """Obtain data via a single transport and record the cost."""
+
+        stats = self.stats[transport]
+        start = monotonic()
+        start_cpu = thread_time()
+        try:
+            if transport == 'api':
+                data = self.device.livedata
+            else:
+                data = self.device.http_livedata
+        except GWIOError:
+            stats['failures'] += 1
+            raise
+        except Exception as e:
+            # HTTP errors are not fatal, we can always use the API
+            logdbg("Unable to obtain HTTP live data: %s" % e)
+            data = None
+        latency = monotonic() - start
+        cpu = thread_time() - start_cpu
+        if data is None:
+            stats['failures'] += 1
+            return
+        stats['requests'] += 1
+        # keep a running average of latency and CPU cost
+        if stats['latency'] is None:
+            stats['latency'], stats['cpu'] = latency, cpu
+        else:
+            stats['latency'] += (latency - stats['latency']) / 8.0
+            stats['cpu'] += (cpu - stats['cpu']) / 8.0
+        results[transport] = data
+
+    def merge(self, results):
+        """Merge the data from each transport as per the routes."""
+
+        data = {}
+        for transport in self.transports:
+            if results.get(transport) is not None:
+                data.update(results[transport])
+        # routed fields take the value from the transport they are routed to
+        for transport in self.transports:
+            if results.get(transport) is not None:
+                for field in self.routes[transport]:
+                    if field in results[transport]:
+                        data[field] = results[transport][field]
+        return data
+
+    def summary(self):
+        """Summarise the routes and transport costs."""
+
+        parts = []
+        for transport in self.transports:
+            stats = self.stats[transport]
+            if stats['latency'] is not None:
+                cost = '%.1f ms, %.2f ms CPU' % (stats['latency'] * 1000, stats['cpu'] * 1000)
+            else:
+                cost = 'unavailable'
+            parts.append('%s %d fields (%s)' % (transport,
+                                                len(self.routes[transport]) if self.routes else 0,
+                                                cost))
+        return ', '.join(parts)
+
+
 class GatewayDevice(object):
     """Class to directly interact with an Ecowitt gateway device.
 
@@ -6500,6 +9997,25 @@ class GatewayDevice(object):
                 ]
     # sensors that have user updatable firmware
     sensors_with_fware = {'wh80': 'WS80', 'wh85': 'WS85', 'wh90': 'WS90'}
+    # Default time to live in seconds of cached property values keyed by
+    # property name or, for properties obtained via HTTP, HTTP request name. A
+    # value of None caches the property value until the cache is invalidated, 0
+    # disables caching. Concurrent requests for a property are always coalesced
+    # irrespective of the time to live.
+    default_cache_ttl = {'livedata': 0, 'wind': 0, 'rain': 0, 'raindata': 0,
+                         'sensor_state': 0, 'get_livedata_info': 0,
+                         'mac_address': None,
+                         'firmware_version': 3600, 'get_version': 3600,
+                         'get_device_info': 3600, 'get_sensors_info': 3600,
+                         'sensor_id': 60, 'system_params': 300,
+                         'ecowitt_net_params': 300,
+                         'wunderground_params': 300,
+                         'weathercloud_params': 300, 'wow_params': 300,
+                         'custom_params': 300, 'usr_path': 300,
+                         'mulch_offset': 300, 'mulch_t_offset': 300,
+                         'pm25_offset': 300, 'calibration_coefficient': 300,
+                         'soil_calibration': 300, 'offset_calibration': 300,
+                         'co2_offset': 300}
 
     def __init__(self, ip_address=None, port=None,
                  broadcast_address=None, broadcast_port=None,
@@ -6510,33 +10026,161 @@ class GatewayDevice(object):
                  discovery_method=default_discovery_method,
                  discovery_port=default_discovery_port,
                  discovery_period=default_discovery_period,
-                 log_unknown_fields=False, debug=DebugOptions({})):
-        """Initialise a GatewayDevice object."""
+                 log_unknown_fields=False, recorder=None, api=None,
+                 cache_ttl=None, max_retry_wait=default_max_retry_wait,
+                 breaker_threshold=default_breaker_threshold,
+                 breaker_reset=default_breaker_reset,
+                 adaptive_timeout=True,
+                 min_socket_timeout=default_min_socket_timeout,
+                 max_socket_timeout=default_max_socket_timeout,
+                 cancel_event=None, identify=True, debug=DebugOptions({})):
+        """Initialise a GatewayDevice object.
+
+        If a GatewayApi (or compatible) object is passed via the api parameter
+        it is used in lieu of creating a GatewayApi object. Property cache time
+        to live defaults may be overridden by passing a dict of property name
+        and time to live pairs via the cache_ttl parameter. If identify is
+        False the device is not contacted, the device must be identified by
+        calling api.identify() before device data is obtained.
+        """
 
         # get a GatewayApi object to handle the interaction with the API
-        self.api = GatewayApi(ip_address=ip_address,
-                              port=port,
-                              broadcast_address=broadcast_address,
-                              broadcast_port=broadcast_port,
-                              socket_timeout=socket_timeout,
-                              broadcast_timeout=broadcast_timeout,
-                              max_tries=max_tries,
-                              retry_wait=retry_wait,
-                              use_wh32=use_wh32,
-                              ignore_wh40_batt=ignore_wh40_batt,
-                              show_battery=show_battery,
-                              discovery_method=discovery_method,
-                              discovery_port=discovery_port,
-                              discovery_period=discovery_period,
-                              log_unknown_fields=log_unknown_fields,
-                              debug=debug)
+        if api is not None:
+            self.api = api
+        else:
+            self.api = GatewayApi(ip_address=ip_address,
+                                  port=port,
+                                  broadcast_address=broadcast_address,
+                                  broadcast_port=broadcast_port,
+                                  socket_timeout=socket_timeout,
+                                  broadcast_timeout=broadcast_timeout,
+                                  max_tries=max_tries,
+                                  retry_wait=retry_wait,
+                                  use_wh32=use_wh32,
+                                  ignore_wh40_batt=ignore_wh40_batt,
+                                  show_battery=show_battery,
+                                  discovery_method=discovery_method,
+                                  discovery_port=discovery_port,
+                                  discovery_period=discovery_period,
+                                  log_unknown_fields=log_unknown_fields,
+                                  recorder=recorder,
+                                  max_retry_wait=max_retry_wait,
+                                  breaker_threshold=breaker_threshold,
+                                  breaker_reset=breaker_reset,
+                                  adaptive_timeout=adaptive_timeout,
+                                  min_socket_timeout=min_socket_timeout,
+                                  max_socket_timeout=max_socket_timeout,
+                                  cancel_event=cancel_event,
+                                  identify=identify,
+                                  debug=debug)
 
         # get a GatewayHttp object to handle any HTTP requests, we need to use
         # the same IP address as our GatewayApi object
-        self.http = GatewayHttp(ip_address=self.api.ip_address.decode())
+        self.http = GatewayHttp(ip_address=self.api.ip_address.decode(),
+                                timeout=max_socket_timeout)
+        # get a HttpParser object to parse HTTP live data
+        self.http_parser = HttpParser()
 
         # start off logging failures
         self.log_failures = True
+        # property value cache time to live
+        self.cache_ttl = dict(self.default_cache_ttl)
+        if cache_ttl is not None:
+            self.cache_ttl.update(cache_ttl)
+        # cached property values keyed by property name, each value is a tuple
+        # of monotonic time of the request and the property value
+        self.cache = {}
+        # in-flight property requests keyed by property name
+        self.inflight = {}
+        self.cache_lock = threading.Lock()
+        # the device address the cached values were obtained from
+        self.cache_address = (self.api.ip_address, self.api.port)
+        # whether device requests are serialised, ie only one request is made
+        # of the device at a time
+        self.serialise = False
+        self.request_lock = threading.Lock()
+
+    class Flight(object):
+        """An in-flight property request shared by concurrent callers."""
+
+        def __init__(self):
+            self.event = threading.Event()
+            self.waiters = 0
+            self.result = None
+            self.error = None
+
+    def cached(self, name, getter):
+        """Obtain a property value using the cache.
+
+        If the property value is cached and the cached value has not expired
+        return a copy of the cached value. If the property value is already
+        being obtained by another thread wait for and return a copy of that
+        value. Otherwise, call getter to obtain the property value. Any
+        exception raised by getter is raised in all waiting threads.
+
+        If the device address has changed since the cached values were
+        obtained, eg due to re-discovery, the cache is invalidated.
+        """
+
+        ttl = self.cache_ttl.get(name, 0)
+        leader = False
+        with self.cache_lock:
+            if (self.api.ip_address, self.api.port) != self.cache_address:
+                self.cache.clear()
+                self.cache_address = (self.api.ip_address, self.api.port)
+            entry = self.cache.get(name)
+            if entry is not None and (ttl is None or monotonic() - entry[0] < ttl):
+                return copy.deepcopy(entry[1])
+            flight = self.inflight.get(name)
+            if flight is not None:
+                flight.waiters += 1
+            else:
+                flight = self.inflight[name] = GatewayDevice.Flight()
+                leader = True
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+        result = None
+        try:
+            if self.serialise:
+                with self.request_lock:
+                    result = getter()
+            else:
+                result = getter()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.cache_lock:
+                del self.inflight[name]
+                if flight.error is None:
+                    # a value of None means the property value could not be
+                    # obtained so do not cache it
+                    if ttl != 0 and result is not None:
+                        self.cache[name] = (monotonic(), result)
+                    if ttl != 0 or flight.waiters > 0:
+                        # our caller may alter the result, so keep a copy
+                        flight.result = result
+                        result = copy.deepcopy(result)
+            flight.event.set()
+        return result
+
+    def invalidate(self, *names):
+        """Invalidate cached property values.
+
+        Invalidate the named cached property values or, if no property names
+        are given, all cached property values. Should be called after any
+        command that alters the device configuration.
+        """
+
+        with self.cache_lock:
+            if len(names) == 0:
+                self.cache.clear()
+            else:
+                for name in names:
+                    self.cache.pop(name, None)
 
     @property
     def ip_address(self):
@@ -6560,127 +10204,145 @@ class GatewayDevice(object):
     def livedata(self):
         """Gateway device live data."""
 
-        return self.api.get_livedata()
+        return self.cached('livedata', self.api.get_livedata)
+
+    @property
+    def http_livedata(self):
+        """Gateway device live data obtained via HTTP.
+
+        Returns None if no valid data was returned by the device.
+        """
+
+        livedata_info = self.cached('get_livedata_info', self.http.get_livedata_info)
+        if livedata_info is None:
+            return None
+        return self.http_parser.parse_livedata_info(livedata_info)
+
+    @property
+    def wind(self):
+        """Gateway device live wind data."""
+
+        return self.cached('wind', self.api.get_wind_data)
 
     @property
     def raindata(self):
         """Gateway device traditional rain gauge data."""
 
-        return self.api.read_raindata()
+        return self.cached('raindata', self.api.read_raindata)
 
     @property
     def system_params(self):
         """Gateway device system parameters."""
 
-        return self.api.get_system_params()
+        return self.cached('system_params', self.api.get_system_params)
 
     @property
     def ecowitt_net_params(self):
         """Gateway device Ecowitt.net parameters."""
 
-        return self.api.get_ecowitt_net_params()
+        return self.cached('ecowitt_net_params', self.api.get_ecowitt_net_params)
 
     @property
     def wunderground_params(self):
         """Gateway device Weather Underground parameters."""
 
-        return self.api.get_wunderground_params()
+        return self.cached('wunderground_params', self.api.get_wunderground_params)
 
     @property
     def weathercloud_params(self):
         """Gateway device Weathercloud parameters."""
 
-        return self.api.get_weathercloud_params()
+        return self.cached('weathercloud_params', self.api.get_weathercloud_params)
 
     @property
     def wow_params(self):
         """Gateway device Weather Observations Website parameters."""
 
-        return self.api.get_wow_params()
+        return self.cached('wow_params', self.api.get_wow_params)
 
     @property
     def custom_params(self):
         """Gateway device custom server parameters."""
 
-        return self.api.get_custom_params()
+        return self.cached('custom_params', self.api.get_custom_params)
 
     @property
     def usr_path(self):
         """Gateway device user defined custom path parameters."""
 
-        return self.api.get_usr_path()
+        return self.cached('usr_path', self.api.get_usr_path)
 
     @property
     def mac_address(self):
         """Gateway device MAC address."""
 
-        return self.api.get_mac_address()
+        return self.cached('mac_address', self.api.get_mac_address)
 
     @property
     def firmware_version(self):
         """Gateway device firmware version."""
 
-        return self.api.get_firmware_version()
+        return self.cached('firmware_version', self.api.get_firmware_version)
 
     @property
     def sensor_id(self):
         """Gateway device sensor ID data."""
 
-        return self.api.get_sensor_id()
+        return self.cached('sensor_id', self.api.get_sensor_id)
 
     @property
     def mulch_offset(self):
         """Gateway device multichannel temperature and humidity offset data."""
 
-        return self.api.get_mulch_offset()
+        return self.cached('mulch_offset', self.api.get_mulch_offset)
 
     @property
     def mulch_t_offset(self):
         """Gateway device multichannel temperature (WN34) offset data."""
 
-        return self.api.get_mulch_t_offset()
+        return self.cached('mulch_t_offset', self.api.get_mulch_t_offset)
 
     @property
     def pm25_offset(self):
         """Gateway device PM2.5 offset data."""
 
-        return self.api.get_pm25_offset()
+        return self.cached('pm25_offset', self.api.get_pm25_offset)
 
     @property
     def calibration_coefficient(self):
         """Gateway device calibration coefficient data."""
 
-        return self.api.get_calibration_coefficient()
+        return self.cached('calibration_coefficient', self.api.get_calibration_coefficient)
 
     @property
     def soil_calibration(self):
         """Gateway device soil calibration data."""
 
-        return self.api.get_soil_calibration()
+        return self.cached('soil_calibration', self.api.get_soil_calibration)
 
     @property
     def offset_calibration(self):
         """Gateway device offset calibration data."""
 
-        return self.api.get_offset_calibration()
+        return self.cached('offset_calibration', self.api.get_offset_calibration)
 
     @property
     def co2_offset(self):
         """Gateway device CO2 offset data."""
 
-        return self.api.get_co2_offset()
+        return self.cached('co2_offset', self.api.get_co2_offset)
 
     @property
     def rain(self):
         """Gateway device traditional gauge and piezo gauge rain data."""
 
-        return self.api.read_rain()
+        return self.cached('rain', self.api.read_rain)
 
     @property
     def sensor_state(self):
         """Sensor battery state and signal level data."""
 
-        return self.api.get_current_sensor_state()
+        return self.cached('sensor_state', self.api.get_current_sensor_state)
 
     @property
     def discovered_devices(self):
@@ -6701,7 +10363,7 @@ class GatewayDevice(object):
         """
 
         # get firmware version info
-        version = self.http.get_version()
+        version = self.cached('get_version', self.http.get_version)
         # do we have current firmware version info and availability of a new
         # firmware version ?
         if version is not None and 'newVersion' in version:
@@ -6727,7 +10389,7 @@ class GatewayDevice(object):
         """
 
         # get device info
-        device_info = self.http.get_device_info()
+        device_info = self.cached('get_device_info', self.http.get_device_info)
         # return the 'curr_msg' field contents or None
         return device_info.get('curr_msg') if device_info is not None else None
 
@@ -6736,9 +10398,9 @@ class GatewayDevice(object):
         """Device device calibration data."""
 
         # obtain the calibration data via the API
-        parsed_cal_coeff = self.api.get_calibration_coefficient()
+        parsed_cal_coeff = self.calibration_coefficient
         # obtain the offset calibration data via the API
-        parsed_offset = self.api.get_offset_calibration()
+        parsed_offset = self.offset_calibration
         # update our parsed gain data with the parsed offset calibration data
         parsed_cal_coeff.update(parsed_offset)
         # return the parsed data
@@ -6765,7 +10427,7 @@ class GatewayDevice(object):
         """
 
         # obtain the sensor info via the HTTP API
-        sensors = self.http.get_sensors_info()
+        sensors = self.cached('get_sensors_info', self.http.get_sensors_info)
         # initialise a dict to hold our results
         fware_dict = dict()
         # do we have any sensor information
@@ -6786,6 +10448,10 @@ class GatewayDevice(object):
 #                             Utility functions
 # ============================================================================
 
+# whether define_units() has been called in this process
+units_defined = False
+
+
 def define_units():
     """Define formats and conversions used by the driver.
 
@@ -6806,8 +10472,15 @@ def define_units():
     All additions to the core conversion, label and format dicts are done in a
     way that do not overwrite and previous customisations the user may have
     made through another driver or user/extensions.py.
+
+    The additions need only be made once per process, subsequent calls
+    return immediately.
     """
 
+    global units_defined
+
+    if units_defined:
+        return
     # add kilobyte and megabyte conversions
     if 'byte' not in weewx.units.conversionDict:
         # 'byte' is not a key in the conversion dict, so we add all conversions
@@ -6865,7 +10538,7 @@ def define_units():
     for obs, group in six.iteritems(default_groups):
         if obs not in weewx.units.obs_group_dict.keys():
             weewx.units.obs_group_dict[obs] = group
-
+    units_defined = True
 
 
 def natural_sort_keys(source_dict):
@@ -6960,1927 +10633,43 @@ def obfuscate(plain, obf_char='*'):
 
 
 # ============================================================================
-#                             class DirectGateway
+#                       Lazily imported classes and functions
 # ============================================================================
 
-class DirectGateway(object):
-    """Class to interact with gateway driver when run directly.
-
-    Would normally run a driver directly by calling from main() only, but when
-    run directly the gateway driver has many options so pushing the detail into
-    its own class/object makes sense. Also simplifies some test suite
-    routines/calls.
-
-    A DirectGateway object is created with just an optparse options dict and a
-    standard WeeWX station dict. Once created the DirectGateway()
-    process_options() method is called to process the respective command line
-    options.
-    """
-
-    # gateway direct observation group dict, this maps all device 'fields' to a 
-    # WeeWX unit group
-    gw_direct_obs_group_dict = {
-        'intemp': 'group_temperature',
-        'outtemp': 'group_temperature',
-        'dewpoint': 'group_temperature',
-        'windchill': 'group_temperature',
-        'heatindex': 'group_temperature',
-        'inhumid': 'group_percent',
-        'outhumid': 'group_percent',
-        'absbarometer': 'group_pressure',
-        'relbarometer': 'group_pressure',
-        'light': 'group_illuminance',
-        'uv': 'group_radiation',
-        'uvi': 'group_uv',
-        'datetime': 'group_time',
-        'temp1': 'group_temperature',
-        'temp2': 'group_temperature',
-        'temp3': 'group_temperature',
-        'temp4': 'group_temperature',
-        'temp5': 'group_temperature',
-        'temp6': 'group_temperature',
-        'temp7': 'group_temperature',
-        'temp8': 'group_temperature',
-        'temp9': 'group_temperature',
-        'temp10': 'group_temperature',
-        'temp11': 'group_temperature',
-        'temp12': 'group_temperature',
-        'temp13': 'group_temperature',
-        'temp14': 'group_temperature',
-        'temp15': 'group_temperature',
-        'temp16': 'group_temperature',
-        'temp17': 'group_temperature',
-        'humid1': 'group_percent',
-        'humid2': 'group_percent',
-        'humid3': 'group_percent',
-        'humid4': 'group_percent',
-        'humid5': 'group_percent',
-        'humid6': 'group_percent',
-        'humid7': 'group_percent',
-        'humid8': 'group_percent',
-        'humid17': 'group_percent',
-        'pm1': 'group_concentration',
-        'pm251': 'group_concentration',
-        'pm252': 'group_concentration',
-        'pm253': 'group_concentration',
-        'pm254': 'group_concentration',
-        'pm255': 'group_concentration',
-        'pm4': 'group_concentration',
-        'pm10': 'group_concentration',
-        'co2': 'group_fraction',
-        'soiltemp1': 'group_temperature',
-        'soilmoist1': 'group_percent',
-        'soiltemp2': 'group_temperature',
-        'soilmoist2': 'group_percent',
-        'soiltemp3': 'group_temperature',
-        'soilmoist3': 'group_percent',
-        'soiltemp4': 'group_temperature',
-        'soilmoist4': 'group_percent',
-        'soiltemp5': 'group_temperature',
-        'soilmoist5': 'group_percent',
-        'soiltemp6': 'group_temperature',
-        'soilmoist6': 'group_percent',
-        'soiltemp7': 'group_temperature',
-        'soilmoist7': 'group_percent',
-        'soiltemp8': 'group_temperature',
-        'soilmoist8': 'group_percent',
-        'soiltemp9': 'group_temperature',
-        'soilmoist9': 'group_percent',
-        'soiltemp10': 'group_temperature',
-        'soilmoist10': 'group_percent',
-        'soiltemp11': 'group_temperature',
-        'soilmoist11': 'group_percent',
-        'soiltemp12': 'group_temperature',
-        'soilmoist12': 'group_percent',
-        'soiltemp13': 'group_temperature',
-        'soilmoist13': 'group_percent',
-        'soiltemp14': 'group_temperature',
-        'soilmoist14': 'group_percent',
-        'soiltemp15': 'group_temperature',
-        'soilmoist15': 'group_percent',
-        'soiltemp16': 'group_temperature',
-        'soilmoist16': 'group_percent',
-        'pm1_24h_avg': 'group_concentration',
-        'pm251_24h_avg': 'group_concentration',
-        'pm252_24h_avg': 'group_concentration',
-        'pm253_24h_avg': 'group_concentration',
-        'pm254_24h_avg': 'group_concentration',
-        'pm255_24h_avg': 'group_concentration',
-        'pm4_24h_avg': 'group_concentration',
-        'pm10_24h_avg': 'group_concentration',
-        'co2_24h_avg': 'group_fraction',
-        'leak1': 'group_count',
-        'leak2': 'group_count',
-        'leak3': 'group_count',
-        'leak4': 'group_count',
-        'lightningdist': 'group_distance',
-        'lightningdettime': 'group_time',
-        'lightning_strike_count': 'group_count',
-        'lightningcount': 'group_count',
-        't_rain': 'group_rain',
-        't_rainevent': 'group_rain',
-        't_rainrate': 'group_rainrate',
-        't_rainday': 'group_rain',
-        't_rainweek': 'group_rain',
-        't_rainmonth': 'group_rain',
-        't_rainyear': 'group_rain',
-        't_raintotals': 'group_rain',
-        'p_rain': 'group_rain',
-        'p_rainevent': 'group_rain',
-        'p_rainrate': 'group_rainrate',
-        'p_rainday': 'group_rain',
-        'p_rainweek': 'group_rain',
-        'p_rainmonth': 'group_rain',
-        'p_rainyear': 'group_rain',
-        'winddir': 'group_direction',
-        'windspeed': 'group_speed',
-        'gustspeed': 'group_speed',
-        'daymaxwind': 'group_speed',
-        'leafwet1': 'group_percent',
-        'leafwet2': 'group_percent',
-        'leafwet3': 'group_percent',
-        'leafwet4': 'group_percent',
-        'leafwet5': 'group_percent',
-        'leafwet6': 'group_percent',
-        'leafwet7': 'group_percent',
-        'leafwet8': 'group_percent',
-        'heap_free': 'group_data',
-        'wh40_batt': 'group_volt',
-        'wh26_batt': 'group_count',
-        'wh25_batt': 'group_count',
-        'wh24_batt': 'group_count',
-        'wh65_batt': 'group_count',
-        'wh32_batt': 'group_count',
-        'wh31_ch1_batt': 'group_count',
-        'wh31_ch2_batt': 'group_count',
-        'wh31_ch3_batt': 'group_count',
-        'wh31_ch4_batt': 'group_count',
-        'wh31_ch5_batt': 'group_count',
-        'wh31_ch6_batt': 'group_count',
-        'wh31_ch7_batt': 'group_count',
-        'wh31_ch8_batt': 'group_count',
-        'wn34_ch1_batt': 'group_volt',
-        'wn34_ch2_batt': 'group_volt',
-        'wn34_ch3_batt': 'group_volt',
-        'wn34_ch4_batt': 'group_volt',
-        'wn34_ch5_batt': 'group_volt',
-        'wn34_ch6_batt': 'group_volt',
-        'wn34_ch7_batt': 'group_volt',
-        'wn34_ch8_batt': 'group_volt',
-        'wn35_ch1_batt': 'group_volt',
-        'wn35_ch2_batt': 'group_volt',
-        'wn35_ch3_batt': 'group_volt',
-        'wn35_ch4_batt': 'group_volt',
-        'wn35_ch5_batt': 'group_volt',
-        'wn35_ch6_batt': 'group_volt',
-        'wn35_ch7_batt': 'group_volt',
-        'wn35_ch8_batt': 'group_volt',
-        'wh41_ch1_batt': 'group_count',
-        'wh41_ch2_batt': 'group_count',
-        'wh41_ch3_batt': 'group_count',
-        'wh41_ch4_batt': 'group_count',
-        'wh45_batt': 'group_count',
-        'wh46_batt': 'group_count',
-        'wh51_ch1_batt': 'group_volt',
-        'wh51_ch2_batt': 'group_volt',
-        'wh51_ch3_batt': 'group_volt',
-        'wh51_ch4_batt': 'group_volt',
-        'wh51_ch5_batt': 'group_volt',
-        'wh51_ch6_batt': 'group_volt',
-        'wh51_ch7_batt': 'group_volt',
-        'wh51_ch8_batt': 'group_volt',
-        'wh51_ch9_batt': 'group_volt',
-        'wh51_ch10_batt': 'group_volt',
-        'wh51_ch11_batt': 'group_volt',
-        'wh51_ch12_batt': 'group_volt',
-        'wh51_ch13_batt': 'group_volt',
-        'wh51_ch14_batt': 'group_volt',
-        'wh51_ch15_batt': 'group_volt',
-        'wh51_ch16_batt': 'group_volt',
-        'wh55_ch1_batt': 'group_count',
-        'wh55_ch2_batt': 'group_count',
-        'wh55_ch3_batt': 'group_count',
-        'wh55_ch4_batt': 'group_count',
-        'wh57_batt': 'group_count',
-        'wh68_batt': 'group_volt',
-        'ws80_batt': 'group_volt',
-        'ws85_batt': 'group_volt',
-        'ws90_batt': 'group_volt',
-        'wh40_sig': 'group_count',
-        'wh26_sig': 'group_count',
-        'wh25_sig': 'group_count',
-        'wh24_sig': 'group_count',
-        'wh65_sig': 'group_count',
-        'wh32_sig': 'group_count',
-        'wh31_ch1_sig': 'group_count',
-        'wh31_ch2_sig': 'group_count',
-        'wh31_ch3_sig': 'group_count',
-        'wh31_ch4_sig': 'group_count',
-        'wh31_ch5_sig': 'group_count',
-        'wh31_ch6_sig': 'group_count',
-        'wh31_ch7_sig': 'group_count',
-        'wh31_ch8_sig': 'group_count',
-        'wn34_ch1_sig': 'group_count',
-        'wn34_ch2_sig': 'group_count',
-        'wn34_ch3_sig': 'group_count',
-        'wn34_ch4_sig': 'group_count',
-        'wn34_ch5_sig': 'group_count',
-        'wn34_ch6_sig': 'group_count',
-        'wn34_ch7_sig': 'group_count',
-        'wn34_ch8_sig': 'group_count',
-        'wn35_ch1_sig': 'group_count',
-        'wn35_ch2_sig': 'group_count',
-        'wn35_ch3_sig': 'group_count',
-        'wn35_ch4_sig': 'group_count',
-        'wn35_ch5_sig': 'group_count',
-        'wn35_ch6_sig': 'group_count',
-        'wn35_ch7_sig': 'group_count',
-        'wn35_ch8_sig': 'group_count',
-        'wh41_ch1_sig': 'group_count',
-        'wh41_ch2_sig': 'group_count',
-        'wh41_ch3_sig': 'group_count',
-        'wh41_ch4_sig': 'group_count',
-        'wh45_sig': 'group_count',
-        'wh46_sig': 'group_count',
-        'wh51_ch1_sig': 'group_count',
-        'wh51_ch2_sig': 'group_count',
-        'wh51_ch3_sig': 'group_count',
-        'wh51_ch4_sig': 'group_count',
-        'wh51_ch5_sig': 'group_count',
-        'wh51_ch6_sig': 'group_count',
-        'wh51_ch7_sig': 'group_count',
-        'wh51_ch8_sig': 'group_count',
-        'wh51_ch9_sig': 'group_count',
-        'wh51_ch10_sig': 'group_count',
-        'wh51_ch11_sig': 'group_count',
-        'wh51_ch12_sig': 'group_count',
-        'wh51_ch13_sig': 'group_count',
-        'wh51_ch14_sig': 'group_count',
-        'wh51_ch15_sig': 'group_count',
-        'wh51_ch16_sig': 'group_count',
-        'wh55_ch1_sig': 'group_count',
-        'wh55_ch2_sig': 'group_count',
-        'wh55_ch3_sig': 'group_count',
-        'wh55_ch4_sig': 'group_count',
-        'wh57_sig': 'group_count',
-        'wh68_sig': 'group_count',
-        'ws80_sig': 'group_count',
-        'ws85_sig': 'group_count',
-        'ws90_sig': 'group_count'
-    }
-    # list of sensors to be displayed in the sensor ID output
-    sensors_list = []
-
-    def __init__(self, opts, parser, stn_dict):
-        """Initialise a DirectGateway object."""
-
-        # save the optparse options and station dict
-        self.opts = opts
-        self.parser = parser
-        self.stn_dict = stn_dict
-        # obtain the IP address and port number to use
-        self.ip_address = self.ip_from_config_opts()
-        self.port = self.port_from_config_opts()
-        # do we filter battery state data
-        self.show_battery = self.show_battery_from_config_opts()
-
-    def ip_from_config_opts(self):
-        """Obtain the IP address from station config or command line options.
-
-        Determine the IP address to use given a station config dict and command
-        line options. The IP address is chosen as follows:
-        - if specified use the IP address from the command line
-        - if an IP address was not specified on the command line obtain the IP
-          address from the station config dict
-        - if the station config dict does not specify an IP address, or if it
-          is set to 'auto', return None to force device discovery
-        """
-
-        # obtain an IP address from the command line options
-        ip_address = self.opts.ip_address if self.opts.ip_address else None
-        # if we didn't get an IP address check the station config dict
-        if ip_address is None:
-            # obtain the IP address from the station config dict
-            ip_address = self.stn_dict.get('ip_address')
-            # if the station config dict specifies some variation of 'auto'
-            # then we need to return None to force device discovery
-            if ip_address is not None:
-                # do we have a variation of 'auto'
-                if ip_address.lower() == 'auto':
-                    # we need to autodetect IP address so set to None
-                    ip_address = None
-                    if weewx.debug >= 1:
-                        print()
-                        print("IP address to be obtained by discovery")
-                else:
-                    if weewx.debug >= 1:
-                        print()
-                        print("IP address obtained from station config")
-            else:
-                if weewx.debug >= 1:
-                    print()
-                    print("IP address to be obtained by discovery")
-        else:
-            if weewx.debug >= 1:
-                print()
-                print("IP address obtained from command line options")
-        return ip_address
-
-    def port_from_config_opts(self):
-        """Obtain the port from station config or command line options.
-
-        Determine the port to use given a station config dict and command
-        line options. The port is chosen as follows:
-        - if specified use the port from the command line
-        - if a port was not specified on the command line obtain the port from
-          the station config dict
-        - if the station config dict does not specify a port use the default
-          45000
-        """
-
-        # obtain a port number from the command line options
-        port = self.opts.port if self.opts.port else None
-        # if we didn't get a port number check the station config dict
-        if port is None:
-            # obtain the port number from the station config dict
-            port = self.stn_dict.get('port')
-            # if a port number was specified it needs to be an integer not a
-            # string so try to do the conversion
-            try:
-                port = int(port)
-            except (TypeError, ValueError):
-                # If a TypeError then most likely port somehow ended up being
-                # None. If a ValueError then we couldn't convert the port
-                # number to an integer, maybe it was because it was 'auto'
-                # (or some variation) or perhaps it was invalid. Regardless of
-                # the error we need to set port to None to force discovery.
-                port = default_port
-                if weewx.debug >= 1:
-                    print("Port number set to default port number")
-            else:
-                if weewx.debug >= 1:
-                    print("Port number obtained from station config")
-        else:
-            if weewx.debug >= 1:
-                print("Port number obtained from command line options")
-        return port
-
-    def show_battery_from_config_opts(self):
-        """Determine whether to filter nonsense battery state data.
-
-        Determine the whether to filter nonsense battery state data given a
-        station config dict and command line options. The decision to filter is
-        made as follows:
-        - if specified use the show_battery option from the command line
-        - if show_battery was not specified on the command line obtain the
-          show_battery option from the station config dict
-        - if the station config dict does not specify show_battery use the
-          default value False
-        """
-
-        # obtain the show_battery value from the command line options if it
-        # exists
-        show_battery = self.opts.show_battery if self.opts.show_battery else None
-        # if we didn't get a show_battery value check the station config dict
-        if show_battery is None:
-            # obtain the show_battery value from the station config dict, try
-            # to convert it to a Boolean, if it fails be prepared to catch the
-            # ValueError from tobool() and use the default
-            try:
-                show_battery = weeutil.weeutil.tobool(self.stn_dict.get('show_battery'))
-            except ValueError:
-                # we could not get show_battery from the stn_dict so use the default
-                show_battery = default_show_battery
-                if weewx.debug >= 1:
-                    print("Battery state filtering is '%s' (using the default)" % show_battery)
-            else:
-                if weewx.debug >= 1:
-                    print("Port number obtained from station config")
-                    print("Battery state filtering is '%s' (obtained from station config)" % show_battery)
-        else:
-            if weewx.debug >= 1:
-                print("Battery state filtering is '%s' (obtained from command line options)" % show_battery)
-        return show_battery
-
-    def process_options(self):
-        """Call the appropriate method based on the optparse options."""
-
-        # run the driver
-        if hasattr(self.opts, 'test_driver') and self.opts.test_driver:
-            self.test_driver()
-        # run the service with simulator
-        elif hasattr(self.opts, 'test_service') and self.opts.test_service:
-            self.test_service()
-        elif hasattr(self.opts, 'sys_params') and self.opts.sys_params:
-            self.system_params()
-        elif hasattr(self.opts, 'get_rain') and self.opts.get_rain:
-            self.get_rain_data()
-        elif hasattr(self.opts, 'get_all_rain') and self.opts.get_all_rain:
-            self.get_all_rain_data()
-        elif hasattr(self.opts, 'get_mulch_offset') and self.opts.get_mulch_offset:
-            self.get_mulch_offset()
-        elif hasattr(self.opts, 'get_temp_calibration') and self.opts.get_temp_calibration:
-            self.get_mulch_t_offset()
-        elif hasattr(self.opts, 'get_pm25_offset') and self.opts.get_pm25_offset:
-            self.get_pm25_offset()
-        elif hasattr(self.opts, 'get_co2_offset') and self.opts.get_co2_offset:
-            self.get_co2_offset()
-        elif hasattr(self.opts, 'get_calibration') and self.opts.get_calibration:
-            self.get_calibration()
-        elif hasattr(self.opts, 'get_soil_calibration') and self.opts.get_soil_calibration:
-            self.get_soil_calibration()
-        elif hasattr(self.opts, 'get_services') and self.opts.get_services:
-            self.get_services()
-        elif hasattr(self.opts, 'mac') and self.opts.mac:
-            # TODO. Rename to remove 'station' ?
-            self.station_mac()
-        elif hasattr(self.opts, 'firmware') and self.opts.firmware:
-            self.firmware()
-        elif hasattr(self.opts, 'sensors') and self.opts.sensors:
-            self.sensors()
-        elif hasattr(self.opts, 'live') and self.opts.live:
-            self.live_data()
-        elif hasattr(self.opts, 'discover') and self.opts.discover:
-            self.discover()
-        elif hasattr(self.opts, 'map') and self.opts.map:
-            self.field_map()
-        elif hasattr(self.opts, 'driver_map') and self.opts.driver_map:
-            self.driver_field_map()
-        elif hasattr(self.opts, 'sys_service_mapparams') and self.opts.service_map:
-            self.service_field_map()
-        else:
-            print()
-            print("No option selected, nothing done")
-            print()
-            self.parser.print_help()
-            return
-
-    def system_params(self):
-        """Display system parameters.
-
-        Obtain and display the gateway device system parameters. Device IP
-        address and port are derived (in order) as follows:
-        1. command line --ip-address and --port parameters
-        2. [GW1000] stanza in the specified config file
-        3. by discovery
-        """
-
-        # dict for decoding system parameters frequency byte, at present all we
-        # know is 0 = 433MHz
-        freq_decode = {
-            0: '433MHz',
-            1: '868Mhz',
-            2: '915MHz',
-            3: '920MHz'
-        }
-        temperature_comp_decode = {
-            0: 'off',
-            1: 'on'
-        }
-        # wrap in a try..except in case there is an error
-        try:
-            # we want a GatewayDevice object but to get such an object we first
-            # need a GatewayCollector object
-            collector = GatewayCollector(ip_address=self.ip_address,
-                                         port=self.port)
-            # the GatewayDevice object is the collectors device property
-            device = collector.device
-            # identify the device being used
-            print()
-            print("Interrogating %s at %s:%d" % (device.model,
-                                                 device.ip_address.decode(),
-                                                 device.port))
-            # get the device system_params property
-            sys_params_dict = device.system_params
-            # we need the radiation compensation setting which according to the
-            # v1.6.9 API documentation resides in field 7B, but bizarrely is
-            # only available via the CMD_READ_RAIN API command. CMD_READ_RAIN
-            # is a relatively new command so wrap in a try..except just in
-            # case.
-            try:
-                _rain_data = device.rain
-            except GWIOError:
-                temperature_comp = None
-            else:
-                temperature_comp = _rain_data.get('temperature_comp')
-        except GWIOError as e:
-            print()
-            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
-        except socket.timeout:
-            print()
-            print("Timeout. Device at %s did not respond." % (self.ip_address,))
-        else:
-            # create a meaningful string for frequency representation
-            freq_str = freq_decode.get(sys_params_dict['frequency'], 'Unknown')
-            # if sensor_type is 0 there is a WH24 connected, if it's a 1 there
-            # is a WH65
-            _is_wh24 = sys_params_dict['sensor_type'] == 0
-            # string to use in sensor type message
-            _sensor_type_str = 'WH24' if _is_wh24 else 'WH65'
-            # print the system parameters
-            print()
-            print("%26s: %s (%s)" % ('sensor type',
-                                     sys_params_dict['sensor_type'],
-                                     _sensor_type_str))
-            print("%26s: %s (%s)" % ('frequency',
-                                     sys_params_dict['frequency'],
-                                     freq_str))
-            if temperature_comp is not None:
-                print("%26s: %s (%s)" % ('Temperature Compensation',
-                                         temperature_comp,
-                                         temperature_comp_decode.get(temperature_comp, 'unknown')))
-            else:
-                print("%26s: unavailable" % 'Temperature Compensation')
-
-            # The gateway API returns what is labelled "UTC" but is in fact the
-            # current epoch timestamp adjusted by the station timezone offset.
-            # So when the timestamp is converted to a human-readable GMT
-            # date-time string it in fact shows the local date-time. We can
-            # work around this by formatting this offset UTC time stamp as a
-            # UTC date-time but then calling it local time. ideally we would
-            # re-adjust to remove the timezone offset to get the real
-            # (unadjusted) epoch timestamp but since the timezone index is
-            # stored as an arbitrary number rather than an offset in seconds
-            # this is not possible. We can only do what we can.
-            date_time_str = time.strftime("%-d %B %Y %H:%M:%S",
-                                          time.gmtime(sys_params_dict['utc']))
-            print("%26s: %s" % ('date-time', date_time_str))
-            print("%26s: %s" % ('timezone index', sys_params_dict['timezone_index']))
-            print("%26s: %s" % ('DST status', sys_params_dict['dst_status']))
-
-    def get_rain_data(self):
-        """Display the device rain data.
-
-        Obtain and display the device rain data. The device IP address and port
-        are derived (in order) as follows:
-        1. command line --ip-address and --port parameters
-        2. [GW1000] stanza in the specified config file
-        3. by discovery
-        """
-
-        # wrap in a try..except in case there is an error
-        try:
-            # we want a GatewayDevice object but to get such an object we first
-            # need a GatewayCollector object
-            collector = GatewayCollector(ip_address=self.ip_address,
-                                         port=self.port)
-            # the GatewayDevice object is the collectors device property
-            device = collector.device
-            # identify the device being used
-            print()
-            print("Interrogating %s at %s:%d" % (device.model,
-                                                 device.ip_address.decode(),
-                                                 device.port))
-            # get the device objects raindata property
-            rain_data = device.raindata
-        except GWIOError as e:
-            print()
-            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
-        except socket.timeout:
-            print()
-            print("Timeout. Device at %s did not respond." % (self.ip_address,))
-        else:
-            print()
-            print("%10s: %.1f mm/%.1f in" % ('Rain rate', rain_data['t_rainrate'], rain_data['t_rainrate'] / 25.4))
-            print("%10s: %.1f mm/%.1f in" % ('Day rain', rain_data['t_rainday'], rain_data['t_rainday'] / 25.4))
-            print("%10s: %.1f mm/%.1f in" % ('Week rain', rain_data['t_rainweek'], rain_data['t_rainweek'] / 25.4))
-            print("%10s: %.1f mm/%.1f in" % ('Month rain', rain_data['t_rainmonth'], rain_data['t_rainmonth'] / 25.4))
-            print("%10s: %.1f mm/%.1f in" % ('Year rain', rain_data['t_rainyear'], rain_data['t_rainyear'] / 25.4))
-
-    def get_all_rain_data(self):
-        """Display the device rain data including piezo data.
-
-        Obtain and display the device rain data including piezo data. The
-        CMD_READ_RAIN API command is used to obtain the device data, this
-        command returns rain data from the device for both traditional and
-        piezo rain gauges.
-
-        The device address and port are derived (in order) as follows:
-        1. command line --ip-address and --port parameters
-        2. [GW1000] stanza in the specified config file
-        3. by discovery
-
-        Note. Early testing showed the CMD_READ_RAIN command returned data for
-        the piezo gauge only. This may be due to the system under test (it only
-        had a piezo rain gauge) or it may be an issue with the v2.1.3 device
-        firmware.
-        """
-
-        traditional = ['t_rainrate', 't_rainevent', 't_rainday',
-                       't_rainweek', 't_rainmonth', 't_rainyear']
-        piezo = ['p_rainrate', 'p_event', 'p_day', 'p_week', 'p_month', 'p_year',
-                 'gain1', 'gain2', 'gain3', 'gain4', 'gain5']
-        reset = ['day_reset', 'week_reset', 'annual_reset']
-        source_lookup = {0: 'No selection',
-                         1: 'Traditional rain gauge',
-                         2: 'Piezoelectric rain gauge'
-                         }
-        # wrap in a try..except in case there is an error
-        try:
-            # we want a GatewayDevice object but to get such an object we first
-            # need a GatewayCollector object
-            collector = GatewayCollector(ip_address=self.ip_address,
-                                         port=self.port)
-            # the GatewayDevice object is the collectors device property
-            device = collector.device
-            # identify the device being used
-            print()
-            print("Interrogating %s at %s:%d" % (device.model,
-                                                 device.ip_address.decode(),
-                                                 device.port))
-            # get the rain data from the device object. First try to get
-            # all_rain_data but be prepared to catch the exception if our
-            # device does not support CMD_READ_RAIN. In that case fall back to
-            # the rain_data property instead.
-            try:
-                rain_data = device.rain
-                loginf(rain_data)
-            except UnknownApiCommand:
-                # use the rain_data property
-                rain_data = device.raindata
-        except GWIOError as e:
-            print()
-            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
-        except socket.timeout:
-            print()
-            print("Timeout. Device at %s did not respond." % (self.ip_address,))
-        else:
-            print()
-            if 'rain_priority' in rain_data:
-                print("    Rainfall data priority: %s" % source_lookup.get(rain_data['rain_priority'],
-                                                                           "unknown selection"))
-                print()
-            if any(field in rain_data for field in traditional):
-                print("    Traditional rain data:")
-                _data = rain_data.get('t_rainrate')
-                _data_str = "%.1fmm/hr (%.1fin/hr)" % (_data, _data / 25.4) if _data is not None else "---mm/hr (---in/hr)"
-                print("%30s: %s)" % ('Rain rate', _data_str))
-                _data = rain_data.get('t_rainevent')
-                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
-                print("%30s: %s" % ('Event rain', _data_str))
-                _data = rain_data.get('t_rainday')
-                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
-                print("%30s: %s" % ('Daily rain', _data_str))
-                _data = rain_data.get('t_rainweek')
-                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
-                print("%30s: %s" % ('Weekly rain', _data_str))
-                _data = rain_data.get('t_rainmonth')
-                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
-                print("%30s: %s" % ('Monthly rain', _data_str))
-                _data = rain_data.get('t_rainyear')
-                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
-                print("%30s: %s" % ('Yearly rain', _data_str))
-                _data = rain_data.get('t_raingain')
-                _data_str = "%.2f" % _data / 100.0 if _data is not None else "---"
-                print("%30s: %s" % ('Rain gain', _data_str))
-            else:
-                print("    No traditional rain data available")
-            print()
-            if any(field in rain_data for field in piezo):
-                print("    Piezo rain data:")
-                _data = rain_data.get('p_rainrate')
-                _data_str = "%.1fmm/hr (%.1fin/hr)" % (_data, _data / 25.4) if _data is not None else "---mm/hr (---in/hr)"
-                print("%30s: %s)" % ('Rain rate', _data_str))
-                _data = rain_data.get('p_rainevent')
-                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
-                print("%30s: %s" % ('Event rain', _data_str))
-                _data = rain_data.get('p_rainday')
-                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
-                print("%30s: %s" % ('Daily rain', _data_str))
-                _data = rain_data.get('p_rainweek')
-                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
-                print("%30s: %s" % ('Weekly rain', _data_str))
-                _data = rain_data.get('p_rainmonth')
-                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
-                print("%30s: %s" % ('Monthly rain', _data_str))
-                _data = rain_data.get('p_rainyear')
-                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
-                print("%30s: %s" % ('Yearly rain', _data_str))
-                print("%30s: %.2f (%s)" % ('Rain1 gain', rain_data.get('gain1', '--'), '< 4mm/h'))
-                print("%30s: %.2f (%s)" % ('Rain2 gain', rain_data.get('gain2', '--'), '< 10mm/h'))
-                print("%30s: %.2f (%s)" % ('Rain3 gain', rain_data.get('gain3', '--'), '< 30mm/h'))
-                print("%30s: %.2f (%s)" % ('Rain4 gain', rain_data.get('gain4', '--'), '< 60mm/h'))
-                print("%30s: %.2f (%s)" % ('Rain5 gain', rain_data.get('gain5', '--'), '> 60mm/h'))
-            else:
-                print("    No piezo rain data available")
-            print()
-            if any(field in rain_data for field in reset):
-                print("    Rainfall reset time data:")
-                print("%30s: 0%d:00" % ('Daily rainfall reset time', rain_data.get('day_reset', '-----')))
-                _data = rain_data.get('week_reset')
-                _data_str = "%s" % calendar.day_name[(_data + 6) % 7] if _data is not None else "-----"
-                print("%30s: %s" % ('Weekly rainfall reset time', _data_str))
-                _data = rain_data.get('annual_reset')
-                _data_str = "%s" % calendar.month_name[_data + 1] if _data is not None else "-----"
-                print("%30s: %s" % ('Annual rainfall reset time', calendar.month_name[rain_data['annual_reset'] + 1]))
-            else:
-                print("    No rainfall reset time data available")
-
-    def get_mulch_offset(self):
-        """Display device multichannel temperature and humidity offset data.
-
-        Obtain and display the multichannel temperature and humidity offset
-        data from the selected device. The device IP address and port are
-        derived (in order) as follows:
-        1. command line --ip-address and --port parameters
-        2. [GW1000] stanza in the specified config file
-        3. by discovery
-        """
-
-        # wrap in a try..except in case there is an error
-        try:
-            # we want a GatewayDevice object but to get such an object we first
-            # need a GatewayCollector object
-            collector = GatewayCollector(ip_address=self.ip_address,
-                                         port=self.port)
-            # the GatewayDevice object is the collectors device property
-            device = collector.device
-            # identify the device being used
-            print()
-            print("Interrogating %s at %s:%d" % (device.model,
-                                                 device.ip_address.decode(),
-                                                 device.port))
-            # get the mulch offset data from the API
-            mulch_offset_data = device.api.get_mulch_offset()
-        except GWIOError as e:
-            print()
-            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
-        except socket.timeout:
-            print()
-            print("Timeout. Device at %s did not respond." % (self.ip_address,))
-        else:
-            # did we get any mulch offset data
-            if mulch_offset_data is not None:
-                # now format and display the data
-                print()
-                print("Multi-channel Temperature and Humidity Calibration")
-                # iterate over each channel for which we have data
-                for channel in mulch_offset_data:
-                    # print the channel and offset data
-                    mulch_str = "    Channel %d: Temperature offset: %5s Humidity offset: %3s"
-                    # the API returns channels starting at 0, but the WS View
-                    # app displays channels starting at 1, so add 1 to our
-                    # channel number
-                    print(mulch_str % (channel + 1,
-                                       "%2.1f" % mulch_offset_data[channel]['temp'],
-                                       "%d" % mulch_offset_data[channel]['hum']))
-            else:
-                print()
-                print("Device at %s did not respond." % (self.ip_address,))
-
-    def get_mulch_t_offset(self):
-        """Display device multichannel temperature (WN34) offset data.
-
-        Obtain and display the multichannel temperature (WN34) offset data from
-        the selected device. The device IP address and port are derived (in
-        order) as follows:
-        1. command line --ip-address and --port parameters
-        2. [GW1000] stanza in the specified config file
-        3. by discovery
-        """
-
-        # wrap in a try..except in case there is an error
-        try:
-            # we want a GatewayDevice object but to get such an object we first
-            # need a GatewayCollector object
-            collector = GatewayCollector(ip_address=self.ip_address,
-                                         port=self.port)
-            # the GatewayDevice object is the collectors device property
-            device = collector.device
-            # identify the device being used
-            print()
-            print("Interrogating %s at %s:%d" % (device.model,
-                                                 device.ip_address.decode(),
-                                                 device.port))
-            # get the mulch temp offset data via the API
-            mulch_t_offset_data = device.mulch_t_offset
-        except GWIOError as e:
-            print()
-            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
-        except socket.timeout:
-            print()
-            print("Timeout. Device at %s did not respond." % (self.ip_address,))
-        else:
-            # did we get any mulch temp offset data
-            if mulch_t_offset_data is not None:
-                print()
-                print("Multi-channel Temperature Calibration")
-                # do we have any results to display?
-                if len(mulch_t_offset_data) > 0:
-                    # we have results, now format and display the data
-                    # iterate over each channel for which we have data
-                    for channel in mulch_t_offset_data:
-                        # print the channel and offset data
-                        mulch_str = "    Channel %d: Temperature offset: %5s"
-                        # the API returns channels starting at 0x63, but the WSView
-                        # Plus app displays channels starting at 1, so subtract
-                        # 0x62 (or 98) from our channel number
-                        print(mulch_str % (channel - 98,
-                                           "%2.1f" % mulch_t_offset_data[channel]))
-                else:
-                    # we have no results, so display a suitable message
-                    print("    No Multi-channel temperature sensors found")
-            else:
-                print()
-                print("Device at %s did not respond." % (self.ip_address,))
-
-    def get_pm25_offset(self):
-        """Display the device PM2.5 offset data.
-
-        Obtain and display the PM2.5 offset data from the selected device.The
-        device IP address and port are derived (in order) as follows:
-        1. command line --ip-address and --port parameters
-        2. [GW1000] stanza in the specified config file
-        3. by discovery
-        """
-
-        # wrap in a try..except in case there is an error
-        try:
-            # we want a GatewayDevice object but to get such an object we first
-            # need a GatewayCollector object
-            collector = GatewayCollector(ip_address=self.ip_address,
-                                         port=self.port)
-            # the GatewayDevice object is the collectors device property
-            device = collector.device
-            # identify the device being used
-            print()
-            print("Interrogating %s at %s:%d" % (device.model,
-                                                 device.ip_address.decode(),
-                                                 device.port))
-            # get the PM2.5 offset data from the API
-            pm25_offset_data = device.pm25_offset
-        except GWIOError as e:
-            print()
-            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
-        except socket.timeout:
-            print()
-            print("Timeout. Device at %s did not respond." % (self.ip_address,))
-        else:
-            # did we get any PM2.5 offset data
-            if pm25_offset_data is not None:
-                # now format and display the data
-                print()
-                print("PM2.5 Calibration")
-                # iterate over each channel for which we have data
-                for channel in pm25_offset_data:
-                    # print the channel and offset data
-                    print("    Channel %d PM2.5 offset: %5s" % (channel, "%2.1f" % pm25_offset_data[channel]))
-            else:
-                print()
-                print("Device at %s did not respond." % (self.ip_address,))
-
-    def get_co2_offset(self):
-        """Display the device WH45 CO2, PM10 and PM2.5 offset data.
-
-        Obtain and display the WH45 CO2, PM10 and PM2.5 offset data from the
-        selected device. The device IP address and port are derived (in order)
-        as follows:
-        1. command line --ip-address and --port parameters
-        2. [GW1000] stanza in the specified config file
-        3. by discovery
-        """
-
-        # wrap in a try..except in case there is an error
-        try:
-            # we want a GatewayDevice object but to get such an object we first
-            # need a GatewayCollector object
-            collector = GatewayCollector(ip_address=self.ip_address,
-                                         port=self.port)
-            # the GatewayDevice object is the collectors device property
-            device = collector.device
-            # identify the device being used
-            print()
-            print("Interrogating %s at %s:%d" % (device.model,
-                                                 device.ip_address.decode(),
-                                                 device.port))
-            # get the offset data from the API
-            co2_offset_data = device.api.get_co2_offset()
-        except GWIOError as e:
-            print()
-            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
-        except socket.timeout:
-            print()
-            print("Timeout. Device at %s did not respond." % (self.ip_address,))
-        else:
-            # did we get any offset data
-            if co2_offset_data is not None:
-                # now format and display the data
-                print()
-                print("CO2 Calibration")
-                print("%16s: %5s" % ("CO2 offset", "%2.1f" % co2_offset_data['co2']))
-                print("%16s: %5s" % ("PM10 offset", "%2.1f" % co2_offset_data['pm10']))
-                print("%16s: %5s" % ("PM2.5 offset", "%2.1f" % co2_offset_data['pm25']))
-            else:
-                print()
-                print("Device at %s did not respond." % (self.ip_address,))
-
-    def get_calibration(self):
-        """Display the device calibration data.
-
-        Obtain and display the calibration data from the selected device. The
-        device IP address and port are derived (in order) as follows:
-        1. command line --ip-address and --port parameters
-        2. [GW1000] stanza in the specified config file
-        3. by discovery
-        """
-
-        # wrap in a try..except in case there is an error
-        try:
-            # we want a GatewayDevice object but to get such an object we first
-            # need a GatewayCollector object
-            collector = GatewayCollector(ip_address=self.ip_address,
-                                         port=self.port)
-            # the GatewayDevice object is the collectors device property
-            device = collector.device
-            # identify the device being used
-            print()
-            print("Interrogating %s at %s:%d" % (device.model,
-                                                 device.ip_address.decode(),
-                                                 device.port))
-            # get the calibration data from the collector object's calibration
-            # property
-            calibration_data = device.calibration
-        except GWIOError as e:
-            print()
-            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
-        except socket.timeout:
-            print()
-            print("Timeout. Device at %s did not respond." % (self.ip_address,))
-        else:
-            # did we get any calibration data
-            if calibration_data is not None:
-                # now format and display the data
-                print()
-                print("Calibration")
-                print("%26s: %5.2f" % ("Irradiance gain", calibration_data['solar']))
-                print("%26s: %4.1f" % ("UV gain", calibration_data['uv']))
-                print("%26s: %4.1f" % ("Wind gain", calibration_data['wind']))
-                print("%26s: %4.1f %sC" % ("Inside temperature offset", calibration_data['intemp'], u'\xb0'))
-                print("%26s: %4.1f %%" % ("Inside humidity offset", calibration_data['inhum']))
-                print("%26s: %4.1f %sC" % ("Outside temperature offset", calibration_data['outtemp'], u'\xb0'))
-                print("%26s: %4.1f %%" % ("Outside humidity offset", calibration_data['outhum']))
-                print("%26s: %4.1f hPa" % ("Absolute pressure offset", calibration_data['abs']))
-                print("%26s: %4.1f hPa" % ("Relative pressure offset", calibration_data['rel']))
-                print("%26s: %4.1f %s" % ("Wind direction offset", calibration_data['dir'], u'\xb0'))
-            else:
-                print()
-                print("Device at %s did not respond." % (self.ip_address,))
-
-    def get_soil_calibration(self):
-        """Display the device soil moisture sensor calibration data.
-
-        Obtain and display the soil moisture sensor calibration data from the
-        selected device. The device IP address and port are derived (in order)
-        as follows:
-        1. command line --ip-address and --port parameters
-        2. [GW1000] stanza in the specified config file
-        3. by discovery
-        """
-
-        # wrap in a try..except in case there is an error
-        try:
-            # we want a GatewayDevice object but to get such an object we first
-            # need a GatewayCollector object
-            collector = GatewayCollector(ip_address=self.ip_address,
-                                         port=self.port)
-            # the GatewayDevice object is the collectors device property
-            device = collector.device
-            # identify the device being used
-            print()
-            print("Interrogating %s at %s:%d" % (device.model,
-                                                 device.ip_address.decode(),
-                                                 device.port))
-            # get the device soil_calibration property
-            calibration_data = device.soil_calibration
-        except GWIOError as e:
-            print()
-            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
-        except socket.timeout:
-            print()
-            print("Timeout. Device at %s did not respond." % (self.ip_address,))
-        else:
-            # did we get any calibration data
-            if calibration_data is not None:
-                # now format and display the data
-                # first get a list of channels for which we have data, since
-                # this is the keys to a dict we need to sort them
-                channels = sorted(calibration_data.keys())
-                print()
-                print("Soil Calibration")
-                # iterate over each channel printing the channel data
-                for channel in channels:
-                    channel_dict = calibration_data[channel]
-                    # the API returns channels starting at 0, but the
-                    # WSView/WSView Plus apps display channels starting at 1,
-                    # so add 1 to our channel number
-                    print("    Channel %d (%d%%)" % (channel + 1, channel_dict['humidity']))
-                    print("%16s: %d" % ("Now AD", channel_dict['ad']))
-                    print("%16s: %d" % ("0% AD", channel_dict['adj_min']))
-                    print("%16s: %d" % ("100% AD", channel_dict['adj_max']))
-            else:
-                print()
-                print("Device at %s did not respond." % (self.ip_address,))
-
-    def get_services(self):
-        """Display the device Weather Services settings.
-
-        Obtain and display the settings for the various weather services
-        supported by the device. the device IP address and port are
-        derived (in order) as follows:
-        1. command line --ip-address and --port parameters
-        2. [GW1000] stanza in the specified config file
-        3. by discovery
-        """
-
-        # each weather service uses different parameters so define individual
-        # functions to print each services settings
-
-        def print_ecowitt_net(data_dict=None):
-            """Print Ecowitt.net settings."""
-
-            # do we have any settings?
-            if data_dict is not None:
-                # upload interval, 0 means disabled
-                if data_dict['interval'] == 0:
-                    print("%22s: %s" % ("Upload Interval",
-                                        "Upload to Ecowitt.net is disabled"))
-                elif data_dict['interval'] > 1:
-                    print("%22s: %d minutes" % ("Upload Interval",
-                                                data_dict['interval']))
-                else:
-                    print("%22s: %d minute" % ("Upload Interval",
-                                               data_dict['interval']))
-                # device MAC
-                print("%22s: %s" % ("MAC", data_dict['mac']))
-
-        def print_wunderground(data_dict=None):
-            """Print Weather Underground settings."""
-
-            # do we have any settings?
-            if data_dict is not None:
-                # Station ID
-                wu_id = data_dict['id'] if self.opts.unmask else obfuscate(data_dict['id'])
-                print("%22s: %s" % ("Station ID", wu_id))
-                # Station key
-                key = data_dict['password'] if self.opts.unmask else obfuscate(data_dict['password'])
-                print("%22s: %s" % ("Station Key", key))
-
-        def print_weathercloud(data_dict=None):
-            """Print Weathercloud settings."""
-
-            # do we have any settings?
-            if data_dict is not None:
-                # Weathercloud ID
-                wc_id = data_dict['id'] if self.opts.unmask else obfuscate(data_dict['id'])
-                print("%22s: %s" % ("Weathercloud ID", wc_id))
-                # Weathercloud key
-                key = data_dict['key'] if self.opts.unmask else obfuscate(data_dict['key'])
-                print("%22s: %s" % ("Weathercloud Key", key))
-
-        def print_wow(data_dict=None):
-            """Print Weather Observations Website settings."""
-
-            # do we have any settings?
-            if data_dict is not None:
-                # Station ID
-                wow_id = data_dict['id'] if self.opts.unmask else obfuscate(data_dict['id'])
-                print("%22s: %s" % ("Station ID", wow_id))
-                # Station key
-                key = data_dict['password'] if self.opts.unmask else obfuscate(data_dict['password'])
-                print("%22s: %s" % ("Station Key", key))
-
-        def print_custom(data_dict=None):
-            """Print Custom server settings."""
-
-            # do we have any settings?
-            if data_dict is not None:
-                # Is upload enabled, API specifies 1=enabled and 0=disabled, if
-                # we have anything else use 'Unknown'
-                if data_dict['active'] == 1:
-                    print("%22s: %s" % ("Upload", "Enabled"))
-                elif data_dict['active'] == 0:
-                    print("%22s: %s" % ("Upload", "Disabled"))
-                else:
-                    print("%22s: %s" % ("Upload", "Unknown"))
-                # upload protocol, API specifies 1=wundeground and 0=ecowitt,
-                # if we have anything else use 'Unknown'
-                if data_dict['type'] == 0:
-                    print("%22s: %s" % ("Upload Protocol", "Ecowitt"))
-                elif data_dict['type'] == 1:
-                    print("%22s: %s" % ("Upload Protocol", "Wunderground"))
-                else:
-                    print("%22s: %s" % ("Upload Protocol", "Unknown"))
-                # remote server IP address
-                print("%22s: %s" % ("Server IP/Hostname", data_dict['server']))
-                # remote server path, if using wunderground protocol we have
-                # Station ID and Station key as well
-                if data_dict['type'] == 0:
-                    print("%22s: %s" % ("Path", data_dict['ecowitt_path']))
-                elif data_dict['type'] == 1:
-                    print("%22s: %s" % ("Path", data_dict['wu_path']))
-                    custom_id = data_dict['id'] if self.opts.unmask else obfuscate(data_dict['id'])
-                    print("%22s: %s" % ("Station ID", custom_id))
-                    key = data_dict['password'] if self.opts.unmask else obfuscate(data_dict['password'])
-                    print("%22s: %s" % ("Station Key", key))
-                # port
-                print("%22s: %d" % ("Port", data_dict['port']))
-                # upload interval in seconds
-                print("%22s: %d seconds" % ("Upload Interval", data_dict['interval']))
-
-        # look table of functions to use to print weather service settings
-        print_fns = {'ecowitt_net_params': print_ecowitt_net,
-                     'wunderground_params': print_wunderground,
-                     'weathercloud_params': print_weathercloud,
-                     'wow_params': print_wow,
-                     'custom_params': print_custom}
-
-        # wrap in a try..except in case there is an error
-        try:
-            # we want a GatewayDevice object but to get such an object we first
-            # need a GatewayCollector object
-            collector = GatewayCollector(ip_address=self.ip_address,
-                                         port=self.port)
-            # the GatewayDevice object is the collectors device property
-            device = collector.device
-            # identify the device being used
-            print()
-            print("Interrogating %s at %s:%d" % (device.model,
-                                                 device.ip_address.decode(),
-                                                 device.port))
-            # get the settings for each service know to the device, store them
-            # in a dict keyed by the service name
-            services_data = dict()
-            for service in device.services:
-                services_data[service['name']] = getattr(device, service['name'])
-        except GWIOError as e:
-            print()
-            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
-        except socket.timeout:
-            print()
-            print("Timeout. Device at %s did not respond." % (self.ip_address,))
-        else:
-            # did we get any service data
-            if len(services_data) > 0:
-                # now format and display the data
-                print()
-                print("Weather Services")
-                # iterate over the weather services we know about and call the
-                # relevant function to print the services settings
-                for service in device.services:
-                    print()
-                    print("  %s" % (service['long_name'],))
-                    print_fns[service['name']](services_data[service['name']])
-            else:
-                print()
-                print("Device at %s did not respond." % (self.ip_address,))
-
-    def station_mac(self):
-        """Display the device hardware MAC address.
-
-        Obtain and display the hardware MAC address of the selected device. The
-        device IP address and port are derived (in order) as follows:
-        1. command line --ip-address and --port parameters
-        2. [GW1000] stanza in the specified config file
-        3. by discovery
-        """
-
-        # wrap in a try..except in case there is an error
-        try:
-            # we want a GatewayDevice object but to get such an object we first
-            # need a GatewayCollector object
-            collector = GatewayCollector(ip_address=self.ip_address,
-                                         port=self.port)
-            # the GatewayDevice object is the collectors device property
-            device = collector.device
-            # identify the device being used
-            print()
-            print("Interrogating %s at %s:%d" % (device.model,
-                                                 device.ip_address.decode(),
-                                                 device.port))
-            print()
-            # get the device MAC address
-            print("    MAC address: %s" % device.mac_address)
-        except GWIOError as e:
-            print()
-            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
-        except socket.timeout:
-            print()
-            print("Timeout. Device at %s did not respond." % (self.ip_address,))
-
-    def firmware(self):
-        """Display device firmware details.
-
-        Obtain and display the firmware version string from the selected
-        gateway device. User is advised whether a firmware update is available
-        or not.
-
-        The device IP address and port are derived (in order) as follows:
-        1. command line --ip-address and --port parameters
-        2. [GW1000] stanza in the specified config file
-        3. by discovery
-        """
-
-        # wrap in a try..except in case there is an error
-        try:
-            # we want a GatewayDevice object but to get such an object we first
-            # need a GatewayCollector object
-            collector = GatewayCollector(ip_address=self.ip_address,
-                                         port=self.port)
-            # the GatewayDevice object is the collectors device property
-            device = collector.device
-            # get the device model, we will use this multiple times
-            model = device.model
-            # identify the device being used
-            print()
-            print("Interrogating %s at %s:%d" % (model,
-                                                 device.ip_address.decode(),
-                                                 device.port))
-            print()
-            # get the firmware version via the API
-            print("    installed %s firmware version is %s" % (model,
-                                                               device.firmware_version))
-            fware_dict = device.sensor_firmware_versions
-            for sensor_model, sensor_fware_version in fware_dict.items():
-                print("    installed %s firmware version is %s" % (sensor_model,
-                                                                   sensor_fware_version))
-            print()
-            fw_update_avail = device.firmware_update_avail
-            if fw_update_avail:
-                # we have an available firmware update
-                # obtain the 'curr_msg' from the device HTTP API
-                # 'get_device_info' command, this field usually contains the
-                # firmware change details
-                curr_msg = device.firmware_update_message
-                # now print the firmware update details
-                print("    a firmware update is available for this %s," % model)
-                print("    update at http://%s or via the WSView Plus app" % (self.ip_address,))
-                # if we have firmware update details print them
-                if curr_msg is not None:
-                    print()
-                    # Ecowitt have not documented the HTTP API calls so we are
-                    # not exactly sure what the 'curr_msg' field is used for,
-                    # it might be for other things as well
-                    print("    likely firmware update message:")
-                    # multi-line messages seem to have \r\n at the end of each
-                    # line, split the string so we can format it a little better
-                    if '\r\n' in curr_msg:
-                        for line in curr_msg.split('\r\n'):
-                            # print each line
-                            print("      %s" % line)
-                    else:
-                        # print as a single line
-                        print("      %s" % curr_msg)
-                else:
-                    # we had no 'curr_msg' for one reason or another
-                    print("    no firmware update message found")
-            elif fw_update_avail is None:
-                # we don't know if we have an available firmware update
-                print("    could not determine if a firmware update is available for this %s" % model)
-            else:
-                # there must be no available firmware update
-                print("    the firmware is up to date for this %s" % model)
-        except GWIOError as e:
-            print()
-            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
-            print()
-            self.device_connection_help()
-        except socket.timeout:
-            print()
-            print("Timeout. Device at %s did not respond." % (self.ip_address,))
-            print()
-            self.device_connection_help()
-
-    def sensors(self):
-        """Display the device sensor ID information.
-
-        Obtain and display the sensor ID information from the selected device.
-        The device IP address and port are derived (in order) as follows:
-        1. command line --ip-address and --port parameters
-        2. [GW1000] stanza in the specified config file
-        3. by discovery
-        """
-
-        # TODO. Need to think about the object structure here as well as who does what
-        # wrap in a try..except in case there is an error
-        try:
-            # we want a GatewayDevice object but to get such an object we first
-            # need a GatewayCollector object
-            collector = GatewayCollector(ip_address=self.ip_address,
-                                         port=self.port,
-                                         show_battery=self.show_battery)
-            # the GatewayDevice object is the collectors device property
-            device = collector.device
-            # identify the device being used
-            print()
-            print("Interrogating %s at %s:%d" % (device.model,
-                                                 device.ip_address.decode(),
-                                                 device.port))
-            # first update the collector's sensor ID data
-            device.api.update_sensor_id_data()
-        except GWIOError as e:
-            print()
-            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
-            print()
-            self.device_connection_help()
-        except socket.timeout:
-            print()
-            print("Timeout. Device at %s did not respond." % (self.ip_address,))
-            print()
-            self.device_connection_help()
-        else:
-            # now get the sensors property from the collector
-            sensors = collector.device.api.sensors
-            # the sensor ID data is in the sensors data property, did
-            # we get any sensor ID data
-            if sensors.data is not None and len(sensors.data) > 0:
-                # now format and display the data
-                print()
-                print("%-10s %s" % ("Sensor", "Status"))
-                # iterate over each sensor for which we have data
-                for address, sensor_data in six.iteritems(sensors.data):
-                    # the sensor id indicates whether it is disabled, attempting to
-                    # register a sensor or already registered
-                    if sensor_data['id'] == 'fffffffe':
-                        state = 'sensor is disabled'
-                    elif sensor_data['id'] == 'ffffffff':
-                        state = 'sensor is registering...'
-                    else:
-                        # the sensor is registered so we should have signal and battery
-                        # data as well
-                        battery_desc = sensors.batt_state_desc(address, sensor_data.get('battery'))
-                        battery_desc_text = " (%s)" % battery_desc if battery_desc is not None else ""
-                        battery_str = "%s%s" % (sensor_data.get('battery'), battery_desc_text)
-                        state = "sensor ID: %s  signal: %s  battery: %s" % (sensor_data.get('id').lstrip('0'),
-                                                                            sensor_data.get('signal'),
-                                                                            battery_str)
-                        # print the formatted data
-                    print("%-10s %s" % (Sensors.sensor_ids[address].get('long_name'), state))
-            elif len(sensors.data) == 0:
-                print()
-                print("Device at %s did not return any sensor data." % (self.ip_address,))
-            else:
-                print()
-                print("Device at %s did not respond." % (self.ip_address,))
-
-    def live_data(self):
-        """Display the device live sensor data.
-
-        Obtain and display live sensor data from the selected device. Data is
-        presented as read from the device except for conversion to US customary
-        or Metric units. Unit labels are included.
+# The configuration editor, configurator, command line interface and the
+# optional push and process collectors are not needed by the WeeWX engine when
+# running the driver or service, so they are defined in sub-modules that are
+# only imported when one of the following names is first used. The key is the
+# name and the value is the sub-module that defines the name.
+lazy_imports = {
+    'Gw1000ConfEditor': 'config',
+    'GatewayConfigurator': 'config',
+    'PushParser': 'push',
+    'PushReceiver': 'push',
+    'PushCollector': 'push',
+    'PacketRing': 'process',
+    'ProcessCollector': 'process',
+    'CaptureImporter': 'direct',
+    'DirectSession': 'direct',
+    'DirectGateway': 'direct',
+    'main': 'direct'
+}
 
-        The device IP address and port are derived (in order) as follows:
-        1. command line --ip-address and --port parameters
-        2. [GW1000] stanza in the specified config file
-        3. by discovery
-        """
 
-        # wrap in a try..except in case there is an error
-        try:
-            # Get a GatewayCollector object, normally we would reach into a
-            # GatewayDevice object for data but in this case the
-            # GatewayCollector get_current_data() method can be used to
-            # assemble all disparate pieces of data for us.
-            collector = GatewayCollector(ip_address=self.ip_address,
-                                         port=self.port,
-                                         show_battery=self.show_battery)
-            # identify the device being used
-            print()
-            print("Interrogating %s at %s:%d" % (collector.device.model,
-                                                 collector.device.ip_address.decode(),
-                                                 collector.device.port))
-            # call the GatewayCollector objects get_current_data() method to
-            # obtain the live sensor data
-            live_sensor_data_dict = collector.get_current_data()
-        except GWIOError as e:
-            print()
-            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
-            print()
-            self.device_connection_help()
-        except socket.timeout:
-            print()
-            print("Timeout. Device at %s did not respond." % (self.ip_address,))
-            print()
-            self.device_connection_help()
-        else:
-            # we have a data dict to work with, but we need to format the
-            # values and may need to convert units
-
-            # the live sensor data dict is a dict of sensor values and a
-            # timestamp only, whilst all sensor values are in MetricWX units
-            # there is no usUnits field present. We need usUnits to do our unit
-            # conversion so add in the usUnits field.
-            live_sensor_data_dict['usUnits'] = weewx.METRICWX
-            # we will use the timestamp separately so pop it from the dict and
-            # save for later
-            datetime = live_sensor_data_dict.pop('datetime')
-            # extend the WeeWX obs_group_dict with our gateway
-            # obs_group_dict, because weewx.units.obs_group_dict.extend is a
-            # ListOfDicts we need to use .prepend since the synthetic python2
-            # ListOfDicts does not support .update and we want to use the
-            # device entry should there already be an entry of the same name in
-            # weewx.units.obs_group_dict (eg 'rain')
-            weewx.units.obs_group_dict.prepend(DirectGateway.gw_direct_obs_group_dict)
-            # the live data is in MetricWX units, get a suitable converter
-            # based on our output units
-            if self.opts.units.lower() == 'us':
-                _unit_system = weewx.US
-            elif self.opts.units.lower() == 'metricwx':
-                _unit_system = weewx.METRICWX
-            else:
-                _unit_system = weewx.METRIC
-            c = weewx.units.StdUnitConverters[_unit_system]
-            # Now get a formatter, we could use the
-            # weewx.units.default_unit_format_dict, but we need voltages
-            # formatted to two decimal places. So take a copy of the default
-            # unit format dict, change the 'volt' format to suit and use that.
-            gw_unit_format_dict = dict(weewx.units.default_unit_format_dict)
-            gw_unit_format_dict['volt'] = '%.2f'
-            f = weewx.units.Formatter(unit_format_dict=gw_unit_format_dict,
-                                      unit_label_dict=weewx.units.default_unit_label_dict)
-            # now build a new data dict with our converted and formatted data
-            result = {}
-            # iterate over the fields in our original data dict
-            for key, value in six.iteritems(live_sensor_data_dict):
-                # we don't need usUnits in the result so skip it
-                if key == 'usUnits':
-                    continue
-                # get our key as a ValueTuple
-                key_vt = weewx.units.as_value_tuple(live_sensor_data_dict, key)
-                # now get a ValueHelper which will do the conversion and
-                # formatting
-                key_vh = weewx.units.ValueHelper(key_vt, formatter=f, converter=c)
-                # and add the converted and formatted value to our dict
-                result[key] = key_vh.toString(None_string='None')
-            # finally, sort our dict by key and print the data
-            print()
-            print("Displaying data using the WeeWX %s unit group." % weewx.units.unit_nicknames.get(_unit_system))
-            print()
-            print("%s live sensor data (%s): %s" % (collector.device.model,
-                                                    weeutil.weeutil.timestamp_to_string(datetime),
-                                                    weeutil.weeutil.to_sorted_string(result)))
+def __getattr__(name):
+    """Import a lazily imported name on first use."""
 
-    @staticmethod
-    def discover():
-        """Display details of gateway devices on the local network."""
-
-        # this could take a few seconds so warn the user
-        print()
-        print("Discovering devices on the local network. Please wait...")
-        # we want a GatewayDevice object but to get such an object we first
-        # need a GatewayCollector object
-        collector = GatewayCollector()
-        # the GatewayDevice object is the collectors device property
-        device = collector.device
-        # Obtain a list of discovered devices. Would consider wrapping in a
-        # try..except so we can catch any socket timeout exceptions but the
-        # GatewayApi.discover() method should catch any such exceptions for us.
-        device_list = device.discovered_devices
-        print()
-        if len(device_list) > 0:
-            # we have at least one result
-            # first sort our list by IP address
-            sorted_list = sorted(device_list, key=itemgetter('ip_address'))
-            # initialise a counter to count the number of valid devices found
-            num_gw_found = 0
-            # iterate over the unique devices that were found
-            for device in sorted_list:
-                if device['ip_address'] is not None and device['port'] is not None:
-                    print("%s discovered at IP address %s on port %d" % (device['model'],
-                                                                         device['ip_address'],
-                                                                         device['port']))
-                    num_gw_found += 1
-            else:
-                if num_gw_found > 1:
-                    print()
-                    print("Multiple devices were found.")
-                    print("If using the gateway driver consider explicitly specifying the ")
-                    print("IP address and port of the device to be used under [GW1000] in weewx.conf.")
-                elif num_gw_found == 0:
-                    print("No devices were discovered.")
-        else:
-            # we have no results
-            print("No devices were discovered.")
+    if name in lazy_imports:
+        module = importlib.import_module('.'.join([__name__, lazy_imports[name]]))
+        value = getattr(module, name)
+        # save the name so the sub-module is only consulted once
+        globals()[name] = value
+        return value
+    raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
 
-    @staticmethod
-    def field_map():
-        """Display the default field map."""
-
-        # obtain a copy of the default field map, we need a copy so we can
-        # augment it with the battery state map
-        field_map = dict(Gateway.default_field_map)
-        # now add in the rain field map
-        field_map.update(Gateway.rain_field_map)
-        # now add in the wind field map
-        field_map.update(Gateway.wind_field_map)
-        # now add in the battery state field map
-        field_map.update(Gateway.battery_field_map)
-        # now add in the sensor signal field map
-        field_map.update(Gateway.sensor_signal_field_map)
-        print()
-        print("Gateway driver/service default field map:")
-        print("(format is WeeWX field name: gateway field name)")
-        print()
-        # obtain a list of naturally sorted dict keys so that, for example,
-        # xxxxx16 appears in the correct order
-        keys_list = natural_sort_keys(field_map)
-        # iterate over the sorted keys and print the key and item
-        for key in keys_list:
-            print("    %23s: %s" % (key, field_map[key]))
-
-    def driver_field_map(self):
-        """Display the driver field map that would be used.
-
-        By default, the default field map is used by the driver; however, the
-        user may alter the field map used by the driver via the [GW1000]
-        stanza. This method displays the actual field map that would be used by
-        the driver.
-        """
-
-        # this may take a moment to set up so inform the user
-        print()
-        print("This may take a moment...")
-        # place an entry in the log so that if we encounter errors that are
-        # logged we can tell they were not caused by a live WeeWX instance
-        loginf("Obtaining a gateway driver...")
-        # wrap in a try..except in case there is an error obtaining and
-        # interacting with the driver
-        try:
-            # get a GatewayDriver object
-            driver = GatewayDriver(**self.stn_dict)
-            # now display the field map defined in the driver's field_map
-            # property
-            print()
-            print("Gateway driver actual field map:")
-            print("(format is WeeWX field name: gateway field name)")
-            print()
-            # obtain a list of naturally sorted dict keys so that, for example,
-            # xxxxx16 appears in the correct order
-            keys_list = natural_sort_keys(driver.field_map)
-            # iterate over the sorted keys and print the key and item
-            for key in keys_list:
-                print("    %23s: %s" % (key, driver.field_map[key]))
-        except GWIOError as e:
-            print()
-            print("Unable to connect to device: %s" % e)
-            print()
-            print("Unable to display actual driver field map")
-            print()
-            self.device_connection_help()
-        except KeyboardInterrupt:
-            # we have a keyboard interrupt so shut down
-            if driver:
-                driver.closePort()
-        loginf("Finished using gateway driver")
-
-    def service_field_map(self):
-        """Display the service field map that would be used.
-
-        By default, the default field map is used by the service; however, the
-        user may alter the field map used by the service via the [GW1000]
-        stanza. This method displays the actual field map that would be used by
-        the service.
-        """
-
-        # this may take a moment to set up so inform the user
-        print()
-        print("This may take a moment...")
-        # place an entry in the log so that if we encounter errors that are
-        # logged we can tell they were not caused by a live WeeWX instance
-        loginf("Obtaining a gateway service...")
-        # Create a dummy config so we can stand up a dummy engine with a dummy
-        # simulator emitting arbitrary loop packets. Include the gateway
-        # service and StdPrint. StdPrint will take care of printing our loop
-        # packets (no StdArchive so loop packets only, no archive records)
-        config = {
-            'Station': {
-                'station_type': 'Simulator',
-                'altitude': [0, 'meter'],
-                'latitude': 0,
-                'longitude': 0},
-            'Simulator': {
-                'driver': 'weewx.drivers.simulator',
-                'mode': 'simulator'},
-            'GW1000': {},
-            'Engine': {
-                'Services': {
-                    'archive_services': 'user.gw1000.GatewayService',
-                    'report_services': 'weewx.engine.StdPrint'}}}
-        # set the IP address and port in the dummy config
-        config['GW1000']['ip_address'] = self.ip_address
-        config['GW1000']['port'] = self.port
-        # wrap in a try..except in case there is an error
-        try:
-            # create a dummy engine
-            engine = weewx.engine.StdEngine(config)
-            # Our gateway service will have been instantiated by the engine
-            # during its startup. Whilst access to the service is not normally
-            # required we require access here, so we can obtain some info about
-            # the station we are using for this test. The engine does not
-            # provide a ready means to access that gateway service, so we can
-            # do a bit of guessing and iterate over all the engine's services
-            # and select the one that has a 'collector' property. Unlikely to
-            # cause a problem since there are only two services in the dummy
-            # engine.
-            gw_svc = None
-            for svc in engine.service_obj:
-                if hasattr(svc, 'collector'):
-                    gw_svc = svc
-            if gw_svc is not None:
-                # we have a gateway service, it's not much use, but it has the
-                # field map we need so go ahead and display its field map
-                print()
-                print("Gateway service actual field map:")
-                print("(format is WeeWX field name: gateway field name)")
-                print()
-                # obtain a list of naturally sorted dict keys so that, for example,
-                # xxxxx16 appears in the correct order
-                keys_list = natural_sort_keys(gw_svc.field_map)
-                # iterate over the sorted keys and print the key and item
-                for key in keys_list:
-                    print("    %23s: %s" % (key, gw_svc.field_map[key]))
-        except GWIOError as e:
-            print()
-            print("Unable to connect to device: %s" % e)
-            print()
-            print("Unable to display actual driver field map")
-            print()
-            self.device_connection_help()
-        except KeyboardInterrupt:
-            if engine:
-                engine.shutDown()
-        loginf("Finished using gateway service")
-
-    def test_driver(self):
-        """Exercise the gateway driver as a driver.
-
-        Exercises the gateway driver only. Loop packets, but no archive
-        records, are emitted to the console continuously until a keyboard
-        interrupt is received. A station config dict is coalesced from any
-        relevant command line parameters and the config file in use with
-        command line parameters overriding those in the config file.
-        """
-
-        loginf("Testing gateway driver...")
-        # set the IP address and port in the station config dict
-        self.stn_dict['ip_address'] = self.ip_address
-        self.stn_dict['port'] = self.port
-        if self.opts.poll_interval:
-            self.stn_dict['poll_interval'] = self.opts.poll_interval
-        if self.opts.max_tries:
-            self.stn_dict['max_tries'] = self.opts.max_tries
-        if self.opts.retry_wait:
-            self.stn_dict['retry_wait'] = self.opts.retry_wait
-        # wrap in a try..except in case there is an error
-        try:
-            # get a GatewayDriver object
-            driver = GatewayDriver(**self.stn_dict)
-            # identify the device being used
-            print()
-            print("Interrogating %s at %s:%d" % (driver.collector.device.model,
-                                                 driver.collector.device.ip_address.decode(),
-                                                 driver.collector.device.port))
-            print()
-            # continuously get loop packets and print them to screen
-            for pkt in driver.genLoopPackets():
-                print(": ".join([weeutil.weeutil.timestamp_to_string(pkt['dateTime']),
-                                 weeutil.weeutil.to_sorted_string(pkt)]))
-        except GWIOError as e:
-            print()
-            print("Unable to connect to device: %s" % e)
-            print()
-            self.device_connection_help()
-        except KeyboardInterrupt:
-            # we have a keyboard interrupt so shut down
-            driver.closePort()
-        loginf("Gateway driver testing complete")
-
-    def test_service(self):
-        """Exercise the gateway driver as a service.
-
-        Uses a dummy engine/simulator to generate arbitrary loop packets for
-        augmenting. Use a 10-second loop interval so we don't get too many bare
-        packets.
-        """
-
-        loginf("Testing gateway service...")
-        # Create a dummy config, so we can stand up a dummy engine with a dummy
-        # simulator emitting arbitrary loop packets. Include the gateway
-        # service and StdPrint. StdPrint will take care of printing our loop
-        # packets (no StdArchive so loop packets only, no archive records)
-        config = {
-            'Station': {
-                'station_type': 'Simulator',
-                'altitude': [0, 'meter'],
-                'latitude': 0,
-                'longitude': 0},
-            'Simulator': {
-                'driver': 'weewx.drivers.simulator',
-                'mode': 'simulator'},
-            'GW1000': {},
-            'Engine': {
-                'Services': {
-                    'archive_services': 'user.gw1000.GatewayService',
-                    'report_services': 'weewx.engine.StdPrint'}}}
-        # set the IP address and port in the dummy config
-        config['GW1000']['ip_address'] = self.ip_address
-        config['GW1000']['port'] = self.port
-        # these command line options should only be added if they exist
-        if self.opts.poll_interval:
-            config['GW1000']['poll_interval'] = self.opts.poll_interval
-        if self.opts.max_tries:
-            config['GW1000']['max_tries'] = self.opts.max_tries
-        if self.opts.retry_wait:
-            config['GW1000']['retry_wait'] = self.opts.retry_wait
-        # assign our dummyTemp field to a unit group so unit conversion works
-        # properly
-        weewx.units.obs_group_dict['dummyTemp'] = 'group_temperature'
-        # wrap in a try..except in case there is an error
-        try:
-            # create a dummy engine
-            engine = weewx.engine.StdEngine(config)
-            # Our gateway service will have been instantiated by the engine
-            # during its startup. Whilst access to the service is not normally
-            # required we require access here, so we can obtain some info about
-            # the station we are using for this test. The engine does not
-            # provide a ready means to access that gateway service, so we can
-            # do a bit of guessing and iterate over all the engine's services
-            # and select the one that has a 'collector' property. Unlikely to
-            # cause a problem since there are only two services in the dummy
-            # engine.
-            gw_svc = None
-            for svc in engine.service_obj:
-                if hasattr(svc, 'collector'):
-                    gw_svc = svc
-            if gw_svc is not None:
-                # identify the device being used
-                print()
-                print("Interrogating %s at %s:%d" % (gw_svc.collector.device.model,
-                                                     gw_svc.collector.device.ip_address.decode(),
-                                                     gw_svc.collector.device.port))
-            print()
-            while True:
-                # create an arbitrary loop packet, all it needs is a timestamp, a
-                # defined unit system and a token obs
-                packet = {'dateTime': int(time.time()),
-                          'usUnits': weewx.US,
-                          'dummyTemp': 96.3
-                          }
-                # send out a NEW_LOOP_PACKET event with the dummy loop packet
-                # to trigger the gateway service to augment the loop packet
-                engine.dispatchEvent(weewx.Event(weewx.NEW_LOOP_PACKET,
-                                                 packet=packet,
-                                                 origin='software'))
-                # sleep for a bit to emulate the simulator
-                time.sleep(10)
-        except GWIOError as e:
-            print()
-            print("Unable to connect to device: %s" % e)
-            print()
-            self.device_connection_help()
-        except KeyboardInterrupt:
-            engine.shutDown()
-        loginf("Gateway service testing complete")
 
-    @staticmethod
-    def device_connection_help():
-        """Console output help message for device connection problems."""
-
-        print("    Things to check include that the correct device IP address is being used,")
-        print("    the device is powered on and the device is not otherwise disconnected from")
-        print("    the local network.")
-
-
-# To use this driver in standalone mode for testing or development, use one of
-# the following commands (depending on your WeeWX install). For setup.py
-# installs use:
-#
-#   $ PYTHONPATH=/home/weewx/bin python -m user.gw1000
-#
-# or for package installs use:
-#
-#   $ PYTHONPATH=/usr/share/weewx python -m user.gw1000
-#
-# The above api_commands will display details of available command line options.
-#
-# Note. Whilst the driver may be run independently of WeeWX the driver still
-# requires WeeWX and it's dependencies be installed. Consequently, if
-# WeeWX 4.0.0 or later is installed the driver must be run under the same
-# Python version as WeeWX uses. This means that on some systems 'python' in the
-# above api_commands may need to be changed to 'python2' or 'python3'.
-
-def main():
-    import optparse
-
-    usage = """Usage: python -m user.gw1000 --help
-       python -m user.gw1000 --version
-       python -m user.gw1000 --test-driver|--test-service
-            [CONFIG_FILE|--config=CONFIG_FILE]
-            [--ip-address=IP_ADDRESS] [--port=PORT]
-            [--poll-interval=INTERVAL]
-            [--max-tries=MAX_TRIES]
-            [--retry-wait=RETRY_WAIT]
-            [--show-all-batt]
-            [--debug=0|1|2|3]
-       python -m user.gw1000 --live-data
-            [CONFIG_FILE|--config=CONFIG_FILE]
-            [--units=us|metric|metricwx]
-            [--ip-address=IP_ADDRESS] [--port=PORT]
-            [--show-all-batt]
-            [--debug=0|1|2|3]
-       python -m user.gw1000 --default-map|--driver-map|--service-map
-            [CONFIG_FILE|--config=CONFIG_FILE]
-            [--debug=0|1|2|3]
-       python -m user.gw1000 --discover
-            [CONFIG_FILE|--config=CONFIG_FILE]
-            [--debug=0|1|2|3]"""
-
-    parser = optparse.OptionParser(usage=usage)
-    parser.add_option('--version', dest='version', action='store_true',
-                      help='display driver version number')
-    parser.add_option('--discover', dest='discover', action='store_true',
-                      help='discover devices and display device IP address '
-                           'and port')
-    parser.add_option('--live-data', dest='live', action='store_true',
-                      help='display device live sensor data')
-    parser.add_option('--test-driver', dest='test_driver', action='store_true',
-                      metavar='TEST_DRIVER', help='exercise the gateway driver')
-    parser.add_option('--test-service', dest='test_service',
-                      action='store_true', metavar='TEST_SERVICE',
-                      help='exercise the gateway service')
-    parser.add_option('--default-map', dest='map', action='store_true',
-                      help='display the default field map')
-    parser.add_option('--driver-map', dest='driver_map', action='store_true',
-                      help='display the field map that would be used by the gateway '
-                           'driver')
-    parser.add_option('--service-map', dest='service_map', action='store_true',
-                      help='display the field map that would be used by the gateway '
-                           'service')
-    parser.add_option('--ip-address', dest='ip_address',
-                      help='device IP address to use')
-    parser.add_option('--port', dest='port', type=int,
-                      help='device port to use')
-    parser.add_option('--poll-interval', dest='poll_interval', type=int,
-                      help='how often to poll the device API')
-    parser.add_option('--max-tries', dest='max_tries', type=int,
-                      help='max number of attempts to contact the device')
-    parser.add_option('--retry-wait', dest='retry_wait', type=int,
-                      help='how long to wait between attempts to contact the device')
-    parser.add_option('--show-all-batt', dest='show_battery',
-                      action='store_true',
-                      help='show all available battery state data regardless of '
-                           'sensor state')
-    parser.add_option('--unmask', dest='unmask', action='store_true',
-                      help='unmask sensitive settings')
-    parser.add_option('--units', dest='units', metavar='UNITS', default='metric',
-                      help='unit system to use when displaying live data')
-    parser.add_option('--config', dest='config_path', metavar='CONFIG_FILE',
-                      help="Use configuration file CONFIG_FILE.")
-    parser.add_option('--debug', dest='debug', type=int,
-                      help='How much status to display, 0-3')
-    (opts, args) = parser.parse_args()
-
-    # display driver version number
-    if opts.version:
-        print("%s driver version: %s" % (DRIVER_NAME, DRIVER_VERSION))
-        exit(0)
-
-    # get config_dict to use
-    config_path, config_dict = weecfg.read_config(opts.config_path, args)
-    print("Using configuration file %s" % config_path)
-    stn_dict = config_dict.get('GW1000', {})
-
-    # set weewx.debug as necessary
-    if opts.debug is not None:
-        _debug = weeutil.weeutil.to_int(opts.debug)
-    else:
-        _debug = weeutil.weeutil.to_int(config_dict.get('debug', 0))
-    weewx.debug = _debug
-    # inform the user if the debug level is 'higher' than 0
-    if _debug > 0:
-        print("debug level is '%d'" % _debug)
-
-    # Now we can set up the user customized logging, but we need to handle both
-    # v3 and v4 logging. V4 logging is very easy but v3 logging requires us to
-    # set up syslog and raise our log level based on weewx.debug
-    try:
-        # assume v 4 logging
-        weeutil.logger.setup('weewx', config_dict)
-    except AttributeError:
-        # must be v3 logging, so first set the defaults for the system logger
-        syslog.openlog('weewx', syslog.LOG_PID | syslog.LOG_CONS)
-        # now raise the log level if required
-        if weewx.debug > 0:
-            syslog.setlogmask(syslog.LOG_UPTO(syslog.LOG_DEBUG))
-
-    # define custom unit settings used by the gateway driver
-    define_units()
-
-    # get a DirectGateway object
-    direct_gw = DirectGateway(opts, parser, stn_dict)
-    # now let the DirectGateway object process the options
-    direct_gw.process_options()
-
-
-if __name__ == '__main__':
-    main()
\ No newline at end of file
+# module level __getattr__() is not supported before python 3.7, in that case
+# import everything now
+if sys.version_info < (3, 7):
+    for _name in lazy_imports:
+        __getattr__(_name)
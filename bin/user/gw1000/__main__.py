@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+__main__.py
+
+Run the Ecowitt gateway driver directly from the command line.
+
+The driver may be run using python -m user.gw1000 or by running the
+user/gw1000 directory, eg:
+
+    $ PYTHONPATH=/usr/share/weewx python3 /etc/weewx/bin/user/gw1000 --help
+
+Copyright (C) 2020-2024 Gary Roderick                   gjroderick<at>gmail.com
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+# Python imports
+from __future__ import absolute_import
+
+import os.path
+import sys
+
+if not __package__:
+    # we are being run as a directory rather than as a package, so make the
+    # WeeWX user package importable
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user.gw1000.direct import main
+
+main()
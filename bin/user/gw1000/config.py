@@ -0,0 +1,624 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+config.py
+
+WeeWX configuration editor and configurator for the Ecowitt gateway driver.
+
+The classes in this module are used by the WeeWX utilities when installing,
+configuring or interrogating the driver. Neither class is needed when the
+WeeWX engine runs the driver or service, so this module is only loaded when a
+WeeWX utility asks for the configuration editor or configurator.
+
+Copyright (C) 2020-2024 Gary Roderick                   gjroderick<at>gmail.com
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+# Python imports
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Python 2/3 compatibility shims
+from six.moves import StringIO
+
+# WeeWX imports
+import configobj
+import weeutil.weeutil
+import weewx
+import weewx.drivers
+
+# Ecowitt gateway driver imports
+from . import default_poll_interval, default_port, define_units
+from .direct import DirectGateway
+
+
+# ============================================================================
+#                          class Gw1000ConfEditor
+# ============================================================================
+
+class Gw1000ConfEditor(weewx.drivers.AbstractConfEditor):
+    # define our config as a multiline string so we can preserve comments
+    accum_config = """
+    [Accumulator]
+        # Start GW1000 driver extractors
+        [[daymaxwind]]
+            extractor = last
+        [[lightning_distance]]
+            extractor = last
+        [[lightning_strike_count]]
+            extractor = sum
+        [[lightning_last_det_time]]
+            extractor = last
+        [[stormRain]]
+            extractor = last
+        [[dayRain]]
+            extractor = last
+        [[weekRain]]
+            extractor = last
+        [[monthRain]]
+            extractor = last
+        [[yearRain]]
+            extractor = last
+        [[totalRain]]
+            extractor = last
+        [[t_rain]]
+            extractor = sum
+        [[t_stormRain]]
+            extractor = last
+        [[t_dayRain]]
+            extractor = last
+        [[t_weekRain]]
+            extractor = last
+        [[t_monthRain]]
+            extractor = last
+        [[t_yearRain]]
+            extractor = last
+        [[p_rain]]
+            extractor = sum
+        [[p_stormRain]]
+            extractor = last
+        [[p_dayRain]]
+            extractor = last
+        [[p_weekRain]]
+            extractor = last
+        [[p_monthRain]]
+            extractor = last
+        [[p_yearRain]]
+            extractor = last
+        [[pm1_0_24h_avg]]
+            extractor = last
+        [[pm2_51_24h_avg]]
+            extractor = last
+        [[pm2_52_24h_avg]]
+            extractor = last
+        [[pm2_53_24h_avg]]
+            extractor = last
+        [[pm2_54_24h_avg]]
+            extractor = last
+        [[pm2_55_24h_avg]]
+            extractor = last
+        [[pm4_0_24h_avg]]
+            extractor = last
+        [[pm10_0_24h_avg]]
+            extractor = last
+        [[co2_24h_avg]]
+            extractor = last
+        [[heap_free]]
+            extractor = last
+        [[wh40_batt]]
+            extractor = last
+        [[wh26_batt]]
+            extractor = last
+        [[wh25_batt]]
+            extractor = last
+        [[wh65_batt]]
+            extractor = last
+        [[wh32_batt]]
+            extractor = last
+        [[wh31_ch1_batt]]
+            extractor = last
+        [[wh31_ch2_batt]]
+            extractor = last
+        [[wh31_ch3_batt]]
+            extractor = last
+        [[wh31_ch4_batt]]
+            extractor = last
+        [[wh31_ch5_batt]]
+            extractor = last
+        [[wh31_ch6_batt]]
+            extractor = last
+        [[wh31_ch7_batt]]
+            extractor = last
+        [[wh31_ch8_batt]]
+            extractor = last
+        [[wn34_ch1_batt]]
+            extractor = last
+        [[wn34_ch2_batt]]
+            extractor = last
+        [[wn34_ch3_batt]]
+            extractor = last
+        [[wn34_ch4_batt]]
+            extractor = last
+        [[wn34_ch5_batt]]
+            extractor = last
+        [[wn34_ch6_batt]]
+            extractor = last
+        [[wn34_ch7_batt]]
+            extractor = last
+        [[wn34_ch8_batt]]
+            extractor = last
+        [[wn35_ch1_batt]]
+            extractor = last
+        [[wn35_ch2_batt]]
+            extractor = last
+        [[wn35_ch3_batt]]
+            extractor = last
+        [[wn35_ch4_batt]]
+            extractor = last
+        [[wn35_ch5_batt]]
+            extractor = last
+        [[wn35_ch6_batt]]
+            extractor = last
+        [[wn35_ch7_batt]]
+            extractor = last
+        [[wn35_ch8_batt]]
+            extractor = last
+        [[wh41_ch1_batt]]
+            extractor = last
+        [[wh41_ch2_batt]]
+            extractor = last
+        [[wh41_ch3_batt]]
+            extractor = last
+        [[wh41_ch4_batt]]
+            extractor = last
+        [[wh45_batt]]
+            extractor = last
+        [[wh46_batt]]
+            extractor = last
+        [[wh51_ch1_batt]]
+            extractor = last
+        [[wh51_ch2_batt]]
+            extractor = last
+        [[wh51_ch3_batt]]
+            extractor = last
+        [[wh51_ch4_batt]]
+            extractor = last
+        [[wh51_ch5_batt]]
+            extractor = last
+        [[wh51_ch6_batt]]
+            extractor = last
+        [[wh51_ch7_batt]]
+            extractor = last
+        [[wh51_ch8_batt]]
+            extractor = last
+        [[wh51_ch9_batt]]
+            extractor = last
+        [[wh51_ch10_batt]]
+            extractor = last
+        [[wh51_ch11_batt]]
+            extractor = last
+        [[wh51_ch12_batt]]
+            extractor = last
+        [[wh51_ch13_batt]]
+            extractor = last
+        [[wh51_ch14_batt]]
+            extractor = last
+        [[wh51_ch15_batt]]
+            extractor = last
+        [[wh51_ch16_batt]]
+            extractor = last
+        [[wh55_ch1_batt]]
+            extractor = last
+        [[wh55_ch2_batt]]
+            extractor = last
+        [[wh55_ch3_batt]]
+            extractor = last
+        [[wh55_ch4_batt]]
+            extractor = last
+        [[wh57_batt]]
+            extractor = last
+        [[wh68_batt]]
+            extractor = last
+        [[ws80_batt]]
+            extractor = last
+        [[wh40_sig]]
+            extractor = last
+        [[wh26_sig]]
+            extractor = last
+        [[wh25_sig]]
+            extractor = last
+        [[wh65_sig]]
+            extractor = last
+        [[wh32_sig]]
+            extractor = last
+        [[wh31_ch1_sig]]
+            extractor = last
+        [[wh31_ch2_sig]]
+            extractor = last
+        [[wh31_ch3_sig]]
+            extractor = last
+        [[wh31_ch4_sig]]
+            extractor = last
+        [[wh31_ch5_sig]]
+            extractor = last
+        [[wh31_ch6_sig]]
+            extractor = last
+        [[wh31_ch7_sig]]
+            extractor = last
+        [[wh31_ch8_sig]]
+            extractor = last
+        [[wn34_ch1_sig]]
+            extractor = last
+        [[wn34_ch2_sig]]
+            extractor = last
+        [[wn34_ch3_sig]]
+            extractor = last
+        [[wn34_ch4_sig]]
+            extractor = last
+        [[wn34_ch5_sig]]
+            extractor = last
+        [[wn34_ch6_sig]]
+            extractor = last
+        [[wn34_ch7_sig]]
+            extractor = last
+        [[wn34_ch8_sig]]
+            extractor = last
+        [[wn35_ch1_sig]]
+            extractor = last
+        [[wn35_ch2_sig]]
+            extractor = last
+        [[wn35_ch3_sig]]
+            extractor = last
+        [[wn35_ch4_sig]]
+            extractor = last
+        [[wn35_ch5_sig]]
+            extractor = last
+        [[wn35_ch6_sig]]
+            extractor = last
+        [[wn35_ch7_sig]]
+            extractor = last
+        [[wn35_ch8_sig]]
+            extractor = last
+        [[wh41_ch1_sig]]
+            extractor = last
+        [[wh41_ch2_sig]]
+            extractor = last
+        [[wh41_ch3_sig]]
+            extractor = last
+        [[wh41_ch4_sig]]
+            extractor = last
+        [[wh45_sig]]
+            extractor = last
+        [[wh46_sig]]
+            extractor = last
+        [[wh51_ch1_sig]]
+            extractor = last
+        [[wh51_ch2_sig]]
+            extractor = last
+        [[wh51_ch3_sig]]
+            extractor = last
+        [[wh51_ch4_sig]]
+            extractor = last
+        [[wh51_ch5_sig]]
+            extractor = last
+        [[wh51_ch6_sig]]
+            extractor = last
+        [[wh51_ch7_sig]]
+            extractor = last
+        [[wh51_ch8_sig]]
+            extractor = last
+        [[wh51_ch9_sig]]
+            extractor = last
+        [[wh51_ch10_sig]]
+            extractor = last
+        [[wh51_ch11_sig]]
+            extractor = last
+        [[wh51_ch12_sig]]
+            extractor = last
+        [[wh51_ch13_sig]]
+            extractor = last
+        [[wh51_ch14_sig]]
+            extractor = last
+        [[wh51_ch15_sig]]
+            extractor = last
+        [[wh51_ch16_sig]]
+            extractor = last
+        [[wh55_ch1_sig]]
+            extractor = last
+        [[wh55_ch2_sig]]
+            extractor = last
+        [[wh55_ch3_sig]]
+            extractor = last
+        [[wh55_ch4_sig]]
+            extractor = last
+        [[wh57_sig]]
+            extractor = last
+        [[wh68_sig]]
+            extractor = last
+        [[ws80_sig]]
+            extractor = last
+        # End GW1000 driver extractors
+    """
+
+    @property
+    def default_stanza(self):
+        return """
+    [GW1000]
+        # This section is for the GW1000 API driver.
+
+        # The driver to use:
+        driver = user.gw1000
+
+        # How often to poll the GW1000 API:
+        poll_interval = %d
+    """ % (default_poll_interval,)
+
+    def get_conf(self, orig_stanza=None):
+        """Given a configuration stanza, return a possibly modified copy
+        that will work with the current version of the device driver.
+
+        The default behavior is to return the original stanza, unmodified.
+
+        Derived classes should override this if they need to modify previous
+        configuration options or warn about deprecated or harmful options.
+
+        The return value should be a long string. See default_stanza above
+        for an example string stanza.
+        """
+
+        return self.default_stanza if orig_stanza is None else orig_stanza
+
+    def prompt_for_settings(self):
+        """Prompt for settings required for proper operation of this driver.
+
+        Returns a dict of setting, value key pairs for settings to be included
+        in the driver stanza. The _prompt() method may be used to prompt the
+        user for input with a default.
+        """
+
+        # obtain IP address
+        print()
+        print("Specify the gateway device IP address, for example: 192.168.1.100")
+        print("Set to 'auto' to autodiscover the gateway device IP address (not")
+        print("recommended for systems with more than one gateway device)")
+        ip_address = self._prompt('IP address',
+                                  dflt=self.existing_options.get('ip_address'))
+        # obtain port number
+        print()
+        print("Specify gateway device network port, for example: 45000")
+        port = self._prompt('port', dflt=self.existing_options.get('port', default_port))
+        # obtain poll interval
+        print()
+        print("Specify how often to poll the gateway API in seconds")
+        poll_interval = self._prompt('Poll interval',
+                                     dflt=self.existing_options.get('poll_interval',
+                                                                    default_poll_interval))
+        return {'ip_address': ip_address,
+                'port': port,
+                'poll_interval': poll_interval
+                }
+
+    @staticmethod
+    def modify_config(config_dict):
+        import weecfg
+
+        # set loop_on_init
+        loop_on_init_config = """loop_on_init = %d"""
+        dflt = config_dict.get('loop_on_init', '1')
+        label = """The GW1000 driver requires a network connection to the 
+gateway device. Consequently, the absence of a network connection 
+when WeeWX starts will cause WeeWX to exit and such a situation 
+can occur on system startup. The 'loop_on_init' setting can be
+used to mitigate such problems by having WeeWX retry startup 
+indefinitely. Set to '0' to attempt startup once only or '1' to 
+attempt startup indefinitely."""
+        print()
+        loop_on_init = int(weecfg.prompt_with_options(label, dflt, ['0', '1']))
+        loop_on_init_dict = configobj.ConfigObj(StringIO(loop_on_init_config % (loop_on_init,)))
+        config_dict.merge(loop_on_init_dict)
+        if len(config_dict.comments['loop_on_init']) == 0:
+            config_dict.comments['loop_on_init'] = ['',
+                                                    '# Whether to try indefinitely to load the driver']
+        print()
+
+        # set record generation to software
+        print("""Setting record_generation to software.""")
+        config_dict['StdArchive']['record_generation'] = 'software'
+        print()
+
+        # set the accumulator extractor functions
+        print("""Setting accumulator extractor functions.""")
+        # construct our default accumulator config dict
+        accum_config_dict = configobj.ConfigObj(StringIO(Gw1000ConfEditor.accum_config))
+        # merge the existing config dict into our default accumulator config
+        # dict so that we keep any changes made to [Accumulator] by the user
+        accum_config_dict.merge(config_dict)
+        # now make our updated accumulator config the config dict
+        config_dict = configobj.ConfigObj(accum_config_dict)
+
+        # we don't need weecfg anymore so remove it from memory
+        del weecfg
+        print()
+
+
+# ============================================================================
+#                          GatewayConfigurator class
+# ============================================================================
+
+class GatewayConfigurator(weewx.drivers.AbstractConfigurator):
+    """Configures the Ecowitt gateway weather station.
+
+    This class is used by wee_device when interrogating a supported Ecowitt
+    gateway device.
+
+    The Ecowitt gateway device API supports both reading and setting various
+    gateway device parameters; however, at this time the Ecowitt gateway
+    device driver only supports the reading these parameters. The Ecowitt
+    gateway device driver does not support setting these parameters, rather
+    this should be done via the Ecowitt WSView Plus app.
+
+    When used with wee_device this configurator allows station hardware
+    parameters to be displayed. The Ecowitt gateway device driver may also be
+    run directly to test the Ecowitt gateway device driver operation as well as
+    display various driver configuration options (as distinct from gateway
+    device hardware parameters).
+    """
+
+    @property
+    def description(self):
+        """Description displayed as part of wee_device help information."""
+
+        return "Read data and configuration from an Ecowitt gateway weather station."
+
+    @property
+    def usage(self):
+        """wee_device usage information."""
+        return """%prog --help
+       %prog --live-data
+            [CONFIG_FILE|--config=CONFIG_FILE]
+            [--units=us|metric|metricwx]
+            [--ip-address=IP_ADDRESS] [--port=PORT]
+            [--show-all-batt]
+            [--debug=0|1|2|3]
+       %prog --sensors
+            [CONFIG_FILE|--config=CONFIG_FILE]
+            [--ip-address=IP_ADDRESS] [--port=PORT]
+            [--show-all-batt]
+            [--debug=0|1|2|3]
+       %prog --firmware-version|--mac-address|
+            --system-params|--get-rain-data|--get-all-rain_data
+            [CONFIG_FILE|--config=CONFIG_FILE]
+            [--ip-address=IP_ADDRESS] [--port=PORT]
+            [--debug=0|1|2|3]
+       %prog --get-calibration|--get-mulch-th-cal|
+            --get-mulch-soil-cal|--get-pm25-cal|
+            --get-co2-cal
+            [CONFIG_FILE|--config=CONFIG_FILE]
+            [--ip-address=IP_ADDRESS] [--port=PORT]
+            [--debug=0|1|2|3]
+       %prog --get-services
+            [CONFIG_FILE|--config=CONFIG_FILE]
+            [--ip-address=IP_ADDRESS] [--port=PORT]
+            [--unmask] [--debug=0|1|2|3]"""
+
+    @property
+    def epilog(self):
+        """Epilog displayed as part of wee_device help information."""
+
+        return ""
+        # return "Mutating actions will request confirmation before proceeding.\n"
+
+    def add_options(self, parser):
+        """Define wee_device option parser options."""
+
+        parser.add_option('--live-data', dest='live', action='store_true',
+                          help='display device live sensor data')
+        parser.add_option('--sensors', dest='sensors', action='store_true',
+                          help='display device sensor information')
+        parser.add_option('--firmware', dest='firmware',
+                          action='store_true',
+                          help='display device firmware information')
+        parser.add_option('--mac-address', dest='mac', action='store_true',
+                          help='display device station MAC address')
+        parser.add_option('--system-params', dest='sys_params', action='store_true',
+                          help='display device system parameters')
+        parser.add_option('--get-rain-data', dest='get_rain', action='store_true',
+                          help='display device traditional rain data only')
+        parser.add_option('--get-all-rain-data', dest='get_all_rain', action='store_true',
+                          help='display device traditional, piezo and rain reset '
+                               'time data')
+        parser.add_option('--get-calibration', dest='get_calibration',
+                          action='store_true',
+                          help='display device calibration data')
+        parser.add_option('--get-mulch-th-cal', dest='get_mulch_offset',
+                          action='store_true',
+                          help='display device multi-channel temperature and '
+                               'humidity calibration data')
+        parser.add_option('--get-mulch-soil-cal', dest='get_soil_calibration',
+                          action='store_true',
+                          help='display device soil moisture calibration data')
+        parser.add_option('--get-mulch-t-cal', dest='get_temp_calibration',
+                          action='store_true',
+                          help='display device temperature (WN34) calibration data')
+        parser.add_option('--get-pm25-cal', dest='get_pm25_offset',
+                          action='store_true',
+                          help='display device PM2.5 calibration data')
+        parser.add_option('--get-co2-cal', dest='get_co2_offset',
+                          action='store_true',
+                          help='display device CO2 (WH45) calibration data')
+        parser.add_option('--get-services', dest='get_services',
+                          action='store_true',
+                          help='display device weather services configuration data')
+        parser.add_option('--ip-address', dest='ip_address',
+                          help='device IP address to use')
+        parser.add_option('--port', dest='port', type=int,
+                          help='device port to use')
+        parser.add_option('--max-tries', dest='max_tries', type=int,
+                          help='max number of attempts to contact the device')
+        parser.add_option('--retry-wait', dest='retry_wait', type=int,
+                          help='how long to wait before retrying an attempt to contact the device, '
+                          'the wait doubles with each further retry')
+        parser.add_option('--show-all-batt', dest='show_battery',
+                          action='store_true',
+                          help='show all available battery state data regardless of '
+                               'sensor state')
+        parser.add_option('--unmask', dest='unmask', action='store_true',
+                          help='unmask sensitive settings')
+        parser.add_option('--units', dest='units', metavar='UNITS', default='metric',
+                          help='unit system to use when displaying live data')
+        parser.add_option('--config', dest='config_path', metavar='CONFIG_FILE',
+                          help="use configuration file CONFIG_FILE.")
+        parser.add_option('--debug', dest='debug', type=int,
+                          help='how much status to display, 0-3')
+        parser.add_option('--yes', '-y', dest="noprompt", action="store_true",
+                          help="answer yes to every prompt")
+
+    def do_options(self, options, parser, config_dict, prompt):
+        """Process wee_device option parser options."""
+
+        # get station config dict to use
+        stn_dict = config_dict.get('GW1000', {})
+
+        # set weewx.debug as necessary
+        if options.debug is not None:
+            _debug = weeutil.weeutil.to_int(options.debug)
+        else:
+            _debug = weeutil.weeutil.to_int(config_dict.get('debug', 0))
+        weewx.debug = _debug
+        # inform the user if the debug level is 'higher' than 0
+        if _debug > 0:
+            print("debug level is '%d'" % _debug)
+
+        # Now we can set up the user customized logging, but we need to handle both
+        # v3 and v4 logging. V4 logging is very easy but v3 logging requires us to
+        # set up syslog and raise our log level based on weewx.debug
+        try:
+            # assume v 4 logging
+            weeutil.logger.setup('weewx', config_dict)
+        except AttributeError:
+            # must be v3 logging, so first set the defaults for the system logger
+            import syslog
+            syslog.openlog('weewx', syslog.LOG_PID | syslog.LOG_CONS)
+            # now raise the log level if required
+            if weewx.debug > 0:
+                syslog.setlogmask(syslog.LOG_UPTO(syslog.LOG_DEBUG))
+
+        # define custom unit settings used by the gateway driver
+        define_units()
+
+        # get a DirectGateway object
+        direct_gw = DirectGateway(options, parser, stn_dict)
+        # now let the DirectGateway object process the options
+        direct_gw.process_options()
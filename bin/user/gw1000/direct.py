@@ -0,0 +1,2491 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+direct.py
+
+Run the Ecowitt gateway driver directly from the command line.
+
+The classes and functions in this module implement the driver command line
+interface and the import of frame captures into the WeeWX archive.
+
+Copyright (C) 2020-2024 Gary Roderick                   gjroderick<at>gmail.com
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+# Python imports
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import calendar
+import errno
+import json
+import re
+import socket
+import sys
+import time
+from operator import itemgetter
+
+# Python 2/3 compatibility shims
+import six
+
+# WeeWX imports
+import weecfg
+import weeutil.weeutil
+import weewx
+import weewx.accum
+import weewx.engine
+import weewx.manager
+import weewx.units
+from weeutil.weeutil import timestamp_to_string
+
+# Ecowitt gateway driver imports
+from . import (DRIVER_NAME, DRIVER_VERSION, DebugOptions, Gateway,
+               GatewayApi, GatewayCollector, GatewayDevice, GatewayDriver,
+               GWIOError, ReplayCollector, Sensors, UnknownApiCommand,
+               default_backfill_batch_size, default_poll_interval,
+               default_port, default_show_battery, define_units, logdbg,
+               loginf, monotonic, natural_sort_keys, obfuscate)
+
+
+# ============================================================================
+#                            class CaptureImporter
+# ============================================================================
+
+class CaptureImporter(Gateway):
+    """Class to backfill a WeeWX archive from a frame capture.
+
+    A CaptureImporter object replays a frame capture as fast as possible
+    through the same parse, rain/lightning delta and field map processing used
+    by the driver to produce a stream of loop packets. The loop packets are
+    accumulated into archive records using WeeWX accumulators in the same
+    manner as WeeWX software record generation. Each archive record, rather
+    than each loop packet, is converted to the database unit system. Archive
+    records are saved to the database in batches, each
+    batch being committed in a single transaction. Archive records that
+    already exist in the database are not overwritten.
+
+    Only the archive records for intervals that contain at least one captured
+    poll are saved. Derived observations normally calculated by WeeWX services
+    (eg dewpoint) are not calculated.
+    """
+
+    def __init__(self, config_dict, path, binding='wx_binding',
+                 batch_size=default_backfill_batch_size):
+        """Initialise a CaptureImporter object."""
+
+        # obtain our gateway config, we will be replaying a capture as fast as
+        # possible
+        gw_config = dict(config_dict.get('GW1000', {}))
+        gw_config['replay_path'] = path
+        gw_config['replay_speed'] = 0
+        # get device specific debug settings
+        self.debug = DebugOptions(gw_config)
+        # now initialize my superclass
+        super(CaptureImporter, self).__init__(**gw_config)
+        self.config_dict = config_dict
+        self.binding = binding
+        self.batch_size = batch_size
+        # the archive interval to be used
+        self.archive_interval = weeutil.weeutil.to_int(config_dict.get('StdArchive', {}).get('archive_interval',
+                                                                                             300))
+        # the unit system used by the database, use the StdConvert target unit
+        # system
+        target_unit = config_dict.get('StdConvert', {}).get('target_unit', 'US')
+        self.target_unit = weewx.units.unit_constants[target_unit.upper()]
+        # set up the accumulator extractors
+        try:
+            weewx.accum.initialize(config_dict)
+        except AttributeError:
+            # WeeWX 3 does not have accumulator configuration
+            pass
+        # import statistics
+        self.packets = 0
+        self.records = 0
+        self.saved = 0
+
+    def gen_packets(self):
+        """Generator function yielding loop packets from the capture."""
+
+        collector = self.collector
+        while collector.source.next_poll():
+            try:
+                queue_data = collector.get_current_data()
+            except GWIOError:
+                # the captured poll is incomplete or invalid, skip it
+                collector.skipped += 1
+                continue
+            # if not already determined, determine which cumulative rain field
+            # will be used to determine the per period rain field
+            if not self.rain_mapping_confirmed or not self.piezo_rain_mapping_confirmed:
+                self.get_cumulative_rain_field(queue_data)
+            # get the rainfall this period from total
+            self.calculate_rain(queue_data)
+            # get the lightning strike count this period from total
+            self.calculate_lightning_count(queue_data)
+            # map the raw data to WeeWX loop packet fields, the mapped data is
+            # our loop packet
+            packet = self.map_data(queue_data)
+            # add any derived fields
+            if self.aggregator is not None:
+                packet.update(self.aggregator.update(queue_data))
+            packet['dateTime'] = queue_data['datetime']
+            yield packet
+
+    def gen_records(self):
+        """Generator function yielding archive records from the capture.
+
+        Loop packets are added to an accumulator for the archive interval that
+        includes the packet timestamp. When a packet falls outside the current
+        interval an archive record is extracted from the accumulator and
+        yielded.
+        """
+
+        accum = None
+        for packet in self.gen_packets():
+            self.packets += 1
+            if accum is None or not accum.timespan.includesArchiveTime(packet['dateTime']):
+                if accum is not None:
+                    yield self.archive_record(accum)
+                start_ts = weeutil.weeutil.startOfInterval(packet['dateTime'],
+                                                           self.archive_interval)
+                accum = weewx.accum.Accum(weeutil.weeutil.TimeSpan(start_ts,
+                                                                   start_ts + self.archive_interval))
+            try:
+                accum.addRecord(packet)
+            except weewx.accum.OutOfSpan:
+                # the capture is not in time order, skip the packet
+                logdbg("Skipping out of order packet %s" % timestamp_to_string(packet['dateTime']))
+        if accum is not None:
+            yield self.archive_record(accum)
+
+    def archive_record(self, accum):
+        """Extract an archive record from an accumulator.
+
+        The archive record is converted to the database unit system. Unit
+        conversions are linear so converting the accumulated record gives the
+        same result as converting each loop packet.
+        """
+
+        record = weewx.units.StdUnitConverters[self.target_unit].convertDict(accum.getRecord())
+        record['usUnits'] = self.target_unit
+        record['interval'] = self.archive_interval // 60
+        self.records += 1
+        return record
+
+    def run(self):
+        """Import the capture into the database.
+
+        Returns the number of archive records saved.
+        """
+
+        start = monotonic()
+        with weewx.manager.open_manager_with_config(self.config_dict,
+                                                    self.binding,
+                                                    initialize=True) as dbmanager:
+            batch = []
+            for record in self.gen_records():
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    self.save(dbmanager, batch)
+                    batch = []
+            if len(batch) > 0:
+                self.save(dbmanager, batch)
+        elapsed = monotonic() - start
+        loginf("Imported %d packets from '%s' as %d archive records (%d saved) "
+               "in %.3f seconds" % (self.packets, self.collector.path,
+                                    self.records, self.saved, elapsed))
+        return self.saved
+
+    def save(self, dbmanager, batch):
+        """Save a batch of archive records to the database.
+
+        Archive records with timestamps that already exist in the database are
+        discarded, the remaining records are saved.
+        """
+
+        sql = "SELECT dateTime FROM %s WHERE dateTime >= ? AND dateTime <= ?" % dbmanager.table_name
+        existing = set(row[0] for row in dbmanager.genSql(sql, (batch[0]['dateTime'],
+                                                                batch[-1]['dateTime'])))
+        new_records = [rec for rec in batch if rec['dateTime'] not in existing]
+        if len(new_records) > 0:
+            self.saved += dbmanager.addRecord(new_records, log_success=False) or 0
+        logdbg("Saved %d of %d archive records up to %s" % (len(new_records),
+                                                            len(batch),
+                                                            timestamp_to_string(batch[-1]['dateTime'])))
+
+
+# ============================================================================
+#                             class SessionApi
+# ============================================================================
+
+class SessionApi(GatewayApi):
+    """Class to interact with the gateway device API in a direct session.
+
+    A SessionApi object sends all API commands over a single persistent
+    connection and does not identify the device when initialised. Instead,
+    the device MAC address, model and Sensors object are each obtained from
+    the device the first time they are used, so only those API commands
+    required by the action being performed are sent. The device firmware
+    version is obtained from the device once only.
+    """
+
+    def __init__(self, **kwargs):
+        """Initialise a SessionApi object."""
+
+        # initialise our base class, but do not identify the device
+        super(SessionApi, self).__init__(identify=False, persistent=True,
+                                         **kwargs)
+        # the device firmware version, obtained when first required
+        self.firmware_version = None
+
+    def __getattr__(self, name):
+        """Obtain the device MAC address, model or Sensors object.
+
+        Only called if the attribute does not exist, ie the first time the
+        attribute is used.
+        """
+
+        if name == 'mac':
+            self.mac = self.get_mac_address()
+            return self.mac
+        elif name == 'model':
+            self.model = self.get_model_from_firmware(self.get_firmware_version())
+            return self.model
+        elif name == 'sensors':
+            self.identify_sensors()
+            return self.sensors
+        raise AttributeError("'%s' object has no attribute '%s'" % (type(self).__name__,
+                                                                    name))
+
+    def get_firmware_version(self):
+        """Get the device firmware version, the device is asked once only."""
+
+        if self.firmware_version is None:
+            self.firmware_version = super(SessionApi, self).get_firmware_version()
+        return self.firmware_version
+
+
+# ============================================================================
+#                             class DirectSession
+# ============================================================================
+
+class DirectSession(object):
+    """Class to interact with a gateway device when run directly.
+
+    Each DirectGateway action requires a handful of API commands at most. A
+    DirectSession object provides the GatewayDevice object used by an action.
+    The GatewayDevice object uses a SessionApi object, so the device is
+    contacted when the action sends its first API command, only the commands
+    the action requires are sent and all commands share one connection. A
+    GatewayCollector object using the same GatewayDevice object is available
+    for those actions that require one.
+
+    A DirectSession object may be used as a context manager, the connection
+    to the device is closed on exit.
+    """
+
+    def __init__(self, ip_address=None, port=None, show_battery=False, **kwargs):
+        """Initialise a DirectSession object.
+
+        Additional keyword arguments are passed to the SessionApi object.
+        """
+
+        self.show_battery = show_battery
+        self.api = SessionApi(ip_address=ip_address, port=port,
+                              show_battery=show_battery, **kwargs)
+        self.device = GatewayDevice(api=self.api)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def collector(self):
+        """Obtain a GatewayCollector object that uses our device."""
+
+        return GatewayCollector(device=self.device,
+                                show_battery=self.show_battery)
+
+    def close(self):
+        """Close the connection to the device."""
+
+        self.api.close()
+
+
+# ============================================================================
+#                           class LiveDataFormatter
+# ============================================================================
+
+class LiveDataFormatter(object):
+    """Class to convert and round live data for machine-readable output.
+
+    Live data obtained from a GatewayCollector object is in MetricWX units.
+    A LiveDataFormatter object converts each field to a given WeeWX unit
+    system and rounds the result to the number of decimal places normally
+    used when displaying the unit concerned. Values are not formatted as
+    strings and no unit labels are added.
+
+    The conversion and rounding used for a field is determined the first
+    time the field is seen and is then reused, so formatting a packet
+    involves no unit or formatter lookups. If the target unit system is
+    MetricWX no conversion or rounding is performed and the values are
+    passed through as received from the device.
+    """
+
+    def __init__(self, unit_system=weewx.METRICWX, obs_group_dict=None):
+        """Initialise a LiveDataFormatter object."""
+
+        # the unit system to convert to
+        self.unit_system = unit_system
+        # extend the WeeWX obs_group_dict with any additional observation
+        # groups so that gateway specific fields are converted
+        if obs_group_dict is not None:
+            weewx.units.obs_group_dict.prepend(obs_group_dict)
+        # The string formats used by WeeWX when displaying each unit. Under
+        # WeeWX v3 and v4 these are in weewx.units.default_unit_format_dict,
+        # under WeeWX v5 they are in the WeeWX defaults. Voltages are rounded
+        # to two decimal places rather than the WeeWX default of one.
+        try:
+            from weewx import defaults
+            self.unit_format_dict = dict(defaults.defaults['Units']['StringFormats'])
+        except (ImportError, AttributeError, KeyError):
+            self.unit_format_dict = {}
+        self.unit_format_dict.update(weewx.units.default_unit_format_dict)
+        self.unit_format_dict['volt'] = '%.2f'
+        # per-field conversion functions, populated as each field is seen
+        self.field_formatters = {}
+
+    def format(self, data):
+        """Convert and round the fields in a live data dict.
+
+        Returns a new dict, the data dict is not altered.
+        """
+
+        result = {}
+        for field, value in six.iteritems(data):
+            try:
+                formatter = self.field_formatters[field]
+            except KeyError:
+                formatter = self.field_formatters[field] = self.get_formatter(field)
+            result[field] = formatter(value) if value is not None else None
+        return result
+
+    def get_formatter(self, field):
+        """Obtain a function to convert and round a given field."""
+
+        if self.unit_system == weewx.METRICWX:
+            return self.identity
+        from_unit, group = weewx.units.getStandardUnitType(weewx.METRICWX, field)
+        to_unit, group = weewx.units.getStandardUnitType(self.unit_system, field)
+        if from_unit is None or to_unit is None:
+            # the field does not belong to a unit group, eg a timestamp
+            return self.identity
+        if from_unit == to_unit:
+            convert = self.identity
+        else:
+            convert = weewx.units.conversionDict.get(from_unit, {}).get(to_unit,
+                                                                        self.identity)
+        places = self.decimal_places(self.unit_format_dict.get(to_unit))
+        if places is None:
+            return convert
+        elif places == 0:
+            return lambda value: int(round(convert(value)))
+        return lambda value: round(convert(value), places)
+
+    @staticmethod
+    def decimal_places(format_string):
+        """Obtain the number of decimal places used by a string format.
+
+        Returns None if the number of decimal places cannot be determined.
+        """
+
+        if format_string is None:
+            return None
+        match = re.search(r'\.(\d+)f', format_string)
+        if match is not None:
+            return int(match.group(1))
+        if format_string.endswith('d'):
+            return 0
+        return None
+
+    @staticmethod
+    def identity(value):
+        """Return a value unchanged."""
+
+        return value
+
+
+# ============================================================================
+#                             class DirectGateway
+# ============================================================================
+
+class DirectGateway(object):
+    """Class to interact with gateway driver when run directly.
+
+    Would normally run a driver directly by calling from main() only, but when
+    run directly the gateway driver has many options so pushing the detail into
+    its own class/object makes sense. Also simplifies some test suite
+    routines/calls.
+
+    A DirectGateway object is created with just an optparse options dict and a
+    standard WeeWX station dict. Once created the DirectGateway()
+    process_options() method is called to process the respective command line
+    options.
+    """
+
+    # gateway direct observation group dict, this maps all device 'fields' to a 
+    # WeeWX unit group
+    gw_direct_obs_group_dict = {
+        'intemp': 'group_temperature',
+        'outtemp': 'group_temperature',
+        'dewpoint': 'group_temperature',
+        'windchill': 'group_temperature',
+        'heatindex': 'group_temperature',
+        'inhumid': 'group_percent',
+        'outhumid': 'group_percent',
+        'absbarometer': 'group_pressure',
+        'relbarometer': 'group_pressure',
+        'light': 'group_illuminance',
+        'uv': 'group_radiation',
+        'uvi': 'group_uv',
+        'datetime': 'group_time',
+        'temp1': 'group_temperature',
+        'temp2': 'group_temperature',
+        'temp3': 'group_temperature',
+        'temp4': 'group_temperature',
+        'temp5': 'group_temperature',
+        'temp6': 'group_temperature',
+        'temp7': 'group_temperature',
+        'temp8': 'group_temperature',
+        'temp9': 'group_temperature',
+        'temp10': 'group_temperature',
+        'temp11': 'group_temperature',
+        'temp12': 'group_temperature',
+        'temp13': 'group_temperature',
+        'temp14': 'group_temperature',
+        'temp15': 'group_temperature',
+        'temp16': 'group_temperature',
+        'temp17': 'group_temperature',
+        'humid1': 'group_percent',
+        'humid2': 'group_percent',
+        'humid3': 'group_percent',
+        'humid4': 'group_percent',
+        'humid5': 'group_percent',
+        'humid6': 'group_percent',
+        'humid7': 'group_percent',
+        'humid8': 'group_percent',
+        'humid17': 'group_percent',
+        'pm1': 'group_concentration',
+        'pm251': 'group_concentration',
+        'pm252': 'group_concentration',
+        'pm253': 'group_concentration',
+        'pm254': 'group_concentration',
+        'pm255': 'group_concentration',
+        'pm4': 'group_concentration',
+        'pm10': 'group_concentration',
+        'co2': 'group_fraction',
+        'soiltemp1': 'group_temperature',
+        'soilmoist1': 'group_percent',
+        'soiltemp2': 'group_temperature',
+        'soilmoist2': 'group_percent',
+        'soiltemp3': 'group_temperature',
+        'soilmoist3': 'group_percent',
+        'soiltemp4': 'group_temperature',
+        'soilmoist4': 'group_percent',
+        'soiltemp5': 'group_temperature',
+        'soilmoist5': 'group_percent',
+        'soiltemp6': 'group_temperature',
+        'soilmoist6': 'group_percent',
+        'soiltemp7': 'group_temperature',
+        'soilmoist7': 'group_percent',
+        'soiltemp8': 'group_temperature',
+        'soilmoist8': 'group_percent',
+        'soiltemp9': 'group_temperature',
+        'soilmoist9': 'group_percent',
+        'soiltemp10': 'group_temperature',
+        'soilmoist10': 'group_percent',
+        'soiltemp11': 'group_temperature',
+        'soilmoist11': 'group_percent',
+        'soiltemp12': 'group_temperature',
+        'soilmoist12': 'group_percent',
+        'soiltemp13': 'group_temperature',
+        'soilmoist13': 'group_percent',
+        'soiltemp14': 'group_temperature',
+        'soilmoist14': 'group_percent',
+        'soiltemp15': 'group_temperature',
+        'soilmoist15': 'group_percent',
+        'soiltemp16': 'group_temperature',
+        'soilmoist16': 'group_percent',
+        'pm1_24h_avg': 'group_concentration',
+        'pm251_24h_avg': 'group_concentration',
+        'pm252_24h_avg': 'group_concentration',
+        'pm253_24h_avg': 'group_concentration',
+        'pm254_24h_avg': 'group_concentration',
+        'pm255_24h_avg': 'group_concentration',
+        'pm4_24h_avg': 'group_concentration',
+        'pm10_24h_avg': 'group_concentration',
+        'co2_24h_avg': 'group_fraction',
+        'leak1': 'group_count',
+        'leak2': 'group_count',
+        'leak3': 'group_count',
+        'leak4': 'group_count',
+        'lightningdist': 'group_distance',
+        'lightningdettime': 'group_time',
+        'lightning_strike_count': 'group_count',
+        'lightningcount': 'group_count',
+        't_rain': 'group_rain',
+        't_rainevent': 'group_rain',
+        't_rainrate': 'group_rainrate',
+        't_rainday': 'group_rain',
+        't_rainweek': 'group_rain',
+        't_rainmonth': 'group_rain',
+        't_rainyear': 'group_rain',
+        't_raintotals': 'group_rain',
+        'p_rain': 'group_rain',
+        'p_rainevent': 'group_rain',
+        'p_rainrate': 'group_rainrate',
+        'p_rainday': 'group_rain',
+        'p_rainweek': 'group_rain',
+        'p_rainmonth': 'group_rain',
+        'p_rainyear': 'group_rain',
+        'winddir': 'group_direction',
+        'windspeed': 'group_speed',
+        'gustspeed': 'group_speed',
+        'daymaxwind': 'group_speed',
+        'leafwet1': 'group_percent',
+        'leafwet2': 'group_percent',
+        'leafwet3': 'group_percent',
+        'leafwet4': 'group_percent',
+        'leafwet5': 'group_percent',
+        'leafwet6': 'group_percent',
+        'leafwet7': 'group_percent',
+        'leafwet8': 'group_percent',
+        'heap_free': 'group_data',
+        'wh40_batt': 'group_volt',
+        'wh26_batt': 'group_count',
+        'wh25_batt': 'group_count',
+        'wh24_batt': 'group_count',
+        'wh65_batt': 'group_count',
+        'wh32_batt': 'group_count',
+        'wh31_ch1_batt': 'group_count',
+        'wh31_ch2_batt': 'group_count',
+        'wh31_ch3_batt': 'group_count',
+        'wh31_ch4_batt': 'group_count',
+        'wh31_ch5_batt': 'group_count',
+        'wh31_ch6_batt': 'group_count',
+        'wh31_ch7_batt': 'group_count',
+        'wh31_ch8_batt': 'group_count',
+        'wn34_ch1_batt': 'group_volt',
+        'wn34_ch2_batt': 'group_volt',
+        'wn34_ch3_batt': 'group_volt',
+        'wn34_ch4_batt': 'group_volt',
+        'wn34_ch5_batt': 'group_volt',
+        'wn34_ch6_batt': 'group_volt',
+        'wn34_ch7_batt': 'group_volt',
+        'wn34_ch8_batt': 'group_volt',
+        'wn35_ch1_batt': 'group_volt',
+        'wn35_ch2_batt': 'group_volt',
+        'wn35_ch3_batt': 'group_volt',
+        'wn35_ch4_batt': 'group_volt',
+        'wn35_ch5_batt': 'group_volt',
+        'wn35_ch6_batt': 'group_volt',
+        'wn35_ch7_batt': 'group_volt',
+        'wn35_ch8_batt': 'group_volt',
+        'wh41_ch1_batt': 'group_count',
+        'wh41_ch2_batt': 'group_count',
+        'wh41_ch3_batt': 'group_count',
+        'wh41_ch4_batt': 'group_count',
+        'wh45_batt': 'group_count',
+        'wh46_batt': 'group_count',
+        'wh51_ch1_batt': 'group_volt',
+        'wh51_ch2_batt': 'group_volt',
+        'wh51_ch3_batt': 'group_volt',
+        'wh51_ch4_batt': 'group_volt',
+        'wh51_ch5_batt': 'group_volt',
+        'wh51_ch6_batt': 'group_volt',
+        'wh51_ch7_batt': 'group_volt',
+        'wh51_ch8_batt': 'group_volt',
+        'wh51_ch9_batt': 'group_volt',
+        'wh51_ch10_batt': 'group_volt',
+        'wh51_ch11_batt': 'group_volt',
+        'wh51_ch12_batt': 'group_volt',
+        'wh51_ch13_batt': 'group_volt',
+        'wh51_ch14_batt': 'group_volt',
+        'wh51_ch15_batt': 'group_volt',
+        'wh51_ch16_batt': 'group_volt',
+        'wh55_ch1_batt': 'group_count',
+        'wh55_ch2_batt': 'group_count',
+        'wh55_ch3_batt': 'group_count',
+        'wh55_ch4_batt': 'group_count',
+        'wh57_batt': 'group_count',
+        'wh68_batt': 'group_volt',
+        'ws80_batt': 'group_volt',
+        'ws85_batt': 'group_volt',
+        'ws90_batt': 'group_volt',
+        'wh40_sig': 'group_count',
+        'wh26_sig': 'group_count',
+        'wh25_sig': 'group_count',
+        'wh24_sig': 'group_count',
+        'wh65_sig': 'group_count',
+        'wh32_sig': 'group_count',
+        'wh31_ch1_sig': 'group_count',
+        'wh31_ch2_sig': 'group_count',
+        'wh31_ch3_sig': 'group_count',
+        'wh31_ch4_sig': 'group_count',
+        'wh31_ch5_sig': 'group_count',
+        'wh31_ch6_sig': 'group_count',
+        'wh31_ch7_sig': 'group_count',
+        'wh31_ch8_sig': 'group_count',
+        'wn34_ch1_sig': 'group_count',
+        'wn34_ch2_sig': 'group_count',
+        'wn34_ch3_sig': 'group_count',
+        'wn34_ch4_sig': 'group_count',
+        'wn34_ch5_sig': 'group_count',
+        'wn34_ch6_sig': 'group_count',
+        'wn34_ch7_sig': 'group_count',
+        'wn34_ch8_sig': 'group_count',
+        'wn35_ch1_sig': 'group_count',
+        'wn35_ch2_sig': 'group_count',
+        'wn35_ch3_sig': 'group_count',
+        'wn35_ch4_sig': 'group_count',
+        'wn35_ch5_sig': 'group_count',
+        'wn35_ch6_sig': 'group_count',
+        'wn35_ch7_sig': 'group_count',
+        'wn35_ch8_sig': 'group_count',
+        'wh41_ch1_sig': 'group_count',
+        'wh41_ch2_sig': 'group_count',
+        'wh41_ch3_sig': 'group_count',
+        'wh41_ch4_sig': 'group_count',
+        'wh45_sig': 'group_count',
+        'wh46_sig': 'group_count',
+        'wh51_ch1_sig': 'group_count',
+        'wh51_ch2_sig': 'group_count',
+        'wh51_ch3_sig': 'group_count',
+        'wh51_ch4_sig': 'group_count',
+        'wh51_ch5_sig': 'group_count',
+        'wh51_ch6_sig': 'group_count',
+        'wh51_ch7_sig': 'group_count',
+        'wh51_ch8_sig': 'group_count',
+        'wh51_ch9_sig': 'group_count',
+        'wh51_ch10_sig': 'group_count',
+        'wh51_ch11_sig': 'group_count',
+        'wh51_ch12_sig': 'group_count',
+        'wh51_ch13_sig': 'group_count',
+        'wh51_ch14_sig': 'group_count',
+        'wh51_ch15_sig': 'group_count',
+        'wh51_ch16_sig': 'group_count',
+        'wh55_ch1_sig': 'group_count',
+        'wh55_ch2_sig': 'group_count',
+        'wh55_ch3_sig': 'group_count',
+        'wh55_ch4_sig': 'group_count',
+        'wh57_sig': 'group_count',
+        'wh68_sig': 'group_count',
+        'ws80_sig': 'group_count',
+        'ws85_sig': 'group_count',
+        'ws90_sig': 'group_count'
+    }
+    # list of sensors to be displayed in the sensor ID output
+    sensors_list = []
+
+    def __init__(self, opts, parser, stn_dict, config_dict=None):
+        """Initialise a DirectGateway object."""
+
+        # save the optparse options and station dict
+        self.opts = opts
+        self.parser = parser
+        self.stn_dict = stn_dict
+        # save the full config dict, it is only required by some actions
+        self.config_dict = config_dict
+        # obtain the IP address and port number to use
+        self.ip_address = self.ip_from_config_opts()
+        self.port = self.port_from_config_opts()
+        # do we filter battery state data
+        self.show_battery = self.show_battery_from_config_opts()
+        # the DirectSession object used to interact with the device, obtained
+        # when first required
+        self.direct_session = None
+
+    @property
+    def session(self):
+        """The DirectSession object used to interact with the device."""
+
+        if self.direct_session is None:
+            self.direct_session = DirectSession(ip_address=self.ip_address,
+                                                port=self.port,
+                                                show_battery=self.show_battery)
+        return self.direct_session
+
+    def ip_from_config_opts(self):
+        """Obtain the IP address from station config or command line options.
+
+        Determine the IP address to use given a station config dict and command
+        line options. The IP address is chosen as follows:
+        - if specified use the IP address from the command line
+        - if an IP address was not specified on the command line obtain the IP
+          address from the station config dict
+        - if the station config dict does not specify an IP address, or if it
+          is set to 'auto', return None to force device discovery
+        """
+
+        # obtain an IP address from the command line options
+        ip_address = self.opts.ip_address if self.opts.ip_address else None
+        # if we didn't get an IP address check the station config dict
+        if ip_address is None:
+            # obtain the IP address from the station config dict
+            ip_address = self.stn_dict.get('ip_address')
+            # if the station config dict specifies some variation of 'auto'
+            # then we need to return None to force device discovery
+            if ip_address is not None:
+                # do we have a variation of 'auto'
+                if ip_address.lower() == 'auto':
+                    # we need to autodetect IP address so set to None
+                    ip_address = None
+                    if weewx.debug >= 1:
+                        print()
+                        print("IP address to be obtained by discovery")
+                else:
+                    if weewx.debug >= 1:
+                        print()
+                        print("IP address obtained from station config")
+            else:
+                if weewx.debug >= 1:
+                    print()
+                    print("IP address to be obtained by discovery")
+        else:
+            if weewx.debug >= 1:
+                print()
+                print("IP address obtained from command line options")
+        return ip_address
+
+    def port_from_config_opts(self):
+        """Obtain the port from station config or command line options.
+
+        Determine the port to use given a station config dict and command
+        line options. The port is chosen as follows:
+        - if specified use the port from the command line
+        - if a port was not specified on the command line obtain the port from
+          the station config dict
+        - if the station config dict does not specify a port use the default
+          45000
+        """
+
+        # obtain a port number from the command line options
+        port = self.opts.port if self.opts.port else None
+        # if we didn't get a port number check the station config dict
+        if port is None:
+            # obtain the port number from the station config dict
+            port = self.stn_dict.get('port')
+            # if a port number was specified it needs to be an integer not a
+            # string so try to do the conversion
+            try:
+                port = int(port)
+            except (TypeError, ValueError):
+                # If a TypeError then most likely port somehow ended up being
+                # None. If a ValueError then we couldn't convert the port
+                # number to an integer, maybe it was because it was 'auto'
+                # (or some variation) or perhaps it was invalid. Regardless of
+                # the error we need to set port to None to force discovery.
+                port = default_port
+                if weewx.debug >= 1:
+                    print("Port number set to default port number")
+            else:
+                if weewx.debug >= 1:
+                    print("Port number obtained from station config")
+        else:
+            if weewx.debug >= 1:
+                print("Port number obtained from command line options")
+        return port
+
+    def show_battery_from_config_opts(self):
+        """Determine whether to filter nonsense battery state data.
+
+        Determine the whether to filter nonsense battery state data given a
+        station config dict and command line options. The decision to filter is
+        made as follows:
+        - if specified use the show_battery option from the command line
+        - if show_battery was not specified on the command line obtain the
+          show_battery option from the station config dict
+        - if the station config dict does not specify show_battery use the
+          default value False
+        """
+
+        # obtain the show_battery value from the command line options if it
+        # exists
+        show_battery = self.opts.show_battery if self.opts.show_battery else None
+        # if we didn't get a show_battery value check the station config dict
+        if show_battery is None:
+            # obtain the show_battery value from the station config dict, try
+            # to convert it to a Boolean, if it fails be prepared to catch the
+            # ValueError from tobool() and use the default
+            try:
+                show_battery = weeutil.weeutil.tobool(self.stn_dict.get('show_battery'))
+            except ValueError:
+                # we could not get show_battery from the stn_dict so use the default
+                show_battery = default_show_battery
+                if weewx.debug >= 1:
+                    print("Battery state filtering is '%s' (using the default)" % show_battery)
+            else:
+                if weewx.debug >= 1:
+                    print("Port number obtained from station config")
+                    print("Battery state filtering is '%s' (obtained from station config)" % show_battery)
+        else:
+            if weewx.debug >= 1:
+                print("Battery state filtering is '%s' (obtained from command line options)" % show_battery)
+        return show_battery
+
+    def process_options(self):
+        """Call the appropriate method based on the optparse options."""
+
+        # run the driver
+        if hasattr(self.opts, 'test_driver') and self.opts.test_driver:
+            self.test_driver()
+        # run the service with simulator
+        elif hasattr(self.opts, 'test_service') and self.opts.test_service:
+            self.test_service()
+        elif hasattr(self.opts, 'backfill') and self.opts.backfill:
+            self.backfill()
+        elif hasattr(self.opts, 'sys_params') and self.opts.sys_params:
+            self.system_params()
+        elif hasattr(self.opts, 'get_rain') and self.opts.get_rain:
+            self.get_rain_data()
+        elif hasattr(self.opts, 'get_all_rain') and self.opts.get_all_rain:
+            self.get_all_rain_data()
+        elif hasattr(self.opts, 'get_mulch_offset') and self.opts.get_mulch_offset:
+            self.get_mulch_offset()
+        elif hasattr(self.opts, 'get_temp_calibration') and self.opts.get_temp_calibration:
+            self.get_mulch_t_offset()
+        elif hasattr(self.opts, 'get_pm25_offset') and self.opts.get_pm25_offset:
+            self.get_pm25_offset()
+        elif hasattr(self.opts, 'get_co2_offset') and self.opts.get_co2_offset:
+            self.get_co2_offset()
+        elif hasattr(self.opts, 'get_calibration') and self.opts.get_calibration:
+            self.get_calibration()
+        elif hasattr(self.opts, 'get_soil_calibration') and self.opts.get_soil_calibration:
+            self.get_soil_calibration()
+        elif hasattr(self.opts, 'get_services') and self.opts.get_services:
+            self.get_services()
+        elif hasattr(self.opts, 'mac') and self.opts.mac:
+            # TODO. Rename to remove 'station' ?
+            self.station_mac()
+        elif hasattr(self.opts, 'firmware') and self.opts.firmware:
+            self.firmware()
+        elif hasattr(self.opts, 'sensors') and self.opts.sensors:
+            self.sensors()
+        elif hasattr(self.opts, 'live') and self.opts.live:
+            self.live_data()
+        elif hasattr(self.opts, 'discover') and self.opts.discover:
+            self.discover()
+        elif hasattr(self.opts, 'map') and self.opts.map:
+            self.field_map()
+        elif hasattr(self.opts, 'driver_map') and self.opts.driver_map:
+            self.driver_field_map()
+        elif hasattr(self.opts, 'sys_service_mapparams') and self.opts.service_map:
+            self.service_field_map()
+        else:
+            print()
+            print("No option selected, nothing done")
+            print()
+            self.parser.print_help()
+            return
+        # close the connection to the device if the action used one
+        if self.direct_session is not None:
+            self.direct_session.close()
+
+    def system_params(self):
+        """Display system parameters.
+
+        Obtain and display the gateway device system parameters. Device IP
+        address and port are derived (in order) as follows:
+        1. command line --ip-address and --port parameters
+        2. [GW1000] stanza in the specified config file
+        3. by discovery
+        """
+
+        # dict for decoding system parameters frequency byte, at present all we
+        # know is 0 = 433MHz
+        freq_decode = {
+            0: '433MHz',
+            1: '868Mhz',
+            2: '915MHz',
+            3: '920MHz'
+        }
+        temperature_comp_decode = {
+            0: 'off',
+            1: 'on'
+        }
+        # wrap in a try..except in case there is an error
+        try:
+            # get a GatewayDevice object from our direct session
+            device = self.session.device
+            # identify the device being used
+            print()
+            print("Interrogating %s at %s:%d" % (device.model,
+                                                 device.ip_address.decode(),
+                                                 device.port))
+            # get the device system_params property
+            sys_params_dict = device.system_params
+            # we need the radiation compensation setting which according to the
+            # v1.6.9 API documentation resides in field 7B, but bizarrely is
+            # only available via the CMD_READ_RAIN API command. CMD_READ_RAIN
+            # is a relatively new command so wrap in a try..except just in
+            # case.
+            try:
+                _rain_data = device.rain
+            except GWIOError:
+                temperature_comp = None
+            else:
+                temperature_comp = _rain_data.get('temperature_comp')
+        except GWIOError as e:
+            print()
+            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
+        except socket.timeout:
+            print()
+            print("Timeout. Device at %s did not respond." % (self.ip_address,))
+        else:
+            # create a meaningful string for frequency representation
+            freq_str = freq_decode.get(sys_params_dict['frequency'], 'Unknown')
+            # if sensor_type is 0 there is a WH24 connected, if it's a 1 there
+            # is a WH65
+            _is_wh24 = sys_params_dict['sensor_type'] == 0
+            # string to use in sensor type message
+            _sensor_type_str = 'WH24' if _is_wh24 else 'WH65'
+            # print the system parameters
+            print()
+            print("%26s: %s (%s)" % ('sensor type',
+                                     sys_params_dict['sensor_type'],
+                                     _sensor_type_str))
+            print("%26s: %s (%s)" % ('frequency',
+                                     sys_params_dict['frequency'],
+                                     freq_str))
+            if temperature_comp is not None:
+                print("%26s: %s (%s)" % ('Temperature Compensation',
+                                         temperature_comp,
+                                         temperature_comp_decode.get(temperature_comp, 'unknown')))
+            else:
+                print("%26s: unavailable" % 'Temperature Compensation')
+
+            # The gateway API returns what is labelled "UTC" but is in fact the
+            # current epoch timestamp adjusted by the station timezone offset.
+            # So when the timestamp is converted to a human-readable GMT
+            # date-time string it in fact shows the local date-time. We can
+            # work around this by formatting this offset UTC time stamp as a
+            # UTC date-time but then calling it local time. ideally we would
+            # re-adjust to remove the timezone offset to get the real
+            # (unadjusted) epoch timestamp but since the timezone index is
+            # stored as an arbitrary number rather than an offset in seconds
+            # this is not possible. We can only do what we can.
+            date_time_str = time.strftime("%-d %B %Y %H:%M:%S",
+                                          time.gmtime(sys_params_dict['utc']))
+            print("%26s: %s" % ('date-time', date_time_str))
+            print("%26s: %s" % ('timezone index', sys_params_dict['timezone_index']))
+            print("%26s: %s" % ('DST status', sys_params_dict['dst_status']))
+
+    def get_rain_data(self):
+        """Display the device rain data.
+
+        Obtain and display the device rain data. The device IP address and port
+        are derived (in order) as follows:
+        1. command line --ip-address and --port parameters
+        2. [GW1000] stanza in the specified config file
+        3. by discovery
+        """
+
+        # wrap in a try..except in case there is an error
+        try:
+            # get a GatewayDevice object from our direct session
+            device = self.session.device
+            # identify the device being used
+            print()
+            print("Interrogating %s at %s:%d" % (device.model,
+                                                 device.ip_address.decode(),
+                                                 device.port))
+            # get the device objects raindata property
+            rain_data = device.raindata
+        except GWIOError as e:
+            print()
+            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
+        except socket.timeout:
+            print()
+            print("Timeout. Device at %s did not respond." % (self.ip_address,))
+        else:
+            print()
+            print("%10s: %.1f mm/%.1f in" % ('Rain rate', rain_data['t_rainrate'], rain_data['t_rainrate'] / 25.4))
+            print("%10s: %.1f mm/%.1f in" % ('Day rain', rain_data['t_rainday'], rain_data['t_rainday'] / 25.4))
+            print("%10s: %.1f mm/%.1f in" % ('Week rain', rain_data['t_rainweek'], rain_data['t_rainweek'] / 25.4))
+            print("%10s: %.1f mm/%.1f in" % ('Month rain', rain_data['t_rainmonth'], rain_data['t_rainmonth'] / 25.4))
+            print("%10s: %.1f mm/%.1f in" % ('Year rain', rain_data['t_rainyear'], rain_data['t_rainyear'] / 25.4))
+
+    def get_all_rain_data(self):
+        """Display the device rain data including piezo data.
+
+        Obtain and display the device rain data including piezo data. The
+        CMD_READ_RAIN API command is used to obtain the device data, this
+        command returns rain data from the device for both traditional and
+        piezo rain gauges.
+
+        The device address and port are derived (in order) as follows:
+        1. command line --ip-address and --port parameters
+        2. [GW1000] stanza in the specified config file
+        3. by discovery
+
+        Note. Early testing showed the CMD_READ_RAIN command returned data for
+        the piezo gauge only. This may be due to the system under test (it only
+        had a piezo rain gauge) or it may be an issue with the v2.1.3 device
+        firmware.
+        """
+
+        traditional = ['t_rainrate', 't_rainevent', 't_rainday',
+                       't_rainweek', 't_rainmonth', 't_rainyear']
+        piezo = ['p_rainrate', 'p_event', 'p_day', 'p_week', 'p_month', 'p_year',
+                 'gain1', 'gain2', 'gain3', 'gain4', 'gain5']
+        reset = ['day_reset', 'week_reset', 'annual_reset']
+        source_lookup = {0: 'No selection',
+                         1: 'Traditional rain gauge',
+                         2: 'Piezoelectric rain gauge'
+                         }
+        # wrap in a try..except in case there is an error
+        try:
+            # get a GatewayDevice object from our direct session
+            device = self.session.device
+            # identify the device being used
+            print()
+            print("Interrogating %s at %s:%d" % (device.model,
+                                                 device.ip_address.decode(),
+                                                 device.port))
+            # get the rain data from the device object. First try to get
+            # all_rain_data but be prepared to catch the exception if our
+            # device does not support CMD_READ_RAIN. In that case fall back to
+            # the rain_data property instead.
+            try:
+                rain_data = device.rain
+                loginf(rain_data)
+            except UnknownApiCommand:
+                # use the rain_data property
+                rain_data = device.raindata
+        except GWIOError as e:
+            print()
+            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
+        except socket.timeout:
+            print()
+            print("Timeout. Device at %s did not respond." % (self.ip_address,))
+        else:
+            print()
+            if 'rain_priority' in rain_data:
+                print("    Rainfall data priority: %s" % source_lookup.get(rain_data['rain_priority'],
+                                                                           "unknown selection"))
+                print()
+            if any(field in rain_data for field in traditional):
+                print("    Traditional rain data:")
+                _data = rain_data.get('t_rainrate')
+                _data_str = "%.1fmm/hr (%.1fin/hr)" % (_data, _data / 25.4) if _data is not None else "---mm/hr (---in/hr)"
+                print("%30s: %s)" % ('Rain rate', _data_str))
+                _data = rain_data.get('t_rainevent')
+                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
+                print("%30s: %s" % ('Event rain', _data_str))
+                _data = rain_data.get('t_rainday')
+                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
+                print("%30s: %s" % ('Daily rain', _data_str))
+                _data = rain_data.get('t_rainweek')
+                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
+                print("%30s: %s" % ('Weekly rain', _data_str))
+                _data = rain_data.get('t_rainmonth')
+                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
+                print("%30s: %s" % ('Monthly rain', _data_str))
+                _data = rain_data.get('t_rainyear')
+                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
+                print("%30s: %s" % ('Yearly rain', _data_str))
+                _data = rain_data.get('t_raingain')
+                _data_str = "%.2f" % _data / 100.0 if _data is not None else "---"
+                print("%30s: %s" % ('Rain gain', _data_str))
+            else:
+                print("    No traditional rain data available")
+            print()
+            if any(field in rain_data for field in piezo):
+                print("    Piezo rain data:")
+                _data = rain_data.get('p_rainrate')
+                _data_str = "%.1fmm/hr (%.1fin/hr)" % (_data, _data / 25.4) if _data is not None else "---mm/hr (---in/hr)"
+                print("%30s: %s)" % ('Rain rate', _data_str))
+                _data = rain_data.get('p_rainevent')
+                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
+                print("%30s: %s" % ('Event rain', _data_str))
+                _data = rain_data.get('p_rainday')
+                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
+                print("%30s: %s" % ('Daily rain', _data_str))
+                _data = rain_data.get('p_rainweek')
+                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
+                print("%30s: %s" % ('Weekly rain', _data_str))
+                _data = rain_data.get('p_rainmonth')
+                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
+                print("%30s: %s" % ('Monthly rain', _data_str))
+                _data = rain_data.get('p_rainyear')
+                _data_str = "%.1fmm (%.1fin)" % (_data, _data / 25.4) if _data is not None else "---mm (---in)"
+                print("%30s: %s" % ('Yearly rain', _data_str))
+                print("%30s: %.2f (%s)" % ('Rain1 gain', rain_data.get('gain1', '--'), '< 4mm/h'))
+                print("%30s: %.2f (%s)" % ('Rain2 gain', rain_data.get('gain2', '--'), '< 10mm/h'))
+                print("%30s: %.2f (%s)" % ('Rain3 gain', rain_data.get('gain3', '--'), '< 30mm/h'))
+                print("%30s: %.2f (%s)" % ('Rain4 gain', rain_data.get('gain4', '--'), '< 60mm/h'))
+                print("%30s: %.2f (%s)" % ('Rain5 gain', rain_data.get('gain5', '--'), '> 60mm/h'))
+            else:
+                print("    No piezo rain data available")
+            print()
+            if any(field in rain_data for field in reset):
+                print("    Rainfall reset time data:")
+                print("%30s: 0%d:00" % ('Daily rainfall reset time', rain_data.get('day_reset', '-----')))
+                _data = rain_data.get('week_reset')
+                _data_str = "%s" % calendar.day_name[(_data + 6) % 7] if _data is not None else "-----"
+                print("%30s: %s" % ('Weekly rainfall reset time', _data_str))
+                _data = rain_data.get('annual_reset')
+                _data_str = "%s" % calendar.month_name[_data + 1] if _data is not None else "-----"
+                print("%30s: %s" % ('Annual rainfall reset time', calendar.month_name[rain_data['annual_reset'] + 1]))
+            else:
+                print("    No rainfall reset time data available")
+
+    def get_mulch_offset(self):
+        """Display device multichannel temperature and humidity offset data.
+
+        Obtain and display the multichannel temperature and humidity offset
+        data from the selected device. The device IP address and port are
+        derived (in order) as follows:
+        1. command line --ip-address and --port parameters
+        2. [GW1000] stanza in the specified config file
+        3. by discovery
+        """
+
+        # wrap in a try..except in case there is an error
+        try:
+            # get a GatewayDevice object from our direct session
+            device = self.session.device
+            # identify the device being used
+            print()
+            print("Interrogating %s at %s:%d" % (device.model,
+                                                 device.ip_address.decode(),
+                                                 device.port))
+            # get the mulch offset data from the API
+            mulch_offset_data = device.api.get_mulch_offset()
+        except GWIOError as e:
+            print()
+            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
+        except socket.timeout:
+            print()
+            print("Timeout. Device at %s did not respond." % (self.ip_address,))
+        else:
+            # did we get any mulch offset data
+            if mulch_offset_data is not None:
+                # now format and display the data
+                print()
+                print("Multi-channel Temperature and Humidity Calibration")
+                # iterate over each channel for which we have data
+                for channel in mulch_offset_data:
+                    # print the channel and offset data
+                    mulch_str = "    Channel %d: Temperature offset: %5s Humidity offset: %3s"
+                    # the API returns channels starting at 0, but the WS View
+                    # app displays channels starting at 1, so add 1 to our
+                    # channel number
+                    print(mulch_str % (channel + 1,
+                                       "%2.1f" % mulch_offset_data[channel]['temp'],
+                                       "%d" % mulch_offset_data[channel]['hum']))
+            else:
+                print()
+                print("Device at %s did not respond." % (self.ip_address,))
+
+    def get_mulch_t_offset(self):
+        """Display device multichannel temperature (WN34) offset data.
+
+        Obtain and display the multichannel temperature (WN34) offset data from
+        the selected device. The device IP address and port are derived (in
+        order) as follows:
+        1. command line --ip-address and --port parameters
+        2. [GW1000] stanza in the specified config file
+        3. by discovery
+        """
+
+        # wrap in a try..except in case there is an error
+        try:
+            # get a GatewayDevice object from our direct session
+            device = self.session.device
+            # identify the device being used
+            print()
+            print("Interrogating %s at %s:%d" % (device.model,
+                                                 device.ip_address.decode(),
+                                                 device.port))
+            # get the mulch temp offset data via the API
+            mulch_t_offset_data = device.mulch_t_offset
+        except GWIOError as e:
+            print()
+            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
+        except socket.timeout:
+            print()
+            print("Timeout. Device at %s did not respond." % (self.ip_address,))
+        else:
+            # did we get any mulch temp offset data
+            if mulch_t_offset_data is not None:
+                print()
+                print("Multi-channel Temperature Calibration")
+                # do we have any results to display?
+                if len(mulch_t_offset_data) > 0:
+                    # we have results, now format and display the data
+                    # iterate over each channel for which we have data
+                    for channel in mulch_t_offset_data:
+                        # print the channel and offset data
+                        mulch_str = "    Channel %d: Temperature offset: %5s"
+                        # the API returns channels starting at 0x63, but the WSView
+                        # Plus app displays channels starting at 1, so subtract
+                        # 0x62 (or 98) from our channel number
+                        print(mulch_str % (channel - 98,
+                                           "%2.1f" % mulch_t_offset_data[channel]))
+                else:
+                    # we have no results, so display a suitable message
+                    print("    No Multi-channel temperature sensors found")
+            else:
+                print()
+                print("Device at %s did not respond." % (self.ip_address,))
+
+    def get_pm25_offset(self):
+        """Display the device PM2.5 offset data.
+
+        Obtain and display the PM2.5 offset data from the selected device.The
+        device IP address and port are derived (in order) as follows:
+        1. command line --ip-address and --port parameters
+        2. [GW1000] stanza in the specified config file
+        3. by discovery
+        """
+
+        # wrap in a try..except in case there is an error
+        try:
+            # get a GatewayDevice object from our direct session
+            device = self.session.device
+            # identify the device being used
+            print()
+            print("Interrogating %s at %s:%d" % (device.model,
+                                                 device.ip_address.decode(),
+                                                 device.port))
+            # get the PM2.5 offset data from the API
+            pm25_offset_data = device.pm25_offset
+        except GWIOError as e:
+            print()
+            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
+        except socket.timeout:
+            print()
+            print("Timeout. Device at %s did not respond." % (self.ip_address,))
+        else:
+            # did we get any PM2.5 offset data
+            if pm25_offset_data is not None:
+                # now format and display the data
+                print()
+                print("PM2.5 Calibration")
+                # iterate over each channel for which we have data
+                for channel in pm25_offset_data:
+                    # print the channel and offset data
+                    print("    Channel %d PM2.5 offset: %5s" % (channel, "%2.1f" % pm25_offset_data[channel]))
+            else:
+                print()
+                print("Device at %s did not respond." % (self.ip_address,))
+
+    def get_co2_offset(self):
+        """Display the device WH45 CO2, PM10 and PM2.5 offset data.
+
+        Obtain and display the WH45 CO2, PM10 and PM2.5 offset data from the
+        selected device. The device IP address and port are derived (in order)
+        as follows:
+        1. command line --ip-address and --port parameters
+        2. [GW1000] stanza in the specified config file
+        3. by discovery
+        """
+
+        # wrap in a try..except in case there is an error
+        try:
+            # get a GatewayDevice object from our direct session
+            device = self.session.device
+            # identify the device being used
+            print()
+            print("Interrogating %s at %s:%d" % (device.model,
+                                                 device.ip_address.decode(),
+                                                 device.port))
+            # get the offset data from the API
+            co2_offset_data = device.api.get_co2_offset()
+        except GWIOError as e:
+            print()
+            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
+        except socket.timeout:
+            print()
+            print("Timeout. Device at %s did not respond." % (self.ip_address,))
+        else:
+            # did we get any offset data
+            if co2_offset_data is not None:
+                # now format and display the data
+                print()
+                print("CO2 Calibration")
+                print("%16s: %5s" % ("CO2 offset", "%2.1f" % co2_offset_data['co2']))
+                print("%16s: %5s" % ("PM10 offset", "%2.1f" % co2_offset_data['pm10']))
+                print("%16s: %5s" % ("PM2.5 offset", "%2.1f" % co2_offset_data['pm25']))
+            else:
+                print()
+                print("Device at %s did not respond." % (self.ip_address,))
+
+    def get_calibration(self):
+        """Display the device calibration data.
+
+        Obtain and display the calibration data from the selected device. The
+        device IP address and port are derived (in order) as follows:
+        1. command line --ip-address and --port parameters
+        2. [GW1000] stanza in the specified config file
+        3. by discovery
+        """
+
+        # wrap in a try..except in case there is an error
+        try:
+            # get a GatewayDevice object from our direct session
+            device = self.session.device
+            # identify the device being used
+            print()
+            print("Interrogating %s at %s:%d" % (device.model,
+                                                 device.ip_address.decode(),
+                                                 device.port))
+            # get the calibration data from the device object's calibration
+            # property
+            calibration_data = device.calibration
+        except GWIOError as e:
+            print()
+            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
+        except socket.timeout:
+            print()
+            print("Timeout. Device at %s did not respond." % (self.ip_address,))
+        else:
+            # did we get any calibration data
+            if calibration_data is not None:
+                # now format and display the data
+                print()
+                print("Calibration")
+                print("%26s: %5.2f" % ("Irradiance gain", calibration_data['solar']))
+                print("%26s: %4.1f" % ("UV gain", calibration_data['uv']))
+                print("%26s: %4.1f" % ("Wind gain", calibration_data['wind']))
+                print("%26s: %4.1f %sC" % ("Inside temperature offset", calibration_data['intemp'], u'\xb0'))
+                print("%26s: %4.1f %%" % ("Inside humidity offset", calibration_data['inhum']))
+                print("%26s: %4.1f %sC" % ("Outside temperature offset", calibration_data['outtemp'], u'\xb0'))
+                print("%26s: %4.1f %%" % ("Outside humidity offset", calibration_data['outhum']))
+                print("%26s: %4.1f hPa" % ("Absolute pressure offset", calibration_data['abs']))
+                print("%26s: %4.1f hPa" % ("Relative pressure offset", calibration_data['rel']))
+                print("%26s: %4.1f %s" % ("Wind direction offset", calibration_data['dir'], u'\xb0'))
+            else:
+                print()
+                print("Device at %s did not respond." % (self.ip_address,))
+
+    def get_soil_calibration(self):
+        """Display the device soil moisture sensor calibration data.
+
+        Obtain and display the soil moisture sensor calibration data from the
+        selected device. The device IP address and port are derived (in order)
+        as follows:
+        1. command line --ip-address and --port parameters
+        2. [GW1000] stanza in the specified config file
+        3. by discovery
+        """
+
+        # wrap in a try..except in case there is an error
+        try:
+            # get a GatewayDevice object from our direct session
+            device = self.session.device
+            # identify the device being used
+            print()
+            print("Interrogating %s at %s:%d" % (device.model,
+                                                 device.ip_address.decode(),
+                                                 device.port))
+            # get the device soil_calibration property
+            calibration_data = device.soil_calibration
+        except GWIOError as e:
+            print()
+            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
+        except socket.timeout:
+            print()
+            print("Timeout. Device at %s did not respond." % (self.ip_address,))
+        else:
+            # did we get any calibration data
+            if calibration_data is not None:
+                # now format and display the data
+                # first get a list of channels for which we have data, since
+                # this is the keys to a dict we need to sort them
+                channels = sorted(calibration_data.keys())
+                print()
+                print("Soil Calibration")
+                # iterate over each channel printing the channel data
+                for channel in channels:
+                    channel_dict = calibration_data[channel]
+                    # the API returns channels starting at 0, but the
+                    # WSView/WSView Plus apps display channels starting at 1,
+                    # so add 1 to our channel number
+                    print("    Channel %d (%d%%)" % (channel + 1, channel_dict['humidity']))
+                    print("%16s: %d" % ("Now AD", channel_dict['ad']))
+                    print("%16s: %d" % ("0% AD", channel_dict['adj_min']))
+                    print("%16s: %d" % ("100% AD", channel_dict['adj_max']))
+            else:
+                print()
+                print("Device at %s did not respond." % (self.ip_address,))
+
+    def get_services(self):
+        """Display the device Weather Services settings.
+
+        Obtain and display the settings for the various weather services
+        supported by the device. the device IP address and port are
+        derived (in order) as follows:
+        1. command line --ip-address and --port parameters
+        2. [GW1000] stanza in the specified config file
+        3. by discovery
+        """
+
+        # each weather service uses different parameters so define individual
+        # functions to print each services settings
+
+        def print_ecowitt_net(data_dict=None):
+            """Print Ecowitt.net settings."""
+
+            # do we have any settings?
+            if data_dict is not None:
+                # upload interval, 0 means disabled
+                if data_dict['interval'] == 0:
+                    print("%22s: %s" % ("Upload Interval",
+                                        "Upload to Ecowitt.net is disabled"))
+                elif data_dict['interval'] > 1:
+                    print("%22s: %d minutes" % ("Upload Interval",
+                                                data_dict['interval']))
+                else:
+                    print("%22s: %d minute" % ("Upload Interval",
+                                               data_dict['interval']))
+                # device MAC
+                print("%22s: %s" % ("MAC", data_dict['mac']))
+
+        def print_wunderground(data_dict=None):
+            """Print Weather Underground settings."""
+
+            # do we have any settings?
+            if data_dict is not None:
+                # Station ID
+                wu_id = data_dict['id'] if self.opts.unmask else obfuscate(data_dict['id'])
+                print("%22s: %s" % ("Station ID", wu_id))
+                # Station key
+                key = data_dict['password'] if self.opts.unmask else obfuscate(data_dict['password'])
+                print("%22s: %s" % ("Station Key", key))
+
+        def print_weathercloud(data_dict=None):
+            """Print Weathercloud settings."""
+
+            # do we have any settings?
+            if data_dict is not None:
+                # Weathercloud ID
+                wc_id = data_dict['id'] if self.opts.unmask else obfuscate(data_dict['id'])
+                print("%22s: %s" % ("Weathercloud ID", wc_id))
+                # Weathercloud key
+                key = data_dict['key'] if self.opts.unmask else obfuscate(data_dict['key'])
+                print("%22s: %s" % ("Weathercloud Key", key))
+
+        def print_wow(data_dict=None):
+            """Print Weather Observations Website settings."""
+
+            # do we have any settings?
+            if data_dict is not None:
+                # Station ID
+                wow_id = data_dict['id'] if self.opts.unmask else obfuscate(data_dict['id'])
+                print("%22s: %s" % ("Station ID", wow_id))
+                # Station key
+                key = data_dict['password'] if self.opts.unmask else obfuscate(data_dict['password'])
+                print("%22s: %s" % ("Station Key", key))
+
+        def print_custom(data_dict=None):
+            """Print Custom server settings."""
+
+            # do we have any settings?
+            if data_dict is not None:
+                # Is upload enabled, API specifies 1=enabled and 0=disabled, if
+                # we have anything else use 'Unknown'
+                if data_dict['active'] == 1:
+                    print("%22s: %s" % ("Upload", "Enabled"))
+                elif data_dict['active'] == 0:
+                    print("%22s: %s" % ("Upload", "Disabled"))
+                else:
+                    print("%22s: %s" % ("Upload", "Unknown"))
+                # upload protocol, API specifies 1=wundeground and 0=ecowitt,
+                # if we have anything else use 'Unknown'
+                if data_dict['type'] == 0:
+                    print("%22s: %s" % ("Upload Protocol", "Ecowitt"))
+                elif data_dict['type'] == 1:
+                    print("%22s: %s" % ("Upload Protocol", "Wunderground"))
+                else:
+                    print("%22s: %s" % ("Upload Protocol", "Unknown"))
+                # remote server IP address
+                print("%22s: %s" % ("Server IP/Hostname", data_dict['server']))
+                # remote server path, if using wunderground protocol we have
+                # Station ID and Station key as well
+                if data_dict['type'] == 0:
+                    print("%22s: %s" % ("Path", data_dict['ecowitt_path']))
+                elif data_dict['type'] == 1:
+                    print("%22s: %s" % ("Path", data_dict['wu_path']))
+                    custom_id = data_dict['id'] if self.opts.unmask else obfuscate(data_dict['id'])
+                    print("%22s: %s" % ("Station ID", custom_id))
+                    key = data_dict['password'] if self.opts.unmask else obfuscate(data_dict['password'])
+                    print("%22s: %s" % ("Station Key", key))
+                # port
+                print("%22s: %d" % ("Port", data_dict['port']))
+                # upload interval in seconds
+                print("%22s: %d seconds" % ("Upload Interval", data_dict['interval']))
+
+        # look table of functions to use to print weather service settings
+        print_fns = {'ecowitt_net_params': print_ecowitt_net,
+                     'wunderground_params': print_wunderground,
+                     'weathercloud_params': print_weathercloud,
+                     'wow_params': print_wow,
+                     'custom_params': print_custom}
+
+        # wrap in a try..except in case there is an error
+        try:
+            # get a GatewayDevice object from our direct session
+            device = self.session.device
+            # identify the device being used
+            print()
+            print("Interrogating %s at %s:%d" % (device.model,
+                                                 device.ip_address.decode(),
+                                                 device.port))
+            # get the settings for each service know to the device, store them
+            # in a dict keyed by the service name
+            services_data = dict()
+            for service in device.services:
+                services_data[service['name']] = getattr(device, service['name'])
+        except GWIOError as e:
+            print()
+            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
+        except socket.timeout:
+            print()
+            print("Timeout. Device at %s did not respond." % (self.ip_address,))
+        else:
+            # did we get any service data
+            if len(services_data) > 0:
+                # now format and display the data
+                print()
+                print("Weather Services")
+                # iterate over the weather services we know about and call the
+                # relevant function to print the services settings
+                for service in device.services:
+                    print()
+                    print("  %s" % (service['long_name'],))
+                    print_fns[service['name']](services_data[service['name']])
+            else:
+                print()
+                print("Device at %s did not respond." % (self.ip_address,))
+
+    def station_mac(self):
+        """Display the device hardware MAC address.
+
+        Obtain and display the hardware MAC address of the selected device. The
+        device IP address and port are derived (in order) as follows:
+        1. command line --ip-address and --port parameters
+        2. [GW1000] stanza in the specified config file
+        3. by discovery
+        """
+
+        # wrap in a try..except in case there is an error
+        try:
+            # get a GatewayDevice object from our direct session
+            device = self.session.device
+            # identify the device being used
+            print()
+            print("Interrogating %s at %s:%d" % (device.model,
+                                                 device.ip_address.decode(),
+                                                 device.port))
+            print()
+            # get the device MAC address
+            print("    MAC address: %s" % device.mac_address)
+        except GWIOError as e:
+            print()
+            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
+        except socket.timeout:
+            print()
+            print("Timeout. Device at %s did not respond." % (self.ip_address,))
+
+    def firmware(self):
+        """Display device firmware details.
+
+        Obtain and display the firmware version string from the selected
+        gateway device. User is advised whether a firmware update is available
+        or not.
+
+        The device IP address and port are derived (in order) as follows:
+        1. command line --ip-address and --port parameters
+        2. [GW1000] stanza in the specified config file
+        3. by discovery
+        """
+
+        # wrap in a try..except in case there is an error
+        try:
+            # get a GatewayDevice object from our direct session
+            device = self.session.device
+            # get the device model, we will use this multiple times
+            model = device.model
+            # identify the device being used
+            print()
+            print("Interrogating %s at %s:%d" % (model,
+                                                 device.ip_address.decode(),
+                                                 device.port))
+            print()
+            # get the firmware version via the API
+            print("    installed %s firmware version is %s" % (model,
+                                                               device.firmware_version))
+            fware_dict = device.sensor_firmware_versions
+            for sensor_model, sensor_fware_version in fware_dict.items():
+                print("    installed %s firmware version is %s" % (sensor_model,
+                                                                   sensor_fware_version))
+            print()
+            fw_update_avail = device.firmware_update_avail
+            if fw_update_avail:
+                # we have an available firmware update
+                # obtain the 'curr_msg' from the device HTTP API
+                # 'get_device_info' command, this field usually contains the
+                # firmware change details
+                curr_msg = device.firmware_update_message
+                # now print the firmware update details
+                print("    a firmware update is available for this %s," % model)
+                print("    update at http://%s or via the WSView Plus app" % (self.ip_address,))
+                # if we have firmware update details print them
+                if curr_msg is not None:
+                    print()
+                    # Ecowitt have not documented the HTTP API calls so we are
+                    # not exactly sure what the 'curr_msg' field is used for,
+                    # it might be for other things as well
+                    print("    likely firmware update message:")
+                    # multi-line messages seem to have \r\n at the end of each
+                    # line, split the string so we can format it a little better
+                    if '\r\n' in curr_msg:
+                        for line in curr_msg.split('\r\n'):
+                            # print each line
+                            print("      %s" % line)
+                    else:
+                        # print as a single line
+                        print("      %s" % curr_msg)
+                else:
+                    # we had no 'curr_msg' for one reason or another
+                    print("    no firmware update message found")
+            elif fw_update_avail is None:
+                # we don't know if we have an available firmware update
+                print("    could not determine if a firmware update is available for this %s" % model)
+            else:
+                # there must be no available firmware update
+                print("    the firmware is up to date for this %s" % model)
+        except GWIOError as e:
+            print()
+            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
+            print()
+            self.device_connection_help()
+        except socket.timeout:
+            print()
+            print("Timeout. Device at %s did not respond." % (self.ip_address,))
+            print()
+            self.device_connection_help()
+
+    def sensors(self):
+        """Display the device sensor ID information.
+
+        Obtain and display the sensor ID information from the selected device.
+        The device IP address and port are derived (in order) as follows:
+        1. command line --ip-address and --port parameters
+        2. [GW1000] stanza in the specified config file
+        3. by discovery
+        """
+
+        # TODO. Need to think about the object structure here as well as who does what
+        # wrap in a try..except in case there is an error
+        try:
+            # get a GatewayDevice object from our direct session
+            device = self.session.device
+            # identify the device being used
+            print()
+            print("Interrogating %s at %s:%d" % (device.model,
+                                                 device.ip_address.decode(),
+                                                 device.port))
+            # get the device sensors object, it is obtained using the current
+            # sensor ID data
+            sensors = device.api.sensors
+        except GWIOError as e:
+            print()
+            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
+            print()
+            self.device_connection_help()
+        except socket.timeout:
+            print()
+            print("Timeout. Device at %s did not respond." % (self.ip_address,))
+            print()
+            self.device_connection_help()
+        else:
+            # the sensor ID data is in the sensors data property, did
+            # we get any sensor ID data
+            if sensors.data is not None and len(sensors.data) > 0:
+                # now format and display the data
+                print()
+                print("%-10s %s" % ("Sensor", "Status"))
+                # iterate over each sensor for which we have data
+                for address, sensor_data in six.iteritems(sensors.data):
+                    # the sensor id indicates whether it is disabled, attempting to
+                    # register a sensor or already registered
+                    if sensor_data['id'] == 'fffffffe':
+                        state = 'sensor is disabled'
+                    elif sensor_data['id'] == 'ffffffff':
+                        state = 'sensor is registering...'
+                    else:
+                        # the sensor is registered so we should have signal and battery
+                        # data as well
+                        battery_desc = sensors.batt_state_desc(address, sensor_data.get('battery'))
+                        battery_desc_text = " (%s)" % battery_desc if battery_desc is not None else ""
+                        battery_str = "%s%s" % (sensor_data.get('battery'), battery_desc_text)
+                        state = "sensor ID: %s  signal: %s  battery: %s" % (sensor_data.get('id').lstrip('0'),
+                                                                            sensor_data.get('signal'),
+                                                                            battery_str)
+                        # print the formatted data
+                    print("%-10s %s" % (Sensors.sensor_ids[address].get('long_name'), state))
+            elif len(sensors.data) == 0:
+                print()
+                print("Device at %s did not return any sensor data." % (self.ip_address,))
+            else:
+                print()
+                print("Device at %s did not respond." % (self.ip_address,))
+
+    def live_data(self):
+        """Display the device live sensor data.
+
+        Obtain and display live sensor data from the selected device. Data is
+        presented as read from the device except for conversion to US customary
+        or Metric units. Unit labels are included.
+
+        The device IP address and port are derived (in order) as follows:
+        1. command line --ip-address and --port parameters
+        2. [GW1000] stanza in the specified config file
+        3. by discovery
+
+        If --follow was used the live sensor data is displayed continuously
+        as JSON Lines instead.
+        """
+
+        if getattr(self.opts, 'follow', False):
+            self.follow_live_data()
+            return
+        # wrap in a try..except in case there is an error
+        try:
+            # Get a GatewayCollector object, normally we would reach into a
+            # GatewayDevice object for data but in this case the
+            # GatewayCollector get_current_data() method can be used to
+            # assemble all disparate pieces of data for us.
+            collector = self.session.collector()
+            # identify the device being used
+            print()
+            print("Interrogating %s at %s:%d" % (collector.device.model,
+                                                 collector.device.ip_address.decode(),
+                                                 collector.device.port))
+            # call the GatewayCollector objects get_current_data() method to
+            # obtain the live sensor data
+            live_sensor_data_dict = collector.get_current_data()
+        except GWIOError as e:
+            print()
+            print("Unable to connect to device at %s: %s" % (self.ip_address, e))
+            print()
+            self.device_connection_help()
+        except socket.timeout:
+            print()
+            print("Timeout. Device at %s did not respond." % (self.ip_address,))
+            print()
+            self.device_connection_help()
+        else:
+            # we have a data dict to work with, but we need to format the
+            # values and may need to convert units
+
+            # the live sensor data dict is a dict of sensor values and a
+            # timestamp only, whilst all sensor values are in MetricWX units
+            # there is no usUnits field present. We need usUnits to do our unit
+            # conversion so add in the usUnits field.
+            live_sensor_data_dict['usUnits'] = weewx.METRICWX
+            # we will use the timestamp separately so pop it from the dict and
+            # save for later
+            datetime = live_sensor_data_dict.pop('datetime')
+            # extend the WeeWX obs_group_dict with our gateway
+            # obs_group_dict, because weewx.units.obs_group_dict.extend is a
+            # ListOfDicts we need to use .prepend since the synthetic python2
+            # ListOfDicts does not support .update and we want to use the
+            # device entry should there already be an entry of the same name in
+            # weewx.units.obs_group_dict (eg 'rain')
+            weewx.units.obs_group_dict.prepend(DirectGateway.gw_direct_obs_group_dict)
+            # the live data is in MetricWX units, get a suitable converter
+            # based on our output units
+            _unit_system = self.unit_system_from_opts()
+            c = weewx.units.StdUnitConverters[_unit_system]
+            # Now get a formatter, we could use the
+            # weewx.units.default_unit_format_dict, but we need voltages
+            # formatted to two decimal places. So take a copy of the default
+            # unit format dict, change the 'volt' format to suit and use that.
+            gw_unit_format_dict = dict(weewx.units.default_unit_format_dict)
+            gw_unit_format_dict['volt'] = '%.2f'
+            f = weewx.units.Formatter(unit_format_dict=gw_unit_format_dict,
+                                      unit_label_dict=weewx.units.default_unit_label_dict)
+            # now build a new data dict with our converted and formatted data
+            result = {}
+            # iterate over the fields in our original data dict
+            for key, value in six.iteritems(live_sensor_data_dict):
+                # we don't need usUnits in the result so skip it
+                if key == 'usUnits':
+                    continue
+                # get our key as a ValueTuple
+                key_vt = weewx.units.as_value_tuple(live_sensor_data_dict, key)
+                # now get a ValueHelper which will do the conversion and
+                # formatting
+                key_vh = weewx.units.ValueHelper(key_vt, formatter=f, converter=c)
+                # and add the converted and formatted value to our dict
+                result[key] = key_vh.toString(None_string='None')
+            # finally, sort our dict by key and print the data
+            print()
+            print("Displaying data using the WeeWX %s unit group." % weewx.units.unit_nicknames.get(_unit_system))
+            print()
+            print("%s live sensor data (%s): %s" % (collector.device.model,
+                                                    weeutil.weeutil.timestamp_to_string(datetime),
+                                                    weeutil.weeutil.to_sorted_string(result)))
+
+    def follow_live_data(self):
+        """Continuously display device live sensor data as JSON Lines.
+
+        Poll the selected device every poll interval and display the live
+        sensor data as a single line JSON object per poll, suitable for
+        piping to another program. Each object includes the fields 'datetime'
+        and 'usUnits'. Values are converted to the unit system selected by
+        --units and rounded, except for MetricWX which displays the values as
+        obtained from the device. If --changed-only was used only those fields
+        whose value has changed since the previous poll are included, a field
+        that is no longer reported is included with the value null.
+
+        All polls use the same connection to the device. Errors are displayed
+        on stderr and polling continues. Polling continues until --count
+        polls have been made or the program is interrupted.
+        """
+
+        unit_system = self.unit_system_from_opts()
+        formatter = LiveDataFormatter(unit_system=unit_system,
+                                      obs_group_dict=DirectGateway.gw_direct_obs_group_dict)
+        interval = self.poll_interval_from_config_opts()
+        count = getattr(self.opts, 'count', None)
+        changed_only = getattr(self.opts, 'changed_only', False)
+        collector = self.session.collector()
+        # the last packet displayed, used to determine changed fields
+        last_packet = {}
+        polls = 0
+        next_poll = monotonic()
+        try:
+            while count is None or polls < count:
+                # wait until the next poll is due, if we have fallen behind
+                # poll now rather than trying to catch up
+                delay = next_poll - monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_poll = max(next_poll + interval, monotonic())
+                polls += 1
+                try:
+                    data = collector.get_current_data()
+                except (GWIOError, socket.timeout) as e:
+                    print("Unable to obtain live data from device at %s: %s" % (self.ip_address, e),
+                          file=sys.stderr)
+                    continue
+                packet = formatter.format(data)
+                if changed_only:
+                    changed = dict((field, value) for field, value in six.iteritems(packet)
+                                   if field not in last_packet or last_packet[field] != value)
+                    # fields that are no longer reported
+                    for field in last_packet:
+                        if field not in packet:
+                            changed[field] = None
+                    changed['datetime'] = packet.get('datetime')
+                    last_packet = packet
+                    packet = changed
+                packet['usUnits'] = unit_system
+                print(json.dumps(packet, sort_keys=True, separators=(',', ':')))
+                sys.stdout.flush()
+        except KeyboardInterrupt:
+            pass
+        except IOError as e:
+            # the program reading our output has exited
+            if e.errno != errno.EPIPE:
+                raise
+
+    def unit_system_from_opts(self):
+        """Obtain the WeeWX unit system to use from the --units option."""
+
+        units = self.opts.units.lower() if getattr(self.opts, 'units', None) else 'metric'
+        if units == 'us':
+            return weewx.US
+        elif units == 'metricwx':
+            return weewx.METRICWX
+        return weewx.METRIC
+
+    def poll_interval_from_config_opts(self):
+        """Obtain the poll interval from station config or command line options.
+
+        The poll interval is chosen as follows:
+        - if specified use the poll interval from the command line
+        - if a poll interval was not specified on the command line obtain the
+          poll interval from the station config dict
+        - if the station config dict does not specify a poll interval use the
+          default poll interval
+        """
+
+        if getattr(self.opts, 'poll_interval', None):
+            return self.opts.poll_interval
+        return weeutil.weeutil.to_int(self.stn_dict.get('poll_interval',
+                                                        default_poll_interval))
+
+    @staticmethod
+    def discover():
+        """Display details of gateway devices on the local network."""
+
+        # this could take a few seconds so warn the user
+        print()
+        print("Discovering devices on the local network. Please wait...")
+        # we want a GatewayDevice object, get one from a direct session
+        # without a device address
+        with DirectSession() as session:
+            # Obtain a list of discovered devices. Would consider wrapping in a
+            # try..except so we can catch any socket timeout exceptions but the
+            # GatewayApi.discover() method should catch any such exceptions
+            # for us.
+            device_list = session.device.discovered_devices
+        print()
+        if len(device_list) > 0:
+            # we have at least one result
+            # first sort our list by IP address
+            sorted_list = sorted(device_list, key=itemgetter('ip_address'))
+            # initialise a counter to count the number of valid devices found
+            num_gw_found = 0
+            # iterate over the unique devices that were found
+            for device in sorted_list:
+                if device['ip_address'] is not None and device['port'] is not None:
+                    print("%s discovered at IP address %s on port %d" % (device['model'],
+                                                                         device['ip_address'],
+                                                                         device['port']))
+                    num_gw_found += 1
+            else:
+                if num_gw_found > 1:
+                    print()
+                    print("Multiple devices were found.")
+                    print("If using the gateway driver consider explicitly specifying the ")
+                    print("IP address and port of the device to be used under [GW1000] in weewx.conf.")
+                elif num_gw_found == 0:
+                    print("No devices were discovered.")
+        else:
+            # we have no results
+            print("No devices were discovered.")
+
+    @staticmethod
+    def field_map():
+        """Display the default field map."""
+
+        # obtain a copy of the default field map, we need a copy so we can
+        # augment it with the battery state map
+        field_map = dict(Gateway.default_field_map)
+        # now add in the rain field map
+        field_map.update(Gateway.rain_field_map)
+        # now add in the wind field map
+        field_map.update(Gateway.wind_field_map)
+        # now add in the battery state field map
+        field_map.update(Gateway.battery_field_map)
+        # now add in the sensor signal field map
+        field_map.update(Gateway.sensor_signal_field_map)
+        print()
+        print("Gateway driver/service default field map:")
+        print("(format is WeeWX field name: gateway field name)")
+        print()
+        # obtain a list of naturally sorted dict keys so that, for example,
+        # xxxxx16 appears in the correct order
+        keys_list = natural_sort_keys(field_map)
+        # iterate over the sorted keys and print the key and item
+        for key in keys_list:
+            print("    %23s: %s" % (key, field_map[key]))
+
+    def driver_field_map(self):
+        """Display the driver field map that would be used.
+
+        By default, the default field map is used by the driver; however, the
+        user may alter the field map used by the driver via the [GW1000]
+        stanza. This method displays the actual field map that would be used by
+        the driver.
+        """
+
+        # this may take a moment to set up so inform the user
+        print()
+        print("This may take a moment...")
+        # place an entry in the log so that if we encounter errors that are
+        # logged we can tell they were not caused by a live WeeWX instance
+        loginf("Obtaining a gateway driver...")
+        # wrap in a try..except in case there is an error obtaining and
+        # interacting with the driver
+        try:
+            # get a GatewayDriver object
+            driver = GatewayDriver(**self.stn_dict)
+            # now display the field map defined in the driver's field_map
+            # property
+            print()
+            print("Gateway driver actual field map:")
+            print("(format is WeeWX field name: gateway field name)")
+            print()
+            # obtain a list of naturally sorted dict keys so that, for example,
+            # xxxxx16 appears in the correct order
+            keys_list = natural_sort_keys(driver.field_map)
+            # iterate over the sorted keys and print the key and item
+            for key in keys_list:
+                print("    %23s: %s" % (key, driver.field_map[key]))
+        except GWIOError as e:
+            print()
+            print("Unable to connect to device: %s" % e)
+            print()
+            print("Unable to display actual driver field map")
+            print()
+            self.device_connection_help()
+        except KeyboardInterrupt:
+            # we have a keyboard interrupt so shut down
+            if driver:
+                driver.closePort()
+        loginf("Finished using gateway driver")
+
+    def service_field_map(self):
+        """Display the service field map that would be used.
+
+        By default, the default field map is used by the service; however, the
+        user may alter the field map used by the service via the [GW1000]
+        stanza. This method displays the actual field map that would be used by
+        the service.
+        """
+
+        # this may take a moment to set up so inform the user
+        print()
+        print("This may take a moment...")
+        # place an entry in the log so that if we encounter errors that are
+        # logged we can tell they were not caused by a live WeeWX instance
+        loginf("Obtaining a gateway service...")
+        # Create a dummy config so we can stand up a dummy engine with a dummy
+        # simulator emitting arbitrary loop packets. Include the gateway
+        # service and StdPrint. StdPrint will take care of printing our loop
+        # packets (no StdArchive so loop packets only, no archive records)
+        config = {
+            'Station': {
+                'station_type': 'Simulator',
+                'altitude': [0, 'meter'],
+                'latitude': 0,
+                'longitude': 0},
+            'Simulator': {
+                'driver': 'weewx.drivers.simulator',
+                'mode': 'simulator'},
+            'GW1000': {},
+            'Engine': {
+                'Services': {
+                    'archive_services': 'user.gw1000.GatewayService',
+                    'report_services': 'weewx.engine.StdPrint'}}}
+        # set the IP address and port in the dummy config
+        config['GW1000']['ip_address'] = self.ip_address
+        config['GW1000']['port'] = self.port
+        # wrap in a try..except in case there is an error
+        try:
+            # create a dummy engine
+            engine = weewx.engine.StdEngine(config)
+            # Our gateway service will have been instantiated by the engine
+            # during its startup. Whilst access to the service is not normally
+            # required we require access here, so we can obtain some info about
+            # the station we are using for this test. The engine does not
+            # provide a ready means to access that gateway service, so we can
+            # do a bit of guessing and iterate over all the engine's services
+            # and select the one that has a 'collector' property. Unlikely to
+            # cause a problem since there are only two services in the dummy
+            # engine.
+            gw_svc = None
+            for svc in engine.service_obj:
+                if hasattr(svc, 'collector'):
+                    gw_svc = svc
+            if gw_svc is not None:
+                # we have a gateway service, it's not much use, but it has the
+                # field map we need so go ahead and display its field map
+                print()
+                print("Gateway service actual field map:")
+                print("(format is WeeWX field name: gateway field name)")
+                print()
+                # obtain a list of naturally sorted dict keys so that, for example,
+                # xxxxx16 appears in the correct order
+                keys_list = natural_sort_keys(gw_svc.field_map)
+                # iterate over the sorted keys and print the key and item
+                for key in keys_list:
+                    print("    %23s: %s" % (key, gw_svc.field_map[key]))
+        except GWIOError as e:
+            print()
+            print("Unable to connect to device: %s" % e)
+            print()
+            print("Unable to display actual driver field map")
+            print()
+            self.device_connection_help()
+        except KeyboardInterrupt:
+            if engine:
+                engine.shutDown()
+        loginf("Finished using gateway service")
+
+    def test_driver(self):
+        """Exercise the gateway driver as a driver.
+
+        Exercises the gateway driver only. Loop packets, but no archive
+        records, are emitted to the console continuously until a keyboard
+        interrupt is received. A station config dict is coalesced from any
+        relevant command line parameters and the config file in use with
+        command line parameters overriding those in the config file.
+        """
+
+        loginf("Testing gateway driver...")
+        # set the IP address and port in the station config dict
+        self.stn_dict['ip_address'] = self.ip_address
+        self.stn_dict['port'] = self.port
+        if self.opts.poll_interval:
+            self.stn_dict['poll_interval'] = self.opts.poll_interval
+        if self.opts.max_tries:
+            self.stn_dict['max_tries'] = self.opts.max_tries
+        if self.opts.retry_wait:
+            self.stn_dict['retry_wait'] = self.opts.retry_wait
+        # are we replaying a frame capture
+        if getattr(self.opts, 'replay', None):
+            self.stn_dict['replay_path'] = self.opts.replay
+            if self.opts.replay_speed is not None:
+                self.stn_dict['replay_speed'] = self.opts.replay_speed
+        # wrap in a try..except in case there is an error
+        try:
+            # get a GatewayDriver object
+            driver = GatewayDriver(**self.stn_dict)
+            # identify the device being used
+            print()
+            if isinstance(driver.collector, ReplayCollector):
+                print("Replaying %s capture '%s'" % (driver.collector.device.model,
+                                                     driver.collector.path))
+            else:
+                print("Interrogating %s at %s:%d" % (driver.collector.device.model,
+                                                     driver.collector.device.ip_address.decode(),
+                                                     driver.collector.device.port))
+            print()
+            # continuously get loop packets and print them to screen
+            packet_count = 0
+            for pkt in driver.genLoopPackets():
+                print(": ".join([weeutil.weeutil.timestamp_to_string(pkt['dateTime']),
+                                 weeutil.weeutil.to_sorted_string(pkt)]))
+                packet_count += 1
+            # we only get here at the end of a replay
+            elapsed = monotonic() - driver.collector.replay_start
+            print()
+            print("Replayed %d packets in %.3f seconds "
+                  "(%.1f packets per second)" % (packet_count,
+                                                 elapsed,
+                                                 packet_count / max(elapsed, 1e-6)))
+            driver.closePort()
+        except GWIOError as e:
+            print()
+            print("Unable to connect to device: %s" % e)
+            print()
+            self.device_connection_help()
+        except KeyboardInterrupt:
+            # we have a keyboard interrupt so shut down
+            driver.closePort()
+        loginf("Gateway driver testing complete")
+
+    def backfill(self):
+        """Import a frame capture into the WeeWX archive.
+
+        Replay a frame capture through the gateway driver processing pipeline
+        and save the resulting archive records to the WeeWX database specified
+        by the config file in use.
+        """
+
+        loginf("Importing frame capture '%s'..." % self.opts.backfill)
+        try:
+            importer = CaptureImporter(self.config_dict, self.opts.backfill)
+        except GWIOError as e:
+            print()
+            print("Unable to import frame capture: %s" % e)
+            print()
+            return
+        print()
+        print("Importing %s capture '%s' using a %d second archive interval" % (importer.collector.device.model,
+                                                                              self.opts.backfill,
+                                                                              importer.archive_interval))
+        start = monotonic()
+        saved = importer.run()
+        elapsed = monotonic() - start
+        print()
+        print("Imported %d packets in %.3f seconds (%.1f packets per second)" % (importer.packets,
+                                                                               elapsed,
+                                                                               importer.packets / max(elapsed, 1e-6)))
+        print("%d archive records were saved, %d already existed" % (saved,
+                                                                     importer.records - saved))
+        loginf("Frame capture import complete")
+
+    def test_service(self):
+        """Exercise the gateway driver as a service.
+
+        Uses a dummy engine/simulator to generate arbitrary loop packets for
+        augmenting. Use a 10-second loop interval so we don't get too many bare
+        packets.
+        """
+
+        loginf("Testing gateway service...")
+        # Create a dummy config, so we can stand up a dummy engine with a dummy
+        # simulator emitting arbitrary loop packets. Include the gateway
+        # service and StdPrint. StdPrint will take care of printing our loop
+        # packets (no StdArchive so loop packets only, no archive records)
+        config = {
+            'Station': {
+                'station_type': 'Simulator',
+                'altitude': [0, 'meter'],
+                'latitude': 0,
+                'longitude': 0},
+            'Simulator': {
+                'driver': 'weewx.drivers.simulator',
+                'mode': 'simulator'},
+            'GW1000': {},
+            'Engine': {
+                'Services': {
+                    'archive_services': 'user.gw1000.GatewayService',
+                    'report_services': 'weewx.engine.StdPrint'}}}
+        # set the IP address and port in the dummy config
+        config['GW1000']['ip_address'] = self.ip_address
+        config['GW1000']['port'] = self.port
+        # these command line options should only be added if they exist
+        if self.opts.poll_interval:
+            config['GW1000']['poll_interval'] = self.opts.poll_interval
+        if self.opts.max_tries:
+            config['GW1000']['max_tries'] = self.opts.max_tries
+        if self.opts.retry_wait:
+            config['GW1000']['retry_wait'] = self.opts.retry_wait
+        # assign our dummyTemp field to a unit group so unit conversion works
+        # properly
+        weewx.units.obs_group_dict['dummyTemp'] = 'group_temperature'
+        # wrap in a try..except in case there is an error
+        try:
+            # create a dummy engine
+            engine = weewx.engine.StdEngine(config)
+            # Our gateway service will have been instantiated by the engine
+            # during its startup. Whilst access to the service is not normally
+            # required we require access here, so we can obtain some info about
+            # the station we are using for this test. The engine does not
+            # provide a ready means to access that gateway service, so we can
+            # do a bit of guessing and iterate over all the engine's services
+            # and select the one that has a 'collector' property. Unlikely to
+            # cause a problem since there are only two services in the dummy
+            # engine.
+            gw_svc = None
+            for svc in engine.service_obj:
+                if hasattr(svc, 'collector'):
+                    gw_svc = svc
+            if gw_svc is not None:
+                # identify the device being used
+                print()
+                print("Interrogating %s at %s:%d" % (gw_svc.collector.device.model,
+                                                     gw_svc.collector.device.ip_address.decode(),
+                                                     gw_svc.collector.device.port))
+            print()
+            while True:
+                # create an arbitrary loop packet, all it needs is a timestamp, a
+                # defined unit system and a token obs
+                packet = {'dateTime': int(time.time()),
+                          'usUnits': weewx.US,
+                          'dummyTemp': 96.3
+                          }
+                # send out a NEW_LOOP_PACKET event with the dummy loop packet
+                # to trigger the gateway service to augment the loop packet
+                engine.dispatchEvent(weewx.Event(weewx.NEW_LOOP_PACKET,
+                                                 packet=packet,
+                                                 origin='software'))
+                # sleep for a bit to emulate the simulator
+                time.sleep(10)
+        except GWIOError as e:
+            print()
+            print("Unable to connect to device: %s" % e)
+            print()
+            self.device_connection_help()
+        except KeyboardInterrupt:
+            engine.shutDown()
+        loginf("Gateway service testing complete")
+
+    @staticmethod
+    def device_connection_help():
+        """Console output help message for device connection problems."""
+
+        print("    Things to check include that the correct device IP address is being used,")
+        print("    the device is powered on and the device is not otherwise disconnected from")
+        print("    the local network.")
+
+
+# To use this driver in standalone mode for testing or development, use one of
+# the following commands (depending on your WeeWX install). For setup.py
+# installs use:
+#
+#   $ PYTHONPATH=/home/weewx/bin python -m user.gw1000
+#
+# or for package installs use:
+#
+#   $ PYTHONPATH=/usr/share/weewx python -m user.gw1000
+#
+# The above api_commands will display details of available command line options.
+#
+# Note. Whilst the driver may be run independently of WeeWX the driver still
+# requires WeeWX and it's dependencies be installed. Consequently, if
+# WeeWX 4.0.0 or later is installed the driver must be run under the same
+# Python version as WeeWX uses. This means that on some systems 'python' in the
+# above api_commands may need to be changed to 'python2' or 'python3'.
+
+def main():
+    import optparse
+
+    usage = """Usage: python -m user.gw1000 --help
+       python -m user.gw1000 --version
+       python -m user.gw1000 --test-driver|--test-service
+            [CONFIG_FILE|--config=CONFIG_FILE]
+            [--ip-address=IP_ADDRESS] [--port=PORT]
+            [--poll-interval=INTERVAL]
+            [--max-tries=MAX_TRIES]
+            [--retry-wait=RETRY_WAIT]
+            [--show-all-batt]
+            [--debug=0|1|2|3]
+       python -m user.gw1000 --test-driver --replay=CAPTURE_FILE
+            [CONFIG_FILE|--config=CONFIG_FILE]
+            [--replay-speed=SPEED]
+            [--debug=0|1|2|3]
+       python -m user.gw1000 --backfill=CAPTURE_FILE
+            [CONFIG_FILE|--config=CONFIG_FILE]
+            [--debug=0|1|2|3]
+       python -m user.gw1000 --live-data
+            [CONFIG_FILE|--config=CONFIG_FILE]
+            [--units=us|metric|metricwx]
+            [--ip-address=IP_ADDRESS] [--port=PORT]
+            [--show-all-batt]
+            [--debug=0|1|2|3]
+       python -m user.gw1000 --live-data --follow
+            [CONFIG_FILE|--config=CONFIG_FILE]
+            [--units=us|metric|metricwx]
+            [--ip-address=IP_ADDRESS] [--port=PORT]
+            [--poll-interval=INTERVAL]
+            [--changed-only] [--count=COUNT]
+            [--show-all-batt]
+            [--debug=0|1|2|3]
+       python -m user.gw1000 --default-map|--driver-map|--service-map
+            [CONFIG_FILE|--config=CONFIG_FILE]
+            [--debug=0|1|2|3]
+       python -m user.gw1000 --discover
+            [CONFIG_FILE|--config=CONFIG_FILE]
+            [--debug=0|1|2|3]"""
+
+    parser = optparse.OptionParser(usage=usage)
+    parser.add_option('--version', dest='version', action='store_true',
+                      help='display driver version number')
+    parser.add_option('--discover', dest='discover', action='store_true',
+                      help='discover devices and display device IP address '
+                           'and port')
+    parser.add_option('--live-data', dest='live', action='store_true',
+                      help='display device live sensor data')
+    parser.add_option('--follow', dest='follow', action='store_true',
+                      help='continuously display device live sensor data as '
+                           'JSON Lines')
+    parser.add_option('--changed-only', dest='changed_only',
+                      action='store_true',
+                      help='only display fields that have changed when '
+                           'following live data')
+    parser.add_option('--count', dest='count', type=int,
+                      help='number of polls to make when following live data')
+    parser.add_option('--test-driver', dest='test_driver', action='store_true',
+                      metavar='TEST_DRIVER', help='exercise the gateway driver')
+    parser.add_option('--test-service', dest='test_service',
+                      action='store_true', metavar='TEST_SERVICE',
+                      help='exercise the gateway service')
+    parser.add_option('--default-map', dest='map', action='store_true',
+                      help='display the default field map')
+    parser.add_option('--driver-map', dest='driver_map', action='store_true',
+                      help='display the field map that would be used by the gateway '
+                           'driver')
+    parser.add_option('--service-map', dest='service_map', action='store_true',
+                      help='display the field map that would be used by the gateway '
+                           'service')
+    parser.add_option('--ip-address', dest='ip_address',
+                      help='device IP address to use')
+    parser.add_option('--port', dest='port', type=int,
+                      help='device port to use')
+    parser.add_option('--poll-interval', dest='poll_interval', type=int,
+                      help='how often to poll the device API')
+    parser.add_option('--max-tries', dest='max_tries', type=int,
+                      help='max number of attempts to contact the device')
+    parser.add_option('--retry-wait', dest='retry_wait', type=int,
+                      help='how long to wait before retrying an attempt to contact the device, '
+                      'the wait doubles with each further retry')
+    parser.add_option('--backfill', dest='backfill', metavar='CAPTURE_FILE',
+                      help='import a frame capture into the WeeWX archive')
+    parser.add_option('--replay', dest='replay', metavar='CAPTURE_FILE',
+                      help='replay a frame capture rather than use a device')
+    parser.add_option('--replay-speed', dest='replay_speed', type=float,
+                      metavar='SPEED',
+                      help='replay speed as a multiple of real time, 0 for '
+                           'as fast as possible')
+    parser.add_option('--show-all-batt', dest='show_battery',
+                      action='store_true',
+                      help='show all available battery state data regardless of '
+                           'sensor state')
+    parser.add_option('--unmask', dest='unmask', action='store_true',
+                      help='unmask sensitive settings')
+    parser.add_option('--units', dest='units', metavar='UNITS', default='metric',
+                      help='unit system to use when displaying live data')
+    parser.add_option('--config', dest='config_path', metavar='CONFIG_FILE',
+                      help="Use configuration file CONFIG_FILE.")
+    parser.add_option('--debug', dest='debug', type=int,
+                      help='How much status to display, 0-3')
+    (opts, args) = parser.parse_args()
+
+    # display driver version number
+    if opts.version:
+        print("%s driver version: %s" % (DRIVER_NAME, DRIVER_VERSION))
+        exit(0)
+
+    # get config_dict to use
+    config_path, config_dict = weecfg.read_config(opts.config_path, args)
+    # when following live data stdout is reserved for the live data
+    info_file = sys.stderr if opts.follow else sys.stdout
+    print("Using configuration file %s" % config_path, file=info_file)
+    stn_dict = config_dict.get('GW1000', {})
+
+    # set weewx.debug as necessary
+    if opts.debug is not None:
+        _debug = weeutil.weeutil.to_int(opts.debug)
+    else:
+        _debug = weeutil.weeutil.to_int(config_dict.get('debug', 0))
+    weewx.debug = _debug
+    # inform the user if the debug level is 'higher' than 0
+    if _debug > 0:
+        print("debug level is '%d'" % _debug, file=info_file)
+
+    # Now we can set up the user customized logging, but we need to handle both
+    # v3 and v4 logging. V4 logging is very easy but v3 logging requires us to
+    # set up syslog and raise our log level based on weewx.debug
+    try:
+        # assume v 4 logging
+        weeutil.logger.setup('weewx', config_dict)
+    except AttributeError:
+        # must be v3 logging, so first set the defaults for the system logger
+        import syslog
+        syslog.openlog('weewx', syslog.LOG_PID | syslog.LOG_CONS)
+        # now raise the log level if required
+        if weewx.debug > 0:
+            syslog.setlogmask(syslog.LOG_UPTO(syslog.LOG_DEBUG))
+
+    # define custom unit settings used by the gateway driver
+    define_units()
+
+    # get a DirectGateway object
+    direct_gw = DirectGateway(opts, parser, stn_dict, config_dict=config_dict)
+    # now let the DirectGateway object process the options
+    direct_gw.process_options()
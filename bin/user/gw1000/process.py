@@ -0,0 +1,414 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+process.py
+
+Collect Ecowitt gateway device data in a child process.
+
+The classes in this module poll the gateway device API from a child process
+and pass the data to the parent through a shared memory ring buffer. This
+module is only loaded if config option collector_process is set.
+
+Copyright (C) 2020-2024 Gary Roderick                   gjroderick<at>gmail.com
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+# Python imports
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import struct
+import threading
+
+# Python 2/3 compatibility shims
+import six
+
+# Ecowitt gateway driver imports
+from . import (GatewayCollector, GWIOError, PacketRecord,
+               default_ring_slot_size, default_ring_slots,
+               log_traceback_critical, logerr, loginf, monotonic)
+# the driver logger, None if WeeWX v3 (syslog based) logging is in use
+try:
+    from . import log
+except ImportError:
+    log = None
+
+
+# ============================================================================
+#                             class PacketRing
+# ============================================================================
+
+class PacketRing(object):
+    """Class implementing a shared memory ring of collector data.
+
+    A PacketRing object is a fixed size ring buffer held in shared memory that
+    is used to pass collector data from a collector process to its parent
+    driver/service. The ring consists of slots fixed size slots, each slot
+    holds a single entry consisting of a fixed length header followed by a
+    JSON encoded payload. The header contains:
+
+    sequence: 8 byte unsigned integer, entry sequence number
+    kind:     1 byte entry kind, 0=data, 1=error, 2=shutdown
+    length:   4 byte unsigned integer, length of the payload that follows
+
+    There is a single writer. Each reader tracks its own position in the ring
+    and a reader that falls more than slots entries behind the writer loses
+    the oldest entries. Entries are encoded as JSON rather than pickled so
+    that a reader only ever decodes plain data.
+
+    A PacketRing object provides the put() and get() methods of a Queue object
+    so may be used in lieu of a Collector object queue.
+    """
+
+    # slot header struct
+    header_struct = struct.Struct('>QBI')
+    # entry kinds
+    DATA = 0
+    ERROR = 1
+    SHUTDOWN = 2
+
+    def __init__(self, slots=default_ring_slots,
+                 slot_size=default_ring_slot_size, context=multiprocessing):
+        """Initialise a PacketRing object."""
+
+        self.slots = slots
+        self.slot_size = slot_size
+        # the shared memory ring, no locking is required as access is
+        # synchronised using our condition
+        self.buffer = context.RawArray('c', slots * slot_size)
+        # sequence number of the most recently written entry
+        self.head = context.RawValue('Q', 0)
+        # condition used to synchronise access and to signal new entries
+        self.condition = context.Condition()
+        # sequence number of the most recently read entry, this is local to
+        # the reading process
+        self.read_seq = 0
+        # number of entries lost by the reader
+        self.lost = 0
+
+    def put(self, item, block=True, timeout=None):
+        """Write an entry to the ring.
+
+        The item may be a dict of collector data, an exception or None. The
+        ring never blocks the writer, when the ring is full the oldest entry
+        is overwritten. The block and timeout parameters are accepted for
+        compatibility with Queue.put().
+        """
+
+        if item is None:
+            kind, payload = self.SHUTDOWN, b''
+        elif isinstance(item, BaseException):
+            kind, payload = self.ERROR, json.dumps(str(item)).encode('utf-8')
+        elif isinstance(item, PacketRecord):
+            kind, payload = self.DATA, json.dumps(item.to_dict()).encode('utf-8')
+        else:
+            kind, payload = self.DATA, json.dumps(item).encode('utf-8')
+        if self.header_struct.size + len(payload) > self.slot_size:
+            # the entry will not fit in a slot, let the reader know there was
+            # a problem
+            _msg = "Collector data too large for ring slot (%d bytes)" % len(payload)
+            logerr(_msg)
+            kind, payload = self.ERROR, json.dumps(_msg).encode('utf-8')
+        with self.condition:
+            seq = self.head.value + 1
+            offset = (seq % self.slots) * self.slot_size
+            header = self.header_struct.pack(seq, kind, len(payload))
+            self.buffer[offset:offset + len(header) + len(payload)] = header + payload
+            self.head.value = seq
+            self.condition.notify_all()
+
+    def get(self, block=True, timeout=None):
+        """Read the next entry from the ring.
+
+        Returns a dict of collector data, a GWIOError exception or None. If
+        there is no entry available and block is True wait up to timeout
+        seconds (forever if timeout is None) for an entry. If no entry is
+        available raise a Queue Empty exception.
+        """
+
+        deadline = None if timeout is None else monotonic() + timeout
+        with self.condition:
+            while self.head.value <= self.read_seq:
+                if not block:
+                    raise six.moves.queue.Empty
+                if deadline is None:
+                    self.condition.wait()
+                else:
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        raise six.moves.queue.Empty
+                    self.condition.wait(remaining)
+            head = self.head.value
+            lost = head - self.read_seq - self.slots
+            if lost > 0:
+                # the writer has lapped us, skip to the oldest entry
+                self.read_seq += lost
+                self.lost += lost
+            self.read_seq += 1
+            offset = (self.read_seq % self.slots) * self.slot_size
+            seq, kind, length = self.header_struct.unpack(self.buffer[offset:offset + self.header_struct.size])
+            start = offset + self.header_struct.size
+            payload = self.buffer[start:start + length]
+        if lost > 0:
+            logerr("Collector data ring overrun, %d entries lost" % lost)
+        if kind == self.SHUTDOWN:
+            return None
+        elif kind == self.ERROR:
+            return GWIOError(json.loads(payload.decode('utf-8')))
+        return json.loads(payload.decode('utf-8'))
+
+
+# ============================================================================
+#                           class ProcessCollector
+# ============================================================================
+
+class ProcessCollector(GatewayCollector):
+    """Class to collect data from a gateway device in a separate process.
+
+    A ProcessCollector object operates as per a GatewayCollector object except
+    the device is polled by a child process rather than a thread. The child
+    process does not compete with the WeeWX process for the Python GIL so poll
+    timing is not affected by report generation or other WeeWX processing.
+    Collector data is passed to the parent via a PacketRing shared memory ring
+    that replaces the Collector queue.
+
+    The WeeWX process is multithreaded, a forked child process could inherit
+    a lock held by another thread (eg a logging handler lock) and deadlock.
+    So where possible the child process is started with the spawn start
+    method and the child builds its own GatewayCollector object from our
+    parameters. Log records from the child process are passed to the parent
+    and logged by the parent's loggers. A supervisor thread in the parent
+    restarts the child process should it exit unexpectedly. If frames are
+    being captured the capture is owned by the child process.
+    """
+
+    def __init__(self, ring_slots=default_ring_slots,
+                 ring_slot_size=default_ring_slot_size, **kwargs):
+        """Initialise our class."""
+
+        # start the child process without forking where possible, under
+        # python 2 the child process is always forked
+        try:
+            self.context = multiprocessing.get_context('spawn')
+            self.spawn = True
+        except (AttributeError, ValueError):
+            self.context = multiprocessing
+            self.spawn = False
+        # event used to tell the child process to stop collecting data, our
+        # collect_data property uses this event so it must exist before we
+        # initialise our base class
+        self.stop_event = self.context.Event()
+        # initialize my base class
+        super(ProcessCollector, self).__init__(**kwargs)
+        # replace our queue with a shared memory ring
+        self.queue = PacketRing(slots=ring_slots, slot_size=ring_slot_size,
+                                context=self.context)
+        # The parameters the child process uses to build its GatewayCollector
+        # object. The child uses the device address we are using, so it does
+        # not need to discover the device. They are passed to a spawned child
+        # so must be picklable.
+        self.process_kwargs = dict(kwargs)
+        if self.process_kwargs.get('required_fields') is not None:
+            self.process_kwargs['required_fields'] = list(self.process_kwargs['required_fields'])
+        self.process_kwargs['ip_address'] = self.device.ip_address.decode()
+        self.process_kwargs['port'] = self.device.port
+        # queue used to pass log records from a spawned child process, a new
+        # queue is used for each child process
+        self.log_queue = None
+        self.process = None
+        self.supervisor = None
+        # number of times the child process has been restarted
+        self.restarts = 0
+
+    @property
+    def collect_data(self):
+        """Are we collecting data, shared with the child process."""
+
+        return not self.stop_event.is_set()
+
+    @collect_data.setter
+    def collect_data(self, value):
+
+        if value:
+            self.stop_event.clear()
+        else:
+            self.stop_event.set()
+
+    def startup(self):
+        """Start a child process that collects data from the API."""
+
+        self.collect_data = True
+        if self.recorder is not None:
+            # the capture is owned by the child process, close the capture
+            # and stop recording frames in this process
+            self.recorder.close()
+            self.device.api.recorder = None
+        self.start_process()
+        self.supervisor = threading.Thread(target=self.supervise)
+        self.supervisor.daemon = True
+        self.supervisor.name = 'GatewayCollectorSupervisor'
+        self.supervisor.start()
+
+    def start_process(self):
+        """Start the child process."""
+
+        # log records are only passed if we are using logging based logging
+        # and the child is spawned, a forked child inherits our loggers
+        if self.spawn and log is not None:
+            self.log_queue = self.context.Queue()
+            log_level = log.getEffectiveLevel()
+        else:
+            self.log_queue = None
+            log_level = None
+        self.process = self.context.Process(target=run_collector,
+                                            args=(self.process_kwargs,
+                                                  self.queue,
+                                                  self.stop_event,
+                                                  self.log_queue,
+                                                  log_level),
+                                            name='gateway-collector')
+        self.process.daemon = True
+        self.process.start()
+        loginf("GatewayCollector process %d has been started" % self.process.pid)
+
+    def supervise(self):
+        """Restart the child process if it exits unexpectedly.
+
+        Whilst waiting, log any log records passed by the child process.
+        """
+
+        while self.collect_data:
+            if self.log_queue is not None:
+                self.forward_logs(1)
+            else:
+                self.process.join(1)
+            if self.collect_data and not self.process.is_alive():
+                logerr("GatewayCollector process exited unexpectedly "
+                       "(exit code %s), restarting in %d seconds" % (self.process.exitcode,
+                                                                     self.retry_wait))
+                # wait before restarting but keep an eye out for a shutdown
+                self.stop_event.wait(self.retry_wait)
+                if self.collect_data:
+                    self.restarts += 1
+                    self.start_process()
+
+    def forward_logs(self, timeout=None):
+        """Log the log records passed by the child process.
+
+        Wait up to timeout seconds for a log record then log all available
+        log records. If timeout is None do not wait.
+        """
+
+        if self.log_queue is None:
+            return
+        try:
+            record = self.log_queue.get(timeout is not None, timeout)
+            while True:
+                logging.getLogger(record.name).handle(record)
+                record = self.log_queue.get(False)
+        except six.moves.queue.Empty:
+            pass
+
+    def shutdown(self):
+        """Shut down the child process that collects data from the API.
+
+        Tell the child process to stop, then wait for it to finish.
+        """
+
+        self.collect_data = False
+        if self.supervisor is not None:
+            self.supervisor.join(5.0)
+            self.supervisor = None
+        if self.process is not None:
+            self.process.join(2.0)
+            if self.process.is_alive():
+                logerr("Unable to shut down GatewayCollector process, terminating")
+                self.process.terminate()
+                self.process.join(1.0)
+            else:
+                loginf("GatewayCollector process has been terminated")
+            # log anything the child process logged as it stopped
+            self.forward_logs()
+        self.process = None
+
+
+# ============================================================================
+#                             class ChildCollector
+# ============================================================================
+
+class ChildCollector(GatewayCollector):
+    """Class to collect data in a ProcessCollector child process.
+
+    A ChildCollector object is a GatewayCollector object that writes to the
+    ProcessCollector PacketRing and collects data until the ProcessCollector
+    stop event is set. The stop event also cancels any blocking waits.
+    """
+
+    def __init__(self, ring, stop_event, **kwargs):
+        """Initialise our class."""
+
+        self.stop_event = stop_event
+        # initialize my base class
+        super(ChildCollector, self).__init__(**kwargs)
+        self.queue = ring
+        self.cancel_event = stop_event
+        self.device.api.retry_policy.cancelled = stop_event
+
+    @property
+    def collect_data(self):
+        """Are we collecting data, only our parent may stop us."""
+
+        return not self.stop_event.is_set()
+
+    @collect_data.setter
+    def collect_data(self, value):
+        pass
+
+
+def run_collector(collector_kwargs, ring, stop_event, log_queue=None,
+                  log_level=None):
+    """ProcessCollector child process entry point.
+
+    collector_kwargs: the ChildCollector parameters
+    ring:             the PacketRing to write collector data to
+    stop_event:       event set when the child process is to stop
+    log_queue:        queue used to pass log records to the parent process,
+                      None if the child process is to use its own logging
+    log_level:        the level at which to pass log records to the parent
+    """
+
+    if log_queue is not None:
+        # pass all log records to our parent
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+        root.setLevel(log_level)
+    recorder = collector_kwargs.get('recorder')
+    if recorder is not None:
+        recorder.open()
+    try:
+        collector = ChildCollector(ring, stop_event, **collector_kwargs)
+        collector.collect()
+    except:
+        # we have an exception so log what we can
+        log_traceback_critical('    ****  ')
+    finally:
+        if recorder is not None:
+            recorder.close()
@@ -0,0 +1,469 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+push.py
+
+Receive data uploaded by an Ecowitt gateway device.
+
+The classes in this module receive and decode the Ecowitt protocol uploads
+made by a gateway device rather than polling the device API. This module, and
+the HTTP server modules it requires, are only loaded if config option
+push_receiver is set.
+
+Copyright (C) 2020-2024 Gary Roderick                   gjroderick<at>gmail.com
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see https://www.gnu.org/licenses/.
+"""
+
+# Python imports
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import calendar
+import socket
+import threading
+import time
+
+# Python 2/3 compatibility shims
+import six
+from six.moves import urllib
+
+# WeeWX imports
+import weewx
+
+# Ecowitt gateway driver imports
+from . import (GatewayCollector, GWIOError, Sensors, default_push_port,
+               logdbg, logerr, loginf, monotonic, natural_sort_dict)
+
+
+# ============================================================================
+#                             class PushParser
+# ============================================================================
+
+class PushParser(object):
+    """Class to parse and decode Ecowitt protocol uploads.
+
+    A gateway device may be configured to upload sensor data to a
+    'customized' server using the Ecowitt protocol. Each upload is an HTTP
+    POST of form encoded sensor data using imperial units. Class PushParser
+    decodes an upload into a dict using the same device field names and units
+    as ApiParser so the decoded data may be used in lieu of live data obtained
+    via the API.
+
+    Upload fields that have no API equivalent (eg hourlyrainin) are ignored.
+    """
+
+    # Map of upload field to device field and conversion function. The
+    # conversion function name is a PushParser method. Battery fields are
+    # handled separately.
+    field_struct = {
+        'tempinf': ('intemp', 'conv_temp'),
+        'humidityin': ('inhumid', 'conv_int'),
+        'baromabsin': ('absbarometer', 'conv_press'),
+        'baromrelin': ('relbarometer', 'conv_press'),
+        'tempf': ('outtemp', 'conv_temp'),
+        'humidity': ('outhumid', 'conv_int'),
+        'winddir': ('winddir', 'conv_int'),
+        'windspeedmph': ('windspeed', 'conv_speed'),
+        'windgustmph': ('gustspeed', 'conv_speed'),
+        'maxdailygust': ('daymaxwind', 'conv_speed'),
+        'solarradiation': ('light', 'conv_light'),
+        'uv': ('uvi', 'conv_int'),
+        'rainratein': ('t_rainrate', 'conv_rain'),
+        'eventrainin': ('t_rainevent', 'conv_rain'),
+        'dailyrainin': ('t_rainday', 'conv_rain'),
+        'weeklyrainin': ('t_rainweek', 'conv_rain'),
+        'monthlyrainin': ('t_rainmonth', 'conv_rain'),
+        'yearlyrainin': ('t_rainyear', 'conv_rain'),
+        'totalrainin': ('t_raintotals', 'conv_rain'),
+        'rrain_piezo': ('p_rainrate', 'conv_rain'),
+        'erain_piezo': ('p_rainevent', 'conv_rain'),
+        'hrain_piezo': ('p_rainhour', 'conv_rain'),
+        'drain_piezo': ('p_rainday', 'conv_rain'),
+        'wrain_piezo': ('p_rainweek', 'conv_rain'),
+        'mrain_piezo': ('p_rainmonth', 'conv_rain'),
+        'yrain_piezo': ('p_rainyear', 'conv_rain'),
+        'lightning': ('lightningdist', 'conv_int'),
+        'lightning_time': ('lightningdettime', 'conv_lightning_time'),
+        'lightning_num': ('lightningcount', 'conv_int'),
+        'tf_co2': ('temp17', 'conv_temp'),
+        'humi_co2': ('humid17', 'conv_int'),
+        'pm1_co2': ('pm1', 'conv_float'),
+        'pm1_24h_co2': ('pm1_24h_avg', 'conv_float'),
+        'pm4_co2': ('pm4', 'conv_float'),
+        'pm4_24h_co2': ('pm4_24h_avg', 'conv_float'),
+        'pm25_co2': ('pm255', 'conv_float'),
+        'pm25_24h_co2': ('pm255_24h_avg', 'conv_float'),
+        'pm10_co2': ('pm10', 'conv_float'),
+        'pm10_24h_co2': ('pm10_24h_avg', 'conv_float'),
+        'co2': ('co2', 'conv_int'),
+        'co2_24h': ('co2_24h_avg', 'conv_int'),
+        'heap': ('heap_free', 'conv_int')
+    }
+    # add the multichannel fields
+    for _ch in range(1, 9):
+        field_struct['temp%df' % _ch] = ('temp%d' % _ch, 'conv_temp')
+        field_struct['humidity%d' % _ch] = ('humid%d' % _ch, 'conv_int')
+        field_struct['tf_ch%d' % _ch] = ('temp%d' % (_ch + 8), 'conv_temp')
+        field_struct['soilmoisture%d' % _ch] = ('soilmoist%d' % _ch, 'conv_int')
+        field_struct['leafwetness_ch%d' % _ch] = ('leafwet%d' % _ch, 'conv_int')
+    for _ch in range(9, 17):
+        field_struct['soilmoisture%d' % _ch] = ('soilmoist%d' % _ch, 'conv_int')
+    for _ch in range(1, 5):
+        field_struct['pm25_ch%d' % _ch] = ('pm25%d' % _ch, 'conv_float')
+        field_struct['pm25_avg_24h_ch%d' % _ch] = ('pm25%d_24h_avg' % _ch, 'conv_float')
+        field_struct['leak_ch%d' % _ch] = ('leak%d' % _ch, 'conv_int')
+    del _ch
+    # Map of upload battery field to sensor address and conversion function.
+    # The device battery field name is derived from the sensor name used by
+    # class Sensors.
+    batt_struct = {
+        'wh65batt': (b'\x00', 'conv_int'),
+        'wh68batt': (b'\x01', 'conv_float'),
+        'wh80batt': (b'\x02', 'conv_float'),
+        'wh40batt': (b'\x03', 'conv_float'),
+        'wh25batt': (b'\x04', 'conv_int'),
+        'wh26batt': (b'\x05', 'conv_int'),
+        'wh57batt': (b'\x1a', 'conv_int'),
+        'co2_batt': (b'\x27', 'conv_int'),
+        'wh90batt': (b'\x30', 'conv_float'),
+        'wh85batt': (b'\x31', 'conv_float')
+    }
+    for _ch in range(1, 9):
+        batt_struct['batt%d' % _ch] = (six.int2byte(0x05 + _ch), 'conv_int')
+        batt_struct['soilbatt%d' % _ch] = (six.int2byte(0x0d + _ch), 'conv_float')
+        batt_struct['tf_batt%d' % _ch] = (six.int2byte(0x1e + _ch), 'conv_float')
+        batt_struct['leaf_batt%d' % _ch] = (six.int2byte(0x27 + _ch), 'conv_float')
+    for _ch in range(1, 5):
+        batt_struct['pm25batt%d' % _ch] = (six.int2byte(0x15 + _ch), 'conv_int')
+        batt_struct['leakbatt%d' % _ch] = (six.int2byte(0x1a + _ch), 'conv_int')
+    del _ch
+
+    def __init__(self, use_wh32=True):
+        """Initialise a PushParser object."""
+
+        # we use the Sensors sensor names for battery fields, a Sensors object
+        # will set the WH26/WH32 name as required
+        self.sensor_ids = Sensors(use_wh32=use_wh32).sensor_ids
+
+    def parse(self, post):
+        """Parse an Ecowitt protocol upload.
+
+        post: The upload data, either the form encoded request body as a
+              string or bytes or a dict of upload field lists as returned by
+              urllib.parse.parse_qs().
+
+        Returns a dict of device field data. The upload time is used for the
+        'datetime' field if it can be decoded, otherwise the current system
+        time is used.
+        """
+
+        if not hasattr(post, 'keys'):
+            if isinstance(post, bytes):
+                post = post.decode('ascii', 'replace')
+            post = urllib.parse.parse_qs(post, keep_blank_values=True)
+        data = {}
+        for key, values in six.iteritems(post):
+            value = values[-1] if isinstance(values, list) else values
+            if key in self.field_struct:
+                field, conv_fn = self.field_struct[key]
+                data[field] = getattr(self, conv_fn)(value)
+            elif key in self.batt_struct:
+                address, conv_fn = self.batt_struct[key]
+                field = '%s_batt' % self.sensor_ids[address]['name']
+                data[field] = getattr(self, conv_fn)(value)
+        data['datetime'] = self.conv_dateutc(post.get('dateutc', [None])[-1])
+        return data
+
+    @staticmethod
+    def conv_float(value):
+        """Convert an upload value to a float, None if not a number."""
+
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def conv_int(value):
+        """Convert an upload value to an integer, None if not a number."""
+
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return None
+
+    def conv_temp(self, value):
+        """Convert an upload temperature in F to C."""
+
+        value = self.conv_float(value)
+        return round((value - 32.0) * 5.0 / 9.0, 1) if value is not None else None
+
+    def conv_press(self, value):
+        """Convert an upload pressure in inHg to hPa."""
+
+        value = self.conv_float(value)
+        return round(value * 33.8639, 1) if value is not None else None
+
+    def conv_speed(self, value):
+        """Convert an upload speed in mph to m/s."""
+
+        value = self.conv_float(value)
+        return round(value * 0.44704, 1) if value is not None else None
+
+    def conv_rain(self, value):
+        """Convert an upload rain amount in inches or rate in inches per hour
+        to mm or mm per hour."""
+
+        value = self.conv_float(value)
+        return round(value * 25.4, 1) if value is not None else None
+
+    def conv_light(self, value):
+        """Convert an upload solar radiation in W/m2 to illuminance in lux.
+
+        The device uses a conversion factor of 126.7 lux per W/m2.
+        """
+
+        value = self.conv_float(value)
+        return round(value * 126.7, 1) if value is not None else None
+
+    def conv_lightning_time(self, value):
+        """Convert an upload lightning strike time.
+
+        The upload provides a unix epoch timestamp, the API provides the
+        timestamp offset by the station time zone (refer
+        ApiParser.decode_utc()). Apply the local time zone offset so the
+        result is consistent with the API.
+        """
+
+        value = self.conv_int(value)
+        return calendar.timegm(time.localtime(value)) if value is not None else None
+
+    @staticmethod
+    def conv_dateutc(value):
+        """Convert an upload UTC date-time string to a unix epoch timestamp.
+
+        If the date-time cannot be decoded the current system time is
+        returned.
+        """
+
+        try:
+            return calendar.timegm(time.strptime(value, '%Y-%m-%d %H:%M:%S'))
+        except (TypeError, ValueError):
+            return int(time.time())
+
+
+# ============================================================================
+#                            class PushReceiver
+# ============================================================================
+
+class PushReceiver(six.moves.socketserver.ThreadingMixIn,
+                   six.moves.BaseHTTPServer.HTTPServer):
+    """Class implementing an HTTP server that receives Ecowitt protocol
+    uploads.
+
+    Each upload is passed, as the form encoded request body, to a callback
+    function. The device is sent a 200 response if the callback returns
+    True, otherwise a 400 response. If a passkey is specified uploads with
+    any other PASSKEY are refused with a 403 response.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    class Handler(six.moves.BaseHTTPServer.BaseHTTPRequestHandler):
+        """Class to handle a single upload."""
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+            except ValueError:
+                length = 0
+            body = self.rfile.read(length).decode('ascii', 'replace')
+            post = urllib.parse.parse_qs(body, keep_blank_values=True)
+            passkey = self.server.passkey
+            if passkey is not None and post.get('PASSKEY', [None])[-1] != passkey:
+                self.server.refused += 1
+                self.send_response(403)
+            elif self.server.callback(post):
+                self.server.received += 1
+                self.send_response(200)
+            else:
+                self.server.refused += 1
+                self.send_response(400)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            logdbg("PushReceiver: %s %s" % (self.address_string(), format % args))
+
+    def __init__(self, callback, address='', port=default_push_port,
+                 passkey=None):
+        """Initialise a PushReceiver object and bind to the listen port."""
+
+        six.moves.BaseHTTPServer.HTTPServer.__init__(self, (address, port),
+                                                     PushReceiver.Handler)
+        self.callback = callback
+        self.passkey = passkey
+        # the port we are listening on, port 0 binds to a free port
+        self.port = self.server_address[1]
+        self.received = 0
+        self.refused = 0
+        self.thread = None
+
+    def start(self):
+        """Start serving uploads in a thread."""
+
+        self.thread = threading.Thread(target=self.serve_forever,
+                                       kwargs={'poll_interval': 0.1})
+        self.thread.daemon = True
+        self.thread.name = 'gateway-push-receiver'
+        self.thread.start()
+
+    def stop(self):
+        """Stop serving uploads and close the listen socket."""
+
+        if self.thread is not None:
+            self.shutdown()
+            self.thread.join(1.0)
+            self.thread = None
+        self.server_close()
+
+
+# ============================================================================
+#                            class PushCollector
+# ============================================================================
+
+class PushCollector(GatewayCollector):
+    """Class to collect data uploaded by a gateway device.
+
+    A PushCollector object is a drop in replacement for a GatewayCollector
+    object that obtains sensor data from Ecowitt protocol uploads made by the
+    device to a PushReceiver rather than by polling the device API. The
+    device must be configured to upload to the host and port the
+    PushReceiver is listening on using the 'customized' upload settings.
+    Each upload is decoded by a PushParser object and the decoded data is
+    queued for the parent driver/service. The API is still used to obtain
+    device details (eg model and firmware version).
+
+    Uploads do not include all API fields, most notably sensor signal levels
+    and some sensor battery states are not included. In hybrid mode the API
+    is additionally polled every hybrid_poll_interval seconds and any fields
+    obtained from the API that are not included in an upload are added to
+    the upload data. Upload data is always used in preference to API data.
+    API data is discarded if an API poll fails and is not used once it is
+    older than hybrid_stale_polls hybrid mode poll intervals. A failed API
+    poll is logged but is not passed to our parent, uploads continue to be
+    queued.
+    """
+
+    # number of hybrid mode poll intervals after which API data is stale
+    hybrid_stale_polls = 3
+
+    def __init__(self, push_address='', push_port=default_push_port,
+                 push_passkey=None, hybrid_poll_interval=0, **kwargs):
+        """Initialise our class."""
+
+        # initialize my base class
+        super(PushCollector, self).__init__(**kwargs)
+
+        self.push_address = push_address
+        self.push_port = push_port
+        self.push_passkey = push_passkey
+        # interval in seconds between hybrid mode API polls, None or 0 if not
+        # using hybrid mode
+        self.hybrid_poll_interval = hybrid_poll_interval
+        # the most recent API data obtained in hybrid mode and the monotonic
+        # time it was obtained
+        self.hybrid_data = None
+        self.hybrid_ts = None
+        self.parser = PushParser(use_wh32=kwargs.get('use_wh32', True))
+        self.receiver = None
+        if self.hybrid_poll_interval:
+            loginf('     API will be polled every %s seconds for fields not '
+                   'included in uploads' % self.hybrid_poll_interval)
+
+    def process_post(self, post):
+        """Decode and queue an upload.
+
+        Called by our PushReceiver for each upload. Returns True if the
+        upload was decoded and queued, otherwise False.
+        """
+
+        try:
+            data = self.parser.parse(post)
+        except Exception as e:
+            logerr('Unable to decode uploaded data: %s' % e)
+            return False
+        if weewx.debug >= 3:
+            logdbg("Parsed uploaded data: %s" % natural_sort_dict(data))
+        # in hybrid mode add any API fields not included in the upload,
+        # provided the API data is not stale
+        hybrid_data, hybrid_ts = self.hybrid_data, self.hybrid_ts
+        if hybrid_data is not None and \
+                monotonic() - hybrid_ts <= self.hybrid_stale_polls * self.hybrid_poll_interval:
+            for field, value in six.iteritems(hybrid_data):
+                if field not in data:
+                    data[field] = value
+        self.queue.put(data)
+        return True
+
+    def collect(self):
+        """Collect sensor data.
+
+        Uploads are received and queued by our PushReceiver, all we need do is
+        poll the API if we are in hybrid mode and wait to be shut down.
+        """
+
+        last_poll = 0
+        while self.collect_data:
+            now = time.time()
+            if self.hybrid_poll_interval and now - last_poll >= self.hybrid_poll_interval:
+                try:
+                    self.hybrid_data = self.get_current_data()
+                    self.hybrid_ts = monotonic()
+                except GWIOError:
+                    if self.log_failures:
+                        logerr('Unable to obtain live sensor data')
+                    # do not add the previous API data to uploads, the API
+                    # data only supplements uploads so uploads continue to
+                    # be queued and our parent is not told of a problem
+                    self.hybrid_data = None
+                last_poll = now
+            self.cancel_event.wait(1)
+
+    def startup(self):
+        """Start receiving uploads and start our collector thread."""
+
+        try:
+            self.receiver = PushReceiver(self.process_post,
+                                         address=self.push_address,
+                                         port=self.push_port,
+                                         passkey=self.push_passkey)
+        except socket.error as e:
+            logerr("Unable to listen for uploads on port %d: %s" % (self.push_port, e))
+            raise GWIOError(e)
+        self.receiver.start()
+        loginf("Listening for device uploads on port %d" % self.receiver.port)
+        super(PushCollector, self).startup()
+
+    def shutdown(self):
+        """Stop receiving uploads and shut down our collector thread."""
+
+        if self.receiver is not None:
+            self.receiver.stop()
+            loginf("Received %d uploads (%d refused)" % (self.receiver.received,
+                                                        self.receiver.refused))
+            self.receiver = None
+        super(PushCollector, self).shutdown()
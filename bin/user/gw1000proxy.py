@@ -0,0 +1,524 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+gw1000proxy.py
+
+A multiplexing proxy for devices using the Ecowitt LAN/Wi-Fi Gateway API.
+
+Ecowitt gateway devices are ESP32 based and cope poorly with several clients
+issuing API commands at the same time. The gateway proxy owns the only
+connection to each upstream gateway device and serves any number of local
+clients. For each upstream device the proxy:
+
+-   listens on a local port and speaks the same binary API as the device, so
+    any gateway API client, including the Ecowitt gateway driver, can use the
+    proxy in lieu of the device
+-   answers read commands from a cache, cached responses are used for ttl
+    seconds after which the next read command is passed to the device
+-   coalesces identical read commands that arrive while the same command is
+    in flight, all waiting clients are answered with the single device
+    response
+-   passes write and unrecognised commands through to the device in the order
+    they are received, a write command clears the cache for the device
+-   only ever has one command in flight to the device at any time
+
+Upstream requests are made using GatewayApi so API command framing, response
+validation and (optional) frame capture are shared with the driver. A client
+whose command cannot be completed has its connection closed without a
+response, as the device would, and the client retries as it normally would.
+
+Copyright (C) 2020-2024 Gary Roderick                   gjroderick<at>gmail.com
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see https://www.gnu.org/licenses/.
+
+Version: 0.1.0                                     Date: Unreleased
+
+Revision History
+    Unreleased             v0.1.0
+        -   initial release
+
+The proxy requires Python 3.7 or later. To run the proxy:
+
+    $ PYTHONPATH=/home/weewx/bin python3 -m user.gw1000proxy --help
+
+For example, to proxy two gateway devices on local ports 45000 and 45001 and
+cache read command responses for 10 seconds:
+
+    $ PYTHONPATH=/home/weewx/bin python3 -m user.gw1000proxy \
+        --device=192.168.1.20 --device=192.168.1.21:45000 --ttl=10
+
+To have the Ecowitt gateway driver use the proxy set the [GW1000] ip_address
+and port config options to the proxy address and port, eg:
+
+    [GW1000]
+        ip_address = 127.0.0.1
+        port = 45000
+
+Note. Only the binary API is proxied. Driver HTTP requests, used for firmware
+update checks, are made to the address set by ip_address.
+"""
+
+# python imports
+import argparse
+import asyncio
+import socket
+import threading
+import time
+
+# WeeWX imports
+import user.gw1000
+from user.gw1000 import GatewayApi, GWIOError, UnknownApiCommand
+
+PROXY_NAME = 'Ecowitt gateway proxy'
+PROXY_VERSION = '0.1.0'
+
+# various defaults used throughout
+# default address the proxy listens on
+default_proxy_ip_address = '127.0.0.1'
+# default local port for the first upstream device
+default_proxy_port = 45000
+# default period in seconds a cached read command response is used
+default_proxy_ttl = 10
+# default number of attempts made to obtain a valid response to a read command
+default_proxy_max_tries = 2
+
+
+def is_read_command(name):
+    """Is an API command a read command that may be cached."""
+
+    return name.startswith(('CMD_READ_', 'CMD_GET_')) or name == 'CMD_GW1000_LIVEDATA'
+
+
+# ============================================================================
+#                            class ProxyStats
+# ============================================================================
+
+class ProxyStats(object):
+    """Simple thread safe counters for proxy activity."""
+
+    def __init__(self):
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def inc(self, key, n=1):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def summary(self, upstreams=()):
+        with self.lock:
+            items = sorted(self.counters.items())
+        requests = self.counters.get('client_requests', 0)
+        upstream = self.counters.get('upstream_requests', 0)
+        lines = ["%s statistics:" % PROXY_NAME]
+        for key, value in items:
+            lines.append("    %-24s %d" % (key, value))
+        if requests > 0:
+            lines.append("    %-24s %.1f" % ('client/upstream ratio', requests / max(upstream, 1)))
+        # upstream round trip time estimates
+        for device in upstreams:
+            for key, est in sorted(device.api.rtt_stats.items()):
+                if est['srtt'] is not None:
+                    lines.append("    %s %s: srtt %.3fs rttvar %.3fs timeout %.3fs" % (device.name,
+                                                                                      key,
+                                                                                      est['srtt'],
+                                                                                      est['rttvar'],
+                                                                                      est['timeout']))
+        return '\n'.join(lines)
+
+
+# ============================================================================
+#                           class UpstreamDevice
+# ============================================================================
+
+class UpstreamDevice(object):
+    """An upstream gateway device shared by all proxy clients.
+
+    An UpstreamDevice object maintains the response cache and in-flight
+    requests for a single gateway device and serialises all requests made to
+    the device. Requests to the device are made from an executor thread using
+    a GatewayApi object.
+    """
+
+    # map of API command codes to command names
+    cmd_names = dict((code, name) for name, code in GatewayApi.api_commands.items())
+
+    def __init__(self, ip_address, port=user.gw1000.default_port, local_port=0,
+                 ttl=default_proxy_ttl, max_tries=default_proxy_max_tries,
+                 socket_timeout=user.gw1000.default_socket_timeout,
+                 recorder=None, stats=None):
+
+        self.local_port = local_port
+        self.ttl = ttl
+        self.max_tries = max_tries
+        self.stats = stats if stats is not None else ProxyStats()
+        # get a GatewayApi object to interact with the device, this will
+        # contact the device
+        self.api = GatewayApi(ip_address=ip_address, port=port,
+                              socket_timeout=socket_timeout,
+                              max_tries=max_tries, retry_wait=0,
+                              recorder=recorder)
+        # cached responses keyed by request packet, each value is a tuple of
+        # monotonic time of the response and the response
+        self.cache = {}
+        # futures for in-flight requests keyed by request packet
+        self.inflight = {}
+        # lock used to serialise requests to the device, the lock must be
+        # created by the event loop that uses it
+        self.lock = None
+
+    @property
+    def name(self):
+        """A short description of the upstream device."""
+
+        return '%s %s at %s:%d' % (self.api.model, self.api.mac,
+                                   self.api.ip_address.decode(), self.api.port)
+
+    async def request(self, packet):
+        """Obtain the response to a client request packet.
+
+        Read commands are answered from the cache if possible, otherwise they
+        join an identical in-flight request or are sent to the device. All
+        other commands are sent to the device. Raises GWIOError if a response
+        could not be obtained.
+        """
+
+        self.stats.inc('client_requests')
+        name = self.cmd_names.get(packet[2:3])
+        if name is None or not is_read_command(name):
+            # writes and unrecognised commands are passed through in order, a
+            # write may change what the device reports so clear the cache
+            self.stats.inc('passthrough')
+            async with self.lock:
+                response = await self.upstream(packet, check=False)
+            self.cache.clear()
+            return response
+        cached = self.cache.get(packet)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            self.stats.inc('cache_hits')
+            return cached[1]
+        future = self.inflight.get(packet)
+        if future is not None:
+            # an identical request is in flight, wait for its response
+            self.stats.inc('coalesced')
+            return await asyncio.shield(future)
+        future = asyncio.get_event_loop().create_future()
+        self.inflight[packet] = future
+        try:
+            async with self.lock:
+                response = await self.upstream(packet, check=True)
+        except GWIOError as e:
+            future.set_exception(e)
+            # mark the exception as retrieved in case no one else is waiting
+            future.exception()
+            raise
+        finally:
+            del self.inflight[packet]
+        self.cache[packet] = (time.monotonic(), response)
+        future.set_result(response)
+        return response
+
+    async def upstream(self, packet, check):
+        """Send a request packet to the device from an executor thread."""
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.send, packet, check)
+
+    def send(self, packet, check):
+        """Send a request packet to the device and return the response.
+
+        If check is True the response is validated and the request repeated
+        up to max_tries times until a valid response is received. Otherwise
+        the request is sent once, requests that change the device state are
+        never repeated. Raises GWIOError if no (valid) response was obtained.
+        """
+
+        tries = self.max_tries if check else 1
+        error = None
+        for attempt in range(tries):
+            self.stats.inc('upstream_requests')
+            try:
+                response = self.api.send_cmd(packet)
+            except socket.error as e:
+                error = e
+            else:
+                if not check:
+                    return response
+                try:
+                    self.api.check_response(response, packet[2:3])
+                except UnknownApiCommand:
+                    # the device does not understand the command, let the
+                    # client decide what to do with the response
+                    return response
+                except Exception as e:
+                    error = e
+                else:
+                    return response
+            self.stats.inc('upstream_errors')
+        raise GWIOError("Failed to obtain response from %s: %s" % (self.name, error))
+
+
+# ============================================================================
+#                           class GatewayProxy
+# ============================================================================
+
+class GatewayProxy(object):
+    """Proxy one or more gateway devices to local clients.
+
+    All client connections are served from a single asyncio event loop. The
+    proxy may be run in the foreground with run() or in a background thread
+    with start()/stop(), the latter is intended for use in tests.
+
+    devices is a list of upstream device (ip_address, port) tuples. Upstream
+    devices are served on consecutive local ports starting at port. A port of
+    0 requests an ephemeral port, the local port actually used for each
+    upstream device is available via the UpstreamDevice local_port attribute
+    once the proxy has started.
+    """
+
+    def __init__(self, devices, ip_address=default_proxy_ip_address,
+                 port=default_proxy_port, ttl=default_proxy_ttl,
+                 max_tries=default_proxy_max_tries,
+                 socket_timeout=user.gw1000.default_socket_timeout,
+                 recorder=None, verbose=False):
+
+        self.ip_address = ip_address
+        self.stats = ProxyStats()
+        self.verbose = verbose
+        self.upstreams = []
+        for i, (dev_ip, dev_port) in enumerate(devices):
+            self.upstreams.append(UpstreamDevice(dev_ip, dev_port,
+                                                 local_port=port + i if port else 0,
+                                                 ttl=ttl, max_tries=max_tries,
+                                                 socket_timeout=socket_timeout,
+                                                 recorder=recorder,
+                                                 stats=self.stats))
+        self.loop = None
+        self.servers = []
+        # the StreamWriter of each open client connection keyed by the task
+        # handling the connection
+        self.clients = {}
+        self.thread = None
+        self.ready = threading.Event()
+        self.error = None
+
+    async def handle_client(self, upstream, reader, writer):
+        """Handle a client connection to the proxy.
+
+        Commands are processed until the client closes the connection or the
+        proxy is shut down.
+        """
+
+        task = asyncio.current_task()
+        self.clients[task] = writer
+        try:
+            while True:
+                try:
+                    head = await reader.readexactly(4)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if head[:2] != GatewayApi.header:
+                    self.stats.inc('client_bad_request')
+                    break
+                size = head[3]
+                try:
+                    rest = await reader.readexactly(max(size - 2, 0))
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                packet = head + rest
+                if GatewayApi.calc_checksum(packet[2:-1]) != packet[-1]:
+                    # the device silently ignores invalid requests
+                    self.stats.inc('client_bad_checksum')
+                    break
+                try:
+                    response = await upstream.request(packet)
+                except GWIOError as e:
+                    if self.verbose:
+                        print(e)
+                    break
+                writer.write(response)
+                await writer.drain()
+        finally:
+            del self.clients[task]
+            writer.close()
+
+    async def startup(self):
+        """Start a server for each upstream device."""
+
+        for upstream in self.upstreams:
+            upstream.lock = asyncio.Lock()
+            server = await asyncio.start_server(
+                lambda r, w, u=upstream: self.handle_client(u, r, w),
+                self.ip_address, upstream.local_port, reuse_address=True)
+            upstream.local_port = server.sockets[0].getsockname()[1]
+            self.servers.append(server)
+
+    async def shutdown(self):
+        """Stop all servers and close any open client connections.
+
+        Client connections must be closed before waiting for a server to
+        close, from Python 3.12.1 a server is not closed until all of its
+        client connections have been closed.
+        """
+
+        for server in self.servers:
+            server.close()
+        clients = list(self.clients.items())
+        for task, writer in clients:
+            writer.close()
+            task.cancel()
+        # wait for the client connection tasks and transports to finish
+        for task, writer in clients:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+            try:
+                await writer.wait_closed()
+            except (asyncio.CancelledError, Exception):
+                pass
+        for server in self.servers:
+            await server.wait_closed()
+        self.servers = []
+
+    def _thread_main(self):
+        """Event loop thread target."""
+
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.startup())
+        except Exception as e:
+            self.error = e
+            self.ready.set()
+            self.loop.close()
+            return
+        self.ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.run_until_complete(self.shutdown())
+            self.loop.close()
+
+    def start(self, timeout=10):
+        """Start the proxy in a background thread.
+
+        Returns once the proxy is listening for each upstream device. Any
+        error raised during start up is re-raised.
+        """
+
+        self.thread = threading.Thread(target=self._thread_main, name='gw-proxy')
+        self.thread.daemon = True
+        self.thread.start()
+        self.ready.wait(timeout)
+        if self.error is not None:
+            raise self.error
+
+    def stop(self, timeout=10):
+        """Stop a proxy started with start()."""
+
+        if self.loop is not None and self.thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+            self.thread = None
+
+
+def parse_device(device):
+    """Parse an IP_ADDRESS[:PORT] device specification."""
+
+    ip_address, _sep, port = device.partition(':')
+    return ip_address, int(port) if port else user.gw1000.default_port
+
+
+def main():
+
+    usage = """python3 -m user.gw1000proxy --help
+       python3 -m user.gw1000proxy --version
+       python3 -m user.gw1000proxy --device=IP_ADDRESS[:PORT]
+            [--device=IP_ADDRESS[:PORT] ...] [--ip-address=IP_ADDRESS]
+            [--port=PORT] [--ttl=SECONDS] [--max-tries=NUM]
+            [--socket-timeout=SECONDS] [--capture=CAPTURE_FILE]
+            [--stats-interval=SECONDS] [--verbose]"""
+
+    parser = argparse.ArgumentParser(usage=usage,
+                                     description='Proxy one or more Ecowitt gateway devices.')
+    parser.add_argument('--version', dest='version', action='store_true',
+                        help='display proxy version number')
+    parser.add_argument('--device', dest='devices', action='append', default=[],
+                        help='upstream device address and optional port, may '
+                             'be repeated')
+    parser.add_argument('--ip-address', dest='ip_address',
+                        default=default_proxy_ip_address,
+                        help='address the proxy listens on')
+    parser.add_argument('--port', dest='port', type=int,
+                        default=default_proxy_port,
+                        help='local port for the first upstream device, '
+                             'further devices use consecutive ports')
+    parser.add_argument('--ttl', dest='ttl', type=float,
+                        default=default_proxy_ttl,
+                        help='seconds a cached read command response is used')
+    parser.add_argument('--max-tries', dest='max_tries', type=int,
+                        default=default_proxy_max_tries,
+                        help='attempts made to obtain a valid response to a '
+                             'read command')
+    parser.add_argument('--socket-timeout', dest='socket_timeout', type=float,
+                        default=user.gw1000.default_socket_timeout,
+                        help='upstream socket timeout in seconds')
+    parser.add_argument('--capture', dest='capture',
+                        help='capture upstream API frames to CAPTURE_FILE')
+    parser.add_argument('--stats-interval', dest='stats_interval', type=float,
+                        help='seconds between display of proxy statistics')
+    parser.add_argument('--verbose', dest='verbose', action='store_true',
+                        help='display additional information')
+    args = parser.parse_args()
+
+    if args.version:
+        print("%s version: %s" % (PROXY_NAME, PROXY_VERSION))
+        exit(0)
+    if len(args.devices) == 0:
+        parser.error('at least one upstream device must be specified using --device')
+
+    recorder = user.gw1000.FrameRecorder(args.capture) if args.capture else None
+    try:
+        proxy = GatewayProxy([parse_device(d) for d in args.devices],
+                             ip_address=args.ip_address,
+                             port=args.port,
+                             ttl=args.ttl,
+                             max_tries=args.max_tries,
+                             socket_timeout=args.socket_timeout,
+                             recorder=recorder,
+                             verbose=args.verbose)
+        proxy.start()
+    except (GWIOError, OSError, ValueError) as e:
+        print("Unable to start %s: %s" % (PROXY_NAME, e))
+        exit(1)
+    print("%s proxying %d device(s)" % (PROXY_NAME, len(proxy.upstreams)))
+    for upstream in proxy.upstreams:
+        print("    %s:%d -> %s" % (proxy.ip_address, upstream.local_port, upstream.name))
+    print("Press Ctrl-C to stop")
+    try:
+        while True:
+            time.sleep(args.stats_interval if args.stats_interval else 3600)
+            if args.stats_interval:
+                print(proxy.stats.summary(proxy.upstreams))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        proxy.stop()
+        if recorder is not None:
+            recorder.close()
+        print()
+        print(proxy.stats.summary(proxy.upstreams))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1304 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+gw1000sim.py
+
+A simulator for devices using the Ecowitt LAN/Wi-Fi Gateway API.
+
+The gateway simulator stands up one or more virtual gateway devices on the
+local machine. Each virtual device:
+
+-   answers the gateway API commands listed in GatewayApi.api_commands with
+    valid, checksummed responses. Read commands return data, write commands
+    are acknowledged but do not alter the virtual device
+-   periodically emits the port 59387 UDP broadcast used for device discovery
+    and answers CMD_BROADCAST requests received on port 46000
+-   serves the HTTP requests known to class GatewayHttp
+-   generates evolving sensor data, including diurnal temperature, wind, rain
+    events and lightning strikes
+
+Responses are constructed from the ApiParser structure tables so that the
+simulator and the driver decode paths share a single definition of each field.
+Faults such as additional latency, dropped responses, corrupt checksums and
+truncated responses can be injected at a configurable rate to exercise the
+driver retry and recovery code.
+
+Many virtual devices can be run from a single process. Each virtual device
+listens on its own port (or its own loopback address when --spread is used).
+
+Copyright (C) 2020-2024 Gary Roderick                   gjroderick<at>gmail.com
+
+This program is free software: you can redistribute it and/or modify it under
+the terms of the GNU General Public License as published by the Free Software
+Foundation, either version 3 of the License, or (at your option) any later
+version.
+
+This program is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with
+this program.  If not, see https://www.gnu.org/licenses/.
+
+Version: 0.1.0                                     Date: Unreleased
+
+Revision History
+    Unreleased             v0.1.0
+        -   initial release
+
+The simulator requires Python 3.7 or later. To run the simulator:
+
+    $ PYTHONPATH=/home/weewx/bin python3 -m user.gw1000sim --help
+
+For example, to run 200 virtual devices on ports 45000 to 45199 with 50ms of
+added latency and a 2% chance of a corrupt checksum:
+
+    $ PYTHONPATH=/home/weewx/bin python3 -m user.gw1000sim --devices=200 \
+        --latency=50 --corrupt=2
+
+Note. The driver HTTP client always uses port 80. When the simulator HTTP
+server uses another port, the device address used by the driver HTTP client
+must include the port, eg '127.0.0.1:8000'.
+"""
+
+# python imports
+import argparse
+import asyncio
+import json
+import math
+import random
+import socket
+import struct
+import threading
+import time
+
+from urllib.parse import urlsplit, parse_qs
+
+# WeeWX imports
+import user.gw1000
+from user.gw1000 import ApiParser, GatewayApi, GatewayHttp, Sensors
+
+SIM_NAME = 'Gateway simulator'
+SIM_VERSION = '0.1.0'
+
+# various defaults used throughout
+# default address the virtual devices listen on
+default_sim_ip_address = '127.0.0.1'
+# default port for the first virtual device API server
+default_sim_port = user.gw1000.default_port
+# default port for the first virtual device HTTP server, 0 disables HTTP
+default_sim_http_port = 8000
+# default number of virtual devices
+default_num_devices = 1
+# default virtual device model
+default_sim_model = 'GW2000'
+# default number of WH31 temperature/humidity channels per virtual device
+default_sim_channels = 2
+# default address that discovery broadcasts are sent to
+default_discovery_address = user.gw1000.default_broadcast_address
+# default interval in seconds between discovery broadcasts, 0 disables
+default_discovery_interval = 5
+# default period in seconds a dropped connection is held open before closing
+default_drop_hold = 30
+
+# virtual device models, firmware stem and version, the firmware stem is used
+# in both the firmware version string and the device AP SSID
+sim_models = {
+    'GW1000': ('GW1000', '1.7.7'),
+    'GW1100': ('GW1100A', '2.3.2'),
+    'GW1200': ('GW1200B', '1.3.1'),
+    'GW2000': ('GW2000A', '3.1.1'),
+    'WH2650': ('WH2650A', '1.7.7'),
+    'WN1900': ('WN1900C', '1.2.3'),
+    'WS3900': ('WS3900A', '1.2.4')
+}
+# first three bytes of the virtual device MAC address
+sim_mac_oui = b'\xe8\x68\xe7'
+
+# Struct format and scale factor used to encode a field for each ApiParser
+# decode function. Decode function aliases (eg decode_speed) are resolved
+# against these entries so the simulator tracks any change to the aliases.
+canonical_formats = {
+    'decode_temp': ('>h', 10),
+    'decode_humid': ('B', 1),
+    'decode_press': ('>H', 10),
+    'decode_dir': ('>H', 1),
+    'decode_big_rain': ('>L', 10),
+    'decode_distance': ('B', 1),
+    'decode_utc': ('>L', 1),
+    'decode_count': ('>L', 1),
+    'decode_gain_100': ('>H', 100)
+}
+
+
+def resolve_formats():
+    """Map each ApiParser decode function name to a struct format.
+
+    Returns a dict keyed by decode function name, including any aliases,
+    containing a (struct format, scale factor) tuple.
+    """
+
+    formats = dict()
+    for name, attr in ApiParser.__dict__.items():
+        if not name.startswith('decode_'):
+            continue
+        for canonical, fmt in canonical_formats.items():
+            if ApiParser.__dict__[canonical] is attr:
+                formats[name] = fmt
+                break
+    return formats
+
+
+encode_formats = resolve_formats()
+
+
+def encode_field(decode_fn, value, size):
+    """Encode a single value as the bytes ApiParser.decode_fn expects.
+
+    A value of None is encoded as the 'no data' form used by the device, all
+    bits set. Decode functions without a simple struct format (eg
+    decode_reserved) are encoded as zero bytes.
+    """
+
+    if value is None:
+        return b'\xff' * size
+    try:
+        fmt, scale = encode_formats[decode_fn]
+    except KeyError:
+        return b'\x00' * size
+    return struct.pack(fmt, int(round(value * scale)))
+
+
+def build_response(cmd_code, payload, wide=False, broadcast=False):
+    """Construct a checksummed API response.
+
+    Responses use either a single byte size field or, for responses that may
+    exceed 255 bytes, a two byte big endian size field. The size field counts
+    the command code, the size field, the payload and the checksum, except
+    for broadcast responses where the checksum is not counted.
+
+    cmd_code:  command code, byte string of length one
+    payload:   response payload, byte string
+    wide:      whether a two byte size field is used
+    broadcast: whether this is a CMD_BROADCAST format response
+
+    Returns a response as a bytestring.
+    """
+
+    if broadcast:
+        size = struct.pack('>H', len(payload) + 3)
+    elif wide:
+        size = struct.pack('>H', len(payload) + 4)
+    else:
+        size = struct.pack('B', len(payload) + 3)
+    body = b''.join([cmd_code, size, payload])
+    checksum = GatewayApi.calc_checksum(body)
+    return b''.join([GatewayApi.header, body, struct.pack('B', checksum)])
+
+
+def pack_str(value):
+    """Pack a string as a length byte followed by the ASCII characters."""
+
+    b = value.encode('ascii')
+    return b''.join([struct.pack('B', len(b)), b])
+
+
+def bounded_walk(rng, value, step, lo, hi):
+    """Take a random step of up to +/- step keeping the result in [lo, hi]."""
+
+    return min(hi, max(lo, value + rng.uniform(-step, step)))
+
+
+# ============================================================================
+#                            class FaultProfile
+# ============================================================================
+
+class FaultProfile(object):
+    """Fault injection settings shared by the virtual devices.
+
+    Latency and jitter are in seconds, the fault rates are probabilities in
+    the range 0 to 1. At most one of drop, corrupt or truncate is applied to
+    any one response.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, drop=0.0, corrupt=0.0,
+                 truncate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.drop = drop
+        self.corrupt = corrupt
+        self.truncate = truncate
+        self.rng = random.Random(seed)
+
+    def delay(self):
+        """The delay in seconds to apply before responding."""
+
+        if self.jitter > 0:
+            return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+        return self.latency
+
+    def pick(self):
+        """Select the fault, if any, to apply to a response.
+
+        Returns 'drop', 'corrupt', 'truncate' or None.
+        """
+
+        r = self.rng.random()
+        if r < self.drop:
+            return 'drop'
+        r -= self.drop
+        if r < self.corrupt:
+            return 'corrupt'
+        r -= self.corrupt
+        if r < self.truncate:
+            return 'truncate'
+        return None
+
+    def apply(self, fault, frame):
+        """Apply a corrupt or truncate fault to a response frame."""
+
+        if fault == 'corrupt':
+            return b''.join([frame[:-1], struct.pack('B', frame[-1] ^ 0xFF)])
+        if fault == 'truncate':
+            return frame[:self.rng.randint(1, len(frame) - 1)]
+        return frame
+
+
+# ============================================================================
+#                            class SimStats
+# ============================================================================
+
+class SimStats(object):
+    """Simple counters for simulator activity."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.counters = dict()
+
+    def inc(self, key, n=1):
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def summary(self):
+        """Return a multi-line summary of the counters."""
+
+        elapsed = max(time.time() - self.started, 1e-6)
+        lines = ["%s statistics after %.1f seconds:" % (SIM_NAME, elapsed)]
+        for key in sorted(self.counters):
+            count = self.counters[key]
+            lines.append("    %32s: %8d (%.1f/s)" % (key, count, count / elapsed))
+        return '\n'.join(lines)
+
+
+# ============================================================================
+#                           class VirtualDevice
+# ============================================================================
+
+class VirtualDevice(object):
+    """A single simulated gateway device.
+
+    A VirtualDevice holds the device identity (MAC, IP address, port, model
+    and firmware) and the evolving sensor state. Sensor state is advanced
+    lazily whenever data is requested so that an idle virtual device costs
+    nothing.
+    """
+
+    # map of device field name to (address, decode fn, size) derived from
+    # the ApiParser live data structure, multi-field entries are not used
+    live_fields = dict((v[2], (k, v[0], v[1]))
+                       for k, v in ApiParser.live_data_struct.items()
+                       if isinstance(v[2], str))
+    # map of device field name to (address, decode fn, size) derived from
+    # the ApiParser rain data structure
+    rain_fields = dict((v[2], (k, v[0], v[1]))
+                       for k, v in ApiParser.rain_data_struct.items()
+                       if isinstance(v[2], str))
+    # live data fields present on every virtual device
+    base_fields = ('intemp', 'outtemp', 'dewpoint', 'windchill', 'heatindex',
+                   'inhumid', 'outhumid', 'absbarometer', 'relbarometer',
+                   'winddir', 'windspeed', 'gustspeed', 't_rainevent',
+                   't_rainrate', 't_rainday', 't_rainweek', 't_rainmonth',
+                   't_rainyear', 't_raintotals', 'light', 'uv', 'uvi',
+                   'daymaxwind', 'soilmoist1', 'pm251', 'pm251_24h_avg',
+                   'lightningdist', 'lightningdettime', 'lightningcount',
+                   'heap_free')
+    # CMD_READ_RAIN fields, the piezo gain and reset fields are handled
+    # separately
+    read_rain_fields = ('t_rainevent', 't_rainrate', 't_raingain', 't_rainday',
+                        't_rainweek', 't_rainmonth', 't_rainyear',
+                        'rain_priority', 'temperature_comp', 'p_rainrate',
+                        'p_rainevent', 'p_rainhour', 'p_rainday',
+                        'p_rainweek', 'p_rainmonth', 'p_rainyear')
+    # the rain accumulators kept for each gauge
+    rain_periods = ('event', 'day', 'week', 'month', 'year', 'totals')
+
+    def __init__(self, index, ip_address, port, http_port=None,
+                 model=default_sim_model, channels=default_sim_channels,
+                 seed=None, start_ts=None):
+
+        self.index = index
+        self.ip_address = ip_address
+        self.port = port
+        self.http_port = http_port
+        self.model = model
+        stem, self.fw_version = sim_models.get(model, (model, '1.0.0'))
+        self.firmware = '%s_V%s' % (stem, self.fw_version)
+        self.mac = b''.join([sim_mac_oui, struct.pack('>L', index)[1:]])
+        self.ssid = '%s-WIFI%02X%02X V%s' % (stem,
+                                           self.mac[4],
+                                           self.mac[5],
+                                           self.fw_version)
+        self.channels = max(0, min(8, channels))
+        self.rng = random.Random(None if seed is None else seed + index)
+        # the fields present in this device's live data
+        fields = list(self.base_fields)
+        for ch in range(1, self.channels + 1):
+            fields.extend(['temp%d' % ch, 'humid%d' % ch])
+        self.fields = tuple(sorted(fields, key=lambda f: self.live_fields[f][0]))
+        # sensor state
+        now = time.time() if start_ts is None else start_ts
+        self.last_ts = now
+        self.obs = dict()
+        self.temp_base = self.rng.uniform(12.0, 22.0)
+        self.pressure = self.rng.uniform(1005.0, 1020.0)
+        self.wind_dir = self.rng.uniform(0, 360)
+        self.wind_base = self.rng.uniform(0.5, 4.0)
+        self.raining = False
+        self.last_wet_ts = None
+        self.rain_rate = 0.0
+        self.t_rain = dict((p, 0.0) for p in self.rain_periods)
+        self.p_rain = dict((p, 0.0) for p in self.rain_periods)
+        self.t_rain['year'] = self.t_rain['totals'] = self.rng.uniform(0, 300)
+        self.p_rain['year'] = self.p_rain['totals'] = self.t_rain['year'] * 0.97
+        self.lightning_count = 0
+        self.lightning_ts = None
+        self.lightning_dist = None
+        self.max_gust = 0.0
+        self.heap_free = self.rng.uniform(110000, 130000)
+        self.soil_moist = self.rng.uniform(20, 60)
+        self.pm25 = self.rng.uniform(2, 15)
+        self.lt = time.localtime(now)
+        self.update_obs(now)
+
+    # ---------------------------------------------------------------------
+    #                           sensor state
+    # ---------------------------------------------------------------------
+
+    def advance(self, now=None):
+        """Advance the sensor state to time now."""
+
+        now = time.time() if now is None else now
+        dt = now - self.last_ts
+        if dt <= 0:
+            return
+        self.last_ts = now
+        rng = self.rng
+        lt = time.localtime(now)
+        # handle the period resets, day, week (Sunday), month and year
+        if lt.tm_yday != self.lt.tm_yday or lt.tm_year != self.lt.tm_year:
+            for rain in (self.t_rain, self.p_rain):
+                rain['day'] = 0.0
+                if lt.tm_wday == 6:
+                    rain['week'] = 0.0
+                if lt.tm_mon != self.lt.tm_mon:
+                    rain['month'] = 0.0
+                if lt.tm_year != self.lt.tm_year:
+                    rain['year'] = 0.0
+            self.lightning_count = 0
+            self.max_gust = 0.0
+        self.lt = lt
+        # rain, start or stop an event then accumulate
+        if self.raining:
+            if rng.random() < dt / 1800.0:
+                self.raining = False
+                self.last_wet_ts = now
+        elif rng.random() < dt / 10800.0:
+            self.raining = True
+            if self.last_wet_ts is None or now - self.last_wet_ts > 3600:
+                self.t_rain['event'] = 0.0
+                self.p_rain['event'] = 0.0
+            self.rain_rate = rng.uniform(0.5, 12.0)
+        if self.raining:
+            self.rain_rate = bounded_walk(rng, self.rain_rate, 0.5, 0.2, 60.0)
+            amount = self.rain_rate * dt / 3600.0
+            for period in self.rain_periods:
+                self.t_rain[period] += amount
+                self.p_rain[period] += amount * 0.97
+        # lightning, more frequent when raining
+        rate = 1 / 120.0 if self.raining else 1 / 86400.0
+        expected = rate * dt
+        strikes = int(expected) + (1 if rng.random() < expected % 1 else 0)
+        if strikes > 0:
+            self.lightning_count += strikes
+            # the device reports the strike time offset by the timezone
+            self.lightning_ts = int(now) + lt.tm_gmtoff
+            self.lightning_dist = rng.randint(1, 40)
+        # slowly varying state
+        scale = min(dt, 600.0) / 60.0
+        self.pressure = bounded_walk(rng, self.pressure, 0.05 * scale, 980.0, 1040.0)
+        self.wind_dir = (self.wind_dir + rng.uniform(-15, 15)) % 360
+        self.wind_base = bounded_walk(rng, self.wind_base, 0.3, 0.0, 15.0)
+        self.heap_free = bounded_walk(rng, self.heap_free, 500, 80000, 160000)
+        self.soil_moist = bounded_walk(rng, self.soil_moist, 0.2 * scale, 5, 95)
+        self.pm25 = bounded_walk(rng, self.pm25, 0.5, 0.5, 150)
+        self.update_obs(now)
+
+    def update_obs(self, now):
+        """Derive the current observations from the sensor state."""
+
+        rng = self.rng
+        lt = self.lt
+        hour = lt.tm_hour + lt.tm_min / 60.0 + lt.tm_sec / 3600.0
+        diurnal = math.sin(2 * math.pi * (hour - 9) / 24.0)
+        daylight = max(0.0, math.sin(math.pi * (hour - 6) / 12.0))
+        obs = self.obs
+        outtemp = self.temp_base + 7.0 * diurnal + rng.gauss(0, 0.1)
+        outhumid = min(99, max(5, int(round(65 - 20 * diurnal + rng.gauss(0, 1)))))
+        obs['outtemp'] = round(outtemp, 1)
+        obs['outhumid'] = outhumid
+        obs['dewpoint'] = round(self.dewpoint(outtemp, outhumid), 1)
+        windspeed = max(0.0, self.wind_base + rng.gauss(0, 0.3))
+        gustspeed = windspeed + abs(rng.gauss(0, 1.0))
+        self.max_gust = max(self.max_gust, gustspeed)
+        obs['windchill'] = round(min(outtemp, outtemp - 0.7 * windspeed), 1)
+        obs['heatindex'] = round(max(outtemp, outtemp + 0.05 * (outhumid - 40)), 1)
+        obs['intemp'] = round(21.0 + 1.5 * diurnal + rng.gauss(0, 0.05), 1)
+        obs['inhumid'] = min(99, max(5, int(round(50 - 5 * diurnal))))
+        obs['absbarometer'] = round(self.pressure, 1)
+        obs['relbarometer'] = round(self.pressure + 1.2, 1)
+        obs['winddir'] = int(self.wind_dir) % 360
+        obs['windspeed'] = round(windspeed, 1)
+        obs['gustspeed'] = round(gustspeed, 1)
+        obs['daymaxwind'] = round(self.max_gust, 1)
+        obs['light'] = round(110000.0 * daylight * rng.uniform(0.6, 1.0), 1)
+        obs['uv'] = round(obs['light'] / 100.0, 1)
+        obs['uvi'] = min(15, int(round(11 * daylight)))
+        obs['t_rainrate'] = round(self.rain_rate if self.raining else 0.0, 1)
+        obs['p_rainrate'] = round(obs['t_rainrate'] * 0.97, 1)
+        for period in self.rain_periods:
+            obs['t_rain%s' % period] = self.t_rain[period]
+            obs['p_rain%s' % period] = self.p_rain[period]
+        obs['t_raingain'] = 1.0
+        obs['rain_priority'] = 1
+        obs['temperature_comp'] = 0
+        obs['p_rainhour'] = 0
+        obs['lightningcount'] = self.lightning_count
+        obs['lightningdettime'] = self.lightning_ts
+        obs['lightningdist'] = self.lightning_dist
+        obs['heap_free'] = int(self.heap_free)
+        obs['soilmoist1'] = int(round(self.soil_moist))
+        obs['pm251'] = round(self.pm25, 1)
+        obs['pm251_24h_avg'] = round(self.pm25 * 0.9, 1)
+        for ch in range(1, self.channels + 1):
+            obs['temp%d' % ch] = round(obs['intemp'] + ch * 0.3 - 1.0, 1)
+            obs['humid%d' % ch] = min(99, obs['inhumid'] + ch)
+
+    @staticmethod
+    def dewpoint(t, rh):
+        """Magnus formula dew point in C."""
+
+        b, c = 17.62, 243.12
+        g = math.log(max(rh, 1) / 100.0) + b * t / (c + t)
+        return c * g / (b - g)
+
+    # ---------------------------------------------------------------------
+    #                           API responses
+    # ---------------------------------------------------------------------
+
+    def livedata_payload(self):
+        """Encode the current observations as CMD_GW1000_LIVEDATA payload."""
+
+        parts = []
+        for field in self.fields:
+            address, decode_fn, size = self.live_fields[field]
+            parts.append(address)
+            parts.append(encode_field(decode_fn, self.obs.get(field), size))
+        return b''.join(parts)
+
+    def read_rain_payload(self):
+        """Encode the current rain data as CMD_READ_RAIN payload."""
+
+        parts = []
+        for field in self.read_rain_fields:
+            address, decode_fn, size = self.rain_fields[field]
+            parts.append(address)
+            parts.append(encode_field(decode_fn, self.obs.get(field), size))
+        # piezo gains 1 to 10, 1.00 each
+        parts.append(b'\x87')
+        parts.append(struct.pack('>10H', *([100] * 10)))
+        # day reset 0:00, week reset Sunday, annual reset January
+        parts.append(b'\x88')
+        parts.append(b'\x00\x00\x00')
+        return b''.join(parts)
+
+    def raindata_payload(self):
+        """Encode traditional rain data as CMD_READ_RAINDATA payload."""
+
+        values = (self.obs['t_rainrate'], self.t_rain['day'],
+                  self.t_rain['week'], self.t_rain['month'],
+                  self.t_rain['year'])
+        return struct.pack('>5L', *[int(round(v * 10)) for v in values])
+
+    def connected_sensors(self):
+        """Sensor ID addresses of the sensors connected to this device.
+
+        Returns a dict keyed by sensor address containing the raw battery
+        byte to report.
+        """
+
+        connected = {b'\x00': 0, b'\x04': 0, b'\x0e': 14, b'\x16': 5,
+                     b'\x1a': 5, b'\x30': 160}
+        for ch in range(self.channels):
+            connected[struct.pack('B', 6 + ch)] = 0
+        return connected
+
+    def sensor_id_payload(self):
+        """Encode CMD_READ_SENSOR_ID_NEW payload covering every sensor."""
+
+        connected = self.connected_sensors()
+        parts = []
+        for address in sorted(Sensors.sensor_ids):
+            parts.append(address)
+            if address in connected:
+                parts.append(struct.pack('>L', (self.mac[5] << 16) + (address[0] << 8) + 1))
+                parts.append(struct.pack('BB', connected[address], 4))
+            else:
+                parts.append(b'\xff\xff\xff\xfe\x0f\x00')
+        return b''.join(parts)
+
+    def system_params_payload(self):
+        """Encode CMD_READ_SSSS payload."""
+
+        return struct.pack('>BBLBB', 1, 1, int(self.last_ts) + self.lt.tm_gmtoff, 94, 0)
+
+    def broadcast_payload(self):
+        """Encode CMD_BROADCAST and discovery broadcast payload."""
+
+        ip = socket.inet_aton(self.ip_address)
+        return b''.join([self.mac, ip, struct.pack('>H', self.port),
+                         pack_str(self.ssid)])
+
+    def response(self, cmd_code, now=None):
+        """Obtain the response frame to an API command.
+
+        cmd_code: command code, byte string of length one
+
+        Returns a response as a bytestring or None if the command is not
+        known.
+        """
+
+        try:
+            builder, wide = self.responders[cmd_code]
+        except KeyError:
+            return None
+        if cmd_code in self.live_cmds:
+            self.advance(now)
+        if cmd_code == GatewayApi.api_commands['CMD_BROADCAST']:
+            return build_response(cmd_code, self.broadcast_payload(), broadcast=True)
+        return build_response(cmd_code, builder(self), wide=wide)
+
+    # fixed configuration payloads, laid out as per the matching ApiParser
+    # parse methods
+    def _ecowitt(self):
+        return b'\x01'
+
+    def _wunderground(self):
+        return b''.join([pack_str('ISIMUL%03d' % self.index), pack_str('simpass'), b'\x01'])
+
+    def _wow(self):
+        return b''.join([pack_str('sim%03d' % self.index), pack_str('simpass'),
+                         pack_str(''), b'\x01'])
+
+    def _weathercloud(self):
+        return b''.join([pack_str('simid%03d' % self.index), pack_str('simkey'), b'\x01'])
+
+    def _customized(self):
+        return b''.join([pack_str('sim'), pack_str('simpass'),
+                         pack_str('weewx.local'), struct.pack('>hh', 8080, 60),
+                         b'\x00\x00'])
+
+    def _usr_path(self):
+        return b''.join([pack_str('/data/report/'), pack_str('/weatherstation/updateweatherstation.php?')])
+
+    def _mac(self):
+        return self.mac
+
+    def _firmware(self):
+        return pack_str(self.firmware)
+
+    def _soilhumiad(self):
+        return struct.pack('>BBhBBh', 0, int(round(self.soil_moist)), 250, 0, 70, 500)
+
+    def _mulch_offset(self):
+        return b''.join(struct.pack('Bbb', ch, 0, 0) for ch in range(self.channels))
+
+    def _mulch_t_offset(self):
+        # no WN34 sensors are simulated
+        return b''
+
+    def _pm25_offset(self):
+        return struct.pack('>Bh', 0, 0)
+
+    def _co2_offset(self):
+        return struct.pack('>hhh', 0, 0, 0)
+
+    def _gain(self):
+        return struct.pack('>6H', 1267, 100, 100, 100, 100, 0)
+
+    def _calibration(self):
+        return struct.pack('>hbllhbh', 0, 0, 0, 0, 0, 0, 0)
+
+    def _rain_reset(self):
+        return b'\x00\x00\x00'
+
+    def _ack(self):
+        return b'\x00'
+
+    # map of command code to (payload builder, wide size field)
+    responders = {}
+    # commands whose responses depend on the evolving sensor state
+    live_cmds = ()
+
+
+def _init_responders():
+    """Populate VirtualDevice.responders from GatewayApi.api_commands."""
+
+    read = {
+        'CMD_BROADCAST': (VirtualDevice.broadcast_payload, True),
+        'CMD_READ_ECOWITT': (VirtualDevice._ecowitt, False),
+        'CMD_READ_WUNDERGROUND': (VirtualDevice._wunderground, False),
+        'CMD_READ_WOW': (VirtualDevice._wow, False),
+        'CMD_READ_WEATHERCLOUD': (VirtualDevice._weathercloud, False),
+        'CMD_READ_STATION_MAC': (VirtualDevice._mac, False),
+        'CMD_GW1000_LIVEDATA': (VirtualDevice.livedata_payload, True),
+        'CMD_GET_SOILHUMIAD': (VirtualDevice._soilhumiad, False),
+        'CMD_READ_CUSTOMIZED': (VirtualDevice._customized, False),
+        'CMD_GET_MulCH_OFFSET': (VirtualDevice._mulch_offset, False),
+        'CMD_GET_PM25_OFFSET': (VirtualDevice._pm25_offset, False),
+        'CMD_READ_SSSS': (VirtualDevice.system_params_payload, False),
+        'CMD_READ_RAINDATA': (VirtualDevice.raindata_payload, False),
+        'CMD_READ_GAIN': (VirtualDevice._gain, False),
+        'CMD_READ_CALIBRATION': (VirtualDevice._calibration, False),
+        'CMD_READ_SENSOR_ID': (VirtualDevice.sensor_id_payload, True),
+        'CMD_READ_SENSOR_ID_NEW': (VirtualDevice.sensor_id_payload, True),
+        'CMD_READ_FIRMWARE_VERSION': (VirtualDevice._firmware, False),
+        'CMD_READ_USR_PATH': (VirtualDevice._usr_path, False),
+        'CMD_GET_CO2_OFFSET': (VirtualDevice._co2_offset, False),
+        'CMD_READ_RSTRAIN_TIME': (VirtualDevice._rain_reset, False),
+        'CMD_READ_RAIN': (VirtualDevice.read_rain_payload, True),
+        'CMD_GET_MulCH_T_OFFSET': (VirtualDevice._mulch_t_offset, False)
+    }
+    for cmd, code in GatewayApi.api_commands.items():
+        # any command that is not a read command is acknowledged
+        VirtualDevice.responders[code] = read.get(cmd, (VirtualDevice._ack, False))
+    VirtualDevice.live_cmds = tuple(GatewayApi.api_commands[c] for c in ('CMD_GW1000_LIVEDATA',
+                                                                          'CMD_READ_RAIN',
+                                                                          'CMD_READ_RAINDATA',
+                                                                          'CMD_READ_SENSOR_ID',
+                                                                          'CMD_READ_SENSOR_ID_NEW',
+                                                                          'CMD_READ_SSSS'))
+
+
+_init_responders()
+
+
+# ============================================================================
+#                          HTTP request responses
+# ============================================================================
+
+def http_response(device, command, query):
+    """Obtain the deserialized response to a GatewayHttp request.
+
+    Returns a JSON serializable object or None if the command is unknown.
+    """
+
+    device.advance()
+    obs = device.obs
+    if command == 'get_version':
+        return {'version': 'Version: %s' % device.firmware,
+                'newVersion': '0',
+                'platform': 'ecowitt'}
+    if command == 'get_livedata_info':
+        return http_livedata(device)
+    if command == 'get_ws_settings':
+        return {'platform': 'ecowitt', 'ost_interval': '1',
+                'sta_mac': user.gw1000.bytes_to_hex(device.mac, separator=':'),
+                'wu_id': '', 'wu_key': '', 'wcl_id': '', 'wcl_key': '',
+                'wow_id': '', 'wow_key': '', 'Customized': 'disable',
+                'Protocol': 'ecowitt', 'ecowitt_ip': 'weewx.local',
+                'ecowitt_path': '/data/report/', 'ecowitt_port': '8080',
+                'ecowitt_upload': '60'}
+    if command == 'get_calibration_data':
+        return {'SolarRadWave': '126.7', 'solarRadGain': '1.00',
+                'uvGain': '1.00', 'windGain': '1.00', 'inTempOffset': '0.0',
+                'inHumiOffset': '0', 'absOffset': '0.0', 'altitude': '0',
+                'outTempOffset': '0.0', 'outHumiOffset': '0',
+                'windDirOffset': '0'}
+    if command in ('get_rain_totals', 'get_piezo_rain'):
+        prefix = 'p' if command == 'get_piezo_rain' else 't'
+        return {'rainRate': '%.1f' % obs['%s_rainrate' % prefix],
+                'eventRain': '%.1f' % obs['%s_rainevent' % prefix],
+                'dayRain': '%.1f' % obs['%s_rainday' % prefix],
+                'weekRain': '%.1f' % obs['%s_rainweek' % prefix],
+                'monthRain': '%.1f' % obs['%s_rainmonth' % prefix],
+                'yearRain': '%.1f' % obs['%s_rainyear' % prefix],
+                'rainFallPriority': '1', 'rain_reset_time': '0',
+                'rain_reset_week': '0', 'rain_reset_year': '0'}
+    if command == 'get_device_info':
+        return {'sensorType': '1', 'rf_freq': '1', 'tz_auto': '1',
+                'tz_index': '94', 'dst_stat': '0',
+                'date': time.strftime('%Y-%m-%dT%H:%M', device.lt),
+                'upgrade': '0', 'apAuto': '1', 'newVersion': '0',
+                'curr_msg': 'Simulated firmware %s' % device.firmware,
+                'apName': device.ssid.split(' ')[0], 'APpwd': '', 'time': '20'}
+    if command == 'get_sensors_info':
+        return http_sensors_info(device, query)
+    if command == 'get_network_info':
+        return {'mac': user.gw1000.bytes_to_hex(device.mac, separator=':'),
+                'ethIpType': '1', 'ethIP': device.ip_address,
+                'ethMask': '255.255.255.0', 'ethGateway': '',
+                'ethDNS': '', 'wifi_ip': device.ip_address}
+    if command == 'get_units_info':
+        return {'temperature': '0', 'pressure': '0', 'wind': '0',
+                'rain': '0', 'light': '0'}
+    if command == 'get_cli_soilad':
+        return [{'id': '0', 'name': '', 'humidity': '%d' % obs['soilmoist1'],
+                 'ad': '250', 'ad_select': '0', 'ad_min': '70', 'ad_max': '500'}]
+    if command == 'get_cli_multiCh':
+        return [{'id': '%d' % ch, 'name': '', 'temp': '0.0', 'humi': '0'}
+                for ch in range(device.channels)]
+    if command == 'get_cli_pm25':
+        return [{'id': '0', 'name': '', 'val': '0.0'}]
+    if command == 'get_cli_co2':
+        return {'co2': '0', 'pm25': '0.0', 'pm10': '0.0'}
+    return None
+
+
+def http_livedata(device):
+    """Construct a get_livedata_info response from the current observations.
+
+    Common observations are identified by the hexadecimal API address of the
+    corresponding live data field, values are strings with any unit included
+    in the value or in a separate 'unit' key, as per the device.
+    """
+
+    obs = device.obs
+
+    def item(field, fmt, unit=None, suffix=''):
+        address = VirtualDevice.live_fields[field][0]
+        entry = {'id': '0x%02X' % address[0],
+                 'val': (fmt % obs[field]) + suffix}
+        if unit is not None:
+            entry['unit'] = unit
+        return entry
+
+    common = [item('outtemp', '%.1f', unit='C'),
+              item('outhumid', '%d', suffix='%'),
+              item('dewpoint', '%.1f', unit='C'),
+              item('windchill', '%.1f', unit='C'),
+              item('heatindex', '%.1f', unit='C'),
+              item('winddir', '%d'),
+              item('windspeed', '%.1f', suffix=' m/s'),
+              item('gustspeed', '%.1f', suffix=' m/s'),
+              item('daymaxwind', '%.1f', suffix=' m/s'),
+              item('light', '%.1f', suffix=' lux'),
+              item('uv', '%.1f'),
+              item('uvi', '%d')]
+    rain_ids = (('t_rainevent', 'event'), ('t_rainrate', 'rate'),
+                ('t_rainday', 'day'), ('t_rainweek', 'week'),
+                ('t_rainmonth', 'month'), ('t_rainyear', 'year'))
+    rain = []
+    piezo = []
+    for field, period in rain_ids:
+        address = '0x%02X' % VirtualDevice.live_fields[field][0][0]
+        suffix = ' mm/Hr' if period == 'rate' else ' mm'
+        rain.append({'id': address, 'val': '%.1f%s' % (obs[field], suffix)})
+        piezo.append({'id': address,
+                      'val': '%.1f%s' % (obs['p_rain%s' % period], suffix)})
+    result = {
+        'common_list': common,
+        'rain': rain,
+        'piezoRain': piezo,
+        'wh25': [{'intemp': '%.1f' % obs['intemp'], 'unit': 'C',
+                  'inhumi': '%d%%' % obs['inhumid'],
+                  'abs': '%.1f hPa' % obs['absbarometer'],
+                  'rel': '%.1f hPa' % obs['relbarometer']}],
+        'lightning': [{'distance': '%s km' % ('--' if obs['lightningdist'] is None
+                                              else obs['lightningdist']),
+                       'timestamp': '%s' % ('--' if obs['lightningdettime'] is None
+                                            else obs['lightningdettime']),
+                       'count': '%d' % obs['lightningcount']}],
+        'ch_aisle': [{'channel': '%d' % ch, 'name': '', 'battery': '0',
+                      'temp': '%.1f' % obs['temp%d' % ch], 'unit': 'C',
+                      'humidity': '%d%%' % obs['humid%d' % ch]}
+                     for ch in range(1, device.channels + 1)],
+        'ch_soil': [{'channel': '1', 'name': '', 'battery': '1.4',
+                     'humidity': '%d%%' % obs['soilmoist1']}],
+        'ch_pm25': [{'channel': '1', 'PM25': '%.1f' % obs['pm251'],
+                     'PM25_24H': '%.1f' % obs['pm251_24h_avg'],
+                     'battery': '5'}]
+    }
+    return result
+
+
+def http_sensors_info(device, query):
+    """Construct a get_sensors_info response.
+
+    Sensors are split over two pages as per the device, the page is selected
+    by the 'page' query parameter.
+    """
+
+    connected = device.connected_sensors()
+    sensors = []
+    for address in sorted(Sensors.sensor_ids):
+        name = Sensors.sensor_ids[address]['name']
+        entry = {'img': name.split('_')[0], 'type': '%d' % address[0],
+                 'name': Sensors.sensor_ids[address]['long_name']}
+        if address in connected:
+            entry.update({'id': '%06X%02X' % (device.mac[5], address[0]),
+                          'batt': '%d' % connected[address], 'rssi': '-70',
+                          'signal': '4', 'idst': '1'})
+            if entry['img'] in user.gw1000.GatewayDevice.sensors_with_fware:
+                entry['version'] = '1.3.5'
+        else:
+            entry.update({'id': 'FFFFFFFE', 'batt': '9', 'rssi': '--',
+                          'signal': '--', 'idst': '1'})
+        sensors.append(entry)
+    half = (len(sensors) + 1) // 2
+    page = query.get('page', ['1'])[0]
+    return sensors[half:] if page == '2' else sensors[:half]
+
+
+# ============================================================================
+#                          class GatewaySimulator
+# ============================================================================
+
+class GatewaySimulator(object):
+    """Run a number of virtual gateway devices in a single process.
+
+    All virtual devices are served from a single asyncio event loop. The
+    simulator may be run in the foreground with run() or in a background
+    thread with start()/stop(), the latter is intended for use in tests.
+
+    A port of 0 requests an ephemeral port, the port actually used by each
+    virtual device is available via the device port and http_port
+    attributes once the simulator has started.
+    """
+
+    def __init__(self, devices=default_num_devices,
+                 ip_address=default_sim_ip_address, port=default_sim_port,
+                 http_port=default_sim_http_port, spread=False,
+                 model=default_sim_model, channels=default_sim_channels,
+                 faults=None, seed=None,
+                 discovery_address=default_discovery_address,
+                 discovery_port=user.gw1000.default_discovery_port,
+                 discovery_interval=default_discovery_interval,
+                 broadcast_port=None, drop_hold=default_drop_hold,
+                 verbose=False):
+
+        self.faults = faults if faults is not None else FaultProfile(seed=seed)
+        self.stats = SimStats()
+        self.verbose = verbose
+        self.drop_hold = drop_hold
+        self.discovery_address = discovery_address
+        self.discovery_port = discovery_port
+        self.discovery_interval = discovery_interval
+        self.broadcast_port = broadcast_port
+        models = [m.strip().upper() for m in model.split(',')] if isinstance(model, str) else list(model)
+        base_ip = struct.unpack('>L', socket.inet_aton(ip_address))[0]
+        self.devices = []
+        for i in range(devices):
+            if spread:
+                dev_ip = socket.inet_ntoa(struct.pack('>L', base_ip + i))
+                dev_port = port
+                dev_http = http_port
+            else:
+                dev_ip = ip_address
+                dev_port = port + i if port else 0
+                dev_http = http_port + i if http_port else http_port
+            self.devices.append(VirtualDevice(i, dev_ip, dev_port,
+                                              http_port=dev_http,
+                                              model=models[i % len(models)],
+                                              channels=channels,
+                                              seed=seed))
+        self.loop = None
+        self.servers = []
+        self.transports = []
+        self.tasks = []
+        self.thread = None
+        self.ready = threading.Event()
+        self.error = None
+
+    # ---------------------------------------------------------------------
+    #                         API (TCP) handling
+    # ---------------------------------------------------------------------
+
+    async def handle_api(self, device, reader, writer):
+        """Handle a connection to a virtual device API server.
+
+        Commands are processed until the client closes the connection.
+        """
+
+        self.stats.inc('api_connections')
+        try:
+            while True:
+                try:
+                    head = await reader.readexactly(4)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if head[:2] != GatewayApi.header:
+                    self.stats.inc('api_bad_request')
+                    break
+                size = head[3]
+                try:
+                    rest = await reader.readexactly(max(size - 2, 0))
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                packet = head + rest
+                if GatewayApi.calc_checksum(packet[2:-1]) != packet[-1]:
+                    # the device silently ignores invalid requests
+                    self.stats.inc('api_bad_checksum')
+                    break
+                cmd_code = packet[2:3]
+                frame = device.response(cmd_code)
+                if frame is None:
+                    self.stats.inc('api_unknown_cmd')
+                    break
+                self.stats.inc('api_%s' % self.cmd_name(cmd_code))
+                delay = self.faults.delay()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                fault = self.faults.pick()
+                if fault is not None:
+                    self.stats.inc('fault_%s' % fault)
+                if fault == 'drop':
+                    # hold the connection open without responding until the
+                    # client gives up
+                    try:
+                        await asyncio.wait_for(reader.read(), self.drop_hold)
+                    except (asyncio.TimeoutError, ConnectionError):
+                        pass
+                    break
+                writer.write(self.faults.apply(fault, frame))
+                await writer.drain()
+                if fault == 'truncate':
+                    break
+        finally:
+            writer.close()
+
+    @staticmethod
+    def cmd_name(cmd_code):
+        """Obtain the API command name for a command code."""
+
+        for name, code in GatewayApi.api_commands.items():
+            if code == cmd_code:
+                return name
+        return '0x%02X' % cmd_code[0]
+
+    # ---------------------------------------------------------------------
+    #                           HTTP handling
+    # ---------------------------------------------------------------------
+
+    async def handle_http(self, device, reader, writer):
+        """Handle a single HTTP request to a virtual device."""
+
+        try:
+            try:
+                request_line = await reader.readline()
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+            except ConnectionError:
+                return
+            parts = request_line.decode('latin-1').split()
+            if len(parts) < 2:
+                return
+            url = urlsplit(parts[1])
+            command = url.path.strip('/')
+            delay = self.faults.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.faults.pick() == 'drop':
+                self.stats.inc('fault_http_drop')
+                return
+            body = None
+            if command in GatewayHttp.commands:
+                body = http_response(device, command, parse_qs(url.query))
+            if body is None:
+                self.stats.inc('http_not_found')
+                status = '404 Not Found'
+                data = b'{}'
+            else:
+                self.stats.inc('http_%s' % command)
+                status = '200 OK'
+                data = json.dumps(body).encode('utf-8')
+            headers = ['HTTP/1.1 %s' % status,
+                       'Content-Type: application/json; charset=utf-8',
+                       'Content-Length: %d' % len(data),
+                       'Connection: close', '', '']
+            writer.write('\r\n'.join(headers).encode('latin-1') + data)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    # ---------------------------------------------------------------------
+    #                           UDP handling
+    # ---------------------------------------------------------------------
+
+    async def discovery_broadcaster(self):
+        """Periodically emit the discovery broadcast for each virtual device."""
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.setblocking(False)
+        code = GatewayApi.api_commands['CMD_BROADCAST']
+        try:
+            while True:
+                # spread the broadcasts over the interval
+                gap = self.discovery_interval / max(len(self.devices), 1)
+                for device in self.devices:
+                    frame = build_response(code, device.broadcast_payload(), broadcast=True)
+                    try:
+                        sock.sendto(frame, (self.discovery_address, self.discovery_port))
+                        self.stats.inc('discovery_broadcast')
+                    except OSError as e:
+                        self.stats.inc('discovery_error')
+                        if self.verbose:
+                            print("Discovery broadcast failed: %s" % e)
+                    await asyncio.sleep(gap)
+        finally:
+            sock.close()
+
+    class BroadcastProtocol(asyncio.DatagramProtocol):
+        """Answer CMD_BROADCAST requests on behalf of every virtual device."""
+
+        def __init__(self, sim):
+            self.sim = sim
+            self.transport = None
+
+        def connection_made(self, transport):
+            self.transport = transport
+
+        def datagram_received(self, data, addr):
+            code = GatewayApi.api_commands['CMD_BROADCAST']
+            if data[2:3] != code:
+                return
+            self.sim.stats.inc('api_CMD_BROADCAST')
+            for device in self.sim.devices:
+                frame = device.response(code)
+                fault = self.sim.faults.pick()
+                if fault == 'drop':
+                    continue
+                self.transport.sendto(self.sim.faults.apply(fault, frame), addr)
+
+    # ---------------------------------------------------------------------
+    #                          start up and shut down
+    # ---------------------------------------------------------------------
+
+    async def startup(self):
+        """Start the servers and tasks for all virtual devices."""
+
+        loop = asyncio.get_event_loop()
+        for device in self.devices:
+            server = await asyncio.start_server(
+                lambda r, w, d=device: self.handle_api(d, r, w),
+                device.ip_address, device.port, reuse_address=True)
+            device.port = server.sockets[0].getsockname()[1]
+            self.servers.append(server)
+            if device.http_port is not None:
+                server = await asyncio.start_server(
+                    lambda r, w, d=device: self.handle_http(d, r, w),
+                    device.ip_address, device.http_port, reuse_address=True)
+                device.http_port = server.sockets[0].getsockname()[1]
+                self.servers.append(server)
+        if self.broadcast_port:
+            transport, protocol = await loop.create_datagram_endpoint(
+                lambda: self.BroadcastProtocol(self),
+                local_addr=('0.0.0.0', self.broadcast_port),
+                allow_broadcast=True)
+            self.transports.append(transport)
+        if self.discovery_interval and self.discovery_interval > 0:
+            self.tasks.append(loop.create_task(self.discovery_broadcaster()))
+
+    async def shutdown(self):
+        """Stop all servers and tasks."""
+
+        for task in self.tasks:
+            task.cancel()
+        for task in self.tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        for transport in self.transports:
+            transport.close()
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        self.tasks, self.transports, self.servers = [], [], []
+
+    def _thread_main(self):
+        """Event loop thread target."""
+
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.startup())
+        except Exception as e:
+            self.error = e
+            self.ready.set()
+            self.loop.close()
+            return
+        self.ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.run_until_complete(self.shutdown())
+            self.loop.close()
+
+    def start(self, timeout=10):
+        """Start the simulator in a background thread.
+
+        Returns once all virtual devices are listening. Any error raised
+        during start up is re-raised.
+        """
+
+        self.thread = threading.Thread(target=self._thread_main, name='gw-simulator')
+        self.thread.daemon = True
+        self.thread.start()
+        self.ready.wait(timeout)
+        if self.error is not None:
+            raise self.error
+
+    def stop(self, timeout=10):
+        """Stop a simulator started with start()."""
+
+        if self.loop is not None and self.thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+            self.thread = None
+
+
+def main():
+
+    usage = """python3 -m user.gw1000sim --help
+       python3 -m user.gw1000sim --version
+       python3 -m user.gw1000sim [--devices=NUM] [--ip-address=IP_ADDRESS]
+            [--port=PORT] [--http-port=PORT] [--spread]
+            [--model=MODEL[,MODEL...]] [--channels=NUM] [--seed=SEED]
+            [--latency=MS] [--jitter=MS] [--drop=PCT] [--corrupt=PCT]
+            [--truncate=PCT] [--discovery-address=ADDRESS]
+            [--discovery-port=PORT] [--discovery-interval=SECONDS]
+            [--broadcast-port=PORT] [--stats-interval=SECONDS] [--verbose]"""
+
+    parser = argparse.ArgumentParser(usage=usage,
+                                     description='Simulate one or more Ecowitt gateway devices.')
+    parser.add_argument('--version', dest='version', action='store_true',
+                        help='display simulator version number')
+    parser.add_argument('--devices', dest='devices', type=int,
+                        default=default_num_devices,
+                        help='number of virtual devices to run')
+    parser.add_argument('--ip-address', dest='ip_address',
+                        default=default_sim_ip_address,
+                        help='address the virtual devices listen on')
+    parser.add_argument('--port', dest='port', type=int,
+                        default=default_sim_port,
+                        help='API port of the first virtual device, further '
+                             'devices use consecutive ports')
+    parser.add_argument('--http-port', dest='http_port', type=int,
+                        default=default_sim_http_port,
+                        help='HTTP port of the first virtual device, further '
+                             'devices use consecutive ports, -1 disables HTTP')
+    parser.add_argument('--spread', dest='spread', action='store_true',
+                        help='give each virtual device its own address '
+                             'starting at IP_ADDRESS and use the same ports '
+                             'for each device')
+    parser.add_argument('--model', dest='model', default=default_sim_model,
+                        help='virtual device model, a comma separated list '
+                             'is used in rotation. Known models: %s' % ', '.join(sorted(sim_models)))
+    parser.add_argument('--channels', dest='channels', type=int,
+                        default=default_sim_channels,
+                        help='number of WH31 channels per virtual device (0-8)')
+    parser.add_argument('--seed', dest='seed', type=int,
+                        help='random seed for repeatable sensor data and faults')
+    parser.add_argument('--latency', dest='latency', type=float, default=0,
+                        help='added response latency in milliseconds')
+    parser.add_argument('--jitter', dest='jitter', type=float, default=0,
+                        help='random +/- variation in latency in milliseconds')
+    parser.add_argument('--drop', dest='drop', type=float, default=0,
+                        help='percentage of responses that are dropped')
+    parser.add_argument('--corrupt', dest='corrupt', type=float, default=0,
+                        help='percentage of responses with a corrupt checksum')
+    parser.add_argument('--truncate', dest='truncate', type=float, default=0,
+                        help='percentage of responses that are truncated')
+    parser.add_argument('--discovery-address', dest='discovery_address',
+                        default=default_discovery_address,
+                        help='address discovery broadcasts are sent to')
+    parser.add_argument('--discovery-port', dest='discovery_port', type=int,
+                        default=user.gw1000.default_discovery_port,
+                        help='port discovery broadcasts are sent to')
+    parser.add_argument('--discovery-interval', dest='discovery_interval',
+                        type=float, default=default_discovery_interval,
+                        help='seconds between discovery broadcasts, 0 disables')
+    parser.add_argument('--broadcast-port', dest='broadcast_port', type=int,
+                        help='port on which to answer CMD_BROADCAST requests, '
+                             'normally %d' % user.gw1000.default_broadcast_port)
+    parser.add_argument('--stats-interval', dest='stats_interval', type=float,
+                        help='seconds between display of simulator statistics')
+    parser.add_argument('--verbose', dest='verbose', action='store_true',
+                        help='display additional information')
+    args = parser.parse_args()
+
+    if args.version:
+        print("%s version: %s" % (SIM_NAME, SIM_VERSION))
+        exit(0)
+
+    faults = FaultProfile(latency=args.latency / 1000.0,
+                          jitter=args.jitter / 1000.0,
+                          drop=args.drop / 100.0,
+                          corrupt=args.corrupt / 100.0,
+                          truncate=args.truncate / 100.0,
+                          seed=args.seed)
+    sim = GatewaySimulator(devices=args.devices,
+                           ip_address=args.ip_address,
+                           port=args.port,
+                           http_port=args.http_port if args.http_port >= 0 else None,
+                           spread=args.spread,
+                           model=args.model,
+                           channels=args.channels,
+                           faults=faults,
+                           seed=args.seed,
+                           discovery_address=args.discovery_address,
+                           discovery_port=args.discovery_port,
+                           discovery_interval=args.discovery_interval,
+                           broadcast_port=args.broadcast_port,
+                           verbose=args.verbose)
+    try:
+        sim.start()
+    except OSError as e:
+        print("Unable to start %s: %s" % (SIM_NAME, e))
+        exit(1)
+    print("%s running %d virtual device(s)" % (SIM_NAME, len(sim.devices)))
+    for device in sim.devices[:10] if not args.verbose else sim.devices:
+        http = ' http %d' % device.http_port if device.http_port is not None else ''
+        print("    %-7s %s at %s:%d%s" % (device.model,
+                                          user.gw1000.bytes_to_hex(device.mac, separator=':'),
+                                          device.ip_address, device.port, http))
+    if len(sim.devices) > 10 and not args.verbose:
+        print("    ... and %d more" % (len(sim.devices) - 10,))
+    print("Press Ctrl-C to stop")
+    try:
+        while True:
+            time.sleep(args.stats_interval if args.stats_interval else 3600)
+            if args.stats_interval:
+                print(sim.stats.summary())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sim.stop()
+        print()
+        print(sim.stats.summary())
+
+
+if __name__ == '__main__':
+    main()
@@ -35,8 +35,19 @@ To run the test suite:
     $ PYTHONPATH=$BIN python3 -m user.tests.test_egd [-v]
 """
 # python imports
+import copy
+import math
+import os
+import pickle
+import queue
+import random
+import shutil
 import socket
 import struct
+import subprocess
+import sys
+import tempfile
+import tracemalloc
 import unittest
 
 from io import StringIO
@@ -1245,6 +1256,31 @@ class UtilitiesTestCase(unittest.TestCase):
         self.assertEqual(user.gw1000.obfuscate('1234567890', obf_char='#'),
                          '######7890')
 
+    def test_define_units(self):
+        """Test custom units are defined once only."""
+
+        user.gw1000.define_units()
+        self.assertTrue(user.gw1000.units_defined)
+        self.assertIn('kilobyte', weewx.units.conversionDict)
+        # a second call must not repeat the additions
+        with patch.object(user.gw1000, 'default_groups') as groups:
+            user.gw1000.define_units()
+            groups.items.assert_not_called()
+
+    def test_lazy_import(self):
+        """Test the modules not used by the WeeWX engine are imported on demand."""
+
+        program = ("import sys, user.gw1000; "
+                   "print(sorted(m for m in sys.modules if m.startswith('user.gw1000.')))")
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        output = subprocess.check_output([sys.executable, '-c', program], env=env)
+        self.assertEqual(output.decode().strip(), '[]')
+        # the lazily imported names are available from the package
+        self.assertIs(user.gw1000.DirectGateway, user.gw1000.direct.DirectGateway)
+        self.assertIs(user.gw1000.PushCollector, user.gw1000.push.PushCollector)
+        with self.assertRaises(AttributeError):
+            user.gw1000.NoSuchClass
+
 
 class ListsAndDictsTestCase(unittest.TestCase):
     """Test case to test list and dict consistency."""
@@ -1286,6 +1322,593 @@ class ListsAndDictsTestCase(unittest.TestCase):
                               "missing from the driver default field map")
 
 
+class CaptureTestCase(unittest.TestCase):
+    """Test the FrameRecorder and CaptureReader classes."""
+
+    mac = 'A1:B2:C3:D4:E5:F6'
+
+    def setUp(self):
+
+        self.request = hex_to_bytes('FF FF 50 03 53')
+        self.response = hex_to_bytes('FF FF 50 12 0E 47 57 32 30 30 30 41 '
+                                     '5F 56 33 2E 31 2E 31 E2')
+        # get a temporary directory for our capture files
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, 'gw.cap')
+
+    def test_capture(self):
+        """Test frames are captured and read back correctly."""
+
+        recorder = user.gw1000.FrameRecorder(self.path, index_interval=0)
+        recorder.record(recorder.REQUEST, self.request, cmd=0x50)
+        recorder.record(recorder.RESPONSE, self.response, cmd=0x50,
+                        mac=self.mac, rtt=0.025)
+        recorder.record(recorder.ERROR, b'timed out', cmd=0x50, mac=self.mac)
+        # nothing should be written until the buffer is flushed
+        self.assertEqual(os.path.getsize(self.path), 0)
+        recorder.close()
+        records = list(user.gw1000.CaptureReader(self.path))
+        self.assertEqual([r['direction'] for r in records], [0, 1, 2])
+        self.assertEqual(records[0]['frame'], self.request)
+        self.assertEqual(records[0]['mac'], '00:00:00:00:00:00')
+        self.assertEqual(records[1]['frame'], self.response)
+        self.assertEqual(records[1]['mac'], self.mac)
+        self.assertEqual(records[1]['cmd'], 0x50)
+        self.assertAlmostEqual(records[1]['rtt'], 0.025, places=6)
+        self.assertEqual(records[2]['frame'], b'timed out')
+        self.assertLessEqual(records[0]['monotonic'], records[1]['monotonic'])
+        # reopening the capture should append to the existing file
+        recorder = user.gw1000.FrameRecorder(self.path)
+        recorder.record(recorder.REQUEST, self.request, cmd=0x50)
+        recorder.close()
+        self.assertEqual(len(list(user.gw1000.CaptureReader(self.path))), 4)
+
+    def test_index(self):
+        """Test the capture index can be used to seek by time."""
+
+        recorder = user.gw1000.FrameRecorder(self.path, index_interval=0)
+        for i in range(10):
+            recorder.record(recorder.RESPONSE, self.response, cmd=0x50)
+        recorder.close()
+        reader = user.gw1000.CaptureReader(self.path)
+        self.assertEqual(len(reader.index), 10)
+        records = list(reader)
+        start_ts = records[5]['timestamp']
+        self.assertEqual(reader.seek_offset(start_ts), reader.index[5][1])
+        self.assertEqual(list(reader.records(start_ts=start_ts)), records[5:])
+        self.assertEqual(list(reader.records(stop_ts=start_ts)), records[:5])
+
+    def test_rotate(self):
+        """Test capture files are rotated and pruned."""
+
+        recorder = user.gw1000.FrameRecorder(self.path, max_size=100, keep=2,
+                                             buffer_size=0)
+        for i in range(10):
+            recorder.record(recorder.RESPONSE, self.response, cmd=0x50)
+        recorder.close()
+        segments = user.gw1000.CaptureReader.segments(self.path)
+        self.assertEqual(segments, ['%s.2' % self.path, '%s.1' % self.path, self.path])
+        for segment in segments:
+            self.assertTrue(os.path.exists(segment + '.idx'))
+            self.assertTrue(len(list(user.gw1000.CaptureReader(segment))) > 0)
+
+    def test_truncated(self):
+        """Test a truncated final record is ignored."""
+
+        recorder = user.gw1000.FrameRecorder(self.path)
+        recorder.record(recorder.RESPONSE, self.response, cmd=0x50)
+        recorder.record(recorder.RESPONSE, self.response, cmd=0x50)
+        recorder.close()
+        with open(self.path, 'rb+') as f:
+            f.truncate(os.path.getsize(self.path) - 3)
+        self.assertEqual(len(list(user.gw1000.CaptureReader(self.path))), 1)
+
+
+class PacketRingTestCase(unittest.TestCase):
+    """Test the PacketRing class."""
+
+    data = {'datetime': 1700000000, 'outtemp': 21.3, 'outhumid': 56, 'wh65_batt': None}
+
+    def test_ring(self):
+        """Test data, errors and shutdown signals pass through the ring."""
+
+        ring = user.gw1000.PacketRing(slots=4, slot_size=256)
+        ring.put(self.data)
+        ring.put(user.gw1000.GWIOError('timed out'))
+        ring.put(None)
+        self.assertEqual(ring.get(), self.data)
+        error = ring.get()
+        self.assertIsInstance(error, user.gw1000.GWIOError)
+        self.assertEqual(str(error), 'timed out')
+        self.assertIsNone(ring.get())
+        with self.assertRaises(queue.Empty):
+            ring.get(True, 0.01)
+        with self.assertRaises(queue.Empty):
+            ring.get(False)
+
+    def test_overrun(self):
+        """Test a reader that falls behind loses the oldest entries."""
+
+        ring = user.gw1000.PacketRing(slots=4, slot_size=256)
+        for i in range(10):
+            ring.put({'datetime': i})
+        self.assertEqual([ring.get(False)['datetime'] for i in range(4)], [6, 7, 8, 9])
+        self.assertEqual(ring.lost, 6)
+        # data too large for a slot is replaced by an error
+        ring.put({'data': 'x' * 256})
+        self.assertIsInstance(ring.get(False), user.gw1000.GWIOError)
+
+
+class PacketRecordTestCase(unittest.TestCase):
+    """Test the PacketLayout and PacketRecord classes."""
+
+    data = {'datetime': 1700000000, 'outtemp': 21.3, 'outhumid': 56, 'wh65_batt': None}
+
+    def test_mapping(self):
+        """Test a PacketRecord behaves as a dict."""
+
+        record = user.gw1000.PacketRecord(None, self.data)
+        self.assertEqual(record, self.data)
+        self.assertEqual(len(record), 4)
+        self.assertIn('wh65_batt', record)
+        self.assertIsNone(record['wh65_batt'])
+        self.assertEqual(record.get('intemp', 'none'), 'none')
+        record['intemp'] = 22.1
+        record.update({'outtemp': 20.0})
+        del record['outhumid']
+        self.assertNotIn('outhumid', record)
+        with self.assertRaises(KeyError):
+            record['outhumid']
+        self.assertEqual(record.to_dict(), {'datetime': 1700000000, 'outtemp': 20.0,
+                                            'wh65_batt': None, 'intemp': 22.1})
+        # copies are independent
+        _copy = record.copy()
+        _copy['outtemp'] = 19.0
+        self.assertEqual(record['outtemp'], 20.0)
+        self.assertEqual(copy.deepcopy(record), record)
+        self.assertEqual(pickle.loads(pickle.dumps(record)), record)
+
+    def test_layout(self):
+        """Test records built alike share their layout."""
+
+        first = user.gw1000.PacketRecord(None, self.data)
+        second = user.gw1000.PacketRecord(None, self.data)
+        # layouts are only shared when built from the same layout
+        self.assertEqual(first.layout.fields, second.layout.fields)
+        third = user.gw1000.PacketRecord(first.layout, self.data)
+        self.assertIs(third.layout, first.layout)
+        # adding the same field to records with the same layout gives the
+        # same layout
+        first['intemp'] = 22.1
+        third['intemp'] = 21.9
+        self.assertIs(first.layout, third.layout)
+
+    def test_map_data(self):
+        """Test a PacketRecord maps the same as a dict."""
+
+        gateway = user.gw1000.Gateway.__new__(user.gw1000.Gateway)
+        gateway.field_map = user.gw1000.Gateway.construct_field_map({})
+        gateway.map_plans = {}
+        data = dict(self.data, intemp=22.1, t_rain=1.2)
+        record = user.gw1000.PacketRecord(None, data)
+        self.assertEqual(gateway.map_data(record), gateway.map_data(data))
+        # fields deleted from the record are not mapped
+        del record['outtemp']
+        del data['outtemp']
+        self.assertEqual(gateway.map_data(record), gateway.map_data(data))
+        self.assertEqual(len(gateway.map_plans), 1)
+
+    def test_memory(self):
+        """Test PacketRecords use less memory than dicts."""
+
+        fields = ['field%d' % i for i in range(150)]
+        data = dict((field, float(i)) for i, field in enumerate(fields))
+        layout = user.gw1000.PacketRecord(None, data).layout
+
+        def measure(build):
+            tracemalloc.start()
+            try:
+                # the packets must exist when memory use is measured
+                packets = [build() for i in range(50)]
+                memory = tracemalloc.get_traced_memory()
+                del packets
+                return memory
+            finally:
+                tracemalloc.stop()
+
+        dict_current, dict_peak = measure(lambda: dict((f, data[f]) for f in fields))
+        record_current, record_peak = measure(lambda: user.gw1000.PacketRecord(layout, data))
+        self.assertLess(record_current, dict_current)
+        self.assertLess(record_peak, dict_peak)
+
+
+class HistoryBufferTestCase(unittest.TestCase):
+    """Test the HistoryBuffer class."""
+
+    def get_buffer(self):
+        """Obtain a HistoryBuffer holding ten minutes of polls."""
+
+        history = user.gw1000.HistoryBuffer(slots=10)
+        for i in range(15):
+            data = {'datetime': 1700000060 + 60 * i,
+                    'outtemp': 10.0 + i,
+                    'windspeed': 2.0,
+                    'winddir': 350 if i % 2 else 10,
+                    'wh65_batt': None,
+                    'model': 'GW2000'}
+            if i == 14:
+                # the latest poll is missing outtemp
+                del data['outtemp']
+            history.add(data)
+        return history
+
+    def check_buffer(self):
+        """Check queries of a HistoryBuffer."""
+
+        history = self.get_buffer()
+        # only numeric fields are held
+        self.assertEqual(history.fields, ['outtemp', 'winddir', 'windspeed'])
+        # the buffer holds the last ten polls
+        self.assertEqual(history.count, 10)
+        self.assertEqual(history.range('outtemp')[0], (1700000360, 15.0))
+        self.assertEqual(history.latest('outtemp'), (1700000840, 23.0))
+        self.assertIsNone(history.latest('intemp'))
+        self.assertEqual(history.range('outtemp', 1700000720, 1700000840),
+                         [(1700000780, 22.0), (1700000840, 23.0)])
+        self.assertEqual(history.min('outtemp'), 15.0)
+        self.assertEqual(history.max('outtemp', stop=1700000600), 19.0)
+        self.assertAlmostEqual(history.mean('outtemp', 1700000660), 22.0)
+        self.assertEqual(history.aggregate('outtemp', 'count'), 9)
+        self.assertIsNone(history.mean('outtemp', 1700001000))
+        with self.assertRaises(ValueError):
+            history.aggregate('outtemp', 'median')
+        self.assertEqual(history.resample('outtemp', 300, 'max'),
+                         [(1700000400, 15.0), (1700000700, 20.0), (1700001000, 23.0)])
+        # wind from either side of north averages to north
+        speed, direction = history.wind_vector()
+        self.assertAlmostEqual(speed, 2.0 * math.cos(math.radians(10)))
+        self.assertAlmostEqual(min(direction, 360 - direction), 0.0)
+        self.assertIsNone(history.wind_vector(speed_field='gustspeed'))
+        # out of order data is discarded
+        history.add({'datetime': 1700000000, 'outtemp': 0.0})
+        self.assertEqual(history.min('outtemp'), 15.0)
+        # data with the latest timestamp replaces the latest data
+        history.add({'datetime': 1700000900, 'outtemp': 30.0})
+        self.assertEqual(history.latest('outtemp'), (1700000900, 30.0))
+        self.assertEqual(history.latest('windspeed'), (1700000840, 2.0))
+        self.assertEqual(history.count, 10)
+
+    def test_buffer(self):
+        """Test the HistoryBuffer without numpy."""
+
+        with patch('user.gw1000.numpy', None):
+            self.check_buffer()
+
+    @unittest.skipIf(user.gw1000.numpy is None, 'numpy is not available')
+    def test_buffer_numpy(self):
+        """Test the HistoryBuffer with numpy."""
+
+        self.check_buffer()
+
+
+class WindowAggregatorTestCase(unittest.TestCase):
+    """Test the WindowedAggregate and WindowAggregator classes."""
+
+    derived_fields = {'windSpeed10': ['windspeed', 'mean', '600'],
+                      'windGust10': ['gustspeed', 'max', '600'],
+                      'outTempMin10': ['outtemp', 'min', '600'],
+                      'rain1h': ['t_rain', 'sum', '3600'],
+                      'polls1h': ['t_rain', 'count', '3600'],
+                      'pressureTrend3h': ['relbarometer', 'delta', '10800'],
+                      'invalid': ['outtemp', 'median', '600'],
+                      'incomplete': 'outtemp'}
+
+    def test_parse_config(self):
+        """Test parsing of derived field definitions."""
+
+        derived_fields = user.gw1000.WindowAggregator.parse_config(self.derived_fields)
+        self.assertEqual(len(derived_fields), 6)
+        self.assertEqual(derived_fields['rain1h'], ('t_rain', 'sum', 3600))
+        with self.assertRaises(ValueError):
+            user.gw1000.WindowedAggregate('outtemp', 'median', 600)
+
+    def test_aggregates(self):
+        """Test aggregates match aggregates calculated over the window."""
+
+        derived_fields = user.gw1000.WindowAggregator.parse_config(self.derived_fields)
+        aggregator = user.gw1000.WindowAggregator(derived_fields)
+        rng = random.Random(1)
+        packets = []
+        for i in range(1000):
+            data = {'datetime': 1700000000 + 20 * i,
+                    'windspeed': rng.uniform(0, 10),
+                    'gustspeed': rng.uniform(0, 15),
+                    'outtemp': rng.uniform(-5, 25),
+                    't_rain': rng.choice((0.0, 0.0, 0.3)),
+                    'relbarometer': 1013.0 + rng.uniform(-1, 1)}
+            if i % 7 == 0:
+                # some packets are missing a field
+                data['windspeed'] = None
+            packets.append(data)
+            derived_data = aggregator.update(data)
+            for name, (source, agg, window) in derived_fields.items():
+                values = [p[source] for p in packets[-600:]
+                          if p['datetime'] > data['datetime'] - window and p[source] is not None]
+                if len(values) == 0 and agg != 'count':
+                    self.assertNotIn(name, derived_data)
+                    continue
+                expected = {'mean': lambda: sum(values) / len(values),
+                            'max': lambda: max(values),
+                            'min': lambda: min(values),
+                            'sum': lambda: sum(values),
+                            'count': lambda: len(values),
+                            'delta': lambda: values[-1] - values[0]}[agg]()
+                self.assertAlmostEqual(derived_data[name], expected, places=6)
+        # out of order data is ignored
+        self.assertEqual(aggregator.update({'datetime': 1700000000, 'windspeed': 1.0}), {})
+
+    def test_expiry(self):
+        """Test aggregates with no values in the window are omitted."""
+
+        aggregator = user.gw1000.WindowAggregator({'windSpeed10': ('windspeed', 'mean', 600),
+                                                   'polls10': ('windspeed', 'count', 600)})
+        aggregator.update({'datetime': 1700000000, 'windspeed': 5.0})
+        self.assertEqual(aggregator.update({'datetime': 1700000300}),
+                         {'windSpeed10': 5.0, 'polls10': 1})
+        self.assertEqual(aggregator.update({'datetime': 1700000600}), {'polls10': 0})
+
+
+class SensorArbiterTestCase(unittest.TestCase):
+    """Test the SensorArbiter class."""
+
+    def get_source(self, ts, sensor_data, **data):
+        """Obtain a source of device data for a device."""
+
+        sensors = user.gw1000.Sensors()
+        sensors.sensor_data = sensor_data
+        return dict(data, datetime=ts), sensors
+
+    def test_arbitrate(self):
+        """Test each sensor is taken from the best source."""
+
+        arbiter = user.gw1000.SensorArbiter(counter_fields=('lightningcount',))
+        first = self.get_source(1700000000,
+                                {b'\x06': {'id': 'a1', 'battery': 0, 'signal': 2},
+                                 b'\x07': {'id': 'a2', 'battery': 0, 'signal': 4},
+                                 b'\x1a': {'id': 'c1', 'battery': 5, 'signal': 1},
+                                 b'\x0e': {'id': 'fffffffe', 'battery': None, 'signal': 0}},
+                                intemp=21.0, temp1=10.0, humid1=50, wh31_ch1_batt=0,
+                                wh31_ch1_sig=2, temp2=11.0, humid2=51, wh31_ch2_sig=4,
+                                lightningcount=7, lightningdist=10, wh57_sig=1)
+        second = self.get_source(1700000000,
+                                 {b'\x06': {'id': 'a1', 'battery': 1, 'signal': 4},
+                                  b'\x07': {'id': 'b2', 'battery': 0, 'signal': 3},
+                                  b'\x1a': {'id': 'c1', 'battery': 5, 'signal': 4},
+                                  b'\x0e': {'id': 'd1', 'battery': 14, 'signal': 4}},
+                                 intemp=23.0, temp1=10.2, humid1=52, wh31_ch1_batt=1,
+                                 wh31_ch1_sig=4, temp2=15.0, humid2=60, wh31_ch2_sig=3,
+                                 lightningcount=3, lightningdist=12, wh57_sig=4,
+                                 soilmoist1=30, wh51_ch1_sig=4)
+        data = arbiter.arbitrate([first, second])
+        # device fields not associated with a sensor come from the first
+        # source
+        self.assertEqual(data['intemp'], 21.0)
+        self.assertEqual(data['datetime'], 1700000000)
+        # the sensor heard best by the second device, including its battery
+        # and signal fields
+        self.assertEqual((data['temp1'], data['humid1']), (10.2, 52))
+        self.assertEqual((data['wh31_ch1_batt'], data['wh31_ch1_sig']), (1, 4))
+        # two different sensors on the same channel, the best signal is used
+        self.assertEqual((data['temp2'], data['wh31_ch2_sig']), (11.0, 4))
+        self.assertEqual(arbiter.choices[b'\x07'], ('a2', 0))
+        # a sensor heard by one device only
+        self.assertEqual(data['soilmoist1'], 30)
+        # counters come from the first source to provide them
+        self.assertEqual((data['lightningdist'], data['lightningcount']), (12, 7))
+        # fresher data wins when signal levels are equal
+        older = self.get_source(1699999990, {b'\x06': {'id': 'a1', 'battery': 0, 'signal': 4}},
+                                temp1=9.0)
+        newer = self.get_source(1700000000, {b'\x06': {'id': 'a1', 'battery': 0, 'signal': 4}},
+                                temp1=10.0)
+        self.assertEqual(arbiter.arbitrate([older, newer])['temp1'], 10.0)
+        # a device without data is ignored, counters change source only
+        # when they must
+        data = arbiter.arbitrate([None, second])
+        self.assertEqual(data['intemp'], 23.0)
+        self.assertEqual(data['lightningcount'], 3)
+        data = arbiter.arbitrate([first, second])
+        self.assertEqual(data['lightningcount'], 3)
+
+
+class AdaptivePollSchedulerTestCase(unittest.TestCase):
+    """Test the AdaptivePollScheduler class."""
+
+    def simulate(self, scheduler, period, phase, duration=3600, constant=False):
+        """Simulate polling a sensor that transmits every period seconds.
+
+        Returns a tuple of the number of polls made and a list of the delays
+        between each transmission and the poll that saw it, delays in the
+        first ten minutes are ignored as the scheduler is learning.
+        """
+
+        poll_ts = 0.0
+        polls = 0
+        delays = []
+        tx_count = 0
+        while poll_ts < duration:
+            count = int(math.floor((poll_ts - phase) / period)) + 1
+            if count > tx_count:
+                tx_count = count
+                if poll_ts > 600:
+                    delays.append(poll_ts - (phase + (count - 1) * period))
+            value = 20.0 if constant else 20.0 + tx_count / 10.0
+            polls += 1
+            next_poll = scheduler.update(poll_ts, {'datetime': int(poll_ts),
+                                                   'outtemp': value,
+                                                   'outhumid': 56,
+                                                   'wh65_batt': 0})
+            self.assertGreaterEqual(next_poll - poll_ts, scheduler.min_interval)
+            self.assertLessEqual(next_poll - poll_ts, scheduler.max_interval)
+            poll_ts = next_poll
+        return polls, delays
+
+    def test_learn(self):
+        """Test a sensor period is learnt and polls follow transmissions."""
+
+        for period, phase in ((16.0, 3.3), (61.0, 10.0)):
+            scheduler = user.gw1000.AdaptivePollScheduler(min_interval=2,
+                                                          max_interval=60,
+                                                          margin=0.5)
+            polls, delays = self.simulate(scheduler, period, phase)
+            self.assertEqual(scheduler.groups['outdoor'].period, period)
+            # fewer polls than polling every 5 seconds
+            self.assertLess(polls, 3600 / 5)
+            # once learnt each transmission is seen shortly after it occurs
+            self.assertLess(sum(delays) / len(delays), 2)
+            self.assertLess(max(delays), 2)
+
+    def test_backoff(self):
+        """Test polls back off to the maximum interval when nothing changes."""
+
+        scheduler = user.gw1000.AdaptivePollScheduler(min_interval=5,
+                                                      max_interval=60)
+        polls, delays = self.simulate(scheduler, 16.0, 3.3, constant=True)
+        self.assertEqual(scheduler.groups['outdoor'].period, None)
+        # nothing changes so polls quickly back off to the maximum interval
+        self.assertLessEqual(polls, 3600 // 60 + 10)
+
+
+class DeviceHealthMonitorTestCase(unittest.TestCase):
+    """Test the DeviceHealthMonitor class."""
+
+    def test_heap(self):
+        """Test polling is throttled when free heap memory is low."""
+
+        monitor = user.gw1000.DeviceHealthMonitor(heap_free=20000)
+        self.assertFalse(monitor.update(50000, 0.05))
+        self.assertFalse(monitor.throttled)
+        # low heap throttles, the state change is only reported once
+        self.assertTrue(monitor.update(15000, 0.05))
+        self.assertTrue(monitor.throttled)
+        self.assertFalse(monitor.update(15000, 0.05))
+        # heap just above the threshold is not considered recovered
+        for i in range(5):
+            self.assertFalse(monitor.update(21000, 0.05))
+        self.assertTrue(monitor.throttled)
+        # throttling is relaxed after consecutive healthy polls
+        self.assertFalse(monitor.update(50000, 0.05))
+        self.assertFalse(monitor.update(50000, 0.05))
+        self.assertTrue(monitor.update(50000, 0.05))
+        self.assertFalse(monitor.throttled)
+        self.assertEqual(monitor.metrics['state'], 'normal')
+        self.assertEqual(monitor.metrics['throttle_count'], 1)
+
+    def test_latency(self):
+        """Test polling is throttled when response latency rises."""
+
+        monitor = user.gw1000.DeviceHealthMonitor(latency_factor=3.0)
+        for i in range(20):
+            monitor.update(None, 0.2)
+        self.assertFalse(monitor.throttled)
+        # a single slow response is tolerated
+        monitor.update(None, 1.0)
+        self.assertFalse(monitor.throttled)
+        # but a sustained rise is not
+        for i in range(5):
+            monitor.update(None, 2.0)
+        self.assertTrue(monitor.throttled)
+        # the baseline is not updated while throttled
+        self.assertLess(monitor.baseline, 0.5)
+        for i in range(20):
+            monitor.update(None, 0.2)
+        self.assertFalse(monitor.throttled)
+
+
+class RetryTestCase(unittest.TestCase):
+    """Test the RetryPolicy and CircuitBreaker classes."""
+
+    def test_policy(self):
+        """Test retry waits back off exponentially with jitter."""
+
+        policy = user.gw1000.RetryPolicy(max_tries=5, retry_wait=2, max_wait=10)
+        for attempt, wait in enumerate((2, 4, 8, 10, 10)):
+            delay = policy.delay(attempt)
+            self.assertLessEqual(delay, wait)
+            self.assertGreaterEqual(delay, wait * (1 - policy.jitter))
+        # by default waits start small
+        policy = user.gw1000.RetryPolicy(max_wait=60)
+        for attempt, wait in enumerate((1, 2, 4)):
+            delay = policy.delay(attempt)
+            self.assertLessEqual(delay, wait)
+            self.assertGreaterEqual(delay, wait * (1 - policy.jitter))
+        # a retry wait of 0 retries immediately
+        policy = user.gw1000.RetryPolicy(retry_wait=0, max_wait=60)
+        self.assertEqual(policy.delay(0), 0)
+        self.assertTrue(policy.sleep(0))
+        policy.cancel()
+        self.assertFalse(policy.sleep(10))
+        policy.reset()
+        self.assertTrue(policy.sleep(0.01))
+
+    def test_breaker(self):
+        """Test circuit breaker state transitions."""
+
+        breaker = user.gw1000.CircuitBreaker(threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, user.gw1000.CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        # after the reset period a single trial is allowed
+        breaker.opened -= 60
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, user.gw1000.CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow())
+        # a failed trial opens the circuit breaker again
+        breaker.record_failure()
+        self.assertEqual(breaker.state, user.gw1000.CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        breaker.opened -= 60
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, user.gw1000.CircuitBreaker.CLOSED)
+        # a threshold of 0 disables the circuit breaker
+        breaker = user.gw1000.CircuitBreaker(threshold=0)
+        for i in range(5):
+            breaker.record_failure()
+        self.assertTrue(breaker.allow())
+
+
+class RttEstimatorTestCase(unittest.TestCase):
+    """Test the RttEstimator class."""
+
+    def test_estimate(self):
+        """Test timeouts follow observed round trip times within bounds."""
+
+        rtt = user.gw1000.RttEstimator(initial_timeout=2, min_timeout=0.5,
+                                       max_timeout=10)
+        # no round trip time observed so use the initial timeout
+        self.assertEqual(rtt.timeout(0x27), 2)
+        # a fast device gets the minimum timeout
+        for i in range(10):
+            rtt.update(0x27, 0.03)
+        self.assertEqual(rtt.timeout(0x27), 0.5)
+        self.assertAlmostEqual(rtt.stats[0x27]['srtt'], 0.03)
+        # a slow command gets a longer timeout
+        for i in range(10):
+            rtt.update(0x3C, 3.0 + (i % 2) * 0.5)
+        self.assertGreater(rtt.timeout(0x3C), 3.5)
+        self.assertLess(rtt.timeout(0x3C), 10)
+        # timeouts back off until a round trip time is observed
+        rtt.timed_out(0x3C)
+        rtt.timed_out(0x3C)
+        self.assertEqual(rtt.timeout(0x3C), 10)
+        self.assertEqual(rtt.stats[0x3C]['timeouts'], 2)
+        rtt.update(0x3C, 3.0)
+        self.assertLess(rtt.timeout(0x3C), 10)
+
+
 class StationTestCase(unittest.TestCase):
 
     fake_ip = '192.168.99.99'
@@ -2190,8 +2813,12 @@ def main():
 
     # test cases that are production ready
     test_cases = (DebugOptionsTestCase, SensorsTestCase, ParseTestCase,
-                  UtilitiesTestCase, ListsAndDictsTestCase, StationTestCase,
-                  GatewayServiceTestCase)
+                  UtilitiesTestCase, ListsAndDictsTestCase, CaptureTestCase,
+                  PacketRingTestCase, PacketRecordTestCase,
+                  HistoryBufferTestCase, WindowAggregatorTestCase,
+                  SensorArbiterTestCase, AdaptivePollSchedulerTestCase,
+                  DeviceHealthMonitorTestCase, RetryTestCase,
+                  RttEstimatorTestCase, StationTestCase, GatewayServiceTestCase)
 
     usage = """python3 -m user.tests.test_egd --help
            python3 -m user.tests.test_egd --version
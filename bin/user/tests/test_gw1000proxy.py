@@ -0,0 +1,189 @@
+"""
+Test suite for the Ecowitt gateway proxy.
+
+Copyright (C) 2020-24 Gary Roderick                gjroderick<at>gmail.com
+
+A python3 unittest based test suite for the Ecowitt gateway proxy. The test
+suite uses the Ecowitt gateway simulator as the upstream device and tests
+correct operation of:
+
+-   read command caching and coalescing of identical in-flight requests
+-   pass through of write commands
+-   use of the proxy by the gateway driver GatewayApi and GatewayCollector
+    classes
+-   stopping the proxy with client connections open
+
+Version: 0.1.0                                  Date: Unreleased
+
+Revision History
+    Unreleased          v0.1.0
+        -   initial release
+
+To run the test suite:
+
+-   copy this file to the target machine, nominally to the $BIN/user/tests
+    directory
+
+-   run the test suite using:
+
+    $ PYTHONPATH=$BIN python3 -m user.tests.test_gw1000proxy [-v]
+"""
+# python imports
+import threading
+import unittest
+
+# WeeWX imports
+import user.gw1000
+import user.gw1000proxy
+import user.gw1000sim
+
+TEST_SUITE_NAME = "Gateway proxy"
+TEST_SUITE_VERSION = "0.1.0"
+
+
+class ProxyTestCase(unittest.TestCase):
+    """Test the gateway proxy against a running simulator."""
+
+    def start_proxy(self, faults=None, **kwargs):
+        """Start a simulator and a proxy for the simulated device."""
+
+        self.sim = user.gw1000sim.GatewaySimulator(port=0, http_port=None,
+                                                   discovery_interval=0,
+                                                   seed=1, faults=faults)
+        self.sim.start()
+        self.addCleanup(self.sim.stop)
+        proxy = user.gw1000proxy.GatewayProxy([('127.0.0.1', self.sim.devices[0].port)],
+                                              port=0, **kwargs)
+        proxy.start()
+        self.addCleanup(proxy.stop)
+        return proxy
+
+    def get_api(self, proxy):
+        """Get a GatewayApi object that uses the proxy."""
+
+        return user.gw1000.GatewayApi(ip_address='127.0.0.1',
+                                      port=proxy.upstreams[0].local_port,
+                                      max_tries=1, retry_wait=0)
+
+    def upstream_count(self, cmd):
+        """Number of times the simulated device received an API command."""
+
+        return self.sim.stats.counters.get('api_%s' % cmd, 0)
+
+    def test_cache(self):
+        """Test read commands are answered from the cache."""
+
+        proxy = self.start_proxy(ttl=60)
+        apis = [self.get_api(proxy) for i in range(3)]
+        count = self.upstream_count('CMD_GW1000_LIVEDATA')
+        for i in range(5):
+            for api in apis:
+                self.assertIn('outtemp', api.get_livedata())
+        # every client was answered from the response cached when the first
+        # client was initialised
+        self.assertEqual(self.upstream_count('CMD_GW1000_LIVEDATA'), count)
+        # the device MAC address is read once by the proxy on startup and once
+        # when the first client is initialised
+        self.assertEqual(self.upstream_count('CMD_READ_STATION_MAC'), 2)
+        self.assertGreaterEqual(proxy.stats.counters['cache_hits'], 15)
+
+    def test_coalesce(self):
+        """Test identical in-flight read commands are coalesced."""
+
+        faults = user.gw1000sim.FaultProfile(latency=0.2)
+        proxy = self.start_proxy(faults=faults, ttl=0)
+        api = self.get_api(proxy)
+        count = self.upstream_count('CMD_GW1000_LIVEDATA')
+        results = []
+
+        def poll():
+            results.append(api.get_livedata())
+
+        threads = [threading.Thread(target=poll) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(len(results), 5)
+        # the five concurrent requests should have been served by at most two
+        # device requests
+        self.assertLessEqual(self.upstream_count('CMD_GW1000_LIVEDATA') - count, 2)
+        self.assertGreaterEqual(proxy.stats.counters['coalesced'], 3)
+
+    def test_write(self):
+        """Test write commands are passed through and clear the cache."""
+
+        proxy = self.start_proxy(ttl=60)
+        api = self.get_api(proxy)
+        count = self.upstream_count('CMD_GW1000_LIVEDATA')
+        api.get_livedata()
+        self.assertEqual(self.upstream_count('CMD_GW1000_LIVEDATA'), count)
+        response = api.send_cmd_with_retries('CMD_WRITE_REBOOT')
+        self.assertEqual(response[2:3], api.api_commands['CMD_WRITE_REBOOT'])
+        self.assertEqual(self.upstream_count('CMD_WRITE_REBOOT'), 1)
+        api.get_livedata()
+        self.assertEqual(self.upstream_count('CMD_GW1000_LIVEDATA'), count + 1)
+
+    def test_driver(self):
+        """Test the driver collector can use the proxy in lieu of a device."""
+
+        proxy = self.start_proxy()
+        collector = user.gw1000.GatewayCollector(ip_address='127.0.0.1',
+                                                 port=proxy.upstreams[0].local_port,
+                                                 max_tries=1, retry_wait=0)
+        data = collector.get_current_data()
+        self.assertIn('outtemp', data)
+        self.assertIn('t_rainday', data)
+        self.assertEqual(collector.device.api.mac, proxy.upstreams[0].api.mac)
+
+    def test_stop(self):
+        """Test the proxy stops promptly with a client connected."""
+
+        proxy = self.start_proxy()
+        # a persistent connection remains open between commands
+        api = user.gw1000.GatewayApi(ip_address='127.0.0.1',
+                                     port=proxy.upstreams[0].local_port,
+                                     max_tries=1, retry_wait=0, persistent=True)
+        self.addCleanup(api.close)
+        api.get_mac_address()
+        self.assertEqual(len(proxy.clients), 1)
+        thread = proxy.thread
+        proxy.stop(timeout=5)
+        self.assertFalse(thread.is_alive())
+        # the client connection was closed and its task finished before the
+        # event loop was closed
+        self.assertEqual(proxy.clients, {})
+        self.assertTrue(proxy.loop.is_closed())
+        api.connection.settimeout(1)
+        self.assertEqual(api.connection.recv(16), b'')
+
+
+def suite(test_cases):
+    """Create a TestSuite object containing the tests we are to perform."""
+
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    for test_class in test_cases:
+        suite.addTests(loader.loadTestsFromTestCase(test_class))
+    return suite
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Test the Ecowitt gateway proxy.')
+    parser.add_argument('--version', dest='version', action='store_true',
+                        help='display Ecowitt gateway proxy test suite version number')
+    parser.add_argument('--verbose', dest='verbosity', type=int, metavar="VERBOSITY",
+                        default=2,
+                        help='How much status to display, 0-2')
+    args = parser.parse_args()
+    if args.version:
+        print("%s test suite version: %s" % (TEST_SUITE_NAME, TEST_SUITE_VERSION))
+        exit(0)
+    runner = unittest.TextTestRunner(verbosity=args.verbosity)
+    runner.run(suite((ProxyTestCase,)))
+
+
+if __name__ == '__main__':
+    main()
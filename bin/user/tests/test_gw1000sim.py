@@ -0,0 +1,1099 @@
+"""
+Test suite for the Ecowitt gateway simulator.
+
+Copyright (C) 2020-24 Gary Roderick                gjroderick<at>gmail.com
+
+A python3 unittest based test suite for the Ecowitt gateway simulator. The
+test suite tests correct operation of:
+
+-   construction of simulator API responses
+-   interaction of the gateway driver GatewayApi and GatewayHttp classes with
+    a running simulator, including injected faults
+
+Version: 0.1.0                                  Date: Unreleased
+
+Revision History
+    Unreleased          v0.1.0
+        -   initial release
+
+To run the test suite:
+
+-   copy this file to the target machine, nominally to the $BIN/user/tests
+    directory
+
+-   run the test suite using:
+
+    $ PYTHONPATH=$BIN python3 -m user.tests.test_gw1000sim [-v]
+"""
+# python imports
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+
+from unittest.mock import patch
+
+import configobj
+
+# WeeWX imports
+import weewx.manager
+import user.gw1000
+import user.gw1000sim
+
+TEST_SUITE_NAME = "Gateway simulator"
+TEST_SUITE_VERSION = "0.1.0"
+
+
+class VirtualDeviceTestCase(unittest.TestCase):
+    """Test the VirtualDevice class."""
+
+    def setUp(self):
+
+        self.device = user.gw1000sim.VirtualDevice(0, '127.0.0.1', 45000, seed=1)
+        self.api = user.gw1000.GatewayApi
+        self.parser = user.gw1000.ApiParser()
+
+    def test_responses(self):
+        """Test every API command produces a valid response."""
+
+        # check_response() needs no initialised state so use a bare
+        # GatewayApi object rather than one that attempts to contact a device
+        api = self.api.__new__(self.api)
+        for cmd, code in self.api.api_commands.items():
+            response = self.device.response(code)
+            self.assertIsNotNone(response, msg=cmd)
+            api.check_response(response, code)
+
+    def test_parse(self):
+        """Test simulator responses decode with the driver parsers."""
+
+        codes = self.api.api_commands
+        live = self.parser.parse_livedata(self.device.response(codes['CMD_GW1000_LIVEDATA']))
+        for field in self.device.fields:
+            self.assertIn(field, live)
+        self.assertEqual(live['outtemp'], self.device.obs['outtemp'])
+        rain = self.parser.parse_read_rain(self.device.response(codes['CMD_READ_RAIN']))
+        self.assertIn('p_rainday', rain)
+        self.assertAlmostEqual(rain['t_rainyear'], self.device.t_rain['year'], places=1)
+        fw = self.parser.parse_read_firmware_version(self.device.response(codes['CMD_READ_FIRMWARE_VERSION']))
+        self.assertEqual(fw, self.device.firmware)
+        bcast = self.api.decode_broadcast_response(self.device.response(codes['CMD_BROADCAST']))
+        self.assertEqual(bcast['ip_address'], '127.0.0.1')
+        self.assertEqual(bcast['port'], 45000)
+        self.assertEqual(bcast['ssid'], self.device.ssid)
+
+    def test_evolving(self):
+        """Test the sensor state advances and rain accumulates."""
+
+        start = self.device.last_ts
+        self.device.raining = True
+        self.device.rain_rate = 10.0
+        year = self.device.t_rain['year']
+        self.device.advance(start + 60)
+        self.assertGreater(self.device.t_rain['year'], year)
+        self.assertEqual(self.device.last_ts, start + 60)
+
+
+class SimulatorTestCase(unittest.TestCase):
+    """Test the gateway driver against a running simulator."""
+
+    def start_sim(self, **kwargs):
+        sim = user.gw1000sim.GatewaySimulator(port=0, http_port=0,
+                                              discovery_interval=0,
+                                              seed=1, **kwargs)
+        sim.start()
+        self.addCleanup(sim.stop)
+        return sim
+
+    def test_api(self):
+        """Test a GatewayApi object can initialise and poll the simulator."""
+
+        sim = self.start_sim(devices=3, model='GW1000,GW2000')
+        device = sim.devices[1]
+        api = user.gw1000.GatewayApi(ip_address='127.0.0.1', port=device.port,
+                                     max_tries=1, retry_wait=0)
+        self.assertEqual(api.model, 'GW2000')
+        self.assertEqual(api.mac, user.gw1000.bytes_to_hex(device.mac, separator=':'))
+        self.assertIn('outtemp', api.get_livedata())
+        self.assertIn('t_rainday', api.read_rain())
+        self.assertTrue(len(api.sensors.connected_addresses) > 0)
+
+    def test_http(self):
+        """Test a GatewayHttp object can query the simulator."""
+
+        sim = self.start_sim()
+        device = sim.devices[0]
+        http = user.gw1000.GatewayHttp('127.0.0.1:%d' % device.http_port)
+        self.assertEqual(http.get_version()['newVersion'], '0')
+        self.assertIn('common_list', http.get_livedata_info())
+        self.assertTrue(len(http.get_sensors_info()) > 0)
+
+    def test_faults(self):
+        """Test injected faults are seen as failures by the driver."""
+
+        faults = user.gw1000sim.FaultProfile(corrupt=1.0)
+        sim = self.start_sim(faults=faults)
+        api = user.gw1000.GatewayApi.__new__(user.gw1000.GatewayApi)
+        api.ip_address = b'127.0.0.1'
+        api.port = sim.devices[0].port
+        api.socket_timeout = 1
+        api.max_tries = 2
+        api.retry_wait = 0
+        api.retry_policy = user.gw1000.RetryPolicy(max_tries=2, retry_wait=0)
+        api.breaker = user.gw1000.CircuitBreaker()
+        api.log_failures = False
+        api.recorder = None
+        with self.assertRaises(user.gw1000.GWIOError):
+            api.send_cmd_with_retries('CMD_READ_FIRMWARE_VERSION')
+        self.assertEqual(sim.stats.counters.get('fault_corrupt'), 2)
+
+    def test_breaker_opens(self):
+        """Test a device that does not respond is quickly left alone."""
+
+        faults = user.gw1000sim.FaultProfile(drop=1.0)
+        sim = self.start_sim(faults=faults)
+        # use the default retries and circuit breaker
+        api = user.gw1000.GatewayApi(ip_address='127.0.0.1', port=sim.devices[0].port,
+                                     socket_timeout=0.5, max_socket_timeout=1,
+                                     identify=False)
+        start = time.time()
+        with self.assertRaises(user.gw1000.GWIOError):
+            api.send_cmd_with_retries('CMD_READ_FIRMWARE_VERSION')
+        # each attempt timed out and the retry waits start small, a single
+        # failed command does not open the circuit breaker
+        self.assertEqual(sim.stats.counters.get('fault_drop'), user.gw1000.default_max_tries)
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(api.breaker.state, user.gw1000.CircuitBreaker.CLOSED)
+        # the circuit breaker opens once the threshold is reached
+        with self.assertRaises(user.gw1000.GWIOError):
+            api.send_cmd_with_retries('CMD_READ_FIRMWARE_VERSION')
+        self.assertEqual(api.breaker.state, user.gw1000.CircuitBreaker.OPEN)
+        drops = sim.stats.counters.get('fault_drop')
+        self.assertEqual(drops, user.gw1000.default_breaker_threshold)
+        self.assertLess(time.time() - start, 10)
+        # later commands are not sent
+        with self.assertRaises(user.gw1000.CircuitOpen):
+            api.send_cmd_with_retries('CMD_READ_FIRMWARE_VERSION')
+        self.assertEqual(sim.stats.counters.get('fault_drop'), drops)
+
+    def test_capture(self):
+        """Test API frames exchanged with the simulator are captured."""
+
+        sim = self.start_sim()
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'gw.cap')
+        recorder = user.gw1000.FrameRecorder(path)
+        api = user.gw1000.GatewayApi(ip_address='127.0.0.1', port=sim.devices[0].port,
+                                     max_tries=1, retry_wait=0, recorder=recorder)
+        api.get_livedata()
+        recorder.close()
+        records = list(user.gw1000.CaptureReader(path))
+        # GatewayApi initialisation issues five commands, plus our livedata
+        self.assertEqual(len(records), 12)
+        request, response = records[-2:]
+        self.assertEqual(request['direction'], recorder.REQUEST)
+        self.assertEqual(response['direction'], recorder.RESPONSE)
+        self.assertEqual(response['cmd'], 0x27)
+        self.assertEqual(response['mac'], api.mac)
+        self.assertGreater(response['rtt'], 0)
+        self.assertIn('outtemp', api.parser.parse_livedata(response['frame']))
+
+    def test_replay(self):
+        """Test captured polls replay through the driver pipeline."""
+
+        sim = self.start_sim()
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'gw.cap')
+        recorder = user.gw1000.FrameRecorder(path)
+        collector = user.gw1000.GatewayCollector(ip_address='127.0.0.1',
+                                                 port=sim.devices[0].port,
+                                                 max_tries=1, retry_wait=0,
+                                                 recorder=recorder)
+        live = []
+        for i in range(5):
+            live.append(collector.get_current_data())
+            sim.devices[0].advance(sim.devices[0].last_ts + 60)
+        recorder.close()
+        # replaying the capture should reproduce the live data
+        replay = user.gw1000.ReplayCollector(path, speed=0)
+        self.assertEqual(replay.device.model, collector.device.model)
+        self.assertEqual(replay.device.api.mac, collector.device.api.mac)
+        replayed = []
+        while replay.source.next_poll():
+            # the livedata obtained when GatewayApi was initialised is not
+            # part of a complete poll and cannot be replayed
+            try:
+                data = replay.get_current_data()
+            except user.gw1000.GWIOError:
+                continue
+            self.assertEqual(data.pop('datetime'), int(replay.source.poll_ts))
+            replayed.append(data)
+        for data in live:
+            data.pop('datetime')
+        self.assertEqual(replayed, live)
+        # a driver replaying the capture should emit a packet per poll and
+        # then stop
+        driver = user.gw1000.GatewayDriver(replay_path=path, replay_speed=0)
+        self.addCleanup(driver.closePort)
+        packets = list(driver.genLoopPackets())
+        self.assertEqual(len(packets), len(live))
+        self.assertIn('outTemp', packets[0])
+        self.assertIn('rain', packets[-1])
+        # derived fields are added to each packet and the parsed data is
+        # held in the history
+        driver = user.gw1000.GatewayDriver(replay_path=path, replay_speed=0,
+                                           history_window=3600,
+                                           derived_fields={'rain1h': 't_rain, sum, 3600',
+                                                           'outTempMax1h': 'outtemp, max, 3600'})
+        self.addCleanup(driver.closePort)
+        packets = list(driver.genLoopPackets())
+        self.assertEqual(packets[-1]['outTempMax1h'], max(p['outTemp'] for p in packets))
+        self.assertEqual(driver.history.latest('outtemp'),
+                         (packets[-1]['dateTime'], packets[-1]['outTemp']))
+        # packets with the same timestamp replace each other in the history
+        self.assertEqual(driver.history.count, len(set(p['dateTime'] for p in packets)))
+        # the history holds history_window seconds of polls
+        self.assertEqual(driver.history.slots, 3600 // driver.poll_interval)
+        # with adaptive polling polls may be as often as the minimum poll
+        # interval
+        driver = user.gw1000.GatewayDriver(replay_path=path, replay_speed=0,
+                                           history_window=3600, adaptive_poll=True,
+                                           min_poll_interval=4)
+        self.addCleanup(driver.closePort)
+        self.assertEqual(driver.history.slots, 900)
+
+    def test_backfill(self):
+        """Test a capture can be imported into a WeeWX archive."""
+
+        sim = self.start_sim()
+        device = sim.devices[0]
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'gw.cap')
+        # capture an hour of 10 second polls using a fake clock
+        now = [1700000000.0]
+        device.last_ts = now[0]
+        device.raining = True
+        device.rain_rate = 10.0
+        totals = []
+        with patch.object(user.gw1000.time, 'time', lambda: now[0]):
+            recorder = user.gw1000.FrameRecorder(path)
+            collector = user.gw1000.GatewayCollector(ip_address='127.0.0.1',
+                                                     port=device.port,
+                                                     max_tries=1, retry_wait=0,
+                                                     recorder=recorder)
+            for i in range(360):
+                now[0] += 10
+                device.advance(now[0])
+                totals.append(collector.get_current_data()['t_raintotals'])
+            recorder.close()
+        config_dict = configobj.ConfigObj({
+            'WEEWX_ROOT': tmp_dir,
+            'StdConvert': {'target_unit': 'METRICWX'},
+            'StdArchive': {'archive_interval': 300},
+            'DataBindings': {'wx_binding': {'database': 'archive_sqlite',
+                                            'table_name': 'archive',
+                                            'manager': 'weewx.manager.DaySummaryManager',
+                                            'schema': 'weewx.schemas.wview_extended.schema'}},
+            'Databases': {'archive_sqlite': {'database_name': 'weewx.sdb',
+                                             'database_type': 'SQLite'}},
+            'DatabaseTypes': {'SQLite': {'driver': 'weedb.sqlite',
+                                         'SQLITE_ROOT': tmp_dir}},
+            'GW1000': {}})
+        importer = user.gw1000.CaptureImporter(config_dict, path, batch_size=5)
+        self.assertEqual(importer.run(), 13)
+        self.assertEqual(importer.packets, 360)
+        with weewx.manager.open_manager_with_config(config_dict, 'wx_binding') as dbm:
+            rows = list(dbm.genSql("SELECT dateTime, rain, `interval` FROM archive ORDER BY dateTime"))
+        self.assertEqual(len(rows), 13)
+        for row in rows:
+            self.assertEqual(row[0] % 300, 0)
+            self.assertEqual(row[2], 5)
+        # rain is the sum of the per-poll deltas, the first poll has no
+        # previous total to calculate a delta from
+        self.assertAlmostEqual(sum(row[1] for row in rows), totals[-1] - totals[0], places=1)
+        # a second import should not save any records
+        importer = user.gw1000.CaptureImporter(config_dict, path)
+        self.assertEqual(importer.run(), 0)
+
+    def test_archive(self):
+        """Test the driver generates and retains archive records."""
+
+        sim = self.start_sim()
+        device = sim.devices[0]
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'gw.cap')
+        ring_path = os.path.join(tmp_dir, 'archive.json')
+        # capture 20 minutes of 10 second polls using a fake clock
+        now = [1700000000.0]
+        device.last_ts = now[0]
+        with patch.object(user.gw1000.time, 'time', lambda: now[0]):
+            recorder = user.gw1000.FrameRecorder(path)
+            collector = user.gw1000.GatewayCollector(ip_address='127.0.0.1',
+                                                     port=device.port,
+                                                     max_tries=1, retry_wait=0,
+                                                     recorder=recorder)
+            for i in range(120):
+                now[0] += 10
+                device.advance(now[0])
+                collector.get_current_data()
+            recorder.close()
+        # without an archive interval WeeWX must use software record
+        # generation
+        driver = user.gw1000.GatewayDriver(replay_path=path, replay_speed=0)
+        self.addCleanup(driver.closePort)
+        with self.assertRaises(NotImplementedError):
+            driver.archive_interval
+        with self.assertRaises(NotImplementedError):
+            driver.genArchiveRecords(0)
+        driver = user.gw1000.GatewayDriver(replay_path=path, replay_speed=0,
+                                           archive_interval=300,
+                                           archive_ring_size=2,
+                                           archive_ring_path=ring_path)
+        self.addCleanup(driver.closePort)
+        self.assertEqual(driver.archive_interval, 300)
+        packets = list(driver.genLoopPackets())
+        # only completed intervals are available, the ring holds the two
+        # most recent
+        records = list(driver.genArchiveRecords(0))
+        self.assertEqual(len(records), 2)
+        for record in records:
+            self.assertEqual(record['dateTime'] % 300, 0)
+            self.assertEqual(record['interval'], 5)
+            self.assertIn('outTemp', record)
+        self.assertLess(records[-1]['dateTime'], packets[-1]['dateTime'])
+        self.assertEqual(list(driver.genArchiveRecords(records[-1]['dateTime'])), [])
+        # a new driver should restore the ring
+        driver = user.gw1000.GatewayDriver(replay_path=path, replay_speed=0,
+                                           archive_interval=300,
+                                           archive_ring_path=ring_path)
+        self.addCleanup(driver.closePort)
+        self.assertEqual(list(driver.genArchiveRecords(records[0]['dateTime'])), records[1:])
+
+    def test_process(self):
+        """Test a collector process delivers data and is restarted."""
+
+        sim = self.start_sim()
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'gw.cap')
+        recorder = user.gw1000.FrameRecorder(path, buffer_size=0)
+        collector = user.gw1000.ProcessCollector(ip_address='127.0.0.1',
+                                                 port=sim.devices[0].port,
+                                                 poll_interval=0, max_tries=1,
+                                                 retry_wait=0, recorder=recorder)
+        self.addCleanup(collector.shutdown)
+        # the collector process is spawned and logs via our loggers
+        self.assertTrue(collector.spawn)
+        with self.assertLogs('user.gw1000', 'DEBUG') as logs:
+            collector.startup()
+            self.assertIn('outtemp', collector.queue.get(True, 10))
+            timeout = time.time() + 5
+            while not any(record.process == collector.process.pid for record in logs.records):
+                self.assertLess(time.time(), timeout)
+                time.sleep(0.1)
+        # kill the collector process, it should be restarted
+        pid = collector.process.pid
+        os.kill(pid, signal.SIGKILL)
+        collector.process.join(5)
+        data = collector.queue.get(True, 10)
+        while collector.restarts == 0:
+            data = collector.queue.get(True, 10)
+        self.assertIn('outtemp', data)
+        self.assertNotEqual(collector.process.pid, pid)
+        collector.shutdown()
+        self.assertIsNone(collector.process)
+        # the collector process captured the frames it exchanged
+        cmds = set(record['cmd'] for record in user.gw1000.CaptureReader(path))
+        self.assertIn(0x27, cmds)
+
+    def test_device_cache(self):
+        """Test GatewayDevice property caching and request coalescing."""
+
+        faults = user.gw1000sim.FaultProfile(latency=0.2)
+        sim = self.start_sim(faults=faults)
+        counters = sim.stats.counters
+        device = user.gw1000.GatewayDevice(ip_address='127.0.0.1',
+                                           port=sim.devices[0].port,
+                                           max_tries=1, retry_wait=0,
+                                           cache_ttl={'livedata': 60})
+        # static data is cached until invalidated
+        count = counters['api_CMD_READ_FIRMWARE_VERSION']
+        self.assertEqual(device.firmware_version, device.firmware_version)
+        self.assertEqual(counters['api_CMD_READ_FIRMWARE_VERSION'], count + 1)
+        device.invalidate('firmware_version')
+        device.firmware_version
+        self.assertEqual(counters['api_CMD_READ_FIRMWARE_VERSION'], count + 2)
+        # concurrent requests share a single request, callers may alter their
+        # result without affecting the cached value
+        count = counters['api_CMD_GW1000_LIVEDATA']
+        results = []
+
+        def poll():
+            results.append(device.livedata)
+
+        threads = [threading.Thread(target=poll) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(counters['api_CMD_GW1000_LIVEDATA'], count + 1)
+        self.assertEqual(len(results), 5)
+        results[0]['outtemp'] = None
+        self.assertEqual(device.livedata, results[1])
+        self.assertEqual(counters['api_CMD_GW1000_LIVEDATA'], count + 1)
+        # live data that is not cached is obtained on every request
+        count = counters['api_CMD_READ_SENSOR_ID_NEW']
+        device.sensor_state
+        device.sensor_state
+        self.assertEqual(counters['api_CMD_READ_SENSOR_ID_NEW'], count + 2)
+
+    def test_command_plan(self):
+        """Test the API commands used each poll are negotiated."""
+
+        sim = self.start_sim()
+        device = sim.devices[0]
+        counters = sim.stats.counters
+        field_map = user.gw1000.Gateway.construct_field_map({})
+        collector = user.gw1000.GatewayCollector(ip_address='127.0.0.1',
+                                                 port=device.port,
+                                                 max_tries=1, retry_wait=0,
+                                                 required_fields=field_map.values())
+        # the simulated device has a WS90 so piezo rain data is required
+        data = collector.get_current_data()
+        self.assertIn('p_rainyear', data)
+        self.assertEqual(collector.command_plan, ['CMD_GW1000_LIVEDATA', 'CMD_READ_RAIN'])
+        # remove the WS90, the next poll should negotiate a new command set
+        # that does not use CMD_READ_RAIN
+        connected = device.connected_sensors()
+        del connected[b'\x30']
+        device.connected_sensors = lambda: connected
+        collector.get_current_data()
+        count = counters['api_CMD_READ_RAIN']
+        data = collector.get_current_data()
+        self.assertEqual(collector.command_plan, ['CMD_GW1000_LIVEDATA'])
+        data = collector.get_current_data()
+        self.assertEqual(counters['api_CMD_READ_RAIN'], count + 1)
+        self.assertIn('t_raintotals', data)
+        self.assertNotIn('p_rainyear', data)
+
+    def test_wind_poll(self):
+        """Test wind only polls enrich the next full poll."""
+
+        sim = self.start_sim()
+        counters = sim.stats.counters
+        collector = user.gw1000.GatewayCollector(ip_address='127.0.0.1',
+                                                 port=sim.devices[0].port,
+                                                 poll_interval=2, max_tries=1,
+                                                 retry_wait=0,
+                                                 wind_poll_interval=0.2)
+        # wind only polls decode only the wind fields
+        wind = collector.device.wind
+        self.assertIn('gustspeed', wind)
+        self.assertNotIn('outtemp', wind)
+        # record the wind data seen by the wind only polls
+        samples = []
+        add = collector.wind_accumulator.add
+
+        def record(data):
+            samples.append(data)
+            add(data)
+
+        collector.wind_accumulator.add = record
+        collector.collect_data = True
+        thread = threading.Thread(target=collector.collect)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(setattr, collector, 'collect_data', False)
+        collector.queue.get(True, 10)
+        count = counters['api_CMD_GW1000_LIVEDATA']
+        del samples[:]
+        data = collector.queue.get(True, 10)
+        collector.collect_data = False
+        # several wind only polls occurred between the full polls
+        self.assertGreaterEqual(len(samples), 4)
+        self.assertGreaterEqual(counters['api_CMD_GW1000_LIVEDATA'] - count, len(samples))
+        # the full poll reports the highest gust seen by the wind only polls
+        self.assertGreaterEqual(data['gustspeed'], max(s['gustspeed'] for s in samples))
+
+    def test_throttle(self):
+        """Test polling is throttled when the device is unhealthy."""
+
+        sim = self.start_sim()
+        counters = sim.stats.counters
+        # the simulated device always has less free heap than this
+        monitor = user.gw1000.DeviceHealthMonitor(heap_free=1000000)
+        collector = user.gw1000.GatewayCollector(ip_address='127.0.0.1',
+                                                 port=sim.devices[0].port,
+                                                 poll_interval=0, max_tries=1,
+                                                 retry_wait=0,
+                                                 health_monitor=monitor)
+        collector.collect_data = True
+        thread = threading.Thread(target=collector.collect)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(setattr, collector, 'collect_data', False)
+        data = collector.queue.get(True, 10)
+        self.assertEqual(data['throttled'], 1)
+        self.assertTrue(collector.device.serialise)
+        # sensor state data is no longer refreshed
+        count = counters['api_CMD_READ_SENSOR_ID_NEW']
+        data = collector.queue.get(True, 10)
+        collector.collect_data = False
+        self.assertEqual(data['throttled'], 1)
+        self.assertIn('ws90_batt', data)
+        self.assertEqual(counters['api_CMD_READ_SENSOR_ID_NEW'], count)
+
+    def test_retry(self):
+        """Test failed API commands fail fast and can be abandoned."""
+
+        faults = user.gw1000sim.FaultProfile()
+        sim = self.start_sim(faults=faults)
+        api = user.gw1000.GatewayApi(ip_address='127.0.0.1',
+                                     port=sim.devices[0].port,
+                                     socket_timeout=0.5, max_tries=3,
+                                     retry_wait=30, breaker_threshold=2,
+                                     breaker_reset=60)
+        api.log_failures = False
+        # a refused connection is not retried
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        port = api.port
+        api.port = sock.getsockname()[1]
+        sock.close()
+        start = time.time()
+        for i in range(2):
+            with self.assertRaises(user.gw1000.GWIOError) as cm:
+                api.send_cmd_with_retries('CMD_READ_FIRMWARE_VERSION')
+            self.assertNotIsInstance(cm.exception, user.gw1000.CircuitOpen)
+        self.assertLess(time.time() - start, 5)
+        # the circuit breaker is now open so the command is not sent
+        self.assertEqual(api.breaker.state, user.gw1000.CircuitBreaker.OPEN)
+        with self.assertRaises(user.gw1000.CircuitOpen):
+            api.send_cmd_with_retries('CMD_READ_FIRMWARE_VERSION')
+        # once the reset period has elapsed a trial command is sent
+        api.port = port
+        api.breaker.opened -= 60
+        api.send_cmd_with_retries('CMD_READ_FIRMWARE_VERSION')
+        self.assertEqual(api.breaker.state, user.gw1000.CircuitBreaker.CLOSED)
+        # waits between retries of a command that timed out can be cancelled
+        faults.drop = 1.0
+        errors = []
+
+        def send():
+            try:
+                api.send_cmd_with_retries('CMD_READ_FIRMWARE_VERSION')
+            except user.gw1000.GWIOError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=send)
+        start = time.time()
+        thread.start()
+        time.sleep(1)
+        api.retry_policy.cancel()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertLess(time.time() - start, 3)
+        self.assertEqual(len(errors), 1)
+
+    def test_rtt(self):
+        """Test socket timeouts adapt to device response times."""
+
+        faults = user.gw1000sim.FaultProfile()
+        sim = self.start_sim(faults=faults)
+        api = user.gw1000.GatewayApi(ip_address='127.0.0.1',
+                                     port=sim.devices[0].port,
+                                     socket_timeout=1, max_tries=3,
+                                     retry_wait=0, min_socket_timeout=0.5)
+        api.log_failures = False
+        stats = api.rtt_stats
+        self.assertIn('connect', stats)
+        self.assertLess(stats['CMD_GW1000_LIVEDATA']['srtt'], 0.5)
+        self.assertEqual(stats['CMD_GW1000_LIVEDATA']['timeout'], 0.5)
+        # a device slower than the initial timeout times out once then the
+        # timeout is extended
+        faults.latency = 1.2
+        count = sim.stats.counters.get('api_CMD_READ_RAIN', 0)
+        api.read_rain()
+        api.read_rain()
+        self.assertEqual(sim.stats.counters['api_CMD_READ_RAIN'] - count, 3)
+        stats = api.rtt_stats['CMD_READ_RAIN']
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertGreater(stats['timeout'], 1.2)
+
+    def test_shutdown(self):
+        """Test the collector shuts down promptly when the device hangs."""
+
+        sim = self.start_sim()
+        collector = user.gw1000.GatewayCollector(ip_address='127.0.0.1',
+                                                 port=sim.devices[0].port,
+                                                 poll_interval=0,
+                                                 socket_timeout=30,
+                                                 adaptive_timeout=False,
+                                                 max_tries=3, retry_wait=30)
+        collector.device.api.log_failures = False
+        collector.startup()
+        self.addCleanup(collector.shutdown)
+        self.assertIn('outtemp', collector.queue.get(timeout=10))
+        # a black-holed device, the connection is queued by the OS but never
+        # accepted or answered
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(8)
+        self.addCleanup(sock.close)
+        port = collector.device.api.port
+        collector.device.api.port = sock.getsockname()[1]
+        time.sleep(1.5)
+        thread = collector.thread
+        self.assertTrue(thread.is_alive())
+        start = time.time()
+        collector.shutdown()
+        self.assertLess(time.time() - start, 1)
+        self.assertFalse(thread.is_alive())
+        # the collector can be restarted
+        collector.device.api.port = port
+        while not collector.queue.empty():
+            collector.queue.get()
+        collector.startup()
+        self.assertIn('outtemp', collector.queue.get(timeout=10))
+
+    def test_push(self):
+        """Test sensor data uploaded by the device is decoded and queued."""
+
+        sim = self.start_sim()
+        collector = user.gw1000.PushCollector(ip_address='127.0.0.1',
+                                              port=sim.devices[0].port,
+                                              max_tries=1, retry_wait=0,
+                                              push_port=0, push_passkey='0123456789ABCDEF',
+                                              hybrid_poll_interval=60)
+        collector.startup()
+        self.addCleanup(collector.shutdown)
+        # wait for the first hybrid mode API poll
+        start = time.time()
+        while collector.hybrid_data is None and time.time() - start < 10:
+            time.sleep(0.1)
+        self.assertIsNotNone(collector.hybrid_data)
+        url = 'http://127.0.0.1:%d/data/report/' % collector.receiver.port
+        # replay a recorded upload
+        post = ('PASSKEY=0123456789ABCDEF&stationtype=GW2000A_V3.1.2&runtime=3164&heap=125364'
+                '&dateutc=2024-05-01+10:20:30&tempinf=72.1&humidityin=45&baromrelin=29.921'
+                '&baromabsin=29.785&tempf=60.8&humidity=70&winddir=180&windspeedmph=4.47'
+                '&windgustmph=6.93&maxdailygust=10.29&solarradiation=100.00&uv=1'
+                '&rainratein=0.000&eventrainin=0.122&hourlyrainin=0.000&dailyrainin=0.039'
+                '&weeklyrainin=0.500&monthlyrainin=1.000&yearlyrainin=10.000&totalrainin=10.000'
+                '&temp1f=68.0&humidity1=50&soilmoisture1=33&soilbatt1=1.4&pm25_ch1=5.0'
+                '&pm25_avg_24h_ch1=6.0&pm25batt1=5&wh65batt=0&batt1=0&freq=868M'
+                '&model=GW2000A&interval=16')
+        response = urllib.request.urlopen(url, data=post.encode('ascii'), timeout=5)
+        self.assertEqual(response.getcode(), 200)
+        data = collector.queue.get(timeout=5)
+        self.assertEqual(data['datetime'], 1714558830)
+        self.assertEqual(data['intemp'], 22.3)
+        self.assertEqual(data['outhumid'], 70)
+        self.assertEqual(data['relbarometer'], 1013.2)
+        self.assertEqual(data['windspeed'], 2.0)
+        self.assertEqual(data['gustspeed'], 3.1)
+        self.assertEqual(data['light'], 12670.0)
+        self.assertEqual(data['uvi'], 1)
+        self.assertEqual(data['t_rainday'], 1.0)
+        self.assertEqual(data['t_raintotals'], 254.0)
+        self.assertEqual(data['temp1'], 20.0)
+        self.assertEqual(data['heap_free'], 125364)
+        self.assertEqual(data['wh65_batt'], 0)
+        self.assertEqual(data['wh31_ch1_batt'], 0)
+        self.assertEqual(data['wh51_ch1_batt'], 1.4)
+        self.assertEqual(data['wh41_ch1_batt'], 5)
+        # fields not included in the upload are obtained via the API
+        self.assertEqual(data['uv'], collector.hybrid_data['uv'])
+        self.assertIn('ws90_sig', data)
+        # uploads with the wrong passkey are refused
+        with self.assertRaises(urllib.error.HTTPError) as cm:
+            urllib.request.urlopen(url, data=post.replace('0123', '9999').encode('ascii'),
+                                   timeout=5)
+        self.assertEqual(cm.exception.code, 403)
+        self.assertTrue(collector.queue.empty())
+        self.assertEqual(collector.receiver.received, 1)
+        self.assertEqual(collector.receiver.refused, 1)
+        # stale API data is not added to uploads
+        collector.hybrid_ts -= 3 * 60 + 1
+        urllib.request.urlopen(url, data=post.encode('ascii'), timeout=5)
+        data = collector.queue.get(timeout=5)
+        self.assertEqual(data['intemp'], 22.3)
+        self.assertNotIn('ws90_sig', data)
+
+    def test_push_hybrid_failure(self):
+        """Test uploads continue to be queued when hybrid mode polls fail."""
+
+        sim = self.start_sim()
+        collector = user.gw1000.PushCollector(ip_address='127.0.0.1',
+                                              port=sim.devices[0].port,
+                                              max_tries=1, retry_wait=0,
+                                              push_port=0, push_passkey='0123456789ABCDEF',
+                                              hybrid_poll_interval=1)
+        with patch.object(collector, 'get_current_data',
+                          side_effect=user.gw1000.GWIOError('timed out')) as get_current_data:
+            collector.startup()
+            self.addCleanup(collector.shutdown)
+            # wait for several failed hybrid mode API polls
+            start = time.time()
+            while get_current_data.call_count < 2 and time.time() - start < 10:
+                time.sleep(0.1)
+            self.assertGreaterEqual(get_current_data.call_count, 2)
+            self.assertIsNone(collector.hybrid_data)
+            # the failures are not passed to our parent
+            self.assertTrue(collector.queue.empty())
+            # uploads are still queued, without API data
+            url = 'http://127.0.0.1:%d/data/report/' % collector.receiver.port
+            post = ('PASSKEY=0123456789ABCDEF&stationtype=GW2000A_V3.1.2'
+                    '&dateutc=2024-05-01+10:20:30&tempinf=72.1&humidityin=45'
+                    '&model=GW2000A&interval=16')
+            urllib.request.urlopen(url, data=post.encode('ascii'), timeout=5)
+            data = collector.queue.get(timeout=5)
+            self.assertEqual(data['intemp'], 22.3)
+            self.assertNotIn('ws90_sig', data)
+            self.assertTrue(collector.queue.empty())
+
+    def test_hybrid_livedata(self):
+        """Test live data fields are routed to the API or HTTP."""
+
+        sim = self.start_sim()
+        device = sim.devices[0]
+        # the simulated device provides piezo rain data via HTTP but not via
+        # CMD_GW1000_LIVEDATA
+        collector = user.gw1000.GatewayCollector(ip_address='127.0.0.1',
+                                                 port=device.port,
+                                                 max_tries=1, retry_wait=0,
+                                                 required_fields=['outtemp', 'windspeed',
+                                                                  'p_rainday'],
+                                                 hybrid_livedata=True)
+        collector.device.http.ip_address = '127.0.0.1:%d' % device.http_port
+        # as per a real device HTTP responses are slower than API responses
+        get_livedata_info = collector.device.http.get_livedata_info
+
+        def slow_get_livedata_info():
+            time.sleep(0.05)
+            return get_livedata_info()
+
+        collector.device.http.get_livedata_info = slow_get_livedata_info
+        # HTTP data is normalised to match the API
+        http_data = collector.device.http_livedata
+        api_data = collector.device.livedata
+        for field in ('intemp', 'outhumid', 'relbarometer', 'winddir',
+                      't_rainday', 'temp1', 'pm251', 'soilmoist1'):
+            self.assertIsInstance(http_data[field], type(api_data[field]))
+            self.assertAlmostEqual(http_data[field], api_data[field], delta=30)
+        self.assertNotIn('p_rainday', api_data)
+        router = collector.livedata_router
+        count = sim.stats.counters.get('http_get_livedata_info', 0)
+        for i in range(3):
+            data = collector.get_current_data()
+            self.assertIsNotNone(data['p_rainday'])
+            self.assertIsNotNone(data['outtemp'])
+        # both transports are used each poll, the piezo rain fields are
+        # obtained via HTTP so CMD_READ_RAIN is not required
+        self.assertEqual(sim.stats.counters['http_get_livedata_info'] - count, 3)
+        self.assertIn('p_rainday', router.routes['http'])
+        self.assertNotIn('CMD_READ_RAIN', collector.command_plan)
+        for transport in router.transports:
+            self.assertEqual(router.stats[transport]['requests'], 3)
+            self.assertGreater(router.stats[transport]['latency'], 0)
+            self.assertIsNotNone(router.stats[transport]['cpu'])
+        # if the API provides all required fields HTTP is only used to probe
+        router.required_fields = set(['outtemp', 'windspeed'])
+        router.routes = None
+        count = sim.stats.counters['http_get_livedata_info']
+        for i in range(3):
+            self.assertIn('outtemp', collector.get_current_data())
+        self.assertEqual(sim.stats.counters['http_get_livedata_info'] - count, 1)
+        self.assertFalse(router.routes['http'])
+
+    def test_failover(self):
+        """Test failover to a standby device and back again."""
+
+        sim = self.start_sim(devices=2)
+        primary, standby = sim.devices
+        for device in sim.devices:
+            device.raining = False
+        collector = user.gw1000.FailoverCollector(ip_address='127.0.0.1',
+                                                  port=primary.port,
+                                                  standby_ip_address='127.0.0.1',
+                                                  standby_port=standby.port,
+                                                  health_check_interval=0,
+                                                  failback_checks=2,
+                                                  max_tries=1, retry_wait=0,
+                                                  breaker_threshold=0)
+
+        def poll():
+            # poll then wait for any resulting health check to complete
+            data = collector.get_current_data()
+            if collector.check_thread is not None:
+                collector.check_thread.join(10)
+            return data
+
+        # by default the standby device is the retry for the primary device
+        self.assertEqual(collector.devices[0].api.max_tries, 1)
+        # the standby is aligned with the primary as it is health checked
+        data = poll()
+        self.assertEqual(collector.active, 0)
+        self.assertNotAlmostEqual(standby.t_rain['totals'], data['t_raintotals'], places=1)
+        total = data['t_raintotals']
+        count = data['lightningcount']
+        # rain and lightning after the last health check must not be lost
+        standby.t_rain['totals'] += 2.0
+        standby.lightning_count += 3
+        # the primary fails, the standby is polled instead
+        with patch.object(collector.devices[0].api, 'send_cmd',
+                          side_effect=socket.timeout('timed out')):
+            data = poll()
+            self.assertEqual(collector.active, 1)
+            self.assertAlmostEqual(data['t_raintotals'], total + 2.0, places=3)
+            self.assertEqual(data['lightningcount'], count + 3)
+            # the primary is not used while it is failing
+            data = poll()
+            self.assertEqual(collector.active, 1)
+        # the primary recovers and is used once it passes two health checks
+        for i in range(2):
+            poll()
+            self.assertEqual(collector.active, 1)
+        data = poll()
+        self.assertEqual(collector.active, 0)
+        self.assertEqual(collector.switches, 2)
+        self.assertAlmostEqual(data['t_raintotals'], total + 2.0, places=3)
+        self.assertEqual(data['lightningcount'], count + 3)
+
+    def test_failover_standby_down(self):
+        """Test an unresponsive standby device does not delay polls."""
+
+        sim = self.start_sim()
+        # the standby accepts connections but never responds
+        standby = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(standby.close)
+        standby.bind(('127.0.0.1', 0))
+        standby.listen(16)
+        start = time.time()
+        collector = user.gw1000.FailoverCollector(ip_address='127.0.0.1',
+                                                  port=sim.devices[0].port,
+                                                  standby_ip_address='127.0.0.1',
+                                                  standby_port=standby.getsockname()[1],
+                                                  health_check_interval=0,
+                                                  primary_max_tries=2,
+                                                  max_tries=1, retry_wait=0)
+        self.addCleanup(collector.cancel_event.set)
+        # the standby is not contacted during startup
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(collector.devices[0].api.max_tries, 2)
+        self.assertEqual(collector.devices[1].api.max_tries, 1)
+        device = collector.devices[1]
+        breaker = device.api.breaker
+        deadline = time.time() + 20
+        while breaker.state != user.gw1000.CircuitBreaker.OPEN and time.time() < deadline:
+            start = time.time()
+            self.assertIn('outtemp', collector.get_current_data())
+            # polls of the primary are not held up by the health checks
+            self.assertLess(time.time() - start, 0.5)
+            time.sleep(0.1)
+        # the same standby device is health checked each time, so its circuit
+        # breaker opens
+        self.assertIs(collector.devices[1], device)
+        self.assertEqual(breaker.state, user.gw1000.CircuitBreaker.OPEN)
+        self.assertEqual(collector.active, 0)
+        self.assertEqual(collector.check_successes[1], 0)
+
+    def test_multi_gateway(self):
+        """Test sensor data is combined from more than one device."""
+
+        sim = self.start_sim(devices=2)
+        first, second = sim.devices
+        collector = user.gw1000.MultiGatewayCollector(ip_address='127.0.0.1',
+                                                      port=first.port,
+                                                      gateways=[('127.0.0.1', second.port)],
+                                                      max_tries=1, retry_wait=0,
+                                                      breaker_threshold=0)
+        self.assertEqual(len(collector.devices), 2)
+        data = collector.get_current_data()
+        self.assertIn('outtemp', data)
+        self.assertIn('temp1', data)
+        # each device hears its own sensors at the same signal level so ties
+        # go to the first device
+        self.assertTrue(collector.arbiter.choices)
+        self.assertEqual(set(index for sensor_id, index in collector.arbiter.choices.values()),
+                         {0})
+        self.assertIn('heap_free', data)
+        # the first device fails, its sensors are taken from the second, the
+        # failure is logged once only
+        with patch.object(collector.devices[0].api, 'send_cmd',
+                          side_effect=socket.timeout('timed out')):
+            with self.assertLogs('user.gw1000', 'ERROR') as logs:
+                for i in range(2):
+                    data = collector.get_current_data()
+            self.assertEqual(len([line for line in logs.output if 'Unable to obtain data' in line]), 1)
+            self.assertIn('outtemp', data)
+            self.assertIn('temp1', data)
+            self.assertEqual(set(index for sensor_id, index in collector.arbiter.choices.values()),
+                             {1})
+            # device health is that of the first device only
+            self.assertNotIn('heap_free', data)
+            self.assertIsNone(collector.latency)
+        # data is combined again once the first device recovers
+        collector.get_current_data()
+        self.assertEqual(set(index for sensor_id, index in collector.arbiter.choices.values()),
+                         {0})
+        self.assertIsNotNone(collector.latency)
+
+    def test_multi_gateway_device_down(self):
+        """Test an unresponsive additional device does not delay polls."""
+
+        sim = self.start_sim()
+        # the additional device accepts connections but never responds
+        gateway = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(gateway.close)
+        gateway.bind(('127.0.0.1', 0))
+        gateway.listen(16)
+        start = time.time()
+        collector = user.gw1000.MultiGatewayCollector(ip_address='127.0.0.1',
+                                                      port=sim.devices[0].port,
+                                                      gateways=[('127.0.0.1', gateway.getsockname()[1])],
+                                                      max_tries=1, retry_wait=0)
+        # the additional device is not contacted during startup
+        self.assertLess(time.time() - start, 1)
+        device = collector.devices[1]
+        # each poll waits at most one short socket timeout for the device
+        # until its circuit breaker opens
+        for i in range(user.gw1000.default_breaker_threshold):
+            start = time.time()
+            self.assertIn('outtemp', collector.get_current_data())
+            self.assertLess(time.time() - start, user.gw1000.default_secondary_socket_timeout + 0.5)
+        self.assertIs(collector.devices[1], device)
+        self.assertEqual(device.api.breaker.state, user.gw1000.CircuitBreaker.OPEN)
+        # the device is then skipped
+        start = time.time()
+        self.assertIn('outtemp', collector.get_current_data())
+        self.assertLess(time.time() - start, 0.5)
+
+    def test_direct_session(self):
+        """Test direct mode actions send only the API commands they need."""
+
+        sim = self.start_sim()
+        device = sim.devices[0]
+        opts = argparse.Namespace(ip_address='127.0.0.1', port=device.port,
+                                  show_battery=False, sys_params=True)
+        direct_gw = user.gw1000.DirectGateway(opts, None, {})
+
+        def commands_sent(action):
+            before = dict(sim.stats.counters)
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                action()
+            return output.getvalue(), dict((key, value - before.get(key, 0))
+                                           for key, value in sim.stats.counters.items()
+                                           if value != before.get(key, 0))
+
+        # the device is identified by model only, the commands the action
+        # requires are sent over a single connection that is then closed
+        output, sent = commands_sent(direct_gw.process_options)
+        self.assertIn('Interrogating', output)
+        self.assertIn('frequency', output)
+        self.assertEqual(sent, {'api_connections': 1,
+                                'api_CMD_READ_FIRMWARE_VERSION': 1,
+                                'api_CMD_READ_SSSS': 1,
+                                'api_CMD_READ_RAIN': 1})
+        self.assertIsNone(direct_gw.session.api.connection)
+        output, sent = commands_sent(direct_gw.station_mac)
+        self.assertIn('MAC address', output)
+        self.assertEqual(sent, {'api_connections': 1,
+                                'api_CMD_READ_STATION_MAC': 1})
+        direct_gw.session.close()
+        # a connection closed by the device is replaced without the command
+        # failing
+        with user.gw1000.DirectSession(ip_address='127.0.0.1', port=device.port) as session:
+            api = session.api
+            api.max_tries = 1
+            self.assertIsNone(api.connection)
+            session.device.firmware_version
+            self.assertIsNotNone(api.connection)
+            # an invalid request causes the device to close the connection
+            api.connection.sendall(b'\x00\x00\x00\x00')
+            self.assertEqual(api.get_mac_address(), api.mac)
+        self.assertIsNone(api.connection)
+
+    def test_follow_live_data(self):
+        """Test --live-data --follow displays live data as JSON Lines."""
+
+        sim = self.start_sim()
+        device = sim.devices[0]
+
+        def follow(**kwargs):
+            opts = argparse.Namespace(ip_address='127.0.0.1', port=device.port,
+                                      show_battery=False, live=True, follow=True,
+                                      poll_interval=0.2, count=3, **kwargs)
+            direct_gw = user.gw1000.DirectGateway(opts, None, {})
+            before = sim.stats.counters.get('api_connections', 0)
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                direct_gw.process_options()
+            # all polls use the same connection
+            self.assertEqual(sim.stats.counters['api_connections'] - before, 1)
+            return [json.loads(line) for line in output.getvalue().splitlines()]
+
+        # MetricWX values are displayed as obtained from the device
+        packets = follow(units='metricwx', changed_only=False)
+        self.assertEqual(len(packets), 3)
+        for packet in packets:
+            self.assertEqual(packet['usUnits'], weewx.METRICWX)
+            self.assertIn('datetime', packet)
+            self.assertIn('outtemp', packet)
+        # US customary values are converted and rounded
+        packet = follow(units='us', changed_only=False)[0]
+        self.assertEqual(packet['usUnits'], weewx.US)
+        self.assertGreater(packet['absbarometer'], 25)
+        self.assertLess(packet['absbarometer'], 35)
+        self.assertEqual(packet['absbarometer'], round(packet['absbarometer'], 3))
+        # only changed fields are displayed after the first packet
+        packets = follow(units='metric', changed_only=True)
+        self.assertIn('intemp', packets[0])
+        for packet in packets[1:]:
+            self.assertIn('datetime', packet)
+            self.assertEqual(packet['usUnits'], weewx.METRIC)
+            self.assertLess(len(packet), len(packets[0]))
+
+
+def suite(test_cases):
+    """Create a TestSuite object containing the tests we are to perform."""
+
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    for test_class in test_cases:
+        suite.addTests(loader.loadTestsFromTestCase(test_class))
+    return suite
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Test the Ecowitt gateway simulator.')
+    parser.add_argument('--version', dest='version', action='store_true',
+                        help='display Ecowitt gateway simulator test suite version number')
+    parser.add_argument('--verbose', dest='verbosity', type=int, metavar="VERBOSITY",
+                        default=2,
+                        help='How much status to display, 0-2')
+    args = parser.parse_args()
+    if args.version:
+        print("%s test suite version: %s" % (TEST_SUITE_NAME, TEST_SUITE_VERSION))
+        exit(0)
+    runner = unittest.TextTestRunner(verbosity=args.verbosity)
+    runner.run(suite((VirtualDeviceTestCase, SimulatorTestCase)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+import_time.py
+
+A python program to measure the time taken to import the Ecowitt gateway
+driver.
+
+Each measurement is made in a new python interpreter so that every import is a
+cold import. By default the WeeWX modules the WeeWX engine has already
+imported when it loads a driver are imported before the measurement is made,
+so the result is the additional cost of loading the driver. Use --cold to
+include the WeeWX modules in the measurement.
+
+To run the program:
+
+    $ PYTHONPATH=/usr/share/weewx:/etc/weewx/bin python3 import_time.py
+
+    or for a pip install:
+
+    $ PYTHONPATH=~/weewx-data/bin python3 import_time.py
+
+Use --help to display the available options.
+"""
+
+# Python imports
+from __future__ import print_function
+
+import argparse
+import subprocess
+import sys
+
+VERSION = '0.1.0'
+
+# modules imported by the WeeWX engine before a driver is loaded
+engine_modules = ('weeutil.logger', 'weeutil.weeutil', 'weewx.accum',
+                  'weewx.drivers', 'weewx.engine', 'weewx.units')
+
+# program run in the new interpreter, prints the import time in milliseconds
+# and the number of modules the import added
+measure_program = """
+import importlib, sys, time
+for name in %(preload)r:
+    importlib.import_module(name)
+before = len(sys.modules)
+start = time.time()
+importlib.import_module(%(module)r)
+print('%%.3f %%d' %% ((time.time() - start) * 1000.0, len(sys.modules) - before))
+"""
+
+
+def measure(module, preload, repeat):
+    """Import a module in repeat new interpreters.
+
+    Returns a list of (import time in ms, number of modules added) tuples.
+    """
+
+    program = measure_program % {'module': module, 'preload': preload}
+    results = []
+    for i in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', program])
+        ms, count = output.decode().split()
+        results.append((float(ms), int(count)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the time taken to '
+                                                 'import the Ecowitt gateway driver.')
+    parser.add_argument('--version', action='version', version=VERSION)
+    parser.add_argument('--module', default='user.gw1000',
+                        help='module to import, default is user.gw1000')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='number of measurements to make, default is 20')
+    parser.add_argument('--cold', action='store_true',
+                        help='do not import the WeeWX engine modules first')
+    args = parser.parse_args()
+    preload = () if args.cold else engine_modules
+    # import once to make sure any byte code has been compiled
+    measure(args.module, preload, 1)
+    results = measure(args.module, preload, args.repeat)
+    times = sorted(ms for ms, count in results)
+    print("%s: %d imports, %d modules added" % (args.module, len(times), results[0][1]))
+    print("    min %.1f ms, median %.1f ms, max %.1f ms" % (times[0],
+                                                          times[len(times) // 2],
+                                                          times[-1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -427,6 +427,11 @@ class Gw1000Installer(ExtensionInstaller):
             description='WeeWX driver for devices using the Ecowitt LAN/Wi-Fi Gateway API.',
             author="Gary Roderick",
             author_email="gjroderick<@>gmail.com",
-            files=[('bin/user', ['bin/user/gw1000.py'])],
+            files=[('bin/user/gw1000', ['bin/user/gw1000/__init__.py',
+                                         'bin/user/gw1000/__main__.py',
+                                         'bin/user/gw1000/config.py',
+                                         'bin/user/gw1000/direct.py',
+                                         'bin/user/gw1000/process.py',
+                                         'bin/user/gw1000/push.py'])],
             config=gw1000_dict
         )
\ No newline at end of file